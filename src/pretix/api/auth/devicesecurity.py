@@ -103,6 +103,7 @@ class PretixScanSecurityProfile(AllowListSecurityProfile):
         ('GET', 'api-v1:revokedsecrets-list'),
         ('GET', 'api-v1:blockedsecrets-list'),
         ('GET', 'api-v1:order-list'),
+        ('GET', 'api-v1:event.changes'),
         ('GET', 'api-v1:orderposition-pdf_image'),
         ('POST', 'api-v1:orderposition-printlog'),
         ('GET', 'api-v1:event.settings'),
@@ -57,6 +57,7 @@ from pretix.base.models import (
     CartPosition, Device, Event, OrderPosition, SalesChannel, Seat, TaxRule,
     TeamAPIToken, Voucher,
 )
+from pretix.base.models.changefeed import EventChange
 from pretix.base.models.event import SubEvent
 from pretix.base.models.items import (
     ItemMetaProperty, SubEventItem, SubEventItemVariation,
@@ -470,6 +471,35 @@ class CloneEventSerializer(EventSerializer):
         return new_event
 
 
+class BulkCloneEventEntrySerializer(I18nAwareModelSerializer):
+    class Meta:
+        model = Event
+        fields = ('name', 'slug', 'date_from', 'date_to', 'date_admission', 'presale_start', 'presale_end',
+                  'location')
+
+    def validate(self, data):
+        data = super().validate(data)
+        Event.clean_dates(data.get('date_from'), data.get('date_to'))
+        Event.clean_presale(data.get('presale_start'), data.get('presale_end'))
+        return data
+
+    def validate_slug(self, value):
+        Event.clean_slug(self.context['organizer'], None, value)
+        return value
+
+
+class BulkCloneEventSerializer(serializers.Serializer):
+    events = BulkCloneEventEntrySerializer(many=True, allow_empty=False)
+
+    def validate_events(self, value):
+        slugs = [e['slug'].lower() for e in value]
+        if len(slugs) != len(set(slugs)):
+            raise ValidationError('Duplicate event slug in request.')
+        if len(slugs) > 500:
+            raise ValidationError('You can clone an event into at most 500 new events at once.')
+        return value
+
+
 class SubEventItemSerializer(I18nAwareModelSerializer):
     class Meta:
         model = SubEventItem
@@ -748,6 +778,10 @@ class EventSettingsSerializer(SettingsSerializer):
         'hide_sold_out',
         'meta_noindex',
         'redirect_to_checkout_directly',
+        'waiting_room_active',
+        'waiting_room_rate',
+        'waiting_room_adaptive',
+        'waiting_room_admission_minutes',
         'frontpage_subevent_ordering',
         'event_list_type',
         'event_list_available_only',
@@ -1012,6 +1046,16 @@ class ItemMetaPropertiesSerializer(I18nAwareModelSerializer):
         fields = ('id', 'name', 'default', 'required', 'allowed_values')
 
 
+class EventChangeSerializer(serializers.ModelSerializer):
+    seq = serializers.IntegerField(source='pk')
+    type = serializers.CharField(source='object_type')
+    id = serializers.IntegerField(source='object_id')
+
+    class Meta:
+        model = EventChange
+        fields = ('seq', 'type', 'id', 'action', 'data')
+
+
 def prefetch_by_id(items, qs, id_attr, target_attr):
     """
     Prefetches a related object on each item in the given list of items by searching by id or another
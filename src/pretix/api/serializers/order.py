@@ -64,6 +64,10 @@ from pretix.base.models.orders import (
 from pretix.base.pdf import get_images, get_variables
 from pretix.base.services.cart import error_messages
 from pretix.base.services.locking import LOCK_TRUST_WINDOW, lock_objects
+from pretix.base.services.pdfdata import (
+    enqueue_pdf_data_refresh, evaluate_image_variables, evaluate_meta_data,
+    evaluate_text_variables, get_snapshot,
+)
 from pretix.base.services.pricing import (
     apply_discounts, apply_rounding, get_line_price, get_listed_price,
     is_included_for_free,
@@ -461,71 +465,46 @@ class PdfDataSerializer(serializers.Field):
         if 'event' not in self.context:
             return {}
 
-        ev = instance.subevent or instance.order.event
+        event = self.context['event'] if self.context['event'].pk == instance.order.event_id else instance.order.event
         with language(instance.order.locale, instance.order.event.settings.region):
             # This needs to have some extra performance improvements to avoid creating hundreds of queries when
             # we serialize a list.
 
             if 'vars' not in self.context:
                 self.context['vars'] = get_variables(self.context['event'])
+                self.context['vars_volatile'] = {k: f for k, f in self.context['vars'].items() if f.get('volatile')}
 
             if 'vars_images' not in self.context:
                 self.context['vars_images'] = get_images(self.context['event'])
+                self.context['vars_images_volatile'] = {
+                    k: f for k, f in self.context['vars_images'].items() if f.get('volatile')
+                }
 
-            for k, f in self.context['vars'].items():
-                if 'evaluate_bulk' in f:
-                    # Will be evaluated later by our list serializers
-                    res[k] = (f['evaluate_bulk'], instance)
-                else:
-                    try:
-                        res[k] = f['evaluate'](instance, instance.order, ev)
-                    except:
-                        logger.exception('Evaluating PDF variable failed')
-                        res[k] = '(error)'
-
-            if not hasattr(ev, '_cached_meta_data'):
-                ev._cached_meta_data = ev.meta_data
-
-            for k, v in ev._cached_meta_data.items():
-                res['meta:' + k] = v
-
-            if instance.variation_id:
-                if not hasattr(instance.variation, '_cached_meta_data'):
-                    instance.variation.item = instance.item  # saves some database lookups
-                    instance.variation._cached_meta_data = instance.variation.meta_data
-                for k, v in instance.variation._cached_meta_data.items():
-                    res['itemmeta:' + k] = v
+            snapshot = get_snapshot(instance, event)
+            if snapshot is not None:
+                res.update(snapshot['text'])
+                res.update(evaluate_text_variables(instance, self.context['vars_volatile'], defer_bulk=True))
+                images = {
+                    **snapshot['images'],
+                    **evaluate_image_variables(instance, self.context['vars_images_volatile']),
+                }
             else:
-                if not hasattr(instance.item, '_cached_meta_data'):
-                    instance.item._cached_meta_data = instance.item.meta_data
-                for k, v in instance.item._cached_meta_data.items():
-                    res['itemmeta:' + k] = v
+                # Will be computed in the background for the next request
+                self.context.setdefault('pdf_data_outdated', defaultdict(list))[event].append(instance.pk)
+                res.update(evaluate_text_variables(instance, self.context['vars'], defer_bulk=True))
+                res.update(evaluate_meta_data(instance))
+                images = evaluate_image_variables(instance, self.context['vars_images'])
 
             res['images'] = {}
-
-            for k, f in self.context['vars_images'].items():
-                if 'etag' in f:
-                    try:
-                        has_image = etag = f['etag'](instance, instance.order, ev)
-                    except:
-                        has_image = False
-                        etag = None
-                        logger.exception('Evaluating PDF variable failed')
-                else:
-                    try:
-                        has_image = f['valuate'](instance, instance.order, ev)
-                        etag = None
-                    except:
-                        has_image = False
-                        logger.exception('Evaluating PDF variable failed')
-                if has_image:
+            for k, etag in images.items():
+                if etag:
                     url = reverse('api-v1:orderposition-pdf_image', kwargs={
                         'organizer': instance.order.event.organizer.slug,
                         'event': instance.order.event.slug,
                         'pk': instance.pk,
                         'key': k,
                     }, request=self.context['request'])
-                    if etag:
+                    if etag is not True:
                         url += f'#etag={etag}'
                     res['images'][k] = url
                 else:
@@ -534,6 +513,11 @@ class PdfDataSerializer(serializers.Field):
             return res
 
 
+def _refresh_outdated_pdf_data(context):
+    for event, positions in context.pop('pdf_data_outdated', {}).items():
+        enqueue_pdf_data_refresh(event, positions=positions)
+
+
 class OrderPositionListSerializer(serializers.ListSerializer):
 
     def to_representation(self, data):
@@ -563,6 +547,7 @@ class OrderPositionListSerializer(serializers.ListSerializer):
             for (item, entry, k), result in zip(entries, results):
                 entry["pdf_data"][k] = result
 
+        _refresh_outdated_pdf_data(self.context)
         return data
 
 
@@ -633,6 +618,7 @@ class OrderPositionSerializer(I18nAwareModelSerializer):
                 if isinstance(v, tuple) and callable(v[0]):
                     entry["pdf_data"][k] = v[0]([v[1]])[0]
 
+        _refresh_outdated_pdf_data(self.context)
         return entry
 
 
@@ -813,6 +799,7 @@ class OrderListSerializer(serializers.ListSerializer):
             for (item, entry, k), result in zip(entries, results):
                 entry["pdf_data"][k] = result
 
+        _refresh_outdated_pdf_data(self.context)
         return data
 
 
@@ -27,20 +27,30 @@ from rest_framework.exceptions import ValidationError
 from pretix.api.serializers.i18n import I18nAwareModelSerializer
 from pretix.base.models import Seat, Voucher
 from pretix.base.models.vouchers import generate_codes
+from pretix.base.services.vouchers import bulk_create_vouchers
 
 
 class VoucherListSerializer(serializers.ListSerializer):
     def create(self, validated_data):
+        event = self.context['event']
         vouchers_without_codes = [v for v in validated_data if not v.get('code')]
 
-        for voucher_data, code in zip(vouchers_without_codes, generate_codes(self.context['event'].organizer, num=len(vouchers_without_codes), prefix=None)):
+        for voucher_data, code in zip(vouchers_without_codes, generate_codes(event.organizer, num=len(vouchers_without_codes), prefix=None)):
             voucher_data['code'] = code
 
+        codes = {v['code'].upper() for v in validated_data}
+        existing_codes = set()
+        codes_list = list(codes)
+        for i in range(0, len(codes_list), 500):  # Work around SQLite's SQLITE_MAX_VARIABLE_NUMBER
+            existing_codes |= set(event.vouchers.filter(code__in=codes_list[i:i + 500]).values_list('code', flat=True))
+
+        unavailable = Voucher.clean_quota_check_bulk(validated_data, event)
+
         codes = set()
         seats = set()
         errs = []
         err = False
-        for voucher_data in validated_data:
+        for i, voucher_data in enumerate(validated_data):
             if voucher_data.get('seat') and (voucher_data.get('seat'), voucher_data.get('subevent')) in seats:
                 err = True
                 errs.append({'code': ['Duplicate seat ID in request.']})
@@ -48,15 +58,33 @@ class VoucherListSerializer(serializers.ListSerializer):
             else:
                 seats.add((voucher_data.get('seat'), voucher_data.get('subevent')))
 
-            if voucher_data['code'] in codes:
+            if voucher_data['code'].upper() in codes:
                 err = True
                 errs.append({'code': ['Duplicate voucher code in request.']})
+            elif voucher_data['code'].upper() in existing_codes:
+                err = True
+                errs.append({'code': ['A voucher with this code already exists.']})
+            elif i in unavailable:
+                err = True
+                errs.append({'block_quota': ['You cannot create a voucher that blocks quota as the selected product or '
+                                             'quota is currently sold out or completely reserved.']})
             else:
-                codes.add(voucher_data['code'])
+                codes.add(voucher_data['code'].upper())
                 errs.append({})
         if err:
             raise ValidationError(errs)
-        return super().create(validated_data)
+
+        request = self.context['request']
+        log_data = {
+            voucher_data['code'].upper(): request.data[i] for i, voucher_data in enumerate(validated_data)
+        }
+        return bulk_create_vouchers(
+            event,
+            [Voucher(**voucher_data) for voucher_data in validated_data],
+            log_data=lambda v: log_data[v.code],
+            user=request.user,
+            auth=request.auth,
+        )
 
 
 class SeatGuidField(serializers.CharField):
@@ -77,6 +105,11 @@ class VoucherSerializer(I18nAwareModelSerializer):
         read_only_fields = ('id', 'redeemed', 'budget_used')
         list_serializer_class = VoucherListSerializer
 
+    @property
+    def in_batch(self):
+        # Quota availability and existing codes of a batch are checked together in VoucherListSerializer.create()
+        return isinstance(self.parent, VoucherListSerializer)
+
     def validate(self, data):
         data = super().validate(data)
 
@@ -101,7 +134,7 @@ class VoucherSerializer(I18nAwareModelSerializer):
             ),
             creating=not self.instance
         )
-        if check_quota:
+        if check_quota and not self.in_batch:
             Voucher.clean_quota_check(
                 full_data,
                 full_data.get('max_usages', 1) - (self.instance.redeemed if self.instance else 0),
@@ -111,7 +144,8 @@ class VoucherSerializer(I18nAwareModelSerializer):
                 full_data.get('item'),
                 full_data.get('variation')
             )
-        Voucher.clean_voucher_code(full_data, self.context.get('event'), self.instance.pk if self.instance else None)
+        if not self.in_batch:
+            Voucher.clean_voucher_code(full_data, self.context.get('event'), self.instance.pk if self.instance else None)
 
         if full_data.get('seat'):
             data['seat'] = Voucher.clean_seat_id(
@@ -405,7 +405,8 @@ def _checkin_list_position_queryset(checkinlists, ignore_status=False, ignore_pr
                 )
             ))
         ).select_related(
-            'item', 'variation', 'item__category', 'addon_to', 'order', 'order__invoice_address', 'seat'
+            'item', 'variation', 'item__category', 'addon_to', 'order', 'order__invoice_address', 'seat',
+            'cached_pdf_data',
         )
     else:
         qs = qs.prefetch_related(
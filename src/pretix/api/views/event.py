@@ -33,24 +33,29 @@
 # License for the specific language governing permissions and limitations under the License.
 
 import django_filters
+from celery.result import AsyncResult
 from django.conf import settings
+from django.core.cache import cache
 from django.db import transaction
 from django.db.models import Prefetch, ProtectedError, Q
 from django.utils.timezone import now
 from django_filters.rest_framework import DjangoFilterBackend, FilterSet
 from django_scopes import scopes_disabled
-from rest_framework import serializers, views, viewsets
+from rest_framework import serializers, status, views, viewsets
 from rest_framework.decorators import action
 from rest_framework.exceptions import (
     NotFound, PermissionDenied, ValidationError,
 )
 from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
 
 from pretix.api.auth.permission import EventCRUDPermission
+from pretix.api.models import OAuthAccessToken
 from pretix.api.pagination import TotalOrderingFilter
 from pretix.api.serializers.event import (
-    CloneEventSerializer, DeviceEventSettingsSerializer, EventSerializer,
+    BulkCloneEventSerializer, CloneEventSerializer,
+    DeviceEventSettingsSerializer, EventChangeSerializer, EventSerializer,
     EventSettingsSerializer, ItemMetaPropertiesSerializer,
     SeatBulkBlockInputSerializer, SeatSerializer, SubEventSerializer,
     TaxRuleSerializer,
@@ -61,6 +66,10 @@ from pretix.base.models import (
     TaxRule, TeamAPIToken,
 )
 from pretix.base.models.event import SubEvent
+from pretix.base.services.changefeed import (
+    CHANGE_FEED_MAX_PAGE_SIZE, CHANGE_FEED_PAGE_SIZE, get_changes,
+)
+from pretix.base.services.cloneevent import CloneError, clone_event
 from pretix.base.services.quotas import QuotaAvailability
 from pretix.helpers.dicts import merge_dicts
 from pretix.helpers.i18n import i18ncomp
@@ -360,6 +369,81 @@ class CloneEventViewSet(viewsets.ModelViewSet):
         )
 
 
+class BulkCloneEventViewSet(viewsets.ViewSet):
+    permission = 'can_create_events'
+    write_permission = 'can_create_events'
+    job_timeout = 3600 * 24
+
+    def _job_key(self, asyncid):
+        return f'pretix:api:clone_bulk:{asyncid}'
+
+    def _job_owner(self):
+        # Only the same token, device or user may see the status of a job, and only through the same event
+        auth = self.request.auth
+        if isinstance(auth, (TeamAPIToken, Device, OAuthAccessToken)):
+            actor = f'{type(auth).__name__}:{auth.pk}'
+        else:
+            actor = f'User:{self.request.user.pk}'
+        return f'{self.request.organizer.pk}:{self.request.event.pk}:{actor}'
+
+    def create(self, request, *args, **kwargs):
+        serializer = BulkCloneEventSerializer(data=request.data, context={'organizer': request.organizer})
+        serializer.is_valid(raise_exception=True)
+
+        async_result = clone_event.apply_async(kwargs={
+            'event': request.event.pk,
+            'events': serializer.data['events'],
+            'user': request.user.pk if request.user.is_authenticated else None,
+            'api_token': request.auth.pk if isinstance(request.auth, TeamAPIToken) else None,
+            'device': request.auth.pk if isinstance(request.auth, Device) else None,
+            'oauth_application': request.auth.application.pk if isinstance(request.auth, OAuthAccessToken) else None,
+        })
+        if async_result.ready():
+            # No background workers, the job has already been executed
+            return self._result_response(async_result)
+
+        cache.set(self._job_key(async_result.id), self._job_owner(), timeout=self.job_timeout)
+        url_kwargs = {
+            'asyncid': str(async_result.id),
+        }
+        url_kwargs.update(self.kwargs)
+        return Response({
+            'status': reverse('api-v1:clone_bulk-status', kwargs=url_kwargs, request=request),
+        }, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['GET'], url_name='status', url_path='status/(?P<asyncid>[^/]+)')
+    def status(self, *args, **kwargs):
+        if cache.get(self._job_key(kwargs['asyncid'])) != self._job_owner():
+            raise NotFound()
+        return self._result_response(AsyncResult(kwargs['asyncid']))
+
+    def _result_response(self, res):
+        if res.failed():
+            if isinstance(res.info, dict) and res.info['exc_type'] == 'CloneError':
+                msg = res.info['exc_message']
+            elif isinstance(res.info, CloneError):
+                msg = str(res.info)
+            else:
+                msg = 'Internal error'
+            return Response(
+                {'status': 'failed', 'message': msg},
+                status=status.HTTP_410_GONE
+            )
+        elif res.successful():
+            return Response(
+                {'status': 'ok', 'events': res.result},
+                status=status.HTTP_200_OK
+            )
+
+        return Response(
+            {
+                'status': 'running' if res.state in ('PROGRESS', 'STARTED') else 'waiting',
+                'percentage': res.result.get('value', None) if isinstance(res.result, dict) else None,
+            },
+            status=status.HTTP_409_CONFLICT
+        )
+
+
 with scopes_disabled():
     class SubEventFilter(FilterSet):
         is_past = django_filters.rest_framework.BooleanFilter(method='is_past_qs')
@@ -679,6 +763,30 @@ class EventSettingsView(views.APIView):
         return Response(s.data)
 
 
+class EventChangesView(views.APIView):
+    permission = 'can_view_orders'
+
+    def _int_param(self, name, default):
+        value = self.request.query_params.get(name)
+        if value in (None, ''):
+            return default
+        try:
+            return int(value)
+        except ValueError:
+            raise ValidationError({name: ['A valid integer is required.']})
+
+    def get(self, request, *args, **kwargs):
+        since = self._int_param('since', None)
+        limit = min(max(self._int_param('limit', CHANGE_FEED_PAGE_SIZE), 1), CHANGE_FEED_MAX_PAGE_SIZE)
+        page = get_changes(request.event, since=since, limit=limit)
+        return Response({
+            'cursor': page.cursor,
+            'more': page.more,
+            'reset': page.reset,
+            'changes': EventChangeSerializer(page.changes, many=True).data,
+        })
+
+
 class SeatFilter(FilterSet):
     is_available = django_filters.BooleanFilter(method="is_available_qs")
 
@@ -213,6 +213,23 @@ with scopes_disabled():
             )
 
 
+def positions_prefetch(opq=OrderPosition.objects):
+    """
+    Returns the prefetch for the positions of orders serialized with ``OrderSerializer``, unless PDF data
+    is requested.
+    """
+    return Prefetch(
+        'positions',
+        opq.all().prefetch_related(
+            Prefetch('checkins', queryset=Checkin.objects.select_related('device')),
+            Prefetch('print_logs', queryset=PrintLog.objects.select_related('device')),
+            'item', 'variation',
+            Prefetch('answers', queryset=QuestionAnswer.objects.prefetch_related('options', 'question').order_by('question__position')),
+            'seat',
+        )
+    )
+
+
 class OrderViewSetMixin:
     serializer_class = OrderSerializer
     queryset = Order.objects.none()
@@ -278,19 +295,10 @@ class OrderViewSetMixin:
                     )),
                     Prefetch('addons', opq.select_related('item', 'variation', 'seat')),
                     'linked_media',
-                ).select_related('seat', 'addon_to', 'addon_to__seat')
+                ).select_related('seat', 'addon_to', 'addon_to__seat', 'cached_pdf_data')
             )
         else:
-            return Prefetch(
-                'positions',
-                opq.all().prefetch_related(
-                    Prefetch('checkins', queryset=Checkin.objects.select_related('device')),
-                    Prefetch('print_logs', queryset=PrintLog.objects.select_related('device')),
-                    'item', 'variation',
-                    Prefetch('answers', queryset=QuestionAnswer.objects.prefetch_related('options', 'question').order_by('question__position')),
-                    'seat',
-                )
-            )
+            return positions_prefetch(opq)
 
     def get_serializer_context(self):
         ctx = super().get_serializer_context()
@@ -1154,7 +1162,7 @@ class OrderPositionViewSet(viewsets.ModelViewSet):
                     )
                 ))
             ).select_related(
-                'addon_to', 'seat', 'addon_to__seat'
+                'addon_to', 'seat', 'addon_to__seat', 'cached_pdf_data'
             )
         else:
             qs = qs.prefetch_related(
@@ -22,7 +22,9 @@
 
 import json
 import logging
-from collections import namedtuple
+import threading
+import time
+from collections import defaultdict, namedtuple
 from datetime import timedelta
 from functools import cached_property
 from typing import List, Optional, Protocol
@@ -37,6 +39,7 @@ from pretix.base.datasync.sourcefields import (
 )
 from pretix.base.i18n import language
 from pretix.base.logentrytype_registry import make_link
+from pretix.base.models import OrderPosition
 from pretix.base.models.datasync import OrderSyncQueue, OrderSyncResult
 from pretix.base.signals import PluginAwareRegistry
 from pretix.helpers import OF_SELF
@@ -87,10 +90,41 @@ class ObjectMapping(Protocol):
 
 StaticMapping = namedtuple('StaticMapping', ('id', 'pretix_model', 'external_object_type', 'pretix_id_field', 'external_id_field', 'property_mappings'))
 
+SyncObject = namedtuple('SyncObject', ('external_id_field', 'id_value', 'properties', 'inputs', 'mapped_objects'))
+
+
+class RateLimiter:
+    """
+    Spaces out calls to ``acquire`` such that at most ``rate`` calls per second pass, across all threads
+    of the current process.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.next_slot = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self.lock:
+            t = time.monotonic()
+            wait = self.next_slot - t
+            self.next_slot = max(t, self.next_slot) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
 
 class OutboundSyncProvider:
     max_attempts = 5
     list_field_joiner = ","  # set to None to keep native lists in properties
+    batch_size = None  # set to sync up to this many orders at once through sync_objects_with_properties
+    max_concurrency = 1  # maximum number of events synced in parallel by this provider
+    rate_limit = None  # maximum number of calls to the external system per second and process
 
     def __init__(self, event):
         self.event = event
@@ -106,6 +140,14 @@ class OutboundSyncProvider:
     def display_name(cls):
         return str(cls.identifier)
 
+    @property
+    def rate_limiter(self):
+        with _rate_limiters_lock:
+            key = (self.identifier, self.rate_limit)
+            if key not in _rate_limiters:
+                _rate_limiters[key] = RateLimiter(self.rate_limit)
+            return _rate_limiters[key]
+
     @classmethod
     def enqueue_order(cls, order, triggered_by, not_before=None, immediate=False):
         """
@@ -194,58 +236,100 @@ class OutboundSyncProvider:
         This method should catch all Exceptions and handle them appropriately. It should never throw
         an Exception, as that may block the entire queue.
         """
+        if self.batch_size and self.batch_size > 1:
+            self._sync_queued_orders_batched(queued_orders)
+            return
+
         for queue_item in queued_orders:
-            with transaction.atomic():
-                try:
-                    sq = (
-                        OrderSyncQueue.objects
-                        .select_for_update(of=OF_SELF, nowait=True)
-                        .select_related("order")
-                        .get(pk=queue_item.pk)
-                    )
-                    if sq.in_flight:
-                        continue
-                    sq.in_flight = True
-                    sq.in_flight_since = now()
-                    sq.save()
-                except DatabaseError:
-                    # Either select_for_update failed to lock the row, or we couldn't set in_flight
-                    # as this order is already in flight (UNIQUE violation). In either case, we ignore
-                    # this order for now.
-                    continue
+            sq = self._claim_queue_item(queue_item)
+            if not sq:
+                continue
 
             try:
                 mapped_objects = self.sync_order(sq.order)
-                if not all(all(not res or res.sync_info.get("action", "") == "nothing_to_do" for res in res_list) for res_list in mapped_objects.values()):
-                    sq.order.log_action("pretix.event.order.data_sync.success", {
-                        "provider": self.identifier,
-                        "objects": {
-                            mapping_id: [osr and osr.to_result_dict() for osr in results]
-                            for mapping_id, results in mapped_objects.items()
-                        },
-                    })
-                sq.delete()
-            except UnrecoverableSyncError as e:
-                sq.set_sync_error(e.failure_mode, e.messages, e.full_message)
-            except RecoverableSyncError as e:
-                sq.failed_attempts += 1
-                sq.not_before = self.next_retry_date(sq)
-                # model changes saved by set_sync_error / clear_in_flight calls below
-                if sq.failed_attempts >= self.max_attempts:
-                    logger.exception('Failed to sync order (max attempts exceeded)')
-                    sentry_sdk.capture_exception(e)
-                    sq.set_sync_error("exceeded", e.messages, e.full_message)
-                else:
-                    logger.info(
-                        f"Could not sync order {sq.order.code} to {type(self).__name__} "
-                        f"(transient error, attempt #{sq.failed_attempts}, next {sq.not_before})",
-                        exc_info=True,
-                    )
-                    sq.clear_in_flight()
             except Exception as e:
-                logger.exception('Failed to sync order (unhandled exception)')
+                self._handle_sync_error(sq, e)
+            else:
+                self._handle_sync_success(sq, mapped_objects)
+
+    def _sync_queued_orders_batched(self, queued_orders):
+        claimed = []
+        for queue_item in queued_orders:
+            sq = self._claim_queue_item(queue_item)
+            if sq:
+                claimed.append(sq)
+
+        for i in range(0, len(claimed), self.batch_size):
+            chunk = claimed[i:i + self.batch_size]
+            try:
+                results = self.sync_orders([sq.order for sq in chunk])
+            except Exception as e:
+                results = {sq.order.pk: e for sq in chunk}
+
+            for sq in chunk:
+                result = results[sq.order.pk]
+                if isinstance(result, Exception):
+                    self._handle_sync_error(sq, result)
+                else:
+                    self._handle_sync_success(sq, result)
+
+    def _claim_queue_item(self, queue_item):
+        with transaction.atomic():
+            try:
+                sq = (
+                    OrderSyncQueue.objects
+                    .select_for_update(of=OF_SELF, nowait=True)
+                    .select_related("order")
+                    .get(pk=queue_item.pk)
+                )
+                if sq.in_flight:
+                    return None
+                sq.in_flight = True
+                sq.in_flight_since = now()
+                sq.save()
+                return sq
+            except DatabaseError:
+                # Either select_for_update failed to lock the row, or we couldn't set in_flight
+                # as this order is already in flight (UNIQUE violation). In either case, we ignore
+                # this order for now.
+                return None
+
+    def _handle_sync_success(self, sq, mapped_objects):
+        try:
+            if not all(all(not res or res.sync_info.get("action", "") == "nothing_to_do" for res in res_list) for res_list in mapped_objects.values()):
+                sq.order.log_action("pretix.event.order.data_sync.success", {
+                    "provider": self.identifier,
+                    "objects": {
+                        mapping_id: [osr and osr.to_result_dict() for osr in results]
+                        for mapping_id, results in mapped_objects.items()
+                    },
+                })
+            sq.delete()
+        except Exception as e:
+            self._handle_sync_error(sq, e)
+
+    def _handle_sync_error(self, sq, e):
+        if isinstance(e, UnrecoverableSyncError):
+            sq.set_sync_error(e.failure_mode, e.messages, e.full_message)
+        elif isinstance(e, RecoverableSyncError):
+            sq.failed_attempts += 1
+            sq.not_before = self.next_retry_date(sq)
+            # model changes saved by set_sync_error / clear_in_flight calls below
+            if sq.failed_attempts >= self.max_attempts:
+                logger.error('Failed to sync order (max attempts exceeded)', exc_info=e)
                 sentry_sdk.capture_exception(e)
-                sq.set_sync_error("internal", [], str(e))
+                sq.set_sync_error("exceeded", e.messages, e.full_message)
+            else:
+                logger.info(
+                    f"Could not sync order {sq.order.code} to {type(self).__name__} "
+                    f"(transient error, attempt #{sq.failed_attempts}, next {sq.not_before})",
+                    exc_info=e,
+                )
+                sq.clear_in_flight()
+        else:
+            logger.error('Failed to sync order (unhandled exception)', exc_info=e)
+            sentry_sdk.capture_exception(e)
+            sq.set_sync_error("internal", [], str(e))
 
     @cached_property
     def data_fields(self):
@@ -349,28 +433,45 @@ class OutboundSyncProvider:
         """
         raise NotImplementedError()
 
-    def sync_object(
-            self,
-            inputs: dict,
-            mapping,
-            mapped_objects: dict,
-    ):
-        logger.debug("Syncing object %r, %r, %r", inputs, mapping, mapped_objects)
+    def sync_objects_with_properties(self, mapping: ObjectMapping, objects: List[SyncObject]) -> list:
+        """
+        This method is called with all objects of one mapping within a batch of orders, if ``batch_size`` is set.
+        Override it if the external system supports creating or updating many objects in one request.
+
+        :param mapping: The mapping object as returned by ``self.mappings``
+        :param objects: List of ``SyncObject`` tuples, each containing the arguments ``external_id_field``,
+                        ``id_value``, ``properties``, ``inputs`` and ``mapped_objects`` as they would have been passed
+                        to ``sync_object_with_properties``.
+        :return: A list of the same length as ``objects``. Each entry is what ``sync_object_with_properties`` would
+                 have returned for the respective object, or an exception instance if syncing this specific object
+                 failed. A failed object only fails the order it belongs to, all other orders in the batch continue.
+
+        The default implementation calls ``sync_object_with_properties`` once per object.
+        """
+        results = []
+        for obj in objects:
+            try:
+                results.append(self.sync_object_with_properties(
+                    external_id_field=obj.external_id_field,
+                    id_value=obj.id_value,
+                    properties=obj.properties,
+                    inputs=obj.inputs,
+                    mapping=mapping,
+                    mapped_objects=obj.mapped_objects,
+                ))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def _prepare_object(self, inputs: dict, mapping):
+        logger.debug("Syncing object %r, %r", inputs, mapping)
         properties = self.get_properties(inputs, mapping.property_mappings)
         logger.debug("Properties: %r", properties)
 
         id_value = self.get_field_value(inputs, {"pretix_field": mapping.pretix_id_field})
-        if not id_value:
-            return None
+        return id_value, properties
 
-        info = self.sync_object_with_properties(
-            external_id_field=mapping.external_id_field,
-            id_value=id_value,
-            properties=properties,
-            inputs=inputs,
-            mapping=mapping,
-            mapped_objects=mapped_objects,
-        )
+    def _store_result(self, inputs: dict, mapping, id_value, info):
         if not info:
             return None
         external_link_href = info.pop('external_link_href', None)
@@ -390,6 +491,37 @@ class OutboundSyncProvider:
         )
         return obj
 
+    def sync_object(
+            self,
+            inputs: dict,
+            mapping,
+            mapped_objects: dict,
+    ):
+        id_value, properties = self._prepare_object(inputs, mapping)
+        if not id_value:
+            return None
+
+        self.rate_limiter.acquire()
+        info = self.sync_object_with_properties(
+            external_id_field=mapping.external_id_field,
+            id_value=id_value,
+            properties=properties,
+            inputs=inputs,
+            mapping=mapping,
+            mapped_objects=mapped_objects,
+        )
+        return self._store_result(inputs, mapping, id_value, info)
+
+    def _get_inputs(self, order, positions):
+        order_inputs = {ORDER: order, EVENT: self.event}
+        return {
+            'Order': [order_inputs],
+            'OrderPosition': [
+                {**order_inputs, EVENT_OR_SUBEVENT: op.subevent or self.event, ORDER_POSITION: op}
+                for op in positions
+            ],
+        }
+
     def sync_order(self, order):
         if not self.should_sync_order(order):
             logger.debug("Skipping order %r", order)
@@ -403,25 +535,109 @@ class OutboundSyncProvider:
                 "voucher",
             )
         )
-        order_inputs = {ORDER: order, EVENT: self.event}
+        inputs = self._get_inputs(order, positions)
         mapped_objects = {}
         for mapping in self.mappings:
-            if mapping.pretix_model == 'Order':
-                mapped_objects[mapping.id] = [
-                    self.sync_object(order_inputs, mapping, mapped_objects)
-                ]
-            elif mapping.pretix_model == 'OrderPosition':
-                mapped_objects[mapping.id] = [
-                    self.sync_object({
-                        **order_inputs, EVENT_OR_SUBEVENT: op.subevent or self.event, ORDER_POSITION: op
-                    }, mapping, mapped_objects)
-                    for op in positions
-                ]
-            else:
+            if mapping.pretix_model not in inputs:
                 raise SyncConfigError("Invalid pretix model '{}'".format(mapping.pretix_model))
+            mapped_objects[mapping.id] = [
+                self.sync_object(i, mapping, mapped_objects)
+                for i in inputs[mapping.pretix_model]
+            ]
         self.finalize_sync_order(order)
         return mapped_objects
 
+    def sync_orders(self, orders):
+        """
+        Syncs a batch of orders, calling ``sync_objects_with_properties`` once per mapping for all orders of the
+        batch. Returns a dictionary mapping the primary key of every order either to its ``mapped_objects`` or to
+        the exception that caused the sync of this order to fail.
+        """
+        results = {}
+        for order in orders:
+            if not self.should_sync_order(order):
+                logger.debug("Skipping order %r", order)
+                results[order.pk] = {}
+        orders = [o for o in orders if o.pk not in results]
+        if not orders:
+            return results
+
+        positions = defaultdict(list)
+        for op in (
+            OrderPosition.all
+            .filter(order__in=orders)
+            .prefetch_related("answers", "answers__question")
+            .select_related("voucher")
+            .order_by("order_id", "positionid")
+        ):
+            positions[op.order_id].append(op)
+
+        inputs = {}
+        for order in orders:
+            for op in positions[order.pk]:
+                op.order = order
+            inputs[order.pk] = self._get_inputs(order, positions[order.pk])
+            results[order.pk] = {}
+
+        for mapping in self.mappings:
+            active = [o for o in orders if not isinstance(results[o.pk], Exception)]
+            if mapping.pretix_model not in ('Order', 'OrderPosition'):
+                for order in active:
+                    results[order.pk] = SyncConfigError("Invalid pretix model '{}'".format(mapping.pretix_model))
+                break
+
+            # Collect the objects of all orders, remembering where each result belongs. Slots stay None
+            # for objects without an identifier, just like in sync_order.
+            slots = {}
+            pending = []
+            for order in active:
+                order_slots = []
+                try:
+                    for i in inputs[order.pk][mapping.pretix_model]:
+                        id_value, properties = self._prepare_object(i, mapping)
+                        order_slots.append(None)
+                        if id_value:
+                            pending.append((order, len(order_slots) - 1, i, id_value, SyncObject(
+                                external_id_field=mapping.external_id_field,
+                                id_value=id_value,
+                                properties=properties,
+                                inputs=i,
+                                mapped_objects=results[order.pk],
+                            )))
+                except Exception as e:
+                    results[order.pk] = e
+                    continue
+                slots[order.pk] = order_slots
+
+            pending = [p for p in pending if not isinstance(results[p[0].pk], Exception)]
+            if pending:
+                self.rate_limiter.acquire()
+                infos = self.sync_objects_with_properties(mapping, [p[4] for p in pending])
+                if len(infos) != len(pending):
+                    raise ValueError("sync_objects_with_properties needs to return one result per object")
+                for (order, idx, i, id_value, obj), info in zip(pending, infos):
+                    if isinstance(results[order.pk], Exception):
+                        continue
+                    if isinstance(info, Exception):
+                        results[order.pk] = info
+                        continue
+                    try:
+                        slots[order.pk][idx] = self._store_result(i, mapping, id_value, info)
+                    except Exception as e:
+                        results[order.pk] = e
+
+            for order_pk, order_slots in slots.items():
+                if not isinstance(results[order_pk], Exception):
+                    results[order_pk][mapping.id] = order_slots
+
+        for order in orders:
+            if not isinstance(results[order.pk], Exception):
+                try:
+                    self.finalize_sync_order(order)
+                except Exception as e:
+                    results[order.pk] = e
+        return results
+
     def filter_mapped_objects(self, mapped_objects, inputs):
         """
         For order positions, only
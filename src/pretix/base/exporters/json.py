@@ -33,16 +33,27 @@
 # License for the specific language governing permissions and limitations under the License.
 
 import json
+import tempfile
+from collections import OrderedDict
+from datetime import timezone
 from decimal import Decimal
+from urllib.parse import urljoin
 
+from django import forms
+from django.conf import settings
+from django.core.files import File
 from django.core.serializers.json import DjangoJSONEncoder
 from django.db.models import Prefetch
 from django.dispatch import receiver
 from django.utils.functional import lazy
+from django.utils.timezone import override
 from django.utils.translation import gettext, gettext_lazy, pgettext_lazy
 
 from ..exporter import BaseExporter
-from ..models import ItemMetaValue, ItemVariation, ItemVariationMetaValue
+from ..forms.widgets import SplitDateTimePickerWidget
+from ..models import (
+    ItemMetaValue, ItemVariation, ItemVariationMetaValue, OrderFee,
+)
 from ..signals import register_data_exporters
 
 
@@ -249,3 +260,78 @@ class JSONExporter(BaseExporter):
 @receiver(register_data_exporters, dispatch_uid="exporter_json")
 def register_json_export(sender, **kwargs):
     return JSONExporter
+
+
+class _ExportRequest:
+    """
+    Stands in for the API request when serializing outside of a request, so that all URLs in the
+    output are absolute just like in API responses.
+    """
+    versioning_scheme = None
+
+    def build_absolute_uri(self, location):
+        return urljoin(settings.SITE_URL, location)
+
+
+class OrderJSONLinesExporter(BaseExporter):
+    identifier = 'orders_jsonl'
+    verbose_name = lazy(lambda *args: gettext('Order data') + ' (' + gettext('API format, JSON Lines') + ')', str)()
+    category = pgettext_lazy('export_category', 'Order data')
+    description = gettext_lazy('Download all orders in the same format as the REST API, with one order per line. '
+                               'This is useful to transfer the orders of large events to third-party systems.')
+    chunk_size = 500
+
+    @property
+    def export_form_fields(self):
+        return OrderedDict([
+            ('modified_since', forms.SplitDateTimeField(
+                label=gettext_lazy('Only orders modified since'),
+                required=False,
+                widget=SplitDateTimePickerWidget(),
+            )),
+        ])
+
+    def render(self, form_data, output_file=None):
+        from rest_framework.utils.encoders import JSONEncoder
+
+        from pretix.api.serializers.order import OrderSerializer
+        from pretix.api.views.order import positions_prefetch
+
+        qs = self.event.orders.select_related(
+            'invoice_address', 'customer', 'sales_channel'
+        ).prefetch_related(
+            Prefetch('fees', queryset=OrderFee.objects.all()),
+            'payments', 'refunds', 'refunds__payment',
+            positions_prefetch(),
+        ).order_by('pk')
+        if form_data.get('modified_since'):
+            qs = qs.filter(last_modified__gte=form_data['modified_since'])
+
+        context = {
+            'event': self.event,
+            'request': _ExportRequest(),
+            'include': [],
+            'exclude': [],
+            'pdf_data': False,
+        }
+        f = output_file or tempfile.TemporaryFile()
+        total = qs.count()
+        # With a chunk size, the prefetches are performed per chunk and a server-side cursor is used if the
+        # database supports it, so memory usage does not grow with the number of orders.
+        with override(timezone.utc):  # like the API
+            for i, order in enumerate(qs.iterator(chunk_size=self.chunk_size)):
+                data = OrderSerializer(order, context=context).data
+                f.write(json.dumps(data, cls=JSONEncoder, ensure_ascii=False).encode() + b'\n')
+                if i % self.chunk_size == 0:
+                    self.progress_callback(i / total * 100)
+
+        filename = '{}_orders.jsonl'.format(self.event.slug)
+        if output_file:
+            return filename, 'application/jsonl', None
+        f.seek(0)
+        return filename, 'application/jsonl', File(f, name=filename)
+
+
+@receiver(register_data_exporters, dispatch_uid="exporter_orders_jsonl")
+def register_orders_jsonl_export(sender, **kwargs):
+    return OrderJSONLinesExporter
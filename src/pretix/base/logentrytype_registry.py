@@ -110,12 +110,42 @@ class LogEntryType:
     Base class for a type of LogEntry, identified by its action_type.
     """
 
+    display_version = 1
+    """
+    Version of the output of ``display``. Rendered texts of ``cacheable`` types are cached, so this needs
+    to be increased whenever ``display`` changes in a way that affects existing log entries.
+    """
+
+    cacheable = False
+    """
+    Whether the output of ``display`` only depends on the log entry itself, so it can be cached.
+    This must not be set if ``display`` looks up other objects, e.g. to show their current name.
+    """
+
+    related_objects = {}
+    """
+    Objects referenced by primary key in the log entry data that are needed by ``display``, as a
+    mapping of data keys to ``(model, event_lookup)`` tuples, e.g. ``{'item': (Item, 'event_id')}``.
+    They are fetched in bulk for a whole page of log entries and can be accessed through
+    ``related_object``.
+    """
+
     def __init__(self, action_type=None, plain=None):
         if action_type:
             self.action_type = action_type
         if plain:
             self.plain = plain
 
+    def related_object(self, logentry, model, pk, queryset):
+        """
+        Returns the object of type ``model`` with the given primary key, either from the objects
+        prefetched through ``related_objects`` or by querying ``queryset``.
+        """
+        try:
+            return logentry._related_objects[model, int(pk)]
+        except (AttributeError, KeyError, TypeError, ValueError):
+            return queryset.get(pk=pk)
+
     def display(self, logentry, data):
         """
         Returns the message to be displayed for a given logentry of this type.
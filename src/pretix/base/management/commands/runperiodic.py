@@ -41,7 +41,12 @@ from django.core.management.base import BaseCommand
 from django.db import close_old_connections
 from django.dispatch.dispatcher import NO_RECEIVERS
 
-from pretix.helpers.periodic import SKIPPED
+from pretix.base.services.periodic import (
+    dispatch_periodic_tasks, get_periodic_receivers,
+)
+from pretix.helpers.periodic import (
+    SKIPPED, get_history, receiver_name, run_receiver,
+)
 
 from ...signals import periodic_task
 
@@ -55,6 +60,9 @@ class Command(BaseCommand):
         parser.add_argument('--list-tasks', action='store_true', help='Only list all tasks')
         parser.add_argument('--exclude', action='store', type=str, help='Exclude the tasks with this name '
                                                                         '(dotted path, comma separation)')
+        parser.add_argument('--dispatch', action='store_true', help='Run every task as a separate celery task '
+                                                                    'instead of sequentially in this process')
+        parser.add_argument('--history', action='store_true', help='Only show the recent runs of all tasks')
 
     def handle(self, *args, **options):
         verbosity = int(options['verbosity'])
@@ -64,17 +72,31 @@ class Command(BaseCommand):
         if not periodic_task.receivers or periodic_task.sender_receivers_cache.get(self) is NO_RECEIVERS:
             return
 
-        for receiver in periodic_task._live_receivers(self):
-            name = f'{receiver.__module__}.{receiver.__name__}'
+        selected = []
+        for receiver in get_periodic_receivers(self):
+            name = receiver_name(receiver)
             if options['list_tasks']:
                 print(name)
                 continue
+            if options['history']:
+                self.print_history(name)
+                continue
             if options.get('tasks'):
                 if name not in options.get('tasks').split(','):
                     continue
             if options.get('exclude'):
                 if name in options.get('exclude').split(','):
                     continue
+            selected.append(receiver)
+
+        if options['dispatch'] and settings.HAS_CELERY:
+            dispatch_periodic_tasks(selected)
+            if verbosity > 1:
+                self.stdout.write(f'INFO Dispatched {len(selected)} tasks')
+            return
+
+        for receiver in selected:
+            name = receiver_name(receiver)
 
             if verbosity > 1:
                 self.stdout.write(f'INFO Running {name}…')
@@ -82,7 +104,7 @@ class Command(BaseCommand):
             try:
                 # Check if the DB connection is still good, it might be closed if the previous task took too long.
                 close_old_connections()
-                r = receiver(signal=periodic_task, sender=self)
+                r = run_receiver(receiver, periodic_task, self)
             except Exception as err:
                 if isinstance(err, KeyboardInterrupt):
                     raise err
@@ -99,3 +121,11 @@ class Command(BaseCommand):
                         self.stdout.write(self.style.SUCCESS(f'INFO Skipped {name}'))
                     else:
                         self.stdout.write(self.style.SUCCESS(f'INFO Completed {name} in {round(time.time() - t0, 3)}s'))
+
+    def print_history(self, name):
+        self.stdout.write(name)
+        for run in get_history(name):
+            line = f'  {run["started"]}  {run["outcome"]:<8} {run["duration"]:>10.3f}s'
+            if run.get('message'):
+                line += f'  {run["message"]}'
+            self.stdout.write(line)
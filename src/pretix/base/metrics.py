@@ -33,26 +33,168 @@
 # License for the specific language governing permissions and limitations under the License.
 
 import json
+import logging
 import math
+import os
+import threading
 import time
 from collections import defaultdict
 
+from celery.signals import (
+    before_task_publish, task_postrun, worker_process_shutdown,
+)
 from django.apps import apps
 from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import request_finished
 from django.db import connection
+from django.dispatch import receiver
+from django_scopes import scopes_disabled
 
 from pretix.base.models import Event, Invoice, Order, OrderPosition, Organizer
+from pretix.base.signals import periodic_task
 from pretix.celery_app import app
+from pretix.helpers.periodic import minimum_interval
 
 if settings.HAS_REDIS:
     import django_redis
     redis = django_redis.get_redis_connection("redis")
 
+logger = logging.getLogger(__name__)
+
 REDIS_KEY = "pretix_metrics"
+MODEL_COUNTS_CACHE_KEY = "pretix_metrics_model_counts"
+PUBLISHED_HEADER = "pretix_published"
 _INF = float("inf")
 _MINUS_INF = float("-inf")
 
 
+class _MetricsBuffer:
+    """
+    Metric updates of one thread that have not yet been written to redis. Every thread has its own buffer, so
+    recording a metric only ever competes for the lock with the background flusher of the process.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.thread = threading.current_thread()
+        self.increments = defaultdict(float)
+        self.values = {}
+        self.pending = 0
+        self.last_flush = time.monotonic()
+
+    def due(self):
+        return (
+            self.pending >= settings.METRICS_FLUSH_THRESHOLD
+            or time.monotonic() - self.last_flush >= settings.METRICS_FLUSH_INTERVAL
+        )
+
+    def flush(self):
+        with self.lock:
+            increments, values = self.increments, self.values
+            self.increments, self.values, self.pending = defaultdict(float), {}, 0
+            self.last_flush = time.monotonic()
+        if not settings.HAS_REDIS or not (increments or values):
+            return
+
+        pipe = redis.pipeline()
+        for key, value in values.items():
+            pipe.hset(REDIS_KEY, key, value)
+        for key, amount in increments.items():
+            pipe.hincrbyfloat(REDIS_KEY, key, amount)
+        pipe.execute()
+
+
+_local = threading.local()
+_buffers = set()
+_buffers_lock = threading.Lock()
+_flusher_pid = None
+
+
+def _get_buffer():
+    buf = getattr(_local, 'buffer', None)
+    if buf is None:
+        buf = _local.buffer = _MetricsBuffer()
+        with _buffers_lock:
+            _buffers.add(buf)
+        _start_flusher()
+    return buf
+
+
+def _start_flusher():
+    # The thread does not survive a fork, so every worker process needs to start its own
+    global _flusher_pid
+    with _buffers_lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+    threading.Thread(target=_flusher, name='pretix-metrics-flusher', daemon=True).start()
+
+
+def _flusher():
+    # Drains the buffers of threads that have not recorded or finished a request for a while, e.g. idle
+    # web workers, so their updates do not stay behind indefinitely.
+    while True:
+        time.sleep(settings.METRICS_FLUSH_INTERVAL)
+        try:
+            flush_all(only_due=True)
+        except Exception:
+            logger.exception('Could not flush metrics')
+
+
+def flush():
+    """
+    Writes all metric updates buffered by the current thread to redis in one pipeline.
+    """
+    buf = getattr(_local, 'buffer', None)
+    if buf is not None:
+        buf.flush()
+
+
+def _flush_if_due():
+    buf = getattr(_local, 'buffer', None)
+    if buf is not None and buf.due():
+        buf.flush()
+
+
+def flush_all(only_due=False):
+    """
+    Writes the metric updates buffered by all threads of this process to redis.
+    """
+    with _buffers_lock:
+        buffers = list(_buffers)
+    for buf in buffers:
+        if not buf.thread.is_alive():
+            with _buffers_lock:
+                _buffers.discard(buf)
+        elif only_due and not buf.due():
+            continue
+        buf.flush()
+
+
+def _recorded():
+    buf = _get_buffer()
+    with buf.lock:
+        buf.pending += 1
+    _flush_if_due()
+
+
+@receiver(signal=request_finished, dispatch_uid="metrics_flush_request_finished")
+def flush_after_request(sender, **kwargs):
+    # The interval might have passed since the last metric has been recorded in this thread
+    _flush_if_due()
+
+
+@receiver(signal=task_postrun)
+def flush_after_task(sender=None, **kwargs):
+    _flush_if_due()
+
+
+@receiver(signal=worker_process_shutdown)
+def flush_on_worker_shutdown(sender=None, **kwargs):
+    flush_all()
+
+
 def _float_to_go_string(d):
     # inspired by https://github.com/prometheus/client_python/blob/master/prometheus_client/core.py
     if d == _INF:
@@ -105,31 +247,26 @@ class Metric(object):
 
             return metricname + "{" + ",".join(named_labels) + "}"
 
-    def _inc_in_redis(self, key, amount, pipeline=None):
+    def _inc_in_buffer(self, key, amount):
         """
-        Increments given key in Redis.
+        Increments given key in the buffer of the current thread.
         """
-        if settings.HAS_REDIS:
-            if not pipeline:
-                pipeline = redis
-            pipeline.hincrbyfloat(REDIS_KEY, key, amount)
+        buf = _get_buffer()
+        with buf.lock:
+            if key in buf.values:
+                # The key has been set since the last flush, so the increment needs to be applied after that
+                buf.values[key] += amount
+            else:
+                buf.increments[key] += amount
 
-    def _set_in_redis(self, key, value, pipeline=None):
+    def _set_in_buffer(self, key, value):
         """
-        Sets given key in Redis.
+        Sets given key in the buffer of the current thread, discarding any increments recorded before.
         """
-        if settings.HAS_REDIS:
-            if not pipeline:
-                pipeline = redis
-            pipeline.hset(REDIS_KEY, key, value)
-
-    def _get_redis_pipeline(self):
-        if settings.HAS_REDIS:
-            return redis.pipeline()
-
-    def _execute_redis_pipeline(self, pipeline):
-        if settings.HAS_REDIS:
-            return pipeline.execute()
+        buf = _get_buffer()
+        with buf.lock:
+            buf.increments.pop(key, None)
+            buf.values[key] = value
 
 
 class Counter(Metric):
@@ -148,8 +285,11 @@ class Counter(Metric):
 
         self._check_label_consistency(kwargs)
 
+        if not settings.HAS_REDIS:
+            return
         fullmetric = self._construct_metric_identifier(self.name, kwargs)
-        self._inc_in_redis(fullmetric, amount)
+        self._inc_in_buffer(fullmetric, amount)
+        _recorded()
 
 
 class Gauge(Metric):
@@ -164,8 +304,11 @@ class Gauge(Metric):
         """
         self._check_label_consistency(kwargs)
 
+        if not settings.HAS_REDIS:
+            return
         fullmetric = self._construct_metric_identifier(self.name, kwargs)
-        self._set_in_redis(fullmetric, value)
+        self._set_in_buffer(fullmetric, value)
+        _recorded()
 
     def inc(self, amount=1, **kwargs):
         """
@@ -176,8 +319,11 @@ class Gauge(Metric):
 
         self._check_label_consistency(kwargs)
 
+        if not settings.HAS_REDIS:
+            return
         fullmetric = self._construct_metric_identifier(self.name, kwargs)
-        self._inc_in_redis(fullmetric, amount)
+        self._inc_in_buffer(fullmetric, amount)
+        _recorded()
 
     def dec(self, amount=1, **kwargs):
         """
@@ -188,8 +334,11 @@ class Gauge(Metric):
 
         self._check_label_consistency(kwargs)
 
+        if not settings.HAS_REDIS:
+            return
         fullmetric = self._construct_metric_identifier(self.name, kwargs)
-        self._inc_in_redis(fullmetric, amount * -1)
+        self._inc_in_buffer(fullmetric, amount * -1)
+        _recorded()
 
 
 class Histogram(Metric):
@@ -222,13 +371,14 @@ class Histogram(Metric):
 
         self._check_label_consistency(kwargs)
 
-        pipe = self._get_redis_pipeline()
+        if not settings.HAS_REDIS:
+            return
 
         countmetric = self._construct_metric_identifier(self.name + '_count', kwargs)
-        self._inc_in_redis(countmetric, 1, pipeline=pipe)
+        self._inc_in_buffer(countmetric, 1)
 
         summetric = self._construct_metric_identifier(self.name + '_sum', kwargs)
-        self._inc_in_redis(summetric, amount, pipeline=pipe)
+        self._inc_in_buffer(summetric, amount)
 
         kwargs_le = dict(kwargs.items())
         for i, bound in enumerate(self.buckets):
@@ -236,9 +386,9 @@ class Histogram(Metric):
                 kwargs_le['le'] = _float_to_go_string(bound)
                 bmetric = self._construct_metric_identifier(self.name + '_bucket', kwargs_le,
                                                             labelnames=self.labelnames + ["le"])
-                self._inc_in_redis(bmetric, 1, pipeline=pipe)
+                self._inc_in_buffer(bmetric, 1)
 
-        self._execute_redis_pipeline(pipe)
+        _recorded()
 
 
 def estimate_count_fast(type):
@@ -256,6 +406,59 @@ def estimate_count_fast(type):
         return type.objects.count()
 
 
+@scopes_disabled()
+def refresh_model_counts():
+    """
+    Counts the instances of all models and stores the result in the cache, where ``metric_values`` picks it up.
+    """
+    exact_tables = [
+        Order, OrderPosition, Invoice, Event, Organizer
+    ]
+    counts = {}
+    for m in apps.get_models():  # Count all models
+        if any(issubclass(m, p) for p in exact_tables):
+            counts[str(m._meta)] = m.objects.count()
+        else:
+            counts[str(m._meta)] = estimate_count_fast(m)
+    # Keep the counts for a few intervals, but do not report stale values forever if the refresh stops running
+    cache.set(MODEL_COUNTS_CACHE_KEY, {'time': time.time(), 'counts': counts},
+              timeout=settings.METRICS_MODEL_COUNT_INTERVAL * 60 * 3)
+
+
+@receiver(signal=periodic_task)
+@minimum_interval(minutes_after_success=settings.METRICS_MODEL_COUNT_INTERVAL)
+def periodic_refresh_model_counts(sender, **kwargs):
+    if settings.METRICS_ENABLED:
+        refresh_model_counts()
+
+
+@receiver(signal=before_task_publish)
+def add_published_header(sender=None, headers=None, **kwargs):
+    # Allows to compute the age of the oldest message in a queue
+    if headers is not None:
+        headers[PUBLISHED_HEADER] = time.time()
+
+
+def database_metrics(metrics):
+    if 'postgres' not in settings.DATABASES['default']['ENGINE']:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT COALESCE(state, 'unknown'), COUNT(*) FROM pg_stat_activity "
+            "WHERE datname = current_database() GROUP BY 1;"
+        )
+        for state, count in cursor.fetchall():
+            metrics['pretix_db_connections']['{state="%s"}' % state] = count
+
+        cursor.execute(
+            "SELECT COUNT(*), COALESCE(EXTRACT(EPOCH FROM MAX(now() - query_start)), 0) FROM pg_stat_activity "
+            "WHERE datname = current_database() AND wait_event_type = 'Lock';"
+        )
+        count, max_wait = cursor.fetchone()
+        metrics['pretix_db_lock_waits'][""] = count
+        metrics['pretix_db_lock_wait_max_seconds'][""] = float(max_wait)
+
+
 def metric_values():
     """
     Produces the the values to be presented to the monitoring system
@@ -264,6 +467,7 @@ def metric_values():
 
     # Metrics from redis
     if settings.HAS_REDIS:
+        flush()
         for key, value in redis.hscan_iter(REDIS_KEY, count=1000):
             dkey = key.decode("utf-8")
             splitted = dkey.split("{", 2)
@@ -281,14 +485,13 @@ def metric_values():
         metrics[a] = metrics[atarget]
 
     # Throwaway metrics
-    exact_tables = [
-        Order, OrderPosition, Invoice, Event, Organizer
-    ]
-    for m in apps.get_models():  # Count all models
-        if any(issubclass(m, p) for p in exact_tables):
-            metrics['pretix_model_instances']['{model="%s"}' % m._meta] = m.objects.count()
-        else:
-            metrics['pretix_model_instances']['{model="%s"}' % m._meta] = estimate_count_fast(m)
+    model_counts = cache.get(MODEL_COUNTS_CACHE_KEY)
+    if model_counts:
+        for model, count in model_counts['counts'].items():
+            metrics['pretix_model_instances']['{model="%s"}' % model] = count
+        metrics['pretix_model_instances_age_seconds'][""] = time.time() - model_counts['time']
+
+    database_metrics(metrics)
 
     if settings.HAS_CELERY:
         channel = app.broker_connection().channel()
@@ -298,9 +501,12 @@ def metric_values():
                 llen = client.llen(q.name)
                 lfirst = client.lindex(q.name, -1)
                 metrics['pretix_celery_tasks_queued_count']['{queue="%s"}' % q.name] = llen
+                published = None
                 if lfirst:
                     ldata = json.loads(lfirst)
-                    dt = time.time() - ldata.get('created', 0)
+                    published = (ldata.get('headers') or {}).get(PUBLISHED_HEADER)
+                if published:
+                    dt = time.time() - published
                     metrics['pretix_celery_tasks_queued_age_seconds']['{queue="%s"}' % q.name] = dt
                 else:
                     metrics['pretix_celery_tasks_queued_age_seconds']['{queue="%s"}' % q.name] = 0
@@ -317,5 +523,24 @@ pretix_task_runs_total = Counter("pretix_task_runs_total", "Total calls to a cel
                                  ["task_name", "status"])
 pretix_task_duration_seconds = Histogram("pretix_task_duration_seconds", "Call time of a celery task",
                                          ["task_name"])
+pretix_async_result_seconds = Histogram("pretix_async_result_seconds",
+                                        "Time from submitting a task in a view until its result is delivered to the client",
+                                        ["view", "delivery"])
 pretix_successful_logins = Counter("pretix_logins_successful", "Successful logins", [])
 pretix_failed_logins = Counter("pretix_logins_failed", "Failed logins", ["reason"])
+pretix_periodic_task_runs_total = Counter("pretix_periodic_task_runs_total", "Total runs of a periodic task",
+                                          ["task_name", "outcome"])
+pretix_periodic_task_duration_seconds = Histogram("pretix_periodic_task_duration_seconds", "Run time of a periodic task",
+                                                  ["task_name"], buckets=(.1, .5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 1800.0, _INF))
+pretix_cleanup_rows_deleted_total = Counter("pretix_cleanup_rows_deleted_total", "Rows deleted by periodic cleanup", ["model"])
+pretix_cleanup_bytes_reclaimed_total = Counter("pretix_cleanup_bytes_reclaimed_total", "Storage bytes reclaimed by periodic cleanup",
+                                               ["model"])
+pretix_ticket_render_duration_seconds = Histogram("pretix_ticket_render_duration_seconds", "Rendering time of a ticket file",
+                                                  ["provider"])
+_QUERY_COUNT_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, _INF)
+pretix_view_db_queries = Histogram("pretix_view_db_queries", "Database queries of profiled views", ["url_name"],
+                                   buckets=_QUERY_COUNT_BUCKETS)
+pretix_view_db_seconds = Histogram("pretix_view_db_seconds", "Database time of profiled views", ["url_name"])
+pretix_task_db_queries = Histogram("pretix_task_db_queries", "Database queries of profiled celery tasks", ["task_name"],
+                                   buckets=_QUERY_COUNT_BUCKETS)
+pretix_task_db_seconds = Histogram("pretix_task_db_seconds", "Database time of profiled celery tasks", ["task_name"])
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-19 10:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pretixbase", "0296_invoice_invoice_from_state"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OrderPositionRollupState",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False)),
+                ("timezone", models.CharField(max_length=100)),
+                ("watermark", models.DateTimeField(null=True)),
+                ("event", models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name="order_position_rollup_state", to="pretixbase.event")),
+            ],
+        ),
+        migrations.CreateModel(
+            name="OrderPositionRollup",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False)),
+                ("status", models.CharField(max_length=16)),
+                ("day", models.DateField()),
+                ("payment_day", models.DateField(null=True)),
+                ("count", models.PositiveIntegerField(default=0)),
+                ("price", models.DecimalField(decimal_places=2, default=0, max_digits=13)),
+                ("tax_value", models.DecimalField(decimal_places=2, default=0, max_digits=13)),
+                ("event", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="order_position_rollups", to="pretixbase.event")),
+                ("item", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="+", to="pretixbase.item")),
+                ("subevent", models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name="+", to="pretixbase.subevent")),
+                ("variation", models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name="+", to="pretixbase.itemvariation")),
+            ],
+            options={
+                "indexes": [models.Index(fields=["event", "day"], name="pretixbase__event_i_96613f_idx")],
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.30 on 2026-10-19 10:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def seed_counters(apps, schema_editor):
+    Invoice = apps.get_model("pretixbase", "Invoice")
+    InvoiceNumberCounter = apps.get_model("pretixbase", "InvoiceNumberCounter")
+
+    counters = {}
+    qs = Invoice.objects.exclude(invoice_no__contains="-").values_list("organizer_id", "prefix", "invoice_no")
+    for organizer_id, prefix, invoice_no in qs.iterator():
+        if not invoice_no.isdigit():
+            continue
+        key = (organizer_id, prefix)
+        counters[key] = max(counters.get(key, 0), int(invoice_no))
+
+    InvoiceNumberCounter.objects.bulk_create(
+        [
+            InvoiceNumberCounter(organizer_id=organizer_id, prefix=prefix, value=value)
+            for (organizer_id, prefix), value in counters.items()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pretixbase", "0297_orderpositionrollup"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="InvoiceNumberCounter",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False)),
+                ("prefix", models.CharField(max_length=160)),
+                ("value", models.PositiveBigIntegerField(default=0)),
+                ("organizer", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                                related_name="invoice_number_counters", to="pretixbase.organizer")),
+            ],
+            options={
+                "unique_together": {("organizer", "prefix")},
+            },
+        ),
+        migrations.RunPython(
+            seed_counters,
+            migrations.RunPython.noop,
+        ),
+    ]
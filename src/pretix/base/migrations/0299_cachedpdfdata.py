@@ -0,0 +1,26 @@
+# Generated by Django 4.2.30 on 2026-10-19 11:43
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pretixbase", "0298_invoicenumbercounter"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CachedPdfData",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False)),
+                ("version", models.CharField(max_length=190)),
+                ("data", models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ("created", models.DateTimeField(auto_now=True)),
+                ("order_position", models.OneToOneField(on_delete=django.db.models.deletion.CASCADE,
+                                                        related_name="cached_pdf_data", to="pretixbase.orderposition")),
+            ],
+        ),
+    ]
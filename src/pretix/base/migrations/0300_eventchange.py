@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pretixbase", "0299_cachedpdfdata"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EventChange",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("datetime", models.DateTimeField(auto_now_add=True, db_index=True)),
+                ("object_type", models.CharField(max_length=32)),
+                ("object_id", models.BigIntegerField()),
+                ("action", models.CharField(max_length=16)),
+                ("data", models.JSONField(null=True)),
+                ("event", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="changes",
+                                            to="pretixbase.event")),
+            ],
+            options={
+                "indexes": [models.Index(fields=["event", "id"], name="pretixbase__event_i_4bc984_idx")],
+            },
+        ),
+    ]
@@ -45,9 +45,9 @@ from .media import ReusableMedium
 from .memberships import Membership, MembershipType
 from .notifications import NotificationSetting
 from .orders import (
-    AbstractPosition, CachedCombinedTicket, CachedTicket, CartPosition,
-    InvoiceAddress, Order, OrderFee, OrderPayment, OrderPosition, OrderRefund,
-    QuestionAnswer, RevokedTicketSecret, Transaction,
+    AbstractPosition, CachedCombinedTicket, CachedPdfData, CachedTicket,
+    CartPosition, InvoiceAddress, Order, OrderFee, OrderPayment, OrderPosition,
+    OrderRefund, QuestionAnswer, RevokedTicketSecret, Transaction,
     cachedcombinedticket_name, cachedticket_name, generate_position_secret,
     generate_secret,
 )
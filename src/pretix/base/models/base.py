@@ -207,10 +207,12 @@ class LoggedModel(models.Model, LoggingMixin):
         )
 
     def top_logentries(self):
+        from .log import LogEntry
+
         qs = self.all_logentries()
         if self.all_logentries_link:
             qs = qs[:25]
-        return qs
+        return LogEntry.prepare_display(qs)
 
     def top_logentries_has_more(self):
         return self.all_logentries().count() > 25
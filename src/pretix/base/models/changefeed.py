@@ -0,0 +1,222 @@
+#
+# This file is part of pretix (Community Edition).
+#
+# Copyright (C) 2014-2020  Raphael Michel and contributors
+# Copyright (C) 2020-today pretix GmbH and contributors
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU Affero General
+# Public License as published by the Free Software Foundation in version 3 of the License.
+#
+# ADDITIONAL TERMS APPLY: Pursuant to Section 7 of the GNU Affero General Public License, additional terms are
+# applicable granting you additional permissions and placing additional restrictions on your usage of this software.
+# Please refer to the pretix LICENSE file to obtain the full terms applicable to this work. If you did not receive
+# this file, see <https://pretix.eu/about/en/license>.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License along with this program.  If not, see
+# <https://www.gnu.org/licenses/>.
+#
+
+from contextlib import nullcontext
+
+from django.db import IntegrityError, models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from pretix.base.models import (
+    Checkin, Event, Item, ItemVariation, Order, OrderPosition, Quota,
+    RevokedTicketSecret,
+)
+from pretix.base.models.orders import BlockedTicketSecret
+
+
+class EventChange(models.Model):
+    """
+    An append-only log of changes to the data that offline devices keep in their local databases. Devices
+    remember the highest ``id`` they have seen and only need to fetch newer entries, see
+    ``pretix.base.services.changefeed``.
+
+    Entries are written after the transaction that caused them has been committed, so that the order of
+    ``id`` values matches the order in which changes became visible as closely as possible.
+
+    :param object_type: The kind of object that changed, one of the ``TYPE_*`` constants.
+    :param object_id: The primary key of the changed object.
+    :param action: Whether the object has been created or modified (``upsert``) or removed (``delete``).
+    :param data: A small set of attributes that allows devices to act on the change without fetching the
+                 full object, e.g. the ticket secret.
+    """
+    TYPE_ORDER = 'order'
+    TYPE_POSITION = 'position'
+    TYPE_CHECKIN = 'checkin'
+    TYPE_REVOKED_SECRET = 'revokedsecret'
+    TYPE_BLOCKED_SECRET = 'blockedsecret'
+    TYPE_QUOTA = 'quota'
+    TYPE_ITEM = 'item'
+
+    ACTION_UPSERT = 'upsert'
+    ACTION_DELETE = 'delete'
+
+    id = models.BigAutoField(primary_key=True)
+    event = models.ForeignKey(
+        Event,
+        on_delete=models.CASCADE,
+        related_name='changes',
+    )
+    datetime = models.DateTimeField(auto_now_add=True, db_index=True)
+    object_type = models.CharField(max_length=32)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=16)
+    data = models.JSONField(null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["event", "id"]),
+        ]
+
+    @classmethod
+    def record(cls, event_id, object_type, object_id, action=ACTION_UPSERT, data=None):
+        def _create():
+            try:
+                # Callbacks usually run outside of any transaction, so we only need a savepoint if we are
+                # nested inside one
+                with transaction.atomic() if transaction.get_connection().in_atomic_block else nullcontext():
+                    cls.objects.create(
+                        event_id=event_id,
+                        object_type=object_type,
+                        object_id=object_id,
+                        action=action,
+                        data=data,
+                    )
+            except IntegrityError:
+                # The event has been deleted in the same transaction
+                pass
+
+        transaction.on_commit(_create)
+
+    @classmethod
+    def record_many(cls, object_type, entries, action=ACTION_UPSERT):
+        """
+        Like ``record``, but for a list of ``(event_id, object_id, data)`` tuples at once. This is needed wherever
+        objects are changed through ``QuerySet.update()`` or ``bulk_create()``, which do not send signals.
+        """
+        if not entries:
+            return
+
+        def _create():
+            try:
+                with transaction.atomic() if transaction.get_connection().in_atomic_block else nullcontext():
+                    cls.objects.bulk_create([
+                        cls(event_id=event_id, object_type=object_type, object_id=object_id, action=action, data=data)
+                        for event_id, object_id, data in entries
+                    ], batch_size=500)
+            except IntegrityError:
+                # The event has been deleted in the same transaction
+                pass
+
+        transaction.on_commit(_create)
+
+    @classmethod
+    def record_orders(cls, pks):
+        """
+        Records the given orders as modified, with the same data as if they had been saved.
+        """
+        cls.record_many(cls.TYPE_ORDER, [
+            (event_id, pk, {'code': code, 'status': status})
+            for event_id, pk, code, status in Order.objects.filter(pk__in=pks).values_list(
+                'event_id', 'pk', 'code', 'status'
+            )
+        ])
+
+    @classmethod
+    def record_positions(cls, pks):
+        """
+        Records the given order positions as modified, with the same data as if they had been saved.
+        """
+        cls.record_many(cls.TYPE_POSITION, [
+            (event_id, pk, {'order': code, 'secret': secret, 'canceled': canceled})
+            for event_id, pk, code, secret, canceled in OrderPosition.all.filter(pk__in=pks).values_list(
+                'order__event_id', 'pk', 'order__code', 'secret', 'canceled'
+            )
+        ])
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def changes_order(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) == {'last_modified'}:
+        # Order.touch() is called when related objects change, which are recorded themselves
+        return
+    EventChange.record(
+        instance.event_id, EventChange.TYPE_ORDER, instance.pk,
+        EventChange.ACTION_DELETE if kwargs['signal'] is post_delete else EventChange.ACTION_UPSERT,
+        {'code': instance.code, 'status': instance.status},
+    )
+
+
+@receiver(post_save, sender=OrderPosition)
+@receiver(post_delete, sender=OrderPosition)
+def changes_position(sender, instance, **kwargs):
+    EventChange.record(
+        instance.order.event_id, EventChange.TYPE_POSITION, instance.pk,
+        EventChange.ACTION_DELETE if kwargs['signal'] is post_delete else EventChange.ACTION_UPSERT,
+        {'order': instance.order.code, 'secret': instance.secret, 'canceled': instance.canceled},
+    )
+
+
+@receiver(post_save, sender=Checkin)
+@receiver(post_delete, sender=Checkin)
+def changes_checkin(sender, instance, **kwargs):
+    EventChange.record(
+        instance.list.event_id, EventChange.TYPE_CHECKIN, instance.pk,
+        EventChange.ACTION_DELETE if kwargs['signal'] is post_delete else EventChange.ACTION_UPSERT,
+        {
+            'position': instance.position_id,
+            'list': instance.list_id,
+            'type': instance.type,
+            'datetime': instance.datetime.isoformat(),
+            'successful': instance.successful,
+        },
+    )
+
+
+@receiver(post_save, sender=RevokedTicketSecret)
+def changes_revoked_secret(sender, instance, **kwargs):
+    EventChange.record(
+        instance.event_id, EventChange.TYPE_REVOKED_SECRET, instance.pk, EventChange.ACTION_UPSERT,
+        {'secret': instance.secret},
+    )
+
+
+@receiver(post_save, sender=BlockedTicketSecret)
+def changes_blocked_secret(sender, instance, **kwargs):
+    EventChange.record(
+        instance.event_id, EventChange.TYPE_BLOCKED_SECRET, instance.pk, EventChange.ACTION_UPSERT,
+        {'secret': instance.secret, 'blocked': instance.blocked},
+    )
+
+
+@receiver(post_save, sender=Quota)
+@receiver(post_delete, sender=Quota)
+def changes_quota(sender, instance, **kwargs):
+    EventChange.record(
+        instance.event_id, EventChange.TYPE_QUOTA, instance.pk,
+        EventChange.ACTION_DELETE if kwargs['signal'] is post_delete else EventChange.ACTION_UPSERT,
+    )
+
+
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Item)
+@receiver(post_save, sender=ItemVariation)
+@receiver(post_delete, sender=ItemVariation)
+def changes_item(sender, instance, **kwargs):
+    if isinstance(instance, ItemVariation):
+        # Devices always fetch products including their variations
+        EventChange.record(instance.item.event_id, EventChange.TYPE_ITEM, instance.item_id)
+    else:
+        EventChange.record(
+            instance.event_id, EventChange.TYPE_ITEM, instance.pk,
+            EventChange.ACTION_DELETE if kwargs['signal'] is post_delete else EventChange.ACTION_UPSERT,
+        )
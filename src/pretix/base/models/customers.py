@@ -148,6 +148,8 @@ class Customer(LoggedModel):
         super().save(**kwargs)
 
     def anonymize(self):
+        from .changefeed import EventChange
+
         self.is_active = False
         self.is_verified = False
         self.name_parts = {}
@@ -158,7 +160,9 @@ class Customer(LoggedModel):
         self.notes = None
         self.save()
         self.all_logentries().update(data={}, shredded=True)
+        orders = list(self.orders.values_list('pk', flat=True))
         self.orders.all().update(customer=None)
+        EventChange.record_orders(orders)
         self.reusable_media.all().update(customer=None)
         self.memberships.all().update(attendee_name_parts=None)
         self.attendee_profiles.all().delete()
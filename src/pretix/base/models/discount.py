@@ -28,7 +28,10 @@ from typing import Dict
 
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils.functional import cached_property
 from django.utils.timezone import now
 from django.utils.translation import gettext_lazy as _, pgettext_lazy
 from django_scopes import ScopedManager
@@ -252,6 +255,16 @@ class Discount(LoggedModel):
             'benefit_same_products': self.benefit_same_products,
         })
 
+    @cached_property
+    def condition_product_ids(self) -> frozenset:
+        if self.condition_all_products:
+            return frozenset()
+        return frozenset(p.pk for p in self.condition_limit_products.all())
+
+    @cached_property
+    def benefit_product_ids(self) -> frozenset:
+        return frozenset(p.pk for p in self.benefit_limit_products.all())
+
     def is_available_by_time(self, now_dt=None) -> bool:
         now_dt = now_dt or now()
         if self.available_from and self.available_from > now_dt:
@@ -279,7 +292,7 @@ class Discount(LoggedModel):
             for idx in condition_idx_group:
                 collect_potential_discounts[idx] = [(self, inf, -1, subevent_id)]
 
-    def _addon_idx(self, positions, idx):
+    def _addon_indices(self, positions):
         """
         If we have the following cart:
 
@@ -310,12 +323,23 @@ class Discount(LoggedModel):
         unexpected version happens, e.g. if prices are different. We need to accept this as long as discounts work on
         cart level and not on addon-group level, but this simple sorting reduces the number of support issues by making
         the weird case less likely.
+
+        Returns a dictionary mapping every key of ``positions`` to its index within its addon group. This is computed
+        in a single pass since it is part of every sort key.
         """
-        if not positions[idx].addon_to:
-            return 0
-        return len([1 for i, p in positions.items() if i < idx and p.addon_to == positions[idx].addon_to])
+        seen = defaultdict(int)
+        result = {}
+        for idx in sorted(positions.keys()):
+            addon_to = positions[idx].addon_to
+            if addon_to:
+                result[idx] = seen[addon_to]
+                seen[addon_to] += 1
+            else:
+                result[idx] = 0
+        return result
 
-    def _apply_min_count(self, positions, condition_idx_group, benefit_idx_group, result, collect_potential_discounts, subevent_id):
+    def _apply_min_count(self, positions, condition_idx_group, benefit_idx_group, result, collect_potential_discounts, subevent_id,
+                         addon_idx=None):
         if len(condition_idx_group) < self.condition_min_count:
             return
 
@@ -324,8 +348,10 @@ class Discount(LoggedModel):
 
         if self.benefit_only_apply_to_cheapest_n_matches:
             # sort by line_price
-            condition_idx_group = sorted(condition_idx_group, key=lambda idx: (positions[idx].line_price_gross, self._addon_idx(positions, idx), -idx))
-            benefit_idx_group = sorted(benefit_idx_group, key=lambda idx: (positions[idx].line_price_gross, self._addon_idx(positions, idx), -idx))
+            if addon_idx is None:
+                addon_idx = self._addon_indices(positions)
+            condition_idx_group = sorted(condition_idx_group, key=lambda idx: (positions[idx].line_price_gross, addon_idx[idx], -idx))
+            benefit_idx_group = sorted(benefit_idx_group, key=lambda idx: (positions[idx].line_price_gross, addon_idx[idx], -idx))
 
             # Prevent over-consuming of items, i.e. if our discount is "buy 2, get 1 free", we only
             # want to match multiples of 3
@@ -397,9 +423,7 @@ class Discount(LoggedModel):
         if not self.active:
             return result
 
-        limit_products = set()
-        if not self.condition_all_products:
-            limit_products = {p.pk for p in self.condition_limit_products.all()}
+        limit_products = self.condition_product_ids
 
         # First, filter out everything not even covered by our product scope
         condition_candidates = [
@@ -415,11 +439,16 @@ class Discount(LoggedModel):
                         self.subevent_date_until is None or subevent_date_from <= self.subevent_date_until)
             )
         ]
+        if not condition_candidates:
+            # Neither a minimum count nor a minimum value can be reached
+            return result
+
+        addon_idx = self._addon_indices(positions)
 
         if self.benefit_same_products:
             benefit_candidates = list(condition_candidates)
         else:
-            benefit_products = {p.pk for p in self.benefit_limit_products.all()}
+            benefit_products = self.benefit_product_ids
             benefit_candidates = [
                 idx
                 for idx, (item_id, subevent_id, subevent_date_from, line_price_gross, is_addon_to, voucher_discount) in
@@ -433,7 +462,8 @@ class Discount(LoggedModel):
 
         if self.subevent_mode == self.SUBEVENT_MODE_MIXED:  # also applies to non-series events
             if self.condition_min_count:
-                self._apply_min_count(positions, condition_candidates, benefit_candidates, result, collect_potential_discounts, None)
+                self._apply_min_count(positions, condition_candidates, benefit_candidates, result, collect_potential_discounts, None,
+                                      addon_idx)
             else:
                 self._apply_min_value(positions, condition_candidates, benefit_candidates, result, collect_potential_discounts, None)
 
@@ -447,10 +477,15 @@ class Discount(LoggedModel):
             _groups = groupby(sorted(condition_candidates, key=key), key=key)
             candidate_groups = [(k, list(g)) for k, g in _groups]
 
+            benefit_groups = defaultdict(list)
+            for idx in benefit_candidates:
+                benefit_groups[positions[idx].subevent_id].append(idx)
+
             for subevent_id, g in candidate_groups:
-                benefit_g = [idx for idx in benefit_candidates if positions[idx].subevent_id == subevent_id]
+                benefit_g = benefit_groups.get(subevent_id, [])
                 if self.condition_min_count:
-                    self._apply_min_count(positions, g, benefit_g, result, collect_potential_discounts, subevent_id)
+                    self._apply_min_count(positions, g, benefit_g, result, collect_potential_discounts, subevent_id,
+                                          addon_idx)
                 else:
                     self._apply_min_value(positions, g, benefit_g, result, collect_potential_discounts, subevent_id)
 
@@ -464,13 +499,15 @@ class Discount(LoggedModel):
             #   balance out the cheapest products so that they are not all in the same group
             # - Then add remaining positions to existing groups if possible
             candidate_groups = []
+            condition_candidates = set(condition_candidates)
+            benefit_candidates = set(benefit_candidates)
 
             # Build a list of subevent IDs in descending order of frequency
             subevent_to_idx = defaultdict(list)
             for idx, p in positions.items():
                 subevent_to_idx[p.subevent_id].append(idx)
             for v in subevent_to_idx.values():
-                v.sort(key=lambda idx: (positions[idx].line_price_gross, self._addon_idx(positions, idx)))
+                v.sort(key=lambda idx: (positions[idx].line_price_gross, addon_idx[idx]))
             subevent_order = sorted(list(subevent_to_idx.keys()), key=lambda s: len(subevent_to_idx[s]), reverse=True)
 
             # Build groups of exactly condition_min_count distinct subevents
@@ -494,7 +531,7 @@ class Discount(LoggedModel):
 
                 # Sort the list by prices, then pick one. For "buy 2 get 1 free" we apply a "pick 1 from the start
                 # and 2 from the end" scheme to optimize price distribution among groups
-                candidates = sorted(candidates, key=lambda idx: (positions[idx].line_price_gross, self._addon_idx(positions, idx)))
+                candidates = sorted(candidates, key=lambda idx: (positions[idx].line_price_gross, addon_idx[idx]))
                 if len(current_group) < (self.benefit_only_apply_to_cheapest_n_matches or 0):
                     candidate = candidates[0]
                 else:
@@ -525,6 +562,30 @@ class Discount(LoggedModel):
                     [idx for idx in g if idx in benefit_candidates],
                     result,
                     None,
-                    None
+                    None,
+                    addon_idx
                 )
         return result
+
+
+def _invalidate_discount_plan(event):
+    event.cache.delete('discount_plan_version')
+    # Another process might have filled the cache with the old state before our transaction is committed
+    transaction.on_commit(lambda: event.cache.delete('discount_plan_version'))
+
+
+@receiver(post_save, sender=Discount)
+@receiver(post_delete, sender=Discount)
+def discount_changed(sender, instance, **kwargs):
+    _invalidate_discount_plan(instance.event)
+
+
+@receiver(m2m_changed, sender=Discount.condition_limit_products.through)
+@receiver(m2m_changed, sender=Discount.benefit_limit_products.through)
+@receiver(m2m_changed, sender=Discount.limit_sales_channels.through)
+def discount_relations_changed(sender, instance, action, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if isinstance(instance, Discount) or hasattr(instance, 'event'):
+        # Either a discount, or a product if the relation was changed from the reverse side
+        _invalidate_discount_plan(instance.event)
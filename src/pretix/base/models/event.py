@@ -52,7 +52,7 @@ from django.core.mail import get_connection
 from django.core.validators import (
     MaxValueValidator, MinValueValidator, RegexValidator,
 )
-from django.db import models
+from django.db import connections, models
 from django.db.models import Exists, OuterRef, Prefetch, Q, Subquery, Value
 from django.db.models.functions import Coalesce
 from django.template.defaultfilters import date as _date
@@ -82,6 +82,35 @@ from .organizer import Organizer, Team
 logger = logging.getLogger(__name__)
 
 
+def _bulk_insert(objs):
+    """
+    Inserts a list of new objects of the same model and makes sure their primary keys are set afterwards,
+    even if the database cannot return them from a bulk insert.
+    """
+    objs = list(objs)
+    if not objs:
+        return objs
+    if connections['default'].features.can_return_rows_from_bulk_insert:
+        type(objs[0]).objects.bulk_create(objs)
+    else:
+        for o in objs:
+            o.save(force_insert=True)
+    return objs
+
+
+def _bulk_insert_m2m(model, field_name, pairs):
+    """
+    Creates the rows of the many-to-many relation ``field_name`` of ``model`` for a list of
+    ``(source pk, target pk)`` tuples.
+    """
+    field = model._meta.get_field(field_name)
+    through = field.remote_field.through
+    through.objects.bulk_create([
+        through(**{field.m2m_field_name() + '_id': source, field.m2m_reverse_field_name() + '_id': target})
+        for source, target in pairs
+    ])
+
+
 class EventMixin:
     def clean(self):
         if self.presale_start and self.presale_end and self.presale_start > self.presale_end:
@@ -844,10 +873,18 @@ class Event(EventMixin, LoggedModel):
         ), tz)
 
     def copy_data_from(self, other, skip_meta_data=False):
+        """
+        Copies products, quotas, questions, check-in lists, settings and all other configuration from
+        ``other`` into this event. Objects are created with one query per model instead of one query
+        per object, so this stays fast for large events. Plugins receive the mappings of old primary
+        keys to the new objects through the ``event_copy_data`` signal.
+        """
         from ..signals import event_copy_data
         from . import (
-            Discount, Item, ItemAddOn, ItemBundle, ItemCategory, ItemMetaValue,
-            ItemProgramTime, ItemVariationMetaValue, Question, Quota,
+            CheckinList, Discount, Item, ItemAddOn, ItemBundle, ItemCategory,
+            ItemMetaValue, ItemProgramTime, ItemVariation,
+            ItemVariationMetaValue, LogEntry, Question, QuestionOption, Quota,
+            Seat, SeatCategoryMapping,
         )
 
         #  Note: avoid self.set_active_plugins(), it causes trouble e.g. for the badges plugin.
@@ -862,201 +899,208 @@ class Event(EventMixin, LoggedModel):
         self.testmode = other.testmode
         self.all_sales_channels = other.all_sales_channels
         self.save()
-        self.log_action('pretix.object.cloned', data={'source': other.slug, 'source_id': other.pk})
+        logentries = [
+            self.log_action('pretix.object.cloned', data={'source': other.slug, 'source_id': other.pk}, save=False)
+        ]
 
         if hasattr(other, 'alternative_domain_assignment'):
             other.alternative_domain_assignment.domain.event_assignments.create(event=self)
 
+        sales_channels = {s.identifier: s for s in self.organizer.sales_channels.all()}
+        same_organizer = other.organizer_id == self.organizer_id
+
         if not self.all_sales_channels:
-            self.limit_sales_channels.set(
-                self.organizer.sales_channels.filter(
-                    identifier__in=other.limit_sales_channels.values_list("identifier", flat=True)
-                )
-            )
+            self.limit_sales_channels.set([
+                sales_channels[s.identifier] for s in other.limit_sales_channels.all() if s.identifier in sales_channels
+            ])
+
+        def _channel_pairs(obj, channels):
+            return [(obj.pk, sales_channels[s.identifier].pk) for s in channels if s.identifier in sales_channels]
+
+        def _clone(objs, **attrs):
+            objs = list(objs)
+            for o in objs:
+                o.pk = None
+                o._prefetched_objects_cache = {}
+                for k, v in attrs.items():
+                    setattr(o, k, v)
+            return objs
 
         if not skip_meta_data:
-            for emv in EventMetaValue.objects.filter(event=other):
-                emv.pk = None
-                emv.event = self
-                emv.save(force_insert=True)
-
-        for fl in EventFooterLink.objects.filter(event=other):
-            fl.pk = None
-            fl.event = self
-            fl.save(force_insert=True)
-
-        tax_map = {}
-        for t in other.tax_rules.all():
-            tax_map[t.pk] = t
-            t.pk = None
-            t.event = self
-            t.save(force_insert=True)
-            t.log_action('pretix.object.cloned')
-
-        category_map = {}
-        for c in ItemCategory.objects.filter(event=other):
-            category_map[c.pk] = c
-            c.pk = None
-            c.event = self
-            c.save(force_insert=True)
-            c.log_action('pretix.object.cloned')
-
-        item_meta_properties_map = {}
-        for imp in other.item_meta_properties.all():
-            item_meta_properties_map[imp.pk] = imp
-            imp.pk = None
-            imp.event = self
-            imp.save(force_insert=True)
-            imp.log_action('pretix.object.cloned')
+            EventMetaValue.objects.bulk_create(_clone(EventMetaValue.objects.filter(event=other), event=self))
+
+        EventFooterLink.objects.bulk_create(_clone(EventFooterLink.objects.filter(event=other), event=self))
+
+        tax_map = {t.pk: t for t in other.tax_rules.all()}
+        _bulk_insert(_clone(tax_map.values(), event=self))
+
+        category_map = {c.pk: c for c in ItemCategory.objects.filter(event=other)}
+        _bulk_insert(_clone(category_map.values(), event=self))
+
+        item_meta_properties_map = {imp.pk: imp for imp in other.item_meta_properties.all()}
+        _bulk_insert(_clone(item_meta_properties_map.values(), event=self))
 
         item_map = {}
         variation_map = {}
+        item_relations = []
+        variation_relations = []
         for i in Item.objects.filter(event=other).prefetch_related(
             'variations', 'limit_sales_channels', 'require_membership_types',
             'variations__limit_sales_channels', 'variations__require_membership_types',
             'matched_by_cross_selling_categories',
         ):
-            vars = list(i.variations.all())
-            require_membership_types = list(i.require_membership_types.all())
-            limit_sales_channels = list(i.limit_sales_channels.all())
-            matched_by_cross_selling_categories = list(i.matched_by_cross_selling_categories.all())
+            item_relations.append((
+                i,
+                list(i.require_membership_types.all()),
+                list(i.limit_sales_channels.all()),
+                list(i.matched_by_cross_selling_categories.all()),
+            ))
+            for v in i.variations.all():
+                variation_map[v.pk] = v
+                variation_relations.append((
+                    v,
+                    list(v.require_membership_types.all()),
+                    list(v.limit_sales_channels.all()),
+                ))
             item_map[i.pk] = i
-            i.pk = None
-            i.event = self
-            i._prefetched_objects_cache = {}
+
+        for i in _clone(item_map.values(), event=self):
             if i.picture:
-                i.picture.save(os.path.basename(i.picture.name), i.picture)
+                i.picture.save(os.path.basename(i.picture.name), i.picture, save=False)
             if i.category_id:
                 i.category = category_map[i.category_id]
             if i.tax_rule_id:
                 i.tax_rule = tax_map[i.tax_rule_id]
-
-            if i.grant_membership_type and other.organizer_id != self.organizer_id:
+            if i.grant_membership_type_id and not same_organizer:
                 i.grant_membership_type = None
-
-            i.save()  # no force_insert since i.picture.save could have already inserted
-            i.log_action('pretix.object.cloned')
-
-            if require_membership_types and other.organizer_id == self.organizer_id:
-                i.require_membership_types.set(require_membership_types)
-
+        _bulk_insert(list(item_map.values()))
+
+        for v in _clone(variation_map.values()):
+            v.item = item_map[v.item_id]
+        _bulk_insert(list(variation_map.values()))
+
+        item_membership_types = []
+        item_channels = []
+        cross_selling = []
+        for i, require_membership_types, limit_sales_channels, matched_by_cross_selling_categories in item_relations:
+            if same_organizer:
+                item_membership_types += [(i.pk, m.pk) for m in require_membership_types]
             if not i.all_sales_channels:
-                i.limit_sales_channels.set(self.organizer.sales_channels.filter(identifier__in=[s.identifier for s in limit_sales_channels]))
-
-            for v in vars:
-                require_membership_types = list(v.require_membership_types.all())
-                limit_sales_channels = list(v.limit_sales_channels.all())
-                variation_map[v.pk] = v
-                v.pk = None
-                v.item = i
-                v._prefetched_objects_cache = {}
-                v.save(force_insert=True)
-
-                if require_membership_types and other.organizer_id == self.organizer_id:
-                    v.require_membership_types.set(require_membership_types)
-                if not v.all_sales_channels:
-                    v.limit_sales_channels.set(self.organizer.sales_channels.filter(identifier__in=[s.identifier for s in limit_sales_channels]))
-
-            if matched_by_cross_selling_categories:
-                i.matched_by_cross_selling_categories.set([category_map[c.pk] for c in matched_by_cross_selling_categories])
-
-        for i in self.items.filter(hidden_if_item_available__isnull=False):
-            i.hidden_if_item_available = item_map[i.hidden_if_item_available_id]
-            i.save()
-
-        for imv in ItemMetaValue.objects.filter(item__event=other):
-            imv.pk = None
+                item_channels += _channel_pairs(i, limit_sales_channels)
+            cross_selling += [(category_map[c.pk].pk, i.pk) for c in matched_by_cross_selling_categories]
+        _bulk_insert_m2m(Item, 'require_membership_types', item_membership_types)
+        _bulk_insert_m2m(Item, 'limit_sales_channels', item_channels)
+        _bulk_insert_m2m(ItemCategory, 'cross_selling_match_products', cross_selling)
+
+        variation_membership_types = []
+        variation_channels = []
+        for v, require_membership_types, limit_sales_channels in variation_relations:
+            if same_organizer:
+                variation_membership_types += [(v.pk, m.pk) for m in require_membership_types]
+            if not v.all_sales_channels:
+                variation_channels += _channel_pairs(v, limit_sales_channels)
+        _bulk_insert_m2m(ItemVariation, 'require_membership_types', variation_membership_types)
+        _bulk_insert_m2m(ItemVariation, 'limit_sales_channels', variation_channels)
+
+        imvs = _clone(ItemMetaValue.objects.filter(item__event=other))
+        for imv in imvs:
             imv.property = item_meta_properties_map[imv.property_id]
-            imv.item = item_map[imv.item.pk]
-            imv.save(force_insert=True)
+            imv.item = item_map[imv.item_id]
+        ItemMetaValue.objects.bulk_create(imvs)
 
-        for imv in ItemVariationMetaValue.objects.filter(variation__item__event=other):
-            imv.pk = None
+        imvs = _clone(ItemVariationMetaValue.objects.filter(variation__item__event=other))
+        for imv in imvs:
             imv.property = item_meta_properties_map[imv.property_id]
             imv.variation = variation_map[imv.variation_id]
-            imv.save(force_insert=True)
-
-        for ia in ItemAddOn.objects.filter(base_item__event=other).prefetch_related('base_item', 'addon_category'):
-            ia.pk = None
-            ia.base_item = item_map[ia.base_item.pk]
-            ia.addon_category = category_map[ia.addon_category.pk]
-            ia.save(force_insert=True)
-
-        for ia in ItemBundle.objects.filter(base_item__event=other).prefetch_related('base_item', 'bundled_item', 'bundled_variation'):
-            ia.pk = None
-            ia.base_item = item_map[ia.base_item.pk]
-            ia.bundled_item = item_map[ia.bundled_item.pk]
-            if ia.bundled_variation:
-                ia.bundled_variation = variation_map[ia.bundled_variation.pk]
-            ia.save(force_insert=True)
+        ItemVariationMetaValue.objects.bulk_create(imvs)
+
+        addons = _clone(ItemAddOn.objects.filter(base_item__event=other))
+        for ia in addons:
+            ia.base_item = item_map[ia.base_item_id]
+            ia.addon_category = category_map[ia.addon_category_id]
+        ItemAddOn.objects.bulk_create(addons)
+
+        bundles = _clone(ItemBundle.objects.filter(base_item__event=other))
+        for ib in bundles:
+            ib.base_item = item_map[ib.base_item_id]
+            ib.bundled_item = item_map[ib.bundled_item_id]
+            if ib.bundled_variation_id:
+                ib.bundled_variation = variation_map[ib.bundled_variation_id]
+        ItemBundle.objects.bulk_create(bundles)
 
         if not self.has_subevents and not other.has_subevents:
-            for ipt in ItemProgramTime.objects.filter(item__event=other).prefetch_related('item'):
-                ipt.pk = None
-                ipt.item = item_map[ipt.item.pk]
-                ipt.save(force_insert=True)
+            program_times = _clone(ItemProgramTime.objects.filter(item__event=other))
+            for ipt in program_times:
+                ipt.item = item_map[ipt.item_id]
+            ItemProgramTime.objects.bulk_create(program_times)
 
         quota_map = {}
+        quota_relations = []
         for q in Quota.objects.filter(event=other, subevent__isnull=True).prefetch_related('items', 'variations'):
             quota_map[q.pk] = q
-            items = list(q.items.all())
-            vars = list(q.variations.all())
-            oldid = q.pk
-            q.pk = None
-            q._prefetched_objects_cache = {}
-            q.event = self
-            q.closed = False
-            q.save(force_insert=True)
-            q.log_action('pretix.object.cloned')
-            for i in items:
-                if i.pk in item_map:
-                    q.items.add(item_map[i.pk])
-            for v in vars:
-                q.variations.add(variation_map[v.pk])
-            self.items.filter(hidden_if_available_id=oldid).update(hidden_if_available=q)
-
+            quota_relations.append((q, list(q.items.all()), list(q.variations.all())))
+        _bulk_insert(_clone(quota_map.values(), event=self, closed=False))
+        _bulk_insert_m2m(Quota, 'items', [
+            (q.pk, item_map[i.pk].pk) for q, items, variations in quota_relations for i in items if i.pk in item_map
+        ])
+        _bulk_insert_m2m(Quota, 'variations', [
+            (q.pk, variation_map[v.pk].pk) for q, items, variations in quota_relations for v in variations
+        ])
+
+        items_to_update = []
+        for i in item_map.values():
+            if i.hidden_if_item_available_id or i.hidden_if_available_id in quota_map:
+                if i.hidden_if_item_available_id:
+                    i.hidden_if_item_available = item_map[i.hidden_if_item_available_id]
+                if i.hidden_if_available_id in quota_map:
+                    i.hidden_if_available = quota_map[i.hidden_if_available_id]
+                items_to_update.append(i)
+        Item.objects.bulk_update(items_to_update, ['hidden_if_item_available', 'hidden_if_available'])
+
+        discount_relations = []
         for d in Discount.objects.filter(event=other).prefetch_related(
             'condition_limit_products', 'benefit_limit_products', 'limit_sales_channels'
         ):
-            c_items = list(d.condition_limit_products.all())
-            b_items = list(d.benefit_limit_products.all())
-            limit_sales_channels = list(d.limit_sales_channels.all())
-            d.pk = None
-            d.event = self
-            d._prefetched_objects_cache = {}
-            d.save(force_insert=True)
-            d.log_action('pretix.object.cloned')
-            for i in c_items:
-                if i.pk in item_map:
-                    d.condition_limit_products.add(item_map[i.pk])
-            for i in b_items:
-                if i.pk in item_map:
-                    d.benefit_limit_products.add(item_map[i.pk])
-
-            if not d.all_sales_channels:
-                d.limit_sales_channels.set(self.organizer.sales_channels.filter(identifier__in=[s.identifier for s in limit_sales_channels]))
+            discount_relations.append((
+                d,
+                list(d.condition_limit_products.all()),
+                list(d.benefit_limit_products.all()),
+                list(d.limit_sales_channels.all()),
+            ))
+        discounts = _bulk_insert(_clone([d for d, *relations in discount_relations], event=self))
+        _bulk_insert_m2m(Discount, 'condition_limit_products', [
+            (d.pk, item_map[i.pk].pk) for d, c_items, b_items, channels in discount_relations for i in c_items
+            if i.pk in item_map
+        ])
+        _bulk_insert_m2m(Discount, 'benefit_limit_products', [
+            (d.pk, item_map[i.pk].pk) for d, c_items, b_items, channels in discount_relations for i in b_items
+            if i.pk in item_map
+        ])
+        _bulk_insert_m2m(Discount, 'limit_sales_channels', [
+            pair for d, c_items, b_items, channels in discount_relations if not d.all_sales_channels
+            for pair in _channel_pairs(d, channels)
+        ])
 
         question_map = {}
+        question_relations = []
         for q in Question.objects.filter(event=other).prefetch_related('items', 'options'):
-            items = list(q.items.all())
-            opts = list(q.options.all())
             question_map[q.pk] = q
-            q.pk = None
-            q._prefetched_objects_cache = {}
-            q.event = self
-            q.save(force_insert=True)
-            q.log_action('pretix.object.cloned')
-
-            for i in items:
-                q.items.add(item_map[i.pk])
-            for o in opts:
-                o.pk = None
-                o.question = q
-                o.save(force_insert=True)
-
-        for q in self.questions.filter(dependency_question__isnull=False):
-            q.dependency_question = question_map[q.dependency_question_id]
-            q.save(update_fields=['dependency_question'])
+            question_relations.append((q, list(q.items.all()), list(q.options.all())))
+        _bulk_insert(_clone(question_map.values(), event=self))
+        _bulk_insert_m2m(Question, 'items', [
+            (q.pk, item_map[i.pk].pk) for q, items, options in question_relations for i in items
+        ])
+        options = []
+        for q, items, opts in question_relations:
+            options += _clone(opts, question=q)
+        QuestionOption.objects.bulk_create(options)
+
+        questions_to_update = []
+        for q in question_map.values():
+            if q.dependency_question_id:
+                q.dependency_question = question_map[q.dependency_question_id]
+                questions_to_update.append(q)
+        Question.objects.bulk_update(questions_to_update, ['dependency_question'])
 
         def _walk_rules(rules):
             if isinstance(rules, dict):
@@ -1073,21 +1117,25 @@ class Event(EventMixin, LoggedModel):
                     _walk_rules(i)
 
         checkin_list_map = {}
+        checkin_list_relations = []
         for cl in other.checkin_lists.filter(subevent__isnull=True).prefetch_related(
             'limit_products'
         ):
-            items = list(cl.limit_products.all())
             checkin_list_map[cl.pk] = cl
-            cl.pk = None
-            cl._prefetched_objects_cache = {}
-            cl.event = self
+            checkin_list_relations.append((cl, list(cl.limit_products.all())))
+        for cl in _clone(checkin_list_map.values(), event=self):
             rules = cl.rules
             _walk_rules(rules)
             cl.rules = rules
-            cl.save(force_insert=True)
-            cl.log_action('pretix.object.cloned')
-            for i in items:
-                cl.limit_products.add(item_map[i.pk])
+        _bulk_insert(list(checkin_list_map.values()))
+        _bulk_insert_m2m(CheckinList, 'limit_products', [
+            (cl.pk, item_map[i.pk].pk) for cl, items in checkin_list_relations for i in items
+        ])
+
+        for o in (*tax_map.values(), *category_map.values(), *item_meta_properties_map.values(),
+                  *item_map.values(), *quota_map.values(), *discounts, *question_map.values(),
+                  *checkin_list_map.values()):
+            logentries.append(o.log_action('pretix.object.cloned', save=False))
 
         if other.seating_plan:
             if other.seating_plan.organizer_id == self.organizer_id:
@@ -1100,18 +1148,16 @@ class Event(EventMixin, LoggedModel):
                 self.seating_plan = sp
             self.save()
 
-        for m in other.seat_category_mappings.filter(subevent__isnull=True):
-            m.pk = None
-            m.event = self
+        mappings = _clone(other.seat_category_mappings.filter(subevent__isnull=True), event=self)
+        for m in mappings:
             m.product = item_map[m.product_id]
-            m.save(force_insert=True)
+        SeatCategoryMapping.objects.bulk_create(mappings)
 
-        for s in other.seats.filter(subevent__isnull=True):
-            s.pk = None
-            s.event = self
+        seats = _clone(other.seats.filter(subevent__isnull=True), event=self)
+        for s in seats:
             if s.product_id:
                 s.product = item_map[s.product_id]
-            s.save(force_insert=True)
+        Seat.objects.bulk_create(seats, batch_size=1000)
 
         valid_sales_channel_identifers = set(self.organizer.sales_channels.values_list("identifier", flat=True))
         skip_settings = {
@@ -1155,6 +1201,8 @@ class Event(EventMixin, LoggedModel):
         other.settings._objects.bulk_create(settings_to_save)
 
         self.settings.flush()
+        self.cache.clear()
+        LogEntry.bulk_create_and_postprocess(logentries)
         event_copy_data.send(
             sender=self, other=other,
             tax_map=tax_map, category_map=category_map, item_map=item_map, variation_map=variation_map,
@@ -1715,7 +1763,12 @@ class SubEvent(EventMixin, LoggedModel):
             the app needs to know when a subevent is moved to a date in the future, since that
             might require it to re-download and re-store the orders.
             """
-            Order.objects.filter(all_positions__subevent=self).update(last_modified=now())
+            from .changefeed import EventChange
+
+            orders = Order.objects.filter(all_positions__subevent=self)
+            orders.update(last_modified=now())
+            # The update does not send any signals, but devices need to know about it as well
+            EventChange.record_orders(orders.values('pk'))
 
     @staticmethod
     def clean_items(event, items):
@@ -37,9 +37,9 @@ import warnings
 from decimal import Decimal
 
 import pycountry
-from django.db import DatabaseError, models, transaction
-from django.db.models import Max
-from django.db.models.functions import Cast
+from django.db import DatabaseError, IntegrityError, models, transaction
+from django.db.models import F, Max
+from django.db.models.functions import Cast, Greatest
 from django.utils import timezone
 from django.utils.crypto import get_random_string
 from django.utils.functional import cached_property
@@ -290,8 +290,8 @@ class Invoice(models.Model):
         ]
         return '\n'.join([p.strip() for p in parts if p and p.strip()])
 
-    def _get_numeric_invoice_number(self, c_length):
-        numeric_invoices = Invoice.objects.filter(
+    def _get_max_numeric_invoice_number(self):
+        return Invoice.objects.filter(
             event__organizer=self.event.organizer,
             prefix=self.prefix,
         ).exclude(invoice_no__contains='-').annotate(
@@ -299,7 +299,28 @@ class Invoice(models.Model):
         ).aggregate(
             max=Max('numeric_number')
         )['max'] or 0
-        return self._to_numeric_invoice_number(numeric_invoices + 1, c_length)
+
+    def _get_numeric_invoice_number(self, c_length, resync=False):
+        """
+        Advances the invoice number counter of our organizer and prefix and returns the new number. This needs
+        to be called in the same database transaction that saves the invoice: The counter row stays locked until
+        the transaction ends, and if the invoice can't be saved, the counter is reset as well, so we don't create
+        gaps in the numbering.
+
+        If ``resync`` is set, the counter is moved past the highest number in use, e.g. after a collision with an
+        invoice number that has not been assigned through the counter.
+        """
+        counters = InvoiceNumberCounter.objects.filter(organizer=self.event.organizer, prefix=self.prefix)
+        if resync or not counters.update(value=F('value') + 1):
+            max_existing = self._get_max_numeric_invoice_number()
+            try:
+                with transaction.atomic():
+                    InvoiceNumberCounter.objects.create(
+                        organizer=self.event.organizer, prefix=self.prefix, value=max_existing + 1
+                    )
+            except IntegrityError:
+                counters.update(value=Greatest(F('value'), max_existing) + 1)
+        return self._to_numeric_invoice_number(counters.values_list('value', flat=True).get(), c_length)
 
     def _get_invoice_number_from_order(self):
         return '{order}-{count}'.format(
@@ -331,12 +352,15 @@ class Invoice(models.Model):
             if self.order.testmode:
                 self.prefix += 'TEST-'
             for i in range(10):
-                if self.event.settings.get('invoice_numbers_consecutive'):
-                    self.invoice_no = self._get_numeric_invoice_number(self.event.settings.invoice_numbers_counter_length)
-                else:
-                    self.invoice_no = self._get_invoice_number_from_order()
                 try:
                     with transaction.atomic():
+                        if self.event.settings.get('invoice_numbers_consecutive'):
+                            self.invoice_no = self._get_numeric_invoice_number(
+                                self.event.settings.invoice_numbers_counter_length,
+                                resync=i > 0,
+                            )
+                        else:
+                            self.invoice_no = self._get_invoice_number_from_order()
                         self.full_invoice_no = self.prefix + self.invoice_no
                         return super().save(*args, **kwargs)
                 except DatabaseError:
@@ -504,3 +528,21 @@ class InvoiceLine(models.Model):
             category=DeprecationWarning,
         )
         self.period_to = value
+
+
+class InvoiceNumberCounter(models.Model):
+    """
+    Stores the last consecutive invoice number that has been assigned for an invoice number prefix
+    of an organizer. This allows us to assign the next number without searching all existing
+    invoices, see ``Invoice._get_numeric_invoice_number``.
+    """
+    organizer = models.ForeignKey(
+        'Organizer',
+        related_name='invoice_number_counters',
+        on_delete=models.CASCADE
+    )
+    prefix = models.CharField(max_length=160)
+    value = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('organizer', 'prefix')
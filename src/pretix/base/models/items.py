@@ -2132,11 +2132,14 @@ class Quota(LoggedModel):
             self.event.cache.clear()
 
     def save(self, *args, **kwargs):
+        from ..services.quotas import clear_quota_tokens
+
         # This is *not* called when the db-level cache is upated, since we use bulk_update there
         clear_cache = kwargs.pop('clear_cache', True)
         super().save(*args, **kwargs)
         if self.event and clear_cache:
             self.event.cache.clear()
+        clear_quota_tokens([self])
 
     def rebuild_cache(self, now_dt=None):
         if settings.HAS_REDIS:
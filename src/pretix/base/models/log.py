@@ -32,14 +32,21 @@
 # distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 # License for the specific language governing permissions and limitations under the License.
 
+import hashlib
 import json
 import logging
+from collections import defaultdict
 
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
 from django.db import connections, models
+from django.db.models import prefetch_related_objects
 from django.utils.functional import cached_property
+from django.utils.safestring import SafeData, mark_safe
+from django.utils.timezone import get_current_timezone_name
+from django.utils.translation import get_language
 
 from pretix.helpers.celery import get_task_priority
 
@@ -90,7 +97,15 @@ class LogEntry(models.Model):
         ordering = ('-datetime', '-id')
         indexes = [models.Index(fields=["datetime", "id"])]
 
+    DISPLAY_CACHE_TIMEOUT = 3600 * 24
+
     def display(self):
+        try:
+            return self._prepared_display
+        except AttributeError:
+            return self._render_display()
+
+    def _render_display(self):
         from pretix.base.logentrytype_registry import log_entry_types
 
         log_entry_type, meta = log_entry_types.get(action_type=self.action_type)
@@ -104,6 +119,78 @@ class LogEntry(models.Model):
                 return response
         return self.action_type
 
+    def _display_cache_key(self, log_entry_type):
+        h = hashlib.md5()
+        h.update('{}:{}:{}:{}'.format(
+            self.action_type, log_entry_type.display_version, get_language(), get_current_timezone_name()
+        ).encode())
+        h.update((self.data or '').encode())
+        return 'logentry_display:{}:{}'.format(self.pk, h.hexdigest())
+
+    @classmethod
+    def prepare_display(cls, logentries):
+        """
+        Renders the display texts of a batch of log entries, e.g. one page of a log view, so that
+        ``display()`` does not need to do any further work.
+
+        Texts of log entries whose ``LogEntryType`` is ``cacheable`` are cached per language and time
+        zone. The cache key includes the type's ``display_version`` and the log data, so changing either
+        invalidates the cached text. For types with ``related_objects``, the referenced objects are
+        fetched in bulk before rendering instead.
+
+        :return: A list of the given log entries
+        """
+        from pretix.base.logentrytype_registry import log_entry_types
+
+        logentries = list(logentries)
+        prefetch_related_objects(logentries, 'content_object')
+
+        types = {}
+        keys = {}
+        for le in logentries:
+            log_entry_type, meta = log_entry_types.get(action_type=le.action_type)
+            if log_entry_type:
+                types[le.pk] = log_entry_type
+                if log_entry_type.cacheable and not log_entry_type.related_objects:
+                    keys[le.pk] = le._display_cache_key(log_entry_type)
+
+        cached = cache.get_many(list(keys.values())) if keys else {}
+        missing = []
+        for le in logentries:
+            if le.pk in keys and keys[le.pk] in cached:
+                is_safe, text = cached[keys[le.pk]]
+                le._prepared_display = mark_safe(text) if is_safe else text
+            else:
+                missing.append(le)
+
+        wanted = defaultdict(set)
+        for le in missing:
+            if le.pk not in types or not le.event_id or not le.data:
+                continue
+            data = le.parsed_data
+            for key, (model, lookup) in types[le.pk].related_objects.items():
+                if isinstance(data.get(key), int):
+                    wanted[le.event_id, model, lookup].add(data[key])
+
+        related = defaultdict(dict)
+        for (event_id, model, lookup), pks in wanted.items():
+            for obj in model.objects.filter(pk__in=pks, **{lookup: event_id}):
+                related[event_id][model, obj.pk] = obj
+
+        to_cache = {}
+        for le in missing:
+            if le.event_id in related:
+                le._related_objects = related[le.event_id]
+            text = le._render_display()
+            if le.pk in keys:
+                if text is not None and not isinstance(text, str):
+                    text = str(text)
+                to_cache[keys[le.pk]] = (isinstance(text, SafeData), text)
+            le._prepared_display = text
+        if to_cache:
+            cache.set_many(to_cache, cls.DISPLAY_CACHE_TIMEOUT)
+        return logentries
+
     @property
     def webhook_type(self):
         from pretix.api.webhooks import get_all_webhook_events
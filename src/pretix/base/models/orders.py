@@ -53,6 +53,7 @@ import dateutil
 import pycountry
 from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models, transaction
 from django.db.models import (
     Case, Exists, F, Max, OuterRef, Q, Subquery, Sum, Value, When,
@@ -3585,6 +3586,18 @@ class CachedCombinedTicket(models.Model):
     created = models.DateTimeField(auto_now_add=True)
 
 
+class CachedPdfData(models.Model):
+    """
+    A snapshot of the evaluated ticket layout variables of an order position, as exposed as ``pdf_data`` in the
+    API. A snapshot is only used as long as its ``version`` matches the current state of the order and event,
+    see ``pretix.base.services.pdfdata``.
+    """
+    order_position = models.OneToOneField(OrderPosition, on_delete=models.CASCADE, related_name='cached_pdf_data')
+    version = models.CharField(max_length=190)
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+    created = models.DateTimeField(auto_now=True)
+
+
 class CancellationRequest(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='cancellation_requests')
     created = models.DateTimeField(auto_now_add=True)
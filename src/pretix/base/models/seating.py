@@ -20,7 +20,7 @@
 # <https://www.gnu.org/licenses/>.
 #
 import json
-from collections import namedtuple
+from collections import defaultdict, namedtuple
 
 from django.contrib.staticfiles import finders
 from django.core.exceptions import ValidationError
@@ -163,6 +163,13 @@ class SeatCategoryMapping(models.Model):
     product = models.ForeignKey(Item, related_name='seat_category_mappings', on_delete=models.CASCADE)
 
 
+SeatAvailabilityCheck = namedtuple(
+    'SeatAvailabilityCheck',
+    ('seat', 'ignore_cart', 'ignore_orderpos', 'ignore_voucher_id', 'distance_ignore_cart_id'),
+    defaults=(None, None, None, None),
+)
+
+
 class Seat(models.Model):
     """
     This model is used to represent every single specific seat within an (sub)event that can be selected. It's mainly
@@ -279,76 +286,136 @@ class Seat(models.Model):
             qs_annotated = qs_annotated.annotate(has_closeby_taken=Exists(sq_closeby))
         return qs_annotated
 
+    UNAVAILABLE_BLOCKED = 'blocked'
+    UNAVAILABLE_ORDER = 'order'
+    UNAVAILABLE_CART = 'cart'
+    UNAVAILABLE_VOUCHER = 'voucher'
+    UNAVAILABLE_DISTANCE = 'distance'
+
     def is_available(self, ignore_cart=None, ignore_orderpos=None, ignore_voucher_id=None,
                      sales_channel='web',
                      ignore_distancing=False, distance_ignore_cart_id=None, always_allow_blocked=False):
-        from .orders import Order
+        return Seat.check_availability(
+            [SeatAvailabilityCheck(self, ignore_cart, ignore_orderpos, ignore_voucher_id, distance_ignore_cart_id)],
+            sales_channel=sales_channel,
+            ignore_distancing=ignore_distancing,
+            always_allow_blocked=always_allow_blocked,
+        )[0] is None
+
+    @classmethod
+    def check_availability(cls, checks, sales_channel='web', ignore_distancing=False, always_allow_blocked=False):
+        """
+        Checks the availability of a number of seats of the same event at once. Order positions, cart
+        positions and vouchers occupying any of the seats are fetched in a single query.
+
+        :param checks: A list of ``SeatAvailabilityCheck`` tuples. Their ``ignore_*`` attributes work like the
+                       respective arguments of ``is_available``.
+        :return: A list with one entry per check, ``None`` if the seat is available or one of the
+                 ``UNAVAILABLE_*`` constants giving the reason why it is not.
+        """
+        from .orders import CartPosition, Order, OrderPosition
         from .organizer import SalesChannel
+        from .vouchers import Voucher
 
+        if not checks:
+            return []
         if isinstance(sales_channel, SalesChannel):
             sales_channel = sales_channel.identifier
-        if not always_allow_blocked and self.blocked and sales_channel not in self.event.settings.seating_allow_blocked_seats_for_channel:
-            return False
-        opqs = self.orderposition_set.filter(
+
+        event = checks[0].seat.event
+        seat_ids = {c.seat.pk for c in checks}
+        now_dt = now()
+        occupants = OrderPosition.objects.filter(
+            seat_id__in=seat_ids,
             order__status__in=[Order.STATUS_PENDING, Order.STATUS_PAID],
-            canceled=False
-        )
-        cpqs = self.cartposition_set.filter(expires__gte=now())
-        vqs = self.vouchers.filter(
-            Q(Q(valid_until__isnull=True) | Q(valid_until__gte=now())) &
-            Q(redeemed__lt=F('max_usages'))
+            canceled=False,
+        ).annotate(
+            reason=Value(cls.UNAVAILABLE_ORDER, output_field=models.CharField())
+        ).order_by().values_list('seat_id', 'pk', 'reason').union(
+            CartPosition.objects.filter(
+                seat_id__in=seat_ids,
+                expires__gte=now_dt,
+            ).annotate(
+                reason=Value(cls.UNAVAILABLE_CART, output_field=models.CharField())
+            ).order_by().values_list('seat_id', 'pk', 'reason'),
+            Voucher.objects.filter(
+                Q(valid_until__isnull=True) | Q(valid_until__gte=now_dt),
+                seat_id__in=seat_ids,
+                redeemed__lt=F('max_usages'),
+            ).annotate(
+                reason=Value(cls.UNAVAILABLE_VOUCHER, output_field=models.CharField())
+            ).order_by().values_list('seat_id', 'pk', 'reason'),
+            all=True,
         )
-        if ignore_cart and ignore_cart is not True:
-            cpqs = cpqs.exclude(pk=ignore_cart.pk)
-        if ignore_orderpos:
-            opqs = opqs.exclude(pk=ignore_orderpos.pk)
-        if ignore_voucher_id:
-            vqs = vqs.exclude(pk=ignore_voucher_id)
-
-        if opqs.exists() or (ignore_cart is not True and cpqs.exists()) or vqs.exists():
-            return False
-
-        if self.event.settings.seating_minimal_distance > 0 and not ignore_distancing:
-            ev = (self.subevent or self.event)
-            qs_annotated = Seat.annotated(ev.seats, self.event_id, self.subevent,
-                                          ignore_voucher_id=ignore_voucher_id,
-                                          minimal_distance=0,
-                                          ignore_order_id=ignore_orderpos.order_id if ignore_orderpos else None,
-                                          ignore_cart_id=(
-                                              distance_ignore_cart_id or
-                                              (ignore_cart.cart_id if ignore_cart and ignore_cart is not True else None)
-                                          ))
-            q = Q(has_order=True) | Q(has_voucher=True)
-            if ignore_cart is not True:
-                q |= Q(has_cart=True)
-
-            # The following looks like it makes no sense. Why wouldn't we just use ``Value(self.x)``, we already now
-            # the value? The reason is that x and y are floating point values generated from our JSON files. As it turns
-            # out, PostgreSQL MIGHT store floating point values with a different precision based on the underlying system
-            # architecture. So if we generate e.g. 670.247128887222289 from the JSON file and store it to the database,
-            # PostgreSQL will store it as 670.247128887222289 internally. However if we query it again, we only get
-            # 670.247128887222 back. But if we do calculations with a field in PostgreSQL itself, it uses the full
-            # precision for the calculation.
-            # We don't actually care about the results with this precision, but we care that the results from this
-            # function are exactly the same as from event.free_seats(), so we do this subquery trick to deal with
-            # PostgreSQL's internal values in both cases.
-            # In the long run, we probably just want to round the numbers on insert...
-            # See also https://www.postgresql.org/docs/11/runtime-config-client.html#GUC-EXTRA-FLOAT-DIGITS
-            self_x = Subquery(Seat.objects.filter(pk=self.pk).values('x'))
-            self_y = Subquery(Seat.objects.filter(pk=self.pk).values('y'))
-
-            qs_closeby_taken = qs_annotated.annotate(
-                distance=(
-                    Power(F('x') - self_x, Value(2), output_field=models.FloatField()) +
-                    Power(F('y') - self_y, Value(2), output_field=models.FloatField())
-                )
-            ).exclude(pk=self.pk).filter(
-                q,
-                distance__lt=self.event.settings.seating_minimal_distance ** 2
+        occupied = defaultdict(list)
+        for seat_id, pk, reason in occupants:
+            occupied[seat_id].append((reason, pk))
+
+        allow_blocked_channels = event.settings.seating_allow_blocked_seats_for_channel
+        check_distance = event.settings.seating_minimal_distance > 0 and not ignore_distancing
+        results = []
+        for c in checks:
+            ignored = {
+                cls.UNAVAILABLE_ORDER: c.ignore_orderpos.pk if c.ignore_orderpos else None,
+                cls.UNAVAILABLE_CART: c.ignore_cart.pk if c.ignore_cart and c.ignore_cart is not True else None,
+                cls.UNAVAILABLE_VOUCHER: c.ignore_voucher_id,
+            }
+            reason = None
+            if not always_allow_blocked and c.seat.blocked and sales_channel not in allow_blocked_channels:
+                reason = cls.UNAVAILABLE_BLOCKED
+            else:
+                for r, pk in occupied[c.seat.pk]:
+                    if r == cls.UNAVAILABLE_CART and c.ignore_cart is True:
+                        continue
+                    if pk != ignored[r]:
+                        reason = r
+                        break
+
+            if reason is None and check_distance:
+                if c.seat._closeby_taken(c.ignore_cart, c.ignore_orderpos, c.ignore_voucher_id,
+                                         c.distance_ignore_cart_id):
+                    reason = cls.UNAVAILABLE_DISTANCE
+            results.append(reason)
+        return results
+
+    def _closeby_taken(self, ignore_cart, ignore_orderpos, ignore_voucher_id, distance_ignore_cart_id):
+        ev = (self.subevent or self.event)
+        qs_annotated = Seat.annotated(ev.seats, self.event_id, self.subevent,
+                                      ignore_voucher_id=ignore_voucher_id,
+                                      minimal_distance=0,
+                                      ignore_order_id=ignore_orderpos.order_id if ignore_orderpos else None,
+                                      ignore_cart_id=(
+                                          distance_ignore_cart_id or
+                                          (ignore_cart.cart_id if ignore_cart and ignore_cart is not True else None)
+                                      ))
+        q = Q(has_order=True) | Q(has_voucher=True)
+        if ignore_cart is not True:
+            q |= Q(has_cart=True)
+
+        # The following looks like it makes no sense. Why wouldn't we just use ``Value(self.x)``, we already now
+        # the value? The reason is that x and y are floating point values generated from our JSON files. As it turns
+        # out, PostgreSQL MIGHT store floating point values with a different precision based on the underlying system
+        # architecture. So if we generate e.g. 670.247128887222289 from the JSON file and store it to the database,
+        # PostgreSQL will store it as 670.247128887222289 internally. However if we query it again, we only get
+        # 670.247128887222 back. But if we do calculations with a field in PostgreSQL itself, it uses the full
+        # precision for the calculation.
+        # We don't actually care about the results with this precision, but we care that the results from this
+        # function are exactly the same as from event.free_seats(), so we do this subquery trick to deal with
+        # PostgreSQL's internal values in both cases.
+        # In the long run, we probably just want to round the numbers on insert...
+        # See also https://www.postgresql.org/docs/11/runtime-config-client.html#GUC-EXTRA-FLOAT-DIGITS
+        self_x = Subquery(Seat.objects.filter(pk=self.pk).values('x'))
+        self_y = Subquery(Seat.objects.filter(pk=self.pk).values('y'))
+
+        qs_closeby_taken = qs_annotated.annotate(
+            distance=(
+                Power(F('x') - self_x, Value(2), output_field=models.FloatField()) +
+                Power(F('y') - self_y, Value(2), output_field=models.FloatField())
             )
-            if self.event.settings.seating_distance_within_row:
-                qs_closeby_taken = qs_closeby_taken.filter(row_name=self.row_name)
-            if qs_closeby_taken.exists():
-                return False
-
-        return True
+        ).exclude(pk=self.pk).filter(
+            q,
+            distance__lt=self.event.settings.seating_minimal_distance ** 2
+        )
+        if self.event.settings.seating_distance_within_row:
+            qs_closeby_taken = qs_closeby_taken.filter(row_name=self.row_name)
+        return qs_closeby_taken.exists()
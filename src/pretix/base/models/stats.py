@@ -0,0 +1,109 @@
+#
+# This file is part of pretix (Community Edition).
+#
+# Copyright (C) 2014-2020  Raphael Michel and contributors
+# Copyright (C) 2020-today pretix GmbH and contributors
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU Affero General
+# Public License as published by the Free Software Foundation in version 3 of the License.
+#
+# ADDITIONAL TERMS APPLY: Pursuant to Section 7 of the GNU Affero General Public License, additional terms are
+# applicable granting you additional permissions and placing additional restrictions on your usage of this software.
+# Please refer to the pretix LICENSE file to obtain the full terms applicable to this work. If you did not receive
+# this file, see <https://pretix.eu/about/en/license>.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License along with this program.  If not, see
+# <https://www.gnu.org/licenses/>.
+#
+
+
+from django.db import models
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django_scopes import scopes_disabled
+
+from pretix.base.models import (
+    Event, Item, ItemVariation, Order, OrderPosition, SubEvent,
+)
+
+
+class OrderPositionRollup(models.Model):
+    """
+    Pre-aggregated sales figures used by ``pretix.base.services.stats.order_overview``. Every row
+    contains the number and sum of all order positions of one event that share the same subevent,
+    product, variation, status, order date and date of last payment.
+
+    Rows are never updated in place. Instead, ``refresh_order_rollups`` re-aggregates all rows of
+    the days on which orders have been modified since the last refresh.
+
+    :param status: The position status as used by ``order_overview``, i.e. an order status,
+                   ``"c"`` for canceled positions or ``"unapproved"``.
+    :param day: The date of the order in the event's timezone
+    :param payment_day: The date of the last confirmed or refunded payment in the event's timezone
+    """
+    event = models.ForeignKey(
+        Event,
+        on_delete=models.CASCADE,
+        related_name='order_position_rollups',
+    )
+    subevent = models.ForeignKey(
+        SubEvent,
+        null=True,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    item = models.ForeignKey(
+        Item,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    variation = models.ForeignKey(
+        ItemVariation,
+        null=True,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    status = models.CharField(max_length=16)
+    day = models.DateField()
+    payment_day = models.DateField(null=True)
+    count = models.PositiveIntegerField(default=0)
+    price = models.DecimalField(decimal_places=2, max_digits=13, default=0)
+    tax_value = models.DecimalField(decimal_places=2, max_digits=13, default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["event", "day"]),
+        ]
+
+
+class OrderPositionRollupState(models.Model):
+    """
+    Book-keeping for ``OrderPositionRollup``. ``watermark`` is the point in time up to which order
+    modifications have been incorporated into the rollups of the event. If it is ``None``, the
+    rollups need to be rebuilt from scratch. Since rollup days depend on the event timezone, we
+    store the timezone the rollups have been computed with.
+    """
+    event = models.OneToOneField(
+        Event,
+        on_delete=models.CASCADE,
+        related_name='order_position_rollup_state',
+    )
+    timezone = models.CharField(max_length=100)
+    watermark = models.DateTimeField(null=True)
+
+
+@receiver(post_delete, sender=Order)
+@receiver(post_delete, sender=OrderPosition)
+def rollups_invalidate_on_delete(sender, instance, **kwargs):
+    # Deleted rows do not leave a trace we could use to find the affected days, so we just
+    # force a rebuild. This only happens for test mode orders and is therefore rare.
+    if isinstance(instance, Order):
+        event_id = instance.event_id
+    else:
+        with scopes_disabled():
+            event_id = Order.objects.filter(pk=instance.order_id).values_list('event_id', flat=True).first()
+    OrderPositionRollupState.objects.filter(event_id=event_id).update(watermark=None)
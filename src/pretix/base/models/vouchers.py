@@ -33,6 +33,7 @@
 # distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 # License for the specific language governing permissions and limitations under the License.
 
+from collections import Counter
 from decimal import ROUND_HALF_UP, Decimal
 
 from django.conf import settings
@@ -444,23 +445,18 @@ class Voucher(LoggedModel):
         return quotas
 
     @staticmethod
-    def clean_quota_check(data, cnt, old_instance, event, quota, item, variation):
-        from ..services.locking import lock_objects
-        from ..services.quotas import QuotaAvailability
-
-        old_quotas = Voucher.clean_quota_get_ignored(old_instance)
-
+    def clean_quota_get_new(data, event, quota, item, variation):
         if event.has_subevents and data.get('block_quota') and not data.get('subevent'):
             raise ValidationError(_('If you want this voucher to block quota, you need to select a specific date.'))
 
         if quota:
-            new_quotas = {quota}
+            return {quota}
         elif item and variation:
-            new_quotas = set(variation.quotas.filter(subevent=data.get('subevent')))
+            return set(variation.quotas.filter(subevent=data.get('subevent')))
         elif item and not item.has_variations:
-            new_quotas = set(item.quotas.filter(subevent=data.get('subevent')))
+            return set(item.quotas.filter(subevent=data.get('subevent')))
         elif item and item.has_variations:
-            new_quotas = set(
+            return set(
                 Quota.objects.filter(
                     pk__in=Quota.variations.through.objects.filter(
                         itemvariation__item=item,
@@ -472,6 +468,14 @@ class Voucher(LoggedModel):
             raise ValidationError(_('You need to select a specific product or quota if this voucher should reserve '
                                     'tickets.'))
 
+    @staticmethod
+    def clean_quota_check(data, cnt, old_instance, event, quota, item, variation):
+        from ..services.locking import lock_objects
+        from ..services.quotas import QuotaAvailability
+
+        old_quotas = Voucher.clean_quota_get_ignored(old_instance)
+        new_quotas = Voucher.clean_quota_get_new(data, event, quota, item, variation)
+
         if not (new_quotas - old_quotas):
             return
 
@@ -485,6 +489,44 @@ class Voucher(LoggedModel):
             raise ValidationError(_('You cannot create a voucher that blocks quota as the selected product or '
                                     'quota is currently sold out or completely reserved.'))
 
+    @staticmethod
+    def clean_quota_check_bulk(data_list, event):
+        """
+        Checks the quota availability for a number of new vouchers together, locking and computing every
+        quota only once. Returns the indices of all entries of ``data_list`` that cannot be satisfied.
+        """
+        from ..services.locking import lock_objects
+        from ..services.quotas import QuotaAvailability
+
+        quotas_by_index = {}
+        needed = Counter()
+        quotas_cache = {}
+        for i, data in enumerate(data_list):
+            if not Voucher.clean_quota_needs_checking(data, None, item_changed=False, creating=True):
+                continue
+            key = data.get('quota'), data.get('item'), data.get('variation'), data.get('subevent')
+            if key not in quotas_cache:
+                quotas_cache[key] = Voucher.clean_quota_get_new(
+                    data, event, data.get('quota'), data.get('item'), data.get('variation')
+                )
+            quotas_by_index[i] = quotas_cache[key]
+            for q in quotas_by_index[i]:
+                needed[q] += data.get('max_usages', 1)
+
+        if not needed:
+            return set()
+
+        lock_objects([q for q in needed if q.size is not None], shared_lock_objects=[event])
+
+        qa = QuotaAvailability(count_waitinglist=False)
+        qa.queue(*needed)
+        qa.compute()
+        unavailable = {
+            q for q, r in qa.results.items()
+            if r[0] != Quota.AVAILABILITY_OK or (r[1] is not None and r[1] < needed[q])
+        }
+        return {i for i, quotas in quotas_by_index.items() if quotas & unavailable}
+
     @staticmethod
     def clean_voucher_code(data, event, pk):
         if 'code' in data and Voucher.objects.filter(Q(code__iexact=data['code'].upper()) & Q(event=event) & ~Q(pk=pk)).exists():
@@ -195,42 +195,52 @@ class WaitingListEntry(LoggedModel):
             locked_wle.event = event
             if locked_wle.voucher:
                 raise WaitingListException(_('A voucher has already been sent to this person.'))
-            e = locked_wle.email
-            if locked_wle.name:
-                e += ' / ' + locked_wle.name
-            v = Voucher.objects.create(
-                event=locked_wle.event,
-                max_usages=1,
-                valid_until=now() + timedelta(hours=locked_wle.event.settings.waiting_list_hours),
-                item=locked_wle.item,
-                variation=locked_wle.variation,
-                tag='waiting-list',
-                comment=_('Automatically created from waiting list entry for {email}').format(
-                    email=e
-                ),
-                block_quota=True,
-                subevent=locked_wle.subevent,
-            )
-            v.log_action('pretix.voucher.added', {
-                'item': locked_wle.item.pk,
-                'variation': locked_wle.variation.pk if locked_wle.variation else None,
-                'tag': 'waiting-list',
-                'block_quota': True,
-                'valid_until': v.valid_until.isoformat(),
-                'max_usages': 1,
-                'subevent': locked_wle.subevent.pk if locked_wle.subevent else None,
-                'source': 'waitinglist',
-            }, user=user, auth=auth)
-            v.log_action('pretix.voucher.added.waitinglist', {
-                'email': locked_wle.email,
-                'waitinglistentry': locked_wle.pk,
-            }, user=user, auth=auth)
-            locked_wle.voucher = v
-            locked_wle.save()
+            v = locked_wle.create_voucher(user=user, auth=auth)
 
         self.refresh_from_db()
         self.event = event
+        self.send_voucher_mail(v, user=user, auth=auth)
+
+    def create_voucher(self, user=None, auth=None):
+        """
+        Creates a voucher for this entry and assigns it. Needs to be called within a transaction holding a
+        lock on this entry, the caller is responsible for checking availability.
+        """
+        e = self.email
+        if self.name:
+            e += ' / ' + self.name
+        v = Voucher.objects.create(
+            event=self.event,
+            max_usages=1,
+            valid_until=now() + timedelta(hours=self.event.settings.waiting_list_hours),
+            item=self.item,
+            variation=self.variation,
+            tag='waiting-list',
+            comment=_('Automatically created from waiting list entry for {email}').format(
+                email=e
+            ),
+            block_quota=True,
+            subevent=self.subevent,
+        )
+        v.log_action('pretix.voucher.added', {
+            'item': self.item.pk,
+            'variation': self.variation.pk if self.variation else None,
+            'tag': 'waiting-list',
+            'block_quota': True,
+            'valid_until': v.valid_until.isoformat(),
+            'max_usages': 1,
+            'subevent': self.subevent.pk if self.subevent else None,
+            'source': 'waitinglist',
+        }, user=user, auth=auth)
+        v.log_action('pretix.voucher.added.waitinglist', {
+            'email': self.email,
+            'waitinglistentry': self.pk,
+        }, user=user, auth=auth)
+        self.voucher = v
+        self.save(update_fields=['voucher'])
+        return v
 
+    def send_voucher_mail(self, voucher, user=None, auth=None):
         with language(self.locale, self.event.settings.region):
             self.send_mail(
                 self.event.settings.mail_subject_waiting_list,
@@ -238,7 +248,7 @@ class WaitingListEntry(LoggedModel):
                 get_email_context(
                     event=self.event,
                     waiting_list_entry=self,
-                    waiting_list_voucher=v,
+                    waiting_list_voucher=voucher,
                     event_or_subevent=self.subevent or self.event,
                 ),
                 user=user,
@@ -400,7 +400,8 @@ DEFAULT_VARIABLES = OrderedDict((
         "evaluate": lambda op, order, ev: date_format(
             now().astimezone(ev.timezone),
             "SHORT_DATE_FORMAT"
-        )
+        ),
+        "volatile": True,
     }),
     ("now_datetime", {
         "label": _("Printing date and time"),
@@ -408,7 +409,8 @@ DEFAULT_VARIABLES = OrderedDict((
         "evaluate": lambda op, order, ev: date_format(
             now().astimezone(ev.timezone),
             "SHORT_DATETIME_FORMAT"
-        )
+        ),
+        "volatile": True,
     }),
     ("now_time", {
         "label": _("Printing time"),
@@ -416,7 +418,8 @@ DEFAULT_VARIABLES = OrderedDict((
         "evaluate": lambda op, order, ev: date_format(
             now().astimezone(ev.timezone),
             "TIME_FORMAT"
-        )
+        ),
+        "volatile": True,
     }),
     ("purchase_date", {
         "label": _("Purchase date"),
@@ -526,7 +529,8 @@ DEFAULT_VARIABLES = OrderedDict((
     ("first_scan", {
         "label": _("Date and time of first scan"),
         "editor_sample": _("2017-05-31 19:00"),
-        "evaluate": lambda op, order, ev: get_first_scan(op)
+        "evaluate": lambda op, order, ev: get_first_scan(op),
+        "volatile": True,
     }),
     ("giftcard_issuance_date", {
 
@@ -579,6 +583,7 @@ def images_from_questions(sender, *args, **kwargs):
             'label': _('Question: {question}').format(question=q.question),
             'evaluate': partial(get_answer, question_id=q.pk, etag=False),
             'etag': partial(get_answer, question_id=q.pk, etag=True),
+            'cacheable': True,
         }
     return d
 
@@ -617,13 +622,15 @@ def variables_from_questions(sender, *args, **kwargs):
             'label': _('Question: {question}').format(question=q.question),
             'editor_sample': _('<Answer: {question}>').format(question=q.question),
             'evaluate': partial(get_answer, question_id=q.pk),
-            'migrate_from': 'question_{}'.format(q.pk)
+            'migrate_from': 'question_{}'.format(q.pk),
+            'cacheable': True,
         }
         d['question_{}'.format(q.pk)] = {
             'label': _('Question: {question}').format(question=q.question),
             'editor_sample': _('<Answer: {question}>').format(question=q.question),
             'evaluate': partial(get_answer, question_id=q.pk),
             'hidden': True,
+            'cacheable': True,
         }
     return d
 
@@ -646,11 +653,19 @@ def _get_ia_name_part(key, op, order, ev):
     return value
 
 
+def _volatile_unless_cacheable(variables):
+    # We can't know what variables of plugins depend on, so they are only stored in snapshots if they say so
+    return {
+        k: f if f.get('cacheable') else {**f, 'volatile': True}
+        for k, f in variables.items()
+    }
+
+
 def get_images(event):
     v = copy.copy(DEFAULT_IMAGES)
 
     for recv, res in layout_image_variables.send(sender=event):
-        v.update(res)
+        v.update(_volatile_unless_cacheable(res))
 
     return v
 
@@ -698,7 +713,7 @@ def get_variables(event):
         }
 
     for recv, res in layout_text_variables.send(sender=event):
-        v.update(res)
+        v.update(_volatile_unless_cacheable(res))
 
     return v
 
@@ -31,6 +31,7 @@
 # Unless required by applicable law or agreed to in writing, software distributed under the Apache License 2.0 is
 # distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 # License for the specific language governing permissions and limitations under the License.
+import hashlib
 import re
 import uuid
 from collections import Counter, defaultdict, namedtuple
@@ -61,15 +62,18 @@ from pretix.base.models import (
 )
 from pretix.base.models.event import SubEvent
 from pretix.base.models.orders import OrderFee
+from pretix.base.models.seating import SeatAvailabilityCheck
 from pretix.base.models.tax import TaxRule
 from pretix.base.reldate import RelativeDateWrapper
 from pretix.base.services.checkin import _save_answers
 from pretix.base.services.locking import LockTimeoutException, lock_objects
 from pretix.base.services.pricing import (
-    apply_discounts, apply_rounding, get_line_price, get_listed_price,
-    get_price, is_included_for_free,
+    apply_discounts, apply_rounding, get_discount_plan, get_line_price,
+    get_listed_price, get_price, is_included_for_free,
+)
+from pretix.base.services.quotas import (
+    QuotaAvailability, set_quota_tokens, take_quota_tokens,
 )
-from pretix.base.services.quotas import QuotaAvailability
 from pretix.base.services.tasks import ProfiledEventTask
 from pretix.base.settings import PERSON_NAME_SCHEMES, LazyI18nStringList
 from pretix.base.signals import validate_cart_addons
@@ -240,6 +244,10 @@ def _get_quota_availability(quota_diff, now_dt):
             quotas_ok[quota] = min(count, avail[1])
         else:
             quotas_ok[quota] = count
+    # We know the exact availability now, so we can refresh the headroom used by the fast path of later carts
+    set_quota_tokens({
+        quota: avail[1] - min(quota_diff[quota], avail[1]) for quota, avail in qa.results.items() if avail[1] is not None
+    })
     return quotas_ok
 
 
@@ -397,6 +405,16 @@ def _check_position_constraints(
         raise CartPositionError(error_messages['voucher_required'])
 
 
+def _line_price_key(cp, bundled_positions):
+    """
+    Returns everything the line price of a cart position depends on, as well as the line price itself.
+    """
+    return (
+        cp.item_id, cp.item.tax_rule_id, cp.price_after_voucher, cp.custom_price_input, cp.custom_price_input_is_net,
+        cp.is_bundled, sum(b.price_after_voucher for b in bundled_positions), cp.line_price_gross, cp.tax_rate,
+    )
+
+
 class CartManager:
     AddOperation = namedtuple('AddOperation', ('count', 'item', 'variation', 'voucher', 'quotas',
                                                'addon_to', 'subevent', 'bundled', 'seat', 'listed_price',
@@ -1143,9 +1161,9 @@ class CartManager:
         return vouchers_ok
 
     def _check_min_max_per_product(self):
+        # Only products touched by an operation can change their count, all others have been validated
+        # with an earlier commit of this cart.
         items = Counter()
-        for p in self.positions:
-            items[p.item] += 1
         for op in self._operations:
             if isinstance(op, self.AddOperation):
                 items[op.item] += op.count
@@ -1155,6 +1173,11 @@ class CartManager:
                 items[op.position.item] -= 1
                 for a in op.position.addons.all():
                     items[a.item] -= 1
+        if not items:
+            return None
+
+        for p in self.positions.filter(item__in=list(items)):
+            items[p.item] += 1
 
         err = None
         for item, count in items.items():
@@ -1225,6 +1248,26 @@ class CartManager:
                     )
         return err
 
+    def _get_seat_availability(self):
+        checks = {}
+        for iop, op in enumerate(self._operations):
+            if isinstance(op, self.AddOperation) and op.seat:
+                checks[iop] = SeatAvailabilityCheck(
+                    op.seat,
+                    ignore_voucher_id=op.voucher.id if op.voucher else None,
+                    distance_ignore_cart_id=self.cart_id,
+                )
+            elif isinstance(op, self.ExtendOperation) and op.seat:
+                checks[iop] = SeatAvailabilityCheck(
+                    op.seat,
+                    ignore_cart=op.position,
+                    ignore_voucher_id=op.position.voucher_id,
+                )
+        return dict(zip(
+            checks.keys(),
+            Seat.check_availability(list(checks.values()), sales_channel=self._sales_channel)
+        ))
+
     @transaction.atomic(durable=True)
     def _perform_operations(self):
         full_lock_required = any(getattr(o, 'seat', False) for o in self._operations) and self.event.settings.seating_minimal_distance > 0
@@ -1232,15 +1275,27 @@ class CartManager:
             # We lock the entire event in this case since we don't want to deal with fine-granular locking
             # in the case of seating distance enforcement
             lock_objects([self.event])
+            quotas_with_tokens = {}
         else:
+            limited_quota_diff = {q: d for q, d in self._quota_diff.items() if q.size is not None and d > 0}
+            if take_quota_tokens(limited_quota_diff):
+                # All quotas have plenty of units left, so we do not need to lock them and count their
+                # availability. The units have already been taken from the headroom tracked in redis.
+                quotas_with_tokens = limited_quota_diff
+            else:
+                quotas_with_tokens = {}
             lock_objects(
-                [q for q, d in self._quota_diff.items() if q.size is not None and d > 0] +
+                [q for q in limited_quota_diff if q not in quotas_with_tokens] +
                 [v for v, d in self._voucher_use_diff.items() if d > 0] +
                 [getattr(o, 'seat', False) for o in self._operations if getattr(o, 'seat', False)],
                 shared_lock_objects=[self.event]
             )
         vouchers_ok = self._get_voucher_availability()
-        quotas_ok = _get_quota_availability(self._quota_diff, self.real_now_dt)
+        quotas_ok = _get_quota_availability(
+            {q: d for q, d in self._quota_diff.items() if q not in quotas_with_tokens},
+            self.real_now_dt
+        )
+        quotas_ok.update(quotas_with_tokens)
         err = None
         new_cart_positions = []
         deleted_positions = set()
@@ -1254,6 +1309,7 @@ class CartManager:
             sleep(2)
 
         err_unavailable_products = []
+        seat_availability = None
 
         for iop, op in enumerate(self._operations):
             if isinstance(op, self.RemoveOperation):
@@ -1269,6 +1325,9 @@ class CartManager:
             elif isinstance(op, (self.AddOperation, self.ExtendOperation)):
                 if isinstance(op, self.ExtendOperation) and (op.position.pk in deleted_positions or not op.position.pk):
                     continue  # Already deleted in other operation
+                if seat_availability is None:
+                    # All removals have been performed at this point, since they are sorted first
+                    seat_availability = self._get_seat_availability()
                 # Create a CartPosition for as many items as we can
                 requested_count = quota_available_count = voucher_available_count = op.count
 
@@ -1343,9 +1402,7 @@ class CartManager:
                     available_count = 0
 
                 if isinstance(op, self.AddOperation):
-                    if op.seat and not op.seat.is_available(ignore_voucher_id=op.voucher.id if op.voucher else None,
-                                                            sales_channel=self._sales_channel,
-                                                            distance_ignore_cart_id=self.cart_id):
+                    if op.seat and seat_availability[iop] is not None:
                         available_count = 0
                         err = err or error_messages['seat_unavailable']
 
@@ -1430,8 +1487,7 @@ class CartManager:
 
                         new_cart_positions.append(cp)
                 elif isinstance(op, self.ExtendOperation):
-                    if op.seat and not op.seat.is_available(ignore_cart=op.position, sales_channel=self._sales_channel,
-                                                            ignore_voucher_id=op.position.voucher_id):
+                    if op.seat and seat_availability[iop] is not None:
                         err = err or error_messages['seat_unavailable']
 
                         addons = op.position.addons.all()
@@ -1512,8 +1568,35 @@ class CartManager:
 
         return err
 
+    def _tax_context(self):
+        ia = self.invoice_address
+        if not ia:
+            return None
+        return ia.pk, str(ia.country), ia.state, ia.is_business, ia.vat_id, ia.vat_id_validated
+
     def recompute_final_prices_and_taxes(self):
-        positions = sorted(list(self.positions), key=lambda cp: (-(cp.addon_to_id or 0), cp.pk))
+        """
+        Re-computes line prices, taxes and discounts of the cart. Most commits only touch a few positions of a
+        cart, so we keep a memo in the event cache of the state we computed last time. Line prices are only
+        re-computed for positions whose inputs changed since then, and the discount pass is skipped entirely if
+        neither the cart contents nor the available discounts changed. The event cache is cleared whenever
+        products or tax rules change, which also invalidates the memo.
+        """
+        positions = sorted(
+            list(self.positions.select_related('item__tax_rule')),
+            key=lambda cp: (-(cp.addon_to_id or 0), cp.pk)
+        )
+        memo_key = f'cart_prices:{self.cart_id}'
+        memo = self.event.cache.get(memo_key) or {}
+        tax_context = self._tax_context()
+        known_lines = memo.get('lines', {}) if memo.get('tax') == tax_context else {}
+
+        bundled_positions = defaultdict(list)
+        for cp in positions:
+            if cp.addon_to_id and cp.is_bundled:
+                bundled_positions[cp.addon_to_id].append(cp)
+
+        lines = {}
         diff = Decimal('0.00')
         for cp in positions:
             if cp.listed_price is None:
@@ -1521,26 +1604,47 @@ class CartManager:
                 cp.update_listed_price_and_voucher()
                 cp.migrate_free_price_if_necessary()
 
-            cp.update_line_price(self.invoice_address, [b for b in positions if b.addon_to_id == cp.pk and b.is_bundled])
-
-        discount_results = apply_discounts(
-            self.event,
+            line_key = _line_price_key(cp, bundled_positions[cp.pk])
+            if known_lines.get(cp.pk) != line_key:
+                cp.update_line_price(self.invoice_address, bundled_positions[cp.pk])
+                line_key = _line_price_key(cp, bundled_positions[cp.pk])
+            lines[cp.pk] = line_key
+
+        discount_input = [
+            (cp.item_id, cp.subevent_id, cp.subevent.date_from if cp.subevent_id else None, cp.line_price_gross,
+             cp.addon_to_id, cp.is_bundled, cp.listed_price - cp.price_after_voucher)
+            for cp in positions
+        ]
+        now_dt = time_machine_now()
+        available_discounts = [
+            d.pk for d in get_discount_plan(self.event, self._sales_channel.identifier) if d.is_available_by_time(now_dt)
+        ]
+        discount_key = hashlib.sha256(repr((
             self._sales_channel.identifier,
-            [
-                (cp.item_id, cp.subevent_id, cp.subevent.date_from if cp.subevent_id else None, cp.line_price_gross,
-                 cp.addon_to, cp.is_bundled, cp.listed_price - cp.price_after_voucher)
-                for cp in positions
-            ]
-        )
-
-        for cp, (new_price, discount) in zip(positions, discount_results):
-            if cp.gross_price_before_rounding != new_price or cp.discount_id != (discount.pk if discount else None):
-                diff += new_price - cp.gross_price_before_rounding
-                cp.price = new_price
-                cp.price_includes_rounding_correction = Decimal("0.00")
-                cp.discount = discount
-                cp.save(update_fields=['price', 'price_includes_rounding_correction', 'discount'])
-
+            self.event.cache.get('discount_plan_version'),
+            available_discounts,
+            [cp.pk for cp in positions],
+            discount_input,
+        )).encode()).hexdigest()
+        discount_state = {cp.pk: (cp.gross_price_before_rounding, cp.discount_id) for cp in positions}
+
+        if memo.get('discounts') != (discount_key, discount_state):
+            discount_results = apply_discounts(self.event, self._sales_channel.identifier, discount_input)
+
+            for cp, (new_price, discount) in zip(positions, discount_results):
+                if cp.gross_price_before_rounding != new_price or cp.discount_id != (discount.pk if discount else None):
+                    diff += new_price - cp.gross_price_before_rounding
+                    cp.price = new_price
+                    cp.price_includes_rounding_correction = Decimal("0.00")
+                    cp.discount = discount
+                    cp.save(update_fields=['price', 'price_includes_rounding_correction', 'discount'])
+            discount_state = {cp.pk: (cp.gross_price_before_rounding, cp.discount_id) for cp in positions}
+
+        self.event.cache.set(memo_key, {
+            'tax': tax_context,
+            'lines': lines,
+            'discounts': (discount_key, discount_state),
+        }, int(self._reservation_time.total_seconds()) * 11)
         return diff
 
     def _remove_parents_if_bundles_are_removed(self):
@@ -0,0 +1,111 @@
+#
+# This file is part of pretix (Community Edition).
+#
+# Copyright (C) 2014-2020  Raphael Michel and contributors
+# Copyright (C) 2020-today pretix GmbH and contributors
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU Affero General
+# Public License as published by the Free Software Foundation in version 3 of the License.
+#
+# ADDITIONAL TERMS APPLY: Pursuant to Section 7 of the GNU Affero General Public License, additional terms are
+# applicable granting you additional permissions and placing additional restrictions on your usage of this software.
+# Please refer to the pretix LICENSE file to obtain the full terms applicable to this work. If you did not receive
+# this file, see <https://pretix.eu/about/en/license>.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License along with this program.  If not, see
+# <https://www.gnu.org/licenses/>.
+#
+
+"""
+A change feed for devices that keep a local copy of the data of an event, e.g. for offline check-in.
+
+Instead of repeatedly walking through all orders and positions, devices fetch the entries of
+``pretix.base.models.changefeed.EventChange`` after the last ``id`` they have seen and then only refresh
+the objects mentioned there. A device starts by requesting a cursor, then performs a full download, and
+then polls for changes after that cursor. If the device has not synced for longer than we keep the log, it is
+asked to start over.
+"""
+import time
+from collections import OrderedDict, namedtuple
+from datetime import timedelta
+
+from django.dispatch import receiver
+from django.utils.timezone import now
+from django_scopes import scopes_disabled
+
+from pretix.base.models import Event
+from pretix.base.models.changefeed import EventChange
+from pretix.base.services.cleanup import CLEANUP_TIME_BUDGET, delete_in_chunks
+from pretix.base.settings import GlobalSettingsObject
+from pretix.base.signals import periodic_task
+from pretix.helpers.periodic import minimum_interval
+
+CHANGE_FEED_PAGE_SIZE = 500
+CHANGE_FEED_MAX_PAGE_SIZE = 1000
+# Entries are written right after their transaction commits. Entries younger than this are held back, since an
+# entry with a lower id might still be in flight.
+CHANGE_FEED_HORIZON = timedelta(seconds=2)
+CHANGE_FEED_RETENTION = timedelta(days=30)
+
+ChangeFeedPage = namedtuple('ChangeFeedPage', ('cursor', 'more', 'reset', 'changes'))
+
+
+def _current_cursor():
+    return EventChange.objects.filter(
+        datetime__lt=now() - CHANGE_FEED_HORIZON
+    ).order_by('-pk').values_list('pk', flat=True).first() or 0
+
+
+def get_changes(event: Event, since: int=None, limit: int=CHANGE_FEED_PAGE_SIZE) -> ChangeFeedPage:
+    """
+    Returns the changes of the event after the cursor ``since``. Multiple changes of the same object within one
+    page are collapsed into the last one.
+
+    If ``since`` is ``None`` or older than the retained log, ``reset`` is set and the returned ``cursor`` should be
+    used after downloading all data from scratch.
+    """
+    truncated = GlobalSettingsObject().settings.get('change_feed_truncated', as_type=int, default=0)
+    if since is None or since < truncated:
+        return ChangeFeedPage(cursor=_current_cursor(), more=False, reset=True, changes=[])
+
+    entries = list(
+        EventChange.objects.filter(
+            event=event, pk__gt=since, datetime__lt=now() - CHANGE_FEED_HORIZON
+        ).order_by('pk')[:limit + 1]
+    )
+    more = len(entries) > limit
+    entries = entries[:limit]
+
+    compacted = OrderedDict()
+    for e in entries:
+        key = (e.object_type, e.object_id)
+        compacted.pop(key, None)
+        compacted[key] = e
+
+    return ChangeFeedPage(
+        cursor=entries[-1].pk if entries else since,
+        more=more,
+        reset=False,
+        changes=list(compacted.values()),
+    )
+
+
+@receiver(signal=periodic_task)
+@scopes_disabled()
+@minimum_interval(minutes_after_success=60)
+def clean_change_feed(sender, **kwargs):
+    cutoff = EventChange.objects.filter(
+        datetime__lt=now() - CHANGE_FEED_RETENTION
+    ).order_by('-pk').values_list('pk', flat=True).first()
+    if not cutoff:
+        return
+
+    # Devices with an older cursor could miss changes from now on and need to start over
+    gs = GlobalSettingsObject()
+    if cutoff > gs.settings.get('change_feed_truncated', as_type=int, default=0):
+        gs.settings.set('change_feed_truncated', cutoff)
+    delete_in_chunks(EventChange.objects.filter(pk__lte=cutoff), time.monotonic() + CLEANUP_TIME_BUDGET)
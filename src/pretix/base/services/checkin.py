@@ -31,10 +31,11 @@
 # Unless required by applicable law or agreed to in writing, software distributed under the Apache License 2.0 is
 # distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 # License for the specific language governing permissions and limitations under the License.
+import json
 import logging
 import os
 from datetime import datetime, timedelta, timezone
-from functools import partial, reduce
+from functools import lru_cache, partial, reduce
 
 import dateutil
 import dateutil.parser
@@ -49,7 +50,9 @@ from django.db.models.functions import Coalesce, TruncDate
 from django.dispatch import receiver
 from django.utils.formats import date_format
 from django.utils.functional import cached_property
-from django.utils.timezone import make_aware, now, override
+from django.utils.timezone import (
+    get_default_timezone, is_naive, make_aware, now,
+)
 from django.utils.translation import gettext as _
 from django_scopes import scope, scopes_disabled
 
@@ -59,7 +62,7 @@ from pretix.base.models import (
 )
 from pretix.base.signals import checkin_created, periodic_task
 from pretix.helpers import OF_SELF
-from pretix.helpers.jsonlogic import Logic
+from pretix.helpers.jsonlogic import Logic, compile_logic
 from pretix.helpers.jsonlogic_boolalg import convert_to_dnf
 from pretix.helpers.jsonlogic_query import (
     Equal, GreaterEqualThan, GreaterThan, InList, LowerEqualThan, LowerThan,
@@ -427,7 +430,26 @@ def _get_logic_environment(ev, rule_data, now_dt):
     return logic
 
 
+@lru_cache(maxsize=512)
+def _compile_rules(rules_json):
+    return compile_logic(json.loads(rules_json))
+
+
+def _compiled_rules(clist):
+    """
+    Returns the rules of the check-in list as a compiled function. Since rules are only changed rarely but
+    evaluated on every scan, the compiled version is kept in a process-local cache keyed by the rules themselves,
+    so a changed list version automatically results in a new compilation.
+    """
+    return _compile_rules(json.dumps(clist.rules, sort_keys=True))
+
+
 class LazyRuleVars:
+    """
+    Provides the variables used in check-in rules for a single check-in attempt. All variables based on the
+    check-in history of the position are computed from one query for all check-ins of the position on the
+    list, which is only executed if any of them is used and then shared by all of them.
+    """
     def __init__(self, position, clist, dt, gate):
         self._position = position
         self._clist = clist
@@ -440,14 +462,37 @@ class LazyRuleVars:
             return getattr(self, item)
         raise KeyError()
 
+    @cached_property
+    def _tz(self):
+        return self._clist.event.timezone
+
+    @cached_property
+    def _checkins(self):
+        return list(
+            self._position.checkins.filter(list=self._clist).order_by('datetime', 'pk').values_list('type', 'datetime')
+        )
+
+    @cached_property
+    def _entries(self):
+        return [dt for t, dt in self._checkins if t == Checkin.TYPE_ENTRY]
+
+    @staticmethod
+    def _aware(cutoff):
+        if is_naive(cutoff):
+            # Behave like a database filter, which interprets naive datetimes in the default timezone
+            return make_aware(cutoff, get_default_timezone())
+        return cutoff
+
+    def _days(self, entries):
+        return len({dt.astimezone(self._tz).date() for dt in entries})
+
     @property
     def now(self):
         return self._dt
 
     @property
     def now_isoweekday(self):
-        tz = self._clist.event.timezone
-        return self._dt.astimezone(tz).isoweekday()
+        return self._dt.astimezone(self._tz).isoweekday()
 
     @property
     def gate(self):
@@ -463,88 +508,64 @@ class LazyRuleVars:
 
     @cached_property
     def entries_number(self):
-        return self._position.checkins.filter(type=Checkin.TYPE_ENTRY, list=self._clist).count()
+        return len(self._entries)
 
     @cached_property
     def entries_today(self):
-        tz = self._clist.event.timezone
-        midnight = self._dt.astimezone(tz).replace(hour=0, minute=0, second=0, microsecond=0)
-        return self._position.checkins.filter(type=Checkin.TYPE_ENTRY, list=self._clist, datetime__gte=midnight).count()
+        midnight = self._dt.astimezone(self._tz).replace(hour=0, minute=0, second=0, microsecond=0)
+        return len([dt for dt in self._entries if dt >= midnight])
 
     def entries_since(self, cutoff):
         if ('entries_since', cutoff) not in self.__cache:
-            self.__cache['entries_since', cutoff] = self._position.checkins.filter(type=Checkin.TYPE_ENTRY, list=self._clist, datetime__gte=cutoff).count()
+            cutoff_aware = self._aware(cutoff)
+            self.__cache['entries_since', cutoff] = len([dt for dt in self._entries if dt >= cutoff_aware])
         return self.__cache['entries_since', cutoff]
 
     def entries_before(self, cutoff):
         if ('entries_before', cutoff) not in self.__cache:
-            self.__cache['entries_before', cutoff] = self._position.checkins.filter(type=Checkin.TYPE_ENTRY, list=self._clist, datetime__lt=cutoff).count()
+            cutoff_aware = self._aware(cutoff)
+            self.__cache['entries_before', cutoff] = len([dt for dt in self._entries if dt < cutoff_aware])
         return self.__cache['entries_before', cutoff]
 
     def entries_days_since(self, cutoff):
-        tz = self._clist.event.timezone
-        with override(tz):
-            if ('entries_days_since', cutoff) not in self.__cache:
-                self.__cache['entries_days_since', cutoff] = self._position.checkins.filter(
-                    type=Checkin.TYPE_ENTRY,
-                    list=self._clist,
-                    datetime__gte=cutoff
-                ).annotate(
-                    day=TruncDate('datetime', tzinfo=tz)
-                ).values('day').distinct().count()
-            return self.__cache['entries_days_since', cutoff]
+        if ('entries_days_since', cutoff) not in self.__cache:
+            cutoff_aware = self._aware(cutoff)
+            self.__cache['entries_days_since', cutoff] = self._days([dt for dt in self._entries if dt >= cutoff_aware])
+        return self.__cache['entries_days_since', cutoff]
 
     def entries_days_before(self, cutoff):
-        tz = self._clist.event.timezone
-        with override(tz):
-            if ('entries_days_before', cutoff) not in self.__cache:
-                self.__cache['entries_days_before', cutoff] = self._position.checkins.filter(
-                    type=Checkin.TYPE_ENTRY,
-                    list=self._clist,
-                    datetime__lt=cutoff
-                ).annotate(
-                    day=TruncDate('datetime', tzinfo=tz)
-                ).values('day').distinct().count()
-            return self.__cache['entries_days_before', cutoff]
+        if ('entries_days_before', cutoff) not in self.__cache:
+            cutoff_aware = self._aware(cutoff)
+            self.__cache['entries_days_before', cutoff] = self._days([dt for dt in self._entries if dt < cutoff_aware])
+        return self.__cache['entries_days_before', cutoff]
 
     @cached_property
     def entries_days(self):
-        tz = self._clist.event.timezone
-        with override(tz):
-            return self._position.checkins.filter(list=self._clist, type=Checkin.TYPE_ENTRY).annotate(
-                day=TruncDate('datetime', tzinfo=tz)
-            ).values('day').distinct().count()
+        return self._days(self._entries)
 
     @cached_property
     def entry_status(self):
-        last_checkin = self._position.checkins.filter(list=self._clist).order_by('datetime').last()
-        if not last_checkin or last_checkin.type == Checkin.TYPE_EXIT:
+        if not self._checkins or self._checkins[-1][0] == Checkin.TYPE_EXIT:
             return "absent"
         return "present"
 
     @cached_property
     def minutes_since_last_entry(self):
-        tz = self._clist.event.timezone
-        with override(tz):
-            last_entry = self._position.checkins.filter(list=self._clist, type=Checkin.TYPE_ENTRY).order_by('datetime').last()
-            if last_entry is None:
-                # Returning "None" would be "correct", but the handling of "None" in JSON logic is inconsistent
-                # between platforms (None<1 is true on some, but not all), we rather choose something that is at least
-                # consistent.
-                return -1
-            return (self._dt - last_entry.datetime).total_seconds() // 60
+        if not self._entries:
+            # Returning "None" would be "correct", but the handling of "None" in JSON logic is inconsistent
+            # between platforms (None<1 is true on some, but not all), we rather choose something that is at least
+            # consistent.
+            return -1
+        return (self._dt - self._entries[-1]).total_seconds() // 60
 
     @cached_property
     def minutes_since_first_entry(self):
-        tz = self._clist.event.timezone
-        with override(tz):
-            last_entry = self._position.checkins.filter(list=self._clist, type=Checkin.TYPE_ENTRY).order_by('datetime').first()
-            if last_entry is None:
-                # Returning "None" would be "correct", but the handling of "None" in JSON logic is inconsistent
-                # between platforms (None<1 is true on some, but not all), we rather choose something that is at least
-                # consistent.
-                return -1
-            return (self._dt - last_entry.datetime).total_seconds() // 60
+        if not self._entries:
+            # Returning "None" would be "correct", but the handling of "None" in JSON logic is inconsistent
+            # between platforms (None<1 is true on some, but not all), we rather choose something that is at least
+            # consistent.
+            return -1
+        return (self._dt - self._entries[0]).total_seconds() // 60
 
 
 class SQLLogic:
@@ -1073,7 +1094,7 @@ def perform_checkin(op: OrderPosition, clist: CheckinList, given_answers: dict,
             rule_data = LazyRuleVars(op, clist, dt, gate=gate)
             logic = _get_logic_environment(op.subevent or clist.event, rule_data, now_dt=dt)
             try:
-                logic_result = logic.apply(clist.rules, rule_data)
+                logic_result = _compiled_rules(clist)(logic, rule_data)
             except Exception:
                 logger.exception("Check-in rule evaluation failed")
                 raise CheckInError(
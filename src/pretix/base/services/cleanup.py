@@ -19,14 +19,21 @@
 # You should have received a copy of the GNU Affero General Public License along with this program.  If not, see
 # <https://www.gnu.org/licenses/>.
 #
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
 
 from django.conf import settings
 from django.core.management import call_command
+from django.db import transaction
 from django.dispatch import receiver
 from django.utils.timezone import now
 from django_scopes import scopes_disabled
 
+from pretix.base.metrics import (
+    pretix_cleanup_bytes_reclaimed_total, pretix_cleanup_rows_deleted_total,
+)
 from pretix.base.models import CachedCombinedTicket, CachedTicket
 from pretix.base.models.customers import CustomerSSOGrant
 
@@ -34,36 +41,115 @@ from ..models import CachedFile, CartPosition, InvoiceAddress
 from ..models.auth import UserKnownLoginSource
 from ..signals import periodic_task
 
+logger = logging.getLogger(__name__)
+
+# Rows deleted per query and transaction
+CLEANUP_CHUNK_SIZE = 1000
+# Maximum time in seconds one cleanup receiver may run. Whatever is left over is removed in the next run.
+CLEANUP_TIME_BUDGET = 60
+# Number of parallel requests to the file storage
+CLEANUP_STORAGE_WORKERS = 8
+
+
+def _delete_files(storage, names):
+    def _delete(name):
+        try:
+            size = storage.size(name)
+        except Exception:
+            size = 0
+        try:
+            storage.delete(name)
+        except Exception:
+            logger.warning('Could not delete file %s', name, exc_info=True)
+            return 0
+        return size
+
+    with ThreadPoolExecutor(max_workers=CLEANUP_STORAGE_WORKERS) as executor:
+        return sum(executor.map(_delete, names))
+
+
+def delete_in_chunks(qs, deadline, file_field=None):
+    """
+    Deletes all objects matching ``qs`` in chunks of ``CLEANUP_CHUNK_SIZE`` until either nothing is left or the
+    ``deadline`` (a ``time.monotonic()`` value) has passed.
+
+    If ``file_field`` is given, the referenced files are removed from the storage in parallel after their rows
+    have been deleted, instead of one by one in the ``post_delete`` signal handlers.
+
+    Returns a tuple of the number of deleted rows and the number of bytes removed from the storage.
+    """
+    model = qs.model
+    storage = model._meta.get_field(file_field).storage if file_field else None
+    rows = reclaimed = 0
+
+    while time.monotonic() < deadline:
+        if file_field:
+            chunk = list(qs.values_list('pk', file_field)[:CLEANUP_CHUNK_SIZE])
+        else:
+            chunk = [(pk, None) for pk in qs.values_list('pk', flat=True)[:CLEANUP_CHUNK_SIZE]]
+        if not chunk:
+            break
+
+        pks = [pk for pk, name in chunk]
+        with transaction.atomic():
+            if file_field:
+                # Files are removed below, so the post_delete handlers have nothing left to do
+                model.objects.filter(pk__in=pks).update(**{file_field: None})
+            model.objects.filter(pk__in=pks).delete()
+        rows += len(pks)
+
+        names = [name for pk, name in chunk if name]
+        if names:
+            reclaimed += _delete_files(storage, names)
+
+    label = model._meta.label
+    if rows:
+        pretix_cleanup_rows_deleted_total.inc(rows, model=label)
+    if reclaimed:
+        pretix_cleanup_bytes_reclaimed_total.inc(reclaimed, model=label)
+    return rows, reclaimed
+
+
+def _log_cleanup(name, results):
+    rows = sum(r[0] for r in results)
+    reclaimed = sum(r[1] for r in results)
+    if rows:
+        logger.info('Cleanup %s: deleted %d rows, reclaimed %d bytes', name, rows, reclaimed)
+
 
 @receiver(signal=periodic_task)
 @scopes_disabled()
 def clean_cart_positions(sender, **kwargs):
-    for cp in CartPosition.objects.filter(expires__lt=now() - timedelta(days=14), addon_to__isnull=False):
-        cp.delete()
-    for cp in CartPosition.objects.filter(expires__lt=now() - timedelta(days=14), addon_to__isnull=True):
-        cp.delete()
-    for ia in InvoiceAddress.objects.filter(order__isnull=True, customer__isnull=True, last_modified__lt=now() - timedelta(days=14)):
-        ia.delete()
+    deadline = time.monotonic() + CLEANUP_TIME_BUDGET
+    _log_cleanup('cart positions', [
+        delete_in_chunks(CartPosition.objects.filter(expires__lt=now() - timedelta(days=14), addon_to__isnull=False), deadline),
+        delete_in_chunks(CartPosition.objects.filter(expires__lt=now() - timedelta(days=14), addon_to__isnull=True), deadline),
+        delete_in_chunks(InvoiceAddress.objects.filter(order__isnull=True, customer__isnull=True,
+                                                       last_modified__lt=now() - timedelta(days=14)), deadline),
+    ])
 
 
 @receiver(signal=periodic_task)
 @scopes_disabled()
 def clean_cached_files(sender, **kwargs):
-    for cf in CachedFile.objects.filter(expires__isnull=False, expires__lt=now()):
-        cf.delete()
+    deadline = time.monotonic() + CLEANUP_TIME_BUDGET
+    _log_cleanup('cached files', [
+        delete_in_chunks(CachedFile.objects.filter(expires__isnull=False, expires__lt=now()), deadline, file_field='file'),
+    ])
 
 
 @receiver(signal=periodic_task)
 @scopes_disabled()
 def clean_cached_tickets(sender, **kwargs):
-    for cf in CachedTicket.objects.filter(created__lte=now() - timedelta(hours=settings.CACHE_TICKETS_HOURS)):
-        cf.delete()
-    for cf in CachedCombinedTicket.objects.filter(created__lte=now() - timedelta(hours=settings.CACHE_TICKETS_HOURS)):
-        cf.delete()
-    for cf in CachedTicket.objects.filter(created__lte=now() - timedelta(minutes=30), file__isnull=True):
-        cf.delete()
-    for cf in CachedCombinedTicket.objects.filter(created__lte=now() - timedelta(minutes=30), file__isnull=True):
-        cf.delete()
+    deadline = time.monotonic() + CLEANUP_TIME_BUDGET
+    _log_cleanup('cached tickets', [
+        delete_in_chunks(CachedTicket.objects.filter(created__lte=now() - timedelta(hours=settings.CACHE_TICKETS_HOURS)),
+                         deadline, file_field='file'),
+        delete_in_chunks(CachedCombinedTicket.objects.filter(created__lte=now() - timedelta(hours=settings.CACHE_TICKETS_HOURS)),
+                         deadline, file_field='file'),
+        delete_in_chunks(CachedTicket.objects.filter(created__lte=now() - timedelta(minutes=30), file__isnull=True), deadline),
+        delete_in_chunks(CachedCombinedTicket.objects.filter(created__lte=now() - timedelta(minutes=30), file__isnull=True), deadline),
+    ])
 
 
 @receiver(signal=periodic_task)
@@ -0,0 +1,105 @@
+#
+# This file is part of pretix (Community Edition).
+#
+# Copyright (C) 2014-2020  Raphael Michel and contributors
+# Copyright (C) 2020-today pretix GmbH and contributors
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU Affero General
+# Public License as published by the Free Software Foundation in version 3 of the License.
+#
+# ADDITIONAL TERMS APPLY: Pursuant to Section 7 of the GNU Affero General Public License, additional terms are
+# applicable granting you additional permissions and placing additional restrictions on your usage of this software.
+# Please refer to the pretix LICENSE file to obtain the full terms applicable to this work. If you did not receive
+# this file, see <https://pretix.eu/about/en/license>.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License along with this program.  If not, see
+# <https://www.gnu.org/licenses/>.
+#
+
+from typing import List
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+from django.utils.translation import gettext_noop
+from i18nfield.strings import LazyI18nString
+
+from pretix.api.models import OAuthApplication
+from pretix.base.i18n import LazyLocaleException
+from pretix.base.models import Device, Event, TeamAPIToken, User
+from pretix.base.services.tasks import ProfiledEventTask
+from pretix.celery_app import app
+
+
+class CloneError(LazyLocaleException):
+    pass
+
+
+def _parse_datetime(value):
+    return parse_datetime(value) if value else None
+
+
+def _parse_i18n(value):
+    return LazyI18nString(value) if value else None
+
+
+@app.task(base=ProfiledEventTask, bind=True, throws=(CloneError,))
+def clone_event(self, event: Event, events: List[dict], user: int=None, api_token: int=None,
+                oauth_application: int=None, device: int=None) -> List[str]:
+    """
+    Creates a new event for every entry of ``events`` and copies all data from ``event`` into it. Each
+    entry contains the ``slug``, ``name`` and dates of the new event in their API representation. Either
+    all events are created or none of them.
+    """
+    if user:
+        user = User.objects.get(pk=user)
+    if api_token:
+        auth = TeamAPIToken.objects.get(pk=api_token)
+    elif device:
+        auth = Device.objects.get(pk=device)
+    elif oauth_application:
+        auth = OAuthApplication.objects.get(pk=oauth_application)
+    else:
+        auth = None
+
+    created = []
+    with transaction.atomic():
+        for i, data in enumerate(events):
+            try:
+                Event.clean_slug(event.organizer, None, data['slug'])
+            except ValidationError:
+                raise CloneError(gettext_noop('The slug "%s" has already been used for a different event.'),
+                                 data['slug'])
+
+            new_event = Event(
+                organizer=event.organizer,
+                name=_parse_i18n(data['name']),
+                slug=data['slug'],
+                currency=event.currency,
+                has_subevents=event.has_subevents,
+                date_from=_parse_datetime(data['date_from']),
+                date_to=_parse_datetime(data.get('date_to')),
+                presale_start=_parse_datetime(data.get('presale_start')),
+                presale_end=_parse_datetime(data.get('presale_end')),
+                location=_parse_i18n(data['location']) if 'location' in data else event.location,
+                geo_lat=event.geo_lat,
+                geo_lon=event.geo_lon,
+            )
+            new_event.save()
+            new_event.copy_data_from(event)
+            if data.get('date_admission'):
+                new_event.date_admission = _parse_datetime(data['date_admission'])
+                new_event.save(update_fields=['date_admission'])
+            new_event.log_action('pretix.event.added', user=user, auth=auth, data=data)
+            created.append(new_event.slug)
+
+            if not self.request.called_directly:
+                self.update_state(
+                    state='PROGRESS',
+                    meta={'value': round((i + 1) / len(events) * 100)}
+                )
+    return created
@@ -21,9 +21,14 @@
 #
 
 import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
-from itertools import groupby
+from itertools import groupby, zip_longest
 
+from django.conf import settings
+from django.db import connection
 from django.db.models import F, Window
 from django.db.models.functions import RowNumber
 from django.dispatch import receiver
@@ -53,9 +58,34 @@ def periodic_reset_in_flight(sender, **kwargs):
         sq.set_sync_error('timeout', [], 'Timeout')
 
 
-def run_sync(queue):
+def _sync_event(target_cls, event, queued_orders):
+    with scope(organizer=event.organizer):
+        with target_cls(event=event) as p:
+            p.sync_queued_orders(queued_orders)
+
+
+def _sync_event_in_thread(semaphore, target_cls, event, queued_orders):
+    try:
+        with semaphore:
+            with scopes_disabled():
+                _sync_event(target_cls, event, queued_orders)
+    except Exception:
+        logger.exception("Data sync of %r with %s failed", event, target_cls.identifier)
+    finally:
+        connection.close()
+
+
+def run_sync(queue, workers=None):
+    """
+    Syncs the given queue items, grouped by provider and event. With more than one worker, multiple
+    (provider, event) groups are processed in parallel threads, but never more than ``max_concurrency``
+    of the same provider at the same time.
+    """
+    workers = workers or settings.DATASYNC_WORKERS
     grouped = groupby(sorted(queue, key=lambda q: (q.sync_provider, q.event.pk)), lambda q: (q.sync_provider, q.event))
+    jobs = []
     for (target, event), queued_orders in grouped:
+        queued_orders = list(queued_orders)
         target_cls, meta = datasync_providers.get(identifier=target, active_in=event)
 
         if not target_cls:
@@ -64,9 +94,28 @@ def run_sync(queue):
             logger.info("Deleted %d queue entries from %r because plugin %s inactive", num_deleted, event, target)
             continue
 
-        with scope(organizer=event.organizer):
-            with target_cls(event=event) as p:
-                p.sync_queued_orders(queued_orders)
+        jobs.append((target_cls, event, queued_orders))
+
+    if workers <= 1 or len(jobs) <= 1:
+        for target_cls, event, queued_orders in jobs:
+            _sync_event(target_cls, event, queued_orders)
+        return
+
+    semaphores = {
+        target_cls.identifier: threading.BoundedSemaphore(max(target_cls.max_concurrency, 1))
+        for target_cls, event, queued_orders in jobs
+    }
+    # Interleave the providers, so worker threads are not all blocked waiting for the same provider
+    by_provider = defaultdict(list)
+    for job in jobs:
+        by_provider[job[0].identifier].append(job)
+    jobs = [job for group in zip_longest(*by_provider.values()) for job in group if job]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for target_cls, event, queued_orders in jobs:
+            executor.submit(
+                _sync_event_in_thread, semaphores[target_cls.identifier], target_cls, event, queued_orders
+            )
 
 
 @app.task()
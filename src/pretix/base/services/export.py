@@ -25,7 +25,7 @@ from typing import Any, Dict, Union
 
 from celery.exceptions import MaxRetriesExceededError
 from django.conf import settings
-from django.core.files.base import ContentFile
+from django.core.files.base import ContentFile, File
 from django.db import close_old_connections, connection, transaction
 from django.dispatch import receiver
 from django.utils.timezone import now, override
@@ -63,6 +63,13 @@ class ExportEmptyError(ExportError):
     pass
 
 
+def _export_file(data):
+    # Exporters producing very large files may spool them to disk and return a file instead of the content
+    if isinstance(data, File):
+        return data
+    return ContentFile(data)
+
+
 @app.task(base=ProfiledEventTask, throws=(ExportError, ExportEmptyError), bind=True)
 def export(self, event: Event, fileid: str, provider: str, form_data: Dict[str, Any]) -> None:
     def set_progress(val):
@@ -94,7 +101,7 @@ def export(self, event: Event, fileid: str, provider: str, form_data: Dict[str,
 
                 close_old_connections()  # This task can run very long, we might need a new DB connection
 
-                f = ContentFile(data)
+                f = _export_file(data)
                 file.file.save(cachedfile_name(file, file.filename), f)
     return str(file.pk)
 
@@ -169,7 +176,7 @@ def multiexport(self, organizer: Organizer, user: User, device: int, token: int,
 
                 close_old_connections()  # This task can run very long, we might need a new DB connection
 
-                f = ContentFile(data)
+                f = _export_file(data)
                 file.file.save(cachedfile_name(file, file.filename), f)
     return str(file.pk)
 
@@ -228,7 +235,7 @@ def _run_scheduled_export(schedule, context: Union[Event, Organizer], exporter,
                     gettext('Your export did not contain any data.')
                 )
             file.filename, file.type, data = d
-            filesize = len(data)
+            filesize = data.size if isinstance(data, File) else len(data)
             if filesize > 20 * 1024 * 1024:  # 20 MB
                 raise ExportError(
                     gettext('Your exported data exceeded the size limit for scheduled exports.')
@@ -238,7 +245,7 @@ def _run_scheduled_export(schedule, context: Union[Event, Organizer], exporter,
             if not conn.in_atomic_block:  # atomic execution only happens during tests or with celery always_eager on
                 close_old_connections()  # This task can run very long, we might need a new DB connection
 
-            f = ContentFile(data)
+            f = _export_file(data)
             file.file.save(cachedfile_name(file, file.filename), f)
         except ExportEmptyError as e:
             _handle_error(str(e), soft=True)
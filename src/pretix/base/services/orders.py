@@ -50,8 +50,8 @@ from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.db import transaction
 from django.db.models import (
-    Count, Exists, F, IntegerField, Max, Min, OuterRef, Q, QuerySet, Sum,
-    Value,
+    Count, Exists, F, IntegerField, Max, Min, OuterRef, Q, QuerySet, Subquery,
+    Sum, Value,
 )
 from django.db.models.functions import Coalesce, Greatest
 from django.db.transaction import get_connection
@@ -77,6 +77,7 @@ from pretix.base.models.orders import (
     generate_secret,
 )
 from pretix.base.models.organizer import SalesChannel, TeamAPIToken
+from pretix.base.models.seating import SeatAvailabilityCheck
 from pretix.base.models.tax import TAXED_ZERO, TaxedPrice, TaxRule
 from pretix.base.payment import GiftCardPayment, PaymentException
 from pretix.base.reldate import RelativeDateWrapper
@@ -109,6 +110,7 @@ from pretix.base.signals import (
 from pretix.base.timemachine import time_machine_now, time_machine_now_assigned
 from pretix.celery_app import app
 from pretix.helpers import OF_SELF
+from pretix.helpers.celery import get_task_priority
 from pretix.helpers.models import modelcopy
 from pretix.helpers.periodic import minimum_interval
 from pretix.testutils.middleware import debugflags_var
@@ -792,6 +794,16 @@ def _check_positions(event: Event, now_dt: datetime, time_machine_now_dt: dateti
     if sum(1 for cp in sorted_positions if not cp.addon_to) > limit:
         err = err or (error_messages['max_items'] % limit)
 
+    # Check seat availability of all positions at once, to keep the time we hold the locks short
+    seated_positions = [cp for cp in sorted_positions if cp.seat]
+    seat_availability = dict(zip(
+        (cp.pk for cp in seated_positions),
+        Seat.check_availability(
+            [SeatAvailabilityCheck(cp.seat, ignore_cart=cp, ignore_voucher_id=cp.voucher_id) for cp in seated_positions],
+            sales_channel=sales_channel.identifier,
+        )
+    ))
+
     # Check availability
     for i, cp in enumerate(sorted_positions):
         if cp.pk in deleted_positions or not cp.pk:
@@ -834,7 +846,7 @@ def _check_positions(event: Event, now_dt: datetime, time_machine_now_dt: dateti
             seats_seen.add(cp.seat)
             # Unlike quotas (which we blindly trust as long as the position is not expired), we check seats every
             # time, since we absolutely can not overbook a seat.
-            if not cp.seat.is_available(ignore_cart=cp, ignore_voucher_id=cp.voucher_id, sales_channel=sales_channel.identifier):
+            if seat_availability[cp.pk] is not None:
                 err = err or error_messages['seat_unavailable']
                 delete(cp)
                 continue
@@ -1399,13 +1411,12 @@ def _perform_order(event: Event, payment_requests: List[dict], position_ids: Lis
     }
 
 
-@receiver(signal=periodic_task)
-@scopes_disabled()
-def expire_orders(sender, **kwargs):
-    event_id = None
-    expire = None
+# Number of orders processed per query by the expiry tasks
+EXPIRY_CHUNK_SIZE = 500
 
-    qs = Order.objects.filter(
+
+def _expirable_orders():
+    return Order.objects.filter(
         expires__lt=now(),
         status=Order.STATUS_PENDING,
         valid_if_pending=False,
@@ -1414,60 +1425,151 @@ def expire_orders(sender, **kwargs):
         Exists(
             OrderFee.objects.filter(order_id=OuterRef('pk'), fee_type=OrderFee.FEE_TYPE_CANCELLATION)
         )
-    ).prefetch_related('event').order_by('event_id')
-    for o in qs:
-        if o.event_id != event_id:
-            expire = o.event.settings.get('payment_term_expire_automatically', as_type=bool)
-            event_id = o.event_id
-        if expire and now() >= o.payment_term_expire_date:
-            mark_order_expired(o)
+    )
+
+
+def _iter_chunks(qs):
+    last_pk = 0
+    while True:
+        chunk = list(qs.filter(pk__gt=last_pk).order_by('pk')[:EXPIRY_CHUNK_SIZE])
+        if not chunk:
+            return
+        yield chunk
+        last_pk = chunk[-1].pk
+
+
+def refresh_quota_caches_for_orders(event, order_ids):
+    """
+    Recomputes the availability of all quotas of ``event`` that may have been affected by a status change of the
+    given orders, so the cached availability is up to date without waiting for the next request.
+    """
+    positions = OrderPosition.all.filter(order_id__in=order_ids)
+    item_ids = set(positions.values_list('item_id', flat=True))
+    subevent_ids = set(positions.values_list('subevent_id', flat=True))
+    quotas = event.quotas.filter(items__in=item_ids)
+    if event.has_subevents:
+        quotas = quotas.filter(subevent_id__in=subevent_ids)
+    quotas = list(quotas.distinct())
+    if quotas:
+        qa = QuotaAvailability(early_out=False)
+        qa.queue(*quotas)
+        qa.compute()
+
+
+@receiver(signal=periodic_task)
+@scopes_disabled()
+def expire_orders(sender, **kwargs):
+    event_ids = set(_expirable_orders().order_by().values_list('event_id', flat=True).distinct())
+    for event in Event.objects.filter(pk__in=event_ids):
+        if event.settings.get('payment_term_expire_automatically', as_type=bool):
+            expire_orders_for_event.apply_async(kwargs={'event': event.pk})
+
+
+@app.task(base=ProfiledEventTask)
+def expire_orders_for_event(event: Event):
+    expired = []
+    for chunk in _iter_chunks(_expirable_orders().filter(event=event)):
+        for o in chunk:
+            # Share the event object, and therefore its cached settings, across the batch
+            o.event = event
+            if now() < o.payment_term_expire_date:
+                continue
+
+            with transaction.atomic():
+                # The chunk has been read without a lock. Another run of this task, a payment or an extension
+                # might have changed the order since, so we check again on the locked row.
+                o = Order.objects.select_for_update(of=OF_SELF).filter(
+                    pk=o.pk, status=Order.STATUS_PENDING, expires__lt=now(),
+                ).first()
+                if not o:
+                    continue
+                o.event = event
+                if now() < o.payment_term_expire_date:
+                    continue
+                mark_order_expired(o)
+                expired.append(o.pk)
+
+    if expired:
+        refresh_quota_caches_for_orders(event, expired)
+
+
+def _expiry_warning_candidates():
+    today = now().replace(hour=0, minute=0, second=0)
+    last_payment = OrderPayment.objects.filter(order_id=OuterRef('pk')).order_by('-local_id')
+    return today, Order.objects.filter(
+        expires__gte=today, expiry_reminder_sent=False, status=Order.STATUS_PENDING,
+        datetime__lte=now() - timedelta(hours=2), require_approval=False
+    ).annotate(
+        last_payment_id=Subquery(last_payment.values('pk')[:1]),
+        last_payment_state=Subquery(last_payment.values('state')[:1]),
+    )
+
+
+def _get_expire_warning_days(event):
+    return cache.get_or_set('{}:{}:setting_mail_days_order_expire_warning'.format('event', event.pk),
+                            default=lambda: event.settings.get('mail_days_order_expire_warning', as_type=int),
+                            timeout=3600)
 
 
 @receiver(signal=periodic_task)
 @scopes_disabled()
 @minimum_interval(minutes_after_success=60)
 def send_expiry_warnings(sender, **kwargs):
-    today = now().replace(hour=0, minute=0, second=0)
-    days = None
-    settings = None
-    event_id = None
+    today, qs = _expiry_warning_candidates()
+    event_ids = set(qs.order_by().values_list('event_id', flat=True).distinct())
+    for event in Event.objects.filter(pk__in=event_ids):
+        if _get_expire_warning_days(event):
+            send_expiry_warnings_for_event.apply_async(kwargs={'event': event.pk})
 
-    for o in Order.objects.filter(
-            expires__gte=today, expiry_reminder_sent=False, status=Order.STATUS_PENDING,
-            datetime__lte=now() - timedelta(hours=2), require_approval=False
-    ).only('pk', 'event_id', 'expires').order_by('event_id'):
-
-        lp = o.payments.last()
-        if (
-                lp and
-                lp.state in [OrderPayment.PAYMENT_STATE_CREATED, OrderPayment.PAYMENT_STATE_PENDING] and
-                lp.payment_provider and
-                lp.payment_provider.prevent_reminder_mail(o, lp)
-        ):
-            continue
 
-        if event_id != o.event_id:
-            settings = o.event.settings
-            days = cache.get_or_set('{}:{}:setting_mail_days_order_expire_warning'.format('event', o.event_id),
-                                    default=lambda: settings.get('mail_days_order_expire_warning', as_type=int),
-                                    timeout=3600)
-            event_id = o.event_id
+@app.task(base=ProfiledEventTask)
+def send_expiry_warnings_for_event(event: Event):
+    days = _get_expire_warning_days(event)
+    if not days:
+        return
+    settings = event.settings
+    today, qs = _expiry_warning_candidates()
+    qs = qs.filter(
+        event=event,
+        expires__lt=today + timedelta(days=days + 1),
+    ).annotate(
+        has_cancellation_fee=Exists(
+            OrderFee.objects.filter(order_id=OuterRef('pk'), fee_type=OrderFee.FEE_TYPE_CANCELLATION)
+        )
+    ).only('pk', 'event_id', 'expires')
+
+    for chunk in _iter_chunks(qs):
+        open_payments = {
+            p.pk: p for p in OrderPayment.objects.filter(
+                pk__in=[o.last_payment_id for o in chunk if o.last_payment_state in (
+                    OrderPayment.PAYMENT_STATE_CREATED, OrderPayment.PAYMENT_STATE_PENDING
+                )]
+            )
+        }
+        for o in chunk:
+            o.event = event
+            lp = open_payments.get(o.last_payment_id)
+            if lp:
+                lp.order = o
+                if lp.payment_provider and lp.payment_provider.prevent_reminder_mail(o, lp):
+                    continue
 
-        if days and (o.expires - today).days <= days:
+            has_cancellation_fee = o.has_cancellation_fee
             with transaction.atomic():
-                o = Order.objects.select_related('event').select_for_update(of=OF_SELF).get(pk=o.pk)
+                o = Order.objects.select_for_update(of=OF_SELF).get(pk=o.pk)
                 if o.status != Order.STATUS_PENDING or o.expiry_reminder_sent:
                     # Race condition
                     continue
+                o.event = event
 
                 with language(o.locale, settings.region):
                     o.expiry_reminder_sent = True
                     o.save(update_fields=['expiry_reminder_sent'])
-                    email_context = get_email_context(event=o.event, order=o)
+                    email_context = get_email_context(event=event, order=o)
                     can_autoexpire = (
                         settings.payment_term_expire_automatically and
                         not o.valid_if_pending and
-                        not o.fees.filter(fee_type=OrderFee.FEE_TYPE_CANCELLATION).exists()
+                        not has_cancellation_fee
                     )
                     if can_autoexpire:
                         email_template = settings.mail_text_order_expire_warning
@@ -3423,6 +3525,13 @@ def signal_listener_issue_giftcards(sender: Event, order: Order, **kwargs):
         tickets.invalidate_cache.apply_async(kwargs={'event': sender.pk, 'order': order.pk})
 
 
+@receiver(order_paid, dispatch_uid="pretixbase_order_paid_prerender_tickets")
+def signal_listener_prerender_tickets(sender: Event, order: Order, **kwargs):
+    if not sender.settings.ticket_download:
+        return
+    tickets.enqueue_prerender(order, priority=get_task_priority("tickets", sender.organizer_id))
+
+
 @receiver(order_paid, dispatch_uid="pretixbase_order_paid_memberships")
 @receiver(order_changed, dispatch_uid="pretixbase_order_changed_memberships")
 @transaction.atomic()
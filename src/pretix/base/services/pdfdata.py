@@ -0,0 +1,318 @@
+#
+# This file is part of pretix (Community Edition).
+#
+# Copyright (C) 2014-2020  Raphael Michel and contributors
+# Copyright (C) 2020-today pretix GmbH and contributors
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU Affero General
+# Public License as published by the Free Software Foundation in version 3 of the License.
+#
+# ADDITIONAL TERMS APPLY: Pursuant to Section 7 of the GNU Affero General Public License, additional terms are
+# applicable granting you additional permissions and placing additional restrictions on your usage of this software.
+# Please refer to the pretix LICENSE file to obtain the full terms applicable to this work. If you did not receive
+# this file, see <https://pretix.eu/about/en/license>.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License along with this program.  If not, see
+# <https://www.gnu.org/licenses/>.
+#
+"""
+Snapshots of the ticket layout variables that are exposed as ``pdf_data`` through the API.
+
+Evaluating all variables of a position is expensive and scanning devices request them for every position of an
+event. We therefore store the evaluated values in ``CachedPdfData`` in the background and serve them directly as
+long as they are up to date. A snapshot is up to date if its version matches the one computed by
+``snapshot_version``, which is derived from
+
+* the ``last_modified`` timestamp of the order, which changes whenever the order, its positions, answers, fees
+  or invoice address are modified,
+
+* a fingerprint of the event, which covers its settings, meta data and a random token that is replaced whenever
+  products, questions or meta data of the event are changed.
+
+Variables that depend on anything else, e.g. the current time, are marked as ``volatile`` and always evaluated live.
+This includes all variables of plugins that do not declare themselves ``cacheable``.
+"""
+import hashlib
+import json
+import logging
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Prefetch
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.crypto import get_random_string
+from django_scopes import scopes_disabled
+
+from pretix.base.i18n import language
+from pretix.base.models import (
+    CachedPdfData, Event, EventMetaValue, Item, ItemMetaProperty,
+    ItemMetaValue, ItemVariation, ItemVariationMetaValue, OrderPosition,
+    Question, QuestionOption, SubEventMetaValue,
+)
+from pretix.base.pdf import get_images, get_variables
+from pretix.base.services.tasks import EventTask
+from pretix.celery_app import app
+
+logger = logging.getLogger(__name__)
+
+PDF_DATA_CHUNK_SIZE = 200
+PDF_DATA_TOKEN_TIMEOUT = 7 * 24 * 3600
+
+
+def _event_token(event):
+    return event.cache.get_or_set('pdf_data_version', lambda: get_random_string(12), timeout=PDF_DATA_TOKEN_TIMEOUT)
+
+
+def event_fingerprint(event: Event) -> str:
+    """
+    Returns a hash over all event-level inputs of the layout variables. The result is memoized on the event object,
+    which lives as long as the request or task.
+    """
+    if not hasattr(event, '_pdf_data_fingerprint'):
+        payload = json.dumps([
+            _event_token(event),
+            event.last_modified,
+            event.settings._cache(),
+            event.organizer.settings._cache(),
+            event.meta_data,
+        ], sort_keys=True, default=str)
+        event._pdf_data_fingerprint = hashlib.sha1(payload.encode()).hexdigest()
+    return event._pdf_data_fingerprint
+
+
+def snapshot_version(op: OrderPosition, event: Event) -> str:
+    return '{}:{}'.format(op.order.last_modified.isoformat(), event_fingerprint(event))
+
+
+def get_snapshot(op: OrderPosition, event: Event):
+    """
+    Returns the stored snapshot of the position if it is up to date, otherwise ``None``. ``event`` needs to be the
+    event of the position, it is passed in separately so the fingerprint is only computed once per request.
+    """
+    try:
+        cached = op.cached_pdf_data
+    except CachedPdfData.DoesNotExist:
+        return None
+    if cached.version != snapshot_version(op, event):
+        return None
+    return cached.data
+
+
+def invalidate_pdf_data(event: Event):
+    """
+    Marks all snapshots of the event as outdated.
+    """
+    event.cache.delete('pdf_data_version')
+    # Another process might have filled the cache with the old state before our transaction is committed
+    transaction.on_commit(lambda: event.cache.delete('pdf_data_version'))
+
+
+def evaluate_text_variables(op: OrderPosition, variables: dict, defer_bulk=False) -> dict:
+    """
+    Evaluates the given text variables for the position. If ``defer_bulk`` is set, variables that support bulk
+    evaluation are returned as ``(callable, position)`` tuples, to be evaluated later for many positions at once.
+    """
+    res = {}
+    ev = op.subevent or op.order.event
+    for k, f in variables.items():
+        if defer_bulk and 'evaluate_bulk' in f:
+            res[k] = (f['evaluate_bulk'], op)
+        else:
+            try:
+                res[k] = f['evaluate'](op, op.order, ev)
+            except:
+                logger.exception('Evaluating PDF variable failed')
+                res[k] = '(error)'
+    return res
+
+
+def evaluate_meta_data(op: OrderPosition) -> dict:
+    res = {}
+    ev = op.subevent or op.order.event
+
+    if not hasattr(ev, '_cached_meta_data'):
+        ev._cached_meta_data = ev.meta_data
+
+    for k, v in ev._cached_meta_data.items():
+        res['meta:' + k] = v
+
+    if op.variation_id:
+        if not hasattr(op.variation, '_cached_meta_data'):
+            op.variation.item = op.item  # saves some database lookups
+            op.variation._cached_meta_data = op.variation.meta_data
+        for k, v in op.variation._cached_meta_data.items():
+            res['itemmeta:' + k] = v
+    else:
+        if not hasattr(op.item, '_cached_meta_data'):
+            op.item._cached_meta_data = op.item.meta_data
+        for k, v in op.item._cached_meta_data.items():
+            res['itemmeta:' + k] = v
+    return res
+
+
+def evaluate_image_variables(op: OrderPosition, variables: dict) -> dict:
+    """
+    Returns a dictionary mapping every image variable to its ETag, to ``True`` if an image without an ETag is
+    available, or to ``None`` if there is no image.
+    """
+    res = {}
+    ev = op.subevent or op.order.event
+    for k, f in variables.items():
+        try:
+            if 'etag' in f:
+                res[k] = f['etag'](op, op.order, ev) or None
+            else:
+                res[k] = True if f['evaluate'](op, op.order, ev) else None
+        except:
+            logger.exception('Evaluating PDF variable failed')
+            res[k] = None
+    return res
+
+
+def _queued_key(event_pk):
+    return f'pretix:pdfdata:queued:{event_pk}'
+
+
+def _position_queryset(event):
+    return OrderPosition.all.filter(order__event=event).select_related(
+        'order', 'order__invoice_address', 'item', 'item__category', 'variation', 'subevent', 'addon_to', 'seat',
+        'cached_pdf_data',
+    ).prefetch_related(
+        Prefetch('item', queryset=event.items.prefetch_related(
+            Prefetch('meta_values', ItemMetaValue.objects.select_related('property'), to_attr='meta_values_cached')
+        )),
+        Prefetch('variation', queryset=ItemVariation.objects.prefetch_related(
+            Prefetch('meta_values', ItemVariationMetaValue.objects.select_related('property'),
+                     to_attr='meta_values_cached')
+        )),
+        'answers', 'answers__options', 'answers__question',
+        'addon_to__answers', 'addon_to__answers__options', 'addon_to__answers__question',
+        Prefetch('addons', OrderPosition.objects.select_related('item', 'variation')),
+    )
+
+
+def _build_snapshots(event, positions, text_variables, image_variables):
+    data = {}
+    bulk_queue = defaultdict(list)
+    for op in positions:
+        with language(op.order.locale, event.settings.region):
+            text = evaluate_text_variables(op, text_variables, defer_bulk=True)
+            text.update(evaluate_meta_data(op))
+            images = evaluate_image_variables(op, image_variables)
+        for k, v in text.items():
+            if isinstance(v, tuple) and callable(v[0]):
+                bulk_queue[v[0]].append((op, k))
+        data[op.pk] = {'text': text, 'images': images}
+
+    for func, entries in bulk_queue.items():
+        try:
+            results = func([op for op, k in entries])
+        except:
+            logger.exception('Evaluating PDF variable failed')
+            results = ['(error)'] * len(entries)
+        for (op, k), result in zip(entries, results):
+            data[op.pk]['text'][k] = result
+
+    return [
+        CachedPdfData(order_position=op, version=snapshot_version(op, event), data=data[op.pk])
+        for op in positions
+    ]
+
+
+@app.task(base=EventTask, acks_late=True)
+def refresh_pdf_data(event: Event, positions: list=None, order: int=None):
+    """
+    Creates or updates the snapshots of all positions of the event, or only of the given positions or order.
+    Snapshots that are already up to date are skipped.
+    """
+    if positions is None and order is None:
+        cache.delete(_queued_key(event.pk))
+
+    qs = _position_queryset(event)
+    if positions is not None:
+        qs = qs.filter(pk__in=positions)
+    if order is not None:
+        qs = qs.filter(order_id=order)
+
+    variables = get_variables(event)
+    text_variables = {k: f for k, f in variables.items() if not f.get('volatile')}
+    image_variables = {k: f for k, f in get_images(event).items() if not f.get('volatile')}
+
+    last_pk = 0
+    while True:
+        chunk = list(qs.filter(pk__gt=last_pk).order_by('pk')[:PDF_DATA_CHUNK_SIZE])
+        if not chunk:
+            break
+        last_pk = chunk[-1].pk
+        for op in chunk:
+            op.order.event = event  # saves some database lookups
+        outdated = [op for op in chunk if get_snapshot(op, event) is None]
+        if outdated:
+            CachedPdfData.objects.bulk_create(
+                _build_snapshots(event, outdated, text_variables, image_variables),
+                update_conflicts=True,
+                unique_fields=['order_position'],
+                update_fields=['version', 'data', 'created'],
+            )
+
+
+def enqueue_pdf_data_refresh(event: Event, positions: list=None, order: int=None):
+    """
+    Schedules a refresh of the given snapshots after the current transaction has been committed. A refresh of the
+    full event is only scheduled once until it has started.
+    """
+    def _enqueue():
+        if positions is None and order is None and not cache.add(_queued_key(event.pk), '1', timeout=3600):
+            return
+        refresh_pdf_data.apply_async(
+            kwargs={'event': event.pk, 'positions': positions, 'order': order},
+            priority=settings.PRIORITY_CELERY_LOW,
+        )
+
+    transaction.on_commit(_enqueue)
+
+
+def has_pdf_data_snapshots(event: Event) -> bool:
+    with scopes_disabled():
+        return CachedPdfData.objects.filter(order_position__order__event=event).exists()
+
+
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Item)
+@receiver(post_save, sender=ItemMetaProperty)
+@receiver(post_delete, sender=ItemMetaProperty)
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+@receiver(post_save, sender=EventMetaValue)
+@receiver(post_delete, sender=EventMetaValue)
+def pdf_data_event_changed(sender, instance, **kwargs):
+    invalidate_pdf_data(instance.event)
+
+
+@receiver(post_save, sender=ItemVariation)
+@receiver(post_delete, sender=ItemVariation)
+@receiver(post_save, sender=ItemMetaValue)
+@receiver(post_delete, sender=ItemMetaValue)
+@receiver(post_save, sender=ItemVariationMetaValue)
+@receiver(post_delete, sender=ItemVariationMetaValue)
+@receiver(post_save, sender=QuestionOption)
+@receiver(post_delete, sender=QuestionOption)
+@receiver(post_save, sender=SubEventMetaValue)
+@receiver(post_delete, sender=SubEventMetaValue)
+def pdf_data_related_changed(sender, instance, **kwargs):
+    if isinstance(instance, ItemVariationMetaValue):
+        event = instance.variation.item.event
+    elif isinstance(instance, SubEventMetaValue):
+        event = instance.subevent.event
+    elif isinstance(instance, QuestionOption):
+        event = instance.question.event
+    else:
+        event = instance.item.event
+    invalidate_pdf_data(event)
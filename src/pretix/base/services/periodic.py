@@ -0,0 +1,102 @@
+#
+# This file is part of pretix (Community Edition).
+#
+# Copyright (C) 2014-2020  Raphael Michel and contributors
+# Copyright (C) 2020-today pretix GmbH and contributors
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU Affero General
+# Public License as published by the Free Software Foundation in version 3 of the License.
+#
+# ADDITIONAL TERMS APPLY: Pursuant to Section 7 of the GNU Affero General Public License, additional terms are
+# applicable granting you additional permissions and placing additional restrictions on your usage of this software.
+# Please refer to the pretix LICENSE file to obtain the full terms applicable to this work. If you did not receive
+# this file, see <https://pretix.eu/about/en/license>.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License along with this program.  If not, see
+# <https://www.gnu.org/licenses/>.
+#
+
+import logging
+
+from django.conf import settings
+from django.dispatch.dispatcher import NO_RECEIVERS
+from django.utils.timezone import now
+
+from pretix.base.signals import periodic_task
+from pretix.celery_app import app
+from pretix.helpers.periodic import (
+    acquire_lock, receiver_name, record_run, release_lock, run_receiver,
+)
+
+logger = logging.getLogger(__name__)
+
+# Time limit for receivers that do not define their own through minimum_interval
+DEFAULT_TIMEOUT = 30 * 60
+
+
+def get_periodic_receivers(sender=None):
+    if not periodic_task.receivers or periodic_task.sender_receivers_cache.get(sender) is NO_RECEIVERS:
+        return []
+    return periodic_task._live_receivers(sender)
+
+
+def get_timeout(receiver):
+    return getattr(receiver, 'periodic_timeout', DEFAULT_TIMEOUT)
+
+
+def dispatch_periodic_tasks(receivers):
+    """
+    Schedules each of the given ``periodic_task`` receivers as its own celery task, so a slow receiver does not
+    delay the others.
+    """
+    for receiver in receivers:
+        timeout = get_timeout(receiver)
+        run_periodic_receiver.apply_async(
+            args=(receiver_name(receiver),),
+            soft_time_limit=timeout,
+            time_limit=timeout + 60,
+            expires=timeout,
+        )
+
+
+def _acquire_slot(timeout):
+    for i in range(settings.PERIODIC_TASK_CONCURRENCY):
+        token = acquire_lock(f'periodic_slot_{i}', timeout)
+        if token:
+            return i, token
+    return None, None
+
+
+@app.task(bind=True, max_retries=10, default_retry_delay=30)
+def run_periodic_receiver(self, name: str):
+    receiver = {receiver_name(r): r for r in get_periodic_receivers()}.get(name)
+    if not receiver:
+        logger.warning('Periodic task %s not found', name)
+        return
+
+    timeout = get_timeout(receiver)
+    lock_token = acquire_lock(f'periodic_task_{name}', timeout + 60)
+    if not lock_token:
+        # Still running from a previous dispatch
+        record_run(name, now(), 0, 'skipped', 'running')
+        return
+
+    try:
+        slot, slot_token = _acquire_slot(timeout + 60)
+        if slot is None:
+            # Too many periodic tasks are running at the same time, try again later
+            release_lock(f'periodic_task_{name}', lock_token)
+            lock_token = None
+            raise self.retry()
+
+        try:
+            run_receiver(receiver, periodic_task, None)
+        finally:
+            release_lock(f'periodic_slot_{slot}', slot_token)
+    finally:
+        if lock_token:
+            release_lock(f'periodic_task_{name}', lock_token)
@@ -29,6 +29,7 @@ from typing import List, Literal, Optional, Tuple, Union
 from django import forms
 from django.conf import settings
 from django.db.models import Q
+from django.utils.crypto import get_random_string
 
 from pretix.base.decimal import round_decimal
 from pretix.base.models import (
@@ -166,6 +167,39 @@ def get_line_price(price_after_voucher: Decimal, custom_price_input: Decimal, cu
     return price
 
 
+def get_discount_plan(event: Event, sales_channel: str) -> List[Discount]:
+    """
+    Returns all active discounts of an event for a sales channel in the order they need to be applied, with their
+    product limitations already resolved. The result is kept in the event cache until a discount of the event
+    is changed, so computing prices for a cart usually does not need any database queries for discounts.
+    Availability by time is not part of the plan and needs to be checked by the caller.
+    """
+    version = event.cache.get('discount_plan_version')
+    if version is None:
+        version = get_random_string(length=16)
+        event.cache.set('discount_plan_version', version, 3600)
+    cache_key = f'discount_plan:{version}:{sales_channel}'
+
+    plan = event.cache.get(cache_key)
+    if plan is None:
+        plan = list(
+            event.discounts.filter(
+                Q(all_sales_channels=True) | Q(limit_sales_channels__identifier=sales_channel),
+                active=True,
+            ).prefetch_related(
+                'condition_limit_products', 'benefit_limit_products'
+            ).order_by('position', 'pk')
+        )
+        for discount in plan:
+            # Fill the cached properties so they are stored in the cache as well, but don't store a copy of the event
+            discount.condition_product_ids, discount.benefit_product_ids
+            discount._state.fields_cache.pop('event', None)
+        event.cache.set(cache_key, plan, 3600)
+    for discount in plan:
+        discount.event = event
+    return plan
+
+
 def apply_discounts(event: Event, sales_channel: Union[str, SalesChannel],
                     positions: List[Tuple[int, Optional[int], Optional[datetime], Decimal, bool, bool, Decimal]],
                     collect_potential_discounts: Optional[defaultdict] = None) -> List[Tuple[Decimal, Optional[Discount]]]:
@@ -190,22 +224,24 @@ def apply_discounts(event: Event, sales_channel: Union[str, SalesChannel],
         sales_channel = sales_channel.identifier
     new_prices = {}
 
-    discount_qs = event.discounts.filter(
-        Q(available_from__isnull=True) | Q(available_from__lte=time_machine_now()),
-        Q(available_until__isnull=True) | Q(available_until__gte=time_machine_now()),
-        Q(all_sales_channels=True) | Q(limit_sales_channels__identifier=sales_channel),
-        active=True,
-    ).prefetch_related('condition_limit_products', 'benefit_limit_products').order_by('position', 'pk')
-    for discount in discount_qs:
-        result = discount.apply({
-            idx: PositionInfo(item_id, subevent_id, subevent_date_from, line_price_gross, addon_to, voucher_discount)
-            for
-            idx, (item_id, subevent_id, subevent_date_from, line_price_gross, addon_to, is_bundled, voucher_discount)
-            in enumerate(positions)
-            if not is_bundled and idx not in new_prices
-        }, collect_potential_discounts)
+    remaining = {
+        idx: PositionInfo(item_id, subevent_id, subevent_date_from, line_price_gross, addon_to, voucher_discount)
+        for
+        idx, (item_id, subevent_id, subevent_date_from, line_price_gross, addon_to, is_bundled, voucher_discount)
+        in enumerate(positions)
+        if not is_bundled
+    }
+    now_dt = time_machine_now()
+    for discount in get_discount_plan(event, sales_channel):
+        if not remaining:
+            break
+        if not discount.is_available_by_time(now_dt):
+            continue
+
+        result = discount.apply(remaining, collect_potential_discounts)
         for k in result.keys():
             result[k] = (result[k], discount)
+            del remaining[k]
         new_prices.update(result)
 
     return [new_prices.get(idx, (p[3], None)) for idx, p in enumerate(positions)]
@@ -31,14 +31,17 @@ from django.db.models import (
     Case, Count, F, Func, Max, OuterRef, Q, Subquery, Sum, Value, When,
     prefetch_related_objects,
 )
+from django.dispatch import receiver
 from django.utils.timezone import now
+from django_scopes import scopes_disabled
 
 from pretix.base.models import (
     CartPosition, Checkin, Order, OrderPosition, Quota, Voucher,
     WaitingListEntry,
 )
+from pretix.helpers.periodic import minimum_interval
 
-from ..signals import quota_availability
+from ..signals import periodic_task, quota_availability
 
 
 class QuotaAvailability:
@@ -505,3 +508,110 @@ def grouper(iterable, n, fillvalue=None):
     # grouper('ABCDEFG', 3, 'x') --> ABC DEF Gxx
     args = [iter(iterable)] * n
     return zip_longest(fillvalue=fillvalue, *args)
+
+
+# Takes the requested number of units from all given quotas, but only if every quota has a known headroom that stays
+# at or above the safety margin (the last argument) afterwards. Otherwise, nothing is taken.
+_TAKE_TOKENS_SCRIPT = """
+local margin = tonumber(ARGV[#ARGV])
+for i, key in ipairs(KEYS) do
+    local value = redis.call("get", key)
+    if not value or tonumber(value) - tonumber(ARGV[i]) < margin then
+        return 0
+    end
+end
+for i, key in ipairs(KEYS) do
+    redis.call("decrby", key, ARGV[i])
+end
+return 1
+"""
+_TOKENS_ACTIVE_KEY = 'quotas:tokens'
+
+
+def _tokens_key(quota_id):
+    return f'quotas:{quota_id}:tokens'
+
+
+def quota_tokens_enabled():
+    return settings.HAS_REDIS and settings.QUOTA_TOKENS_MARGIN > 0
+
+
+def take_quota_tokens(quota_diff):
+    """
+    Reserves units from the headroom of quotas that is mirrored in redis, given as a dictionary mapping quotas to
+    the number of units. This only succeeds if the headroom of all quotas is known and stays at or above
+    ``QUOTA_TOKENS_MARGIN``, in which case the quotas do not need to be locked. Otherwise, nothing is reserved
+    and ``False`` is returned, and the availability needs to be checked exactly.
+    """
+    if not quota_tokens_enabled() or not quota_diff:
+        return False
+
+    rc = django_redis.get_redis_connection("redis")
+    quotas = list(quota_diff.keys())
+    return bool(rc.eval(
+        _TAKE_TOKENS_SCRIPT,
+        len(quotas),
+        *[_tokens_key(q.pk) for q in quotas],
+        *[quota_diff[q] for q in quotas],
+        settings.QUOTA_TOKENS_MARGIN,
+    ))
+
+
+def set_quota_tokens(headroom):
+    """
+    Mirrors the headroom of quotas in redis, given as a dictionary mapping quotas to the number of available
+    units. Should be called with numbers computed by ``QuotaAvailability``.
+    """
+    headroom = {q: n for q, n in headroom.items() if n is not None}
+    if not quota_tokens_enabled() or not headroom:
+        return
+
+    rc = django_redis.get_redis_connection("redis")
+    pipe = rc.pipeline(transaction=False)
+    for q, n in headroom.items():
+        pipe.set(_tokens_key(q.pk), max(n, 0), ex=settings.QUOTA_TOKENS_TTL)
+    pipe.sadd(_TOKENS_ACTIVE_KEY, *[q.pk for q in headroom])
+    pipe.execute()
+
+
+def clear_quota_tokens(quotas):
+    """
+    Forgets the mirrored headroom of the given quotas, e.g. after their size has been changed.
+    """
+    if not quota_tokens_enabled() or not quotas:
+        return
+
+    rc = django_redis.get_redis_connection("redis")
+    rc.delete(*[_tokens_key(q.pk) for q in quotas])
+
+
+@receiver(signal=periodic_task)
+@minimum_interval(minutes_after_success=1)
+@scopes_disabled()
+def reconcile_quota_tokens(sender, **kwargs):
+    """
+    Corrects the drift of the mirrored headroom of recently used quotas, e.g. caused by expired carts or by
+    orders created outside of carts.
+    """
+    if not quota_tokens_enabled():
+        return
+
+    rc = django_redis.get_redis_connection("redis")
+    quota_ids = sorted(int(i) for i in rc.smembers(_TOKENS_ACTIVE_KEY))
+    if not quota_ids:
+        return
+
+    pipe = rc.pipeline(transaction=False)
+    for quota_id in quota_ids:
+        pipe.exists(_tokens_key(quota_id))
+    exists = pipe.execute()
+    expired = [quota_id for quota_id, e in zip(quota_ids, exists) if not e]
+    if expired:
+        rc.srem(_TOKENS_ACTIVE_KEY, *expired)
+
+    quotas = list(Quota.objects.filter(pk__in=[quota_id for quota_id in quota_ids if quota_id not in expired]))
+    if quotas:
+        qa = QuotaAvailability()
+        qa.queue(*quotas)
+        qa.compute()
+        set_quota_tokens({q: qa.results[q][1] for q in quotas})
@@ -24,6 +24,7 @@ from django.utils.translation import gettext_lazy as _
 
 from pretix.base.i18n import LazyLocaleException
 from pretix.base.models import CartPosition, Order, OrderPosition, Seat
+from pretix.base.models.changefeed import EventChange
 
 
 class SeatProtected(LazyLocaleException):
@@ -134,8 +135,10 @@ def generate_seats(event, subevent, plan, mapping, blocked_guids=None):
     Seat.objects.bulk_create(create_seats)
     CartPosition.objects.filter(addon_to__seat__in=[s.pk for s in current_seats.values()]).delete()
     CartPosition.objects.filter(seat__in=[s.pk for s in current_seats.values()]).delete()
-    OrderPosition.all.filter(
+    released = list(OrderPosition.all.filter(
         Q(canceled=True) | Q(order__status__in=(Order.STATUS_CANCELED, Order.STATUS_EXPIRED)),
         seat__in=[s.pk for s in current_seats.values()],
-    ).update(seat=None)
+    ).values_list('pk', flat=True))
+    OrderPosition.all.filter(pk__in=released).update(seat=None)
+    EventChange.record_positions(released)
     Seat.objects.filter(pk__in=[s.pk for s in current_seats.values()]).delete()
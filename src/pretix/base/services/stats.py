@@ -32,21 +32,36 @@
 # distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 # License for the specific language governing permissions and limitations under the License.
 
+import operator
 from datetime import date, datetime, time, timedelta
 from decimal import Decimal
+from functools import reduce
 from typing import Any, Dict, Iterable, List, Tuple
+from zoneinfo import ZoneInfo
 
+from django.core.cache import cache
+from django.db import transaction
 from django.db.models import (
-    Case, Count, DateTimeField, F, Max, OuterRef, QuerySet, Subquery, Sum,
+    Case, Count, DateTimeField, F, Max, OuterRef, Q, QuerySet, Subquery, Sum,
     Value, When,
 )
-from django.utils.timezone import make_aware
+from django.db.models.functions import TruncDate
+from django.dispatch import receiver
+from django.utils.timezone import make_aware, now
 from django.utils.translation import gettext_lazy as _
+from django_scopes import scope, scopes_disabled
 
 from pretix.base.models import Event, Item, ItemCategory, Order, OrderPosition
 from pretix.base.models.event import SubEvent
-from pretix.base.models.orders import OrderFee, OrderPayment
-from pretix.base.signals import order_fee_type_name
+from pretix.base.models.orders import OrderFee, OrderPayment, OrderRefund
+from pretix.base.models.stats import (
+    OrderPositionRollup, OrderPositionRollupState,
+)
+from pretix.base.services.tasks import EventTask
+from pretix.base.signals import order_fee_type_name, periodic_task
+from pretix.celery_app import app
+from pretix.helpers import OF_SELF
+from pretix.helpers.periodic import minimum_interval
 
 
 class DummyObject:
@@ -110,6 +125,162 @@ def dictsum(*dicts) -> dict:
     return res
 
 
+#: Orders modified shortly before the last rollup refresh are aggregated again, since their database
+#: transaction might only have been committed after the refresh started.
+ROLLUP_SAFETY_MARGIN = timedelta(minutes=5)
+
+#: If orders on more days than this have been modified, we rebuild all rollups of the event at once.
+ROLLUP_MAX_INCREMENTAL_DAYS = 60
+
+#: Not all changes to orders are visible through ``Order.last_modified``, so all rollups are rebuilt
+#: from scratch in this interval.
+ROLLUP_FULL_REBUILD_INTERVAL = timedelta(days=1)
+
+
+def _position_status():
+    return Case(
+        When(order__status='n', order__require_approval=True, then=Value('unapproved')),
+        When(canceled=True, then=Value('c')),
+        default=F('order__status')
+    )
+
+
+def _last_payment_date_subquery():
+    return OrderPayment.objects.filter(
+        order=OuterRef('order'),
+        state__in=[OrderPayment.PAYMENT_STATE_CONFIRMED, OrderPayment.PAYMENT_STATE_REFUNDED],
+        payment_date__isnull=False
+    ).values('order').annotate(
+        m=Max('payment_date')
+    ).values('m').order_by()
+
+
+def _day_start(d: date, tz) -> datetime:
+    return make_aware(datetime.combine(d, time(hour=0, minute=0, second=0, microsecond=0)), tz)
+
+
+def _rollup_day(dt: datetime, event: Event):
+    """
+    Returns the date in the event timezone that starts at ``dt``, or ``None`` if ``dt`` is not
+    at midnight and therefore can't be answered from daily rollups.
+    """
+    local_dt = dt.astimezone(ZoneInfo(event.settings.timezone))
+    if local_dt.time() != time(hour=0, minute=0, second=0, microsecond=0):
+        return None
+    return local_dt.date()
+
+
+def _modified_orders(event: Event, since: datetime):
+    """
+    Returns all orders of the event that have been modified, paid or refunded since the given point in time.
+    """
+    payments = OrderPayment.objects.filter(
+        Q(created__gte=since) | Q(payment_date__gte=since),
+        order__event=event,
+    ).values('order_id')
+    refunds = OrderRefund.objects.filter(
+        Q(created__gte=since) | Q(execution_date__gte=since),
+        order__event=event,
+    ).values('order_id')
+    return Order.objects.filter(
+        Q(last_modified__gte=since) | Q(pk__in=payments) | Q(pk__in=refunds),
+        event=event,
+    )
+
+
+def _modified_days(event: Event, since: datetime, tz) -> List[date]:
+    """
+    Returns the days (by order date) of all orders that have been modified since the given point in time.
+    """
+    return sorted(
+        _modified_orders(event, since - ROLLUP_SAFETY_MARGIN).annotate(
+            day=TruncDate('datetime', tzinfo=tz)
+        ).values_list('day', flat=True).order_by().distinct()
+    )
+
+
+def _days_q(days: List[date], tz) -> Q:
+    return reduce(operator.or_, [
+        Q(order__datetime__gte=_day_start(d, tz), order__datetime__lt=_day_start(d + timedelta(days=1), tz))
+        for d in days
+    ])
+
+
+def _outdated_rollup_days(event: Event):
+    """
+    Returns the days whose rollups do not contain all changes to the orders of the event, or ``None`` if
+    the rollups can't be used at all. This only reads data and does not lock anything, so it is safe to be
+    used on the request path.
+    """
+    state = OrderPositionRollupState.objects.filter(event=event).first()
+    if not state or state.watermark is None or state.timezone != event.settings.timezone:
+        return None
+    days = _modified_days(event, state.watermark, ZoneInfo(state.timezone))
+    if len(days) > ROLLUP_MAX_INCREMENTAL_DAYS:
+        return None
+    return days
+
+
+def refresh_order_rollups(event: Event, full=False):
+    """
+    Updates the ``OrderPositionRollup`` rows of an event. Only the days on which orders have been
+    created or modified since the last refresh are aggregated again, unless ``full`` is set or the
+    rollups have been invalidated.
+    """
+    tz = ZoneInfo(event.settings.timezone)
+    state, created = OrderPositionRollupState.objects.get_or_create(
+        event=event,
+        defaults={'timezone': str(tz)}
+    )
+
+    with transaction.atomic():
+        state = OrderPositionRollupState.objects.select_for_update(of=OF_SELF).get(pk=state.pk)
+        refresh_started = now()
+
+        days = None
+        if not full and state.watermark is not None and state.timezone == str(tz):
+            days = _modified_days(event, state.watermark, tz)
+            if not days:
+                return
+            if len(days) > ROLLUP_MAX_INCREMENTAL_DAYS:
+                days = None
+
+        qs = OrderPosition.all.filter(order__event=event)
+        rollups = event.order_position_rollups.all()
+        if days is not None:
+            qs = qs.filter(_days_q(days, tz))
+            rollups = rollups.filter(day__in=days)
+
+        counters = qs.annotate(
+            status=_position_status(),
+            day=TruncDate('order__datetime', tzinfo=tz),
+            payment_date=Subquery(_last_payment_date_subquery(), output_field=DateTimeField()),
+            payment_day=TruncDate('payment_date', tzinfo=tz),
+        ).values(
+            'subevent', 'item', 'variation', 'status', 'day', 'payment_day'
+        ).annotate(cnt=Count('id'), price_sum=Sum('price'), tax_sum=Sum('tax_value')).order_by()
+
+        rollups.delete()
+        OrderPositionRollup.objects.bulk_create([
+            OrderPositionRollup(
+                event=event,
+                subevent_id=c['subevent'],
+                item_id=c['item'],
+                variation_id=c['variation'],
+                status=c['status'],
+                day=c['day'],
+                payment_day=c['payment_day'],
+                count=c['cnt'],
+                price=c['price_sum'],
+                tax_value=c['tax_sum'],
+            ) for c in counters
+        ], batch_size=500)
+
+        state.timezone = str(tz)
+        state.watermark = refresh_started
+        state.save(update_fields=['timezone', 'watermark'])
+
+
 def order_overview(
         event: Event, subevent: SubEvent=None, date_filter='', date_from=None, date_until=None, fees=False,
         admission_only=False, base_qs=None, base_fees_qs=None, subevent_date_from=None, subevent_date_until=None,
@@ -121,20 +292,6 @@ def order_overview(
         'variations'
     ).order_by('category__position', 'category_id', 'position', 'name')
 
-    qs = OrderPosition.all if base_qs is None else base_qs
-    if isinstance(subevent, (list, QuerySet)):
-        qs = qs.filter(subevent__in=subevent)
-    elif subevent:
-        qs = qs.filter(subevent=subevent)
-    if subevent_date_from:
-        qs = qs.filter(subevent__date_from__gte=subevent_date_from)
-    if subevent_date_until:
-        qs = qs.filter(subevent__date_from__lt=subevent_date_until)
-
-    if admission_only:
-        qs = qs.filter(item__admission=True)
-        items = items.filter(admission=True)
-
     if date_from and isinstance(date_from, date) and not isinstance(date_from, datetime):
         date_from = make_aware(datetime.combine(
             date_from,
@@ -147,36 +304,85 @@ def order_overview(
             time(hour=0, minute=0, second=0, microsecond=0)
         ), event.timezone)
 
-    if date_filter == 'order_date':
-        if date_from:
-            qs = qs.filter(order__datetime__gte=date_from)
-        if date_until:
-            qs = qs.filter(order__datetime__lt=date_until)
-    elif date_filter == 'last_payment_date':
-        p_date = OrderPayment.objects.filter(
-            order=OuterRef('order'),
-            state__in=[OrderPayment.PAYMENT_STATE_CONFIRMED, OrderPayment.PAYMENT_STATE_REFUNDED],
-            payment_date__isnull=False
-        ).values('order').annotate(
-            m=Max('payment_date')
-        ).values('m').order_by()
-        qs = qs.annotate(payment_date=Subquery(p_date, output_field=DateTimeField()))
-        if date_from:
-            qs = qs.filter(payment_date__gte=date_from)
-        if date_until:
-            qs = qs.filter(payment_date__lt=date_until)
-
-    counters = qs.filter(
-        order__event=event
-    ).annotate(
-        status=Case(
-            When(order__status='n', order__require_approval=True, then=Value('unapproved')),
-            When(canceled=True, then=Value('c')),
-            default=F('order__status')
-        )
-    ).values(
-        'item', 'variation', 'status'
-    ).annotate(cnt=Count('id'), price=Sum('price'), tax_value=Sum('tax_value')).order_by()
+    if admission_only:
+        items = items.filter(admission=True)
+
+    p_date = _last_payment_date_subquery()
+
+    day_from = _rollup_day(date_from, event) if date_from else None
+    day_until = _rollup_day(date_until, event) if date_until else None
+    days_aligned = (not date_from or day_from) and (not date_until or day_until)
+    use_rollups = base_qs is None and (not date_filter or days_aligned)
+    outdated_days = _outdated_rollup_days(event) if use_rollups else None
+    if use_rollups and outdated_days != []:
+        # Rollups are only written in the background, we don't want to block or write on the request path.
+        # Until they are up to date again, the days with modified orders are aggregated live.
+        if cache.add(f'pretix:stats:rollup_refresh:{event.pk}', '1', timeout=60):
+            transaction.on_commit(lambda: refresh_order_rollups_task.apply_async(kwargs={'event': event.pk}))
+        if outdated_days is None:
+            use_rollups = False
+
+    counters = []
+    if use_rollups:
+        # The filters only use day boundaries, so we can answer the query from the pre-aggregated
+        # rollups instead of grouping over all order positions of the event.
+        qs = event.order_position_rollups.exclude(day__in=outdated_days)
+        if isinstance(subevent, (list, QuerySet)):
+            qs = qs.filter(subevent__in=subevent)
+        elif subevent:
+            qs = qs.filter(subevent=subevent)
+        if subevent_date_from:
+            qs = qs.filter(subevent__date_from__gte=subevent_date_from)
+        if subevent_date_until:
+            qs = qs.filter(subevent__date_from__lt=subevent_date_until)
+        if admission_only:
+            qs = qs.filter(item__admission=True)
+
+        day_field = {'order_date': 'day', 'last_payment_date': 'payment_day'}.get(date_filter)
+        if day_field and day_from:
+            qs = qs.filter(**{f'{day_field}__gte': day_from})
+        if day_field and day_until:
+            qs = qs.filter(**{f'{day_field}__lt': day_until})
+
+        counters += qs.values(
+            'item', 'variation', 'status'
+        ).annotate(cnt=Sum('count'), price=Sum('price'), tax_value=Sum('tax_value')).order_by()
+
+    if not use_rollups or outdated_days:
+        qs = OrderPosition.all if base_qs is None else base_qs
+        if use_rollups:
+            qs = qs.filter(_days_q(outdated_days, ZoneInfo(event.settings.timezone)))
+        if isinstance(subevent, (list, QuerySet)):
+            qs = qs.filter(subevent__in=subevent)
+        elif subevent:
+            qs = qs.filter(subevent=subevent)
+        if subevent_date_from:
+            qs = qs.filter(subevent__date_from__gte=subevent_date_from)
+        if subevent_date_until:
+            qs = qs.filter(subevent__date_from__lt=subevent_date_until)
+
+        if admission_only:
+            qs = qs.filter(item__admission=True)
+
+        if date_filter == 'order_date':
+            if date_from:
+                qs = qs.filter(order__datetime__gte=date_from)
+            if date_until:
+                qs = qs.filter(order__datetime__lt=date_until)
+        elif date_filter == 'last_payment_date':
+            qs = qs.annotate(payment_date=Subquery(p_date, output_field=DateTimeField()))
+            if date_from:
+                qs = qs.filter(payment_date__gte=date_from)
+            if date_until:
+                qs = qs.filter(payment_date__lt=date_until)
+
+        counters += qs.filter(
+            order__event=event
+        ).annotate(
+            status=_position_status()
+        ).values(
+            'item', 'variation', 'status'
+        ).annotate(cnt=Count('id'), price=Sum('price'), tax_value=Sum('tax_value')).order_by()
 
     states = {
         'unapproved': 'unapproved',
@@ -185,12 +391,15 @@ def order_overview(
         'pending': Order.STATUS_PENDING,
         'expired': Order.STATUS_EXPIRED,
     }
-    num = {}
+    num = {l: {} for l in states.keys()}
     for l, s in states.items():
-        num[l] = {
-            (p['item'], p['variation']): (p['cnt'], p['price'], p['price'] - p['tax_value'])
-            for p in counters if p['status'] == s
-        }
+        for p in counters:
+            if p['status'] != s:
+                continue
+            # Rollups and live aggregates might both contain a line for the same product
+            key = (p['item'], p['variation'])
+            line = (p['cnt'], p['price'], p['price'] - p['tax_value'])
+            num[l][key] = tuplesum([num[l][key], line]) if key in num[l] else line
 
     num['total'] = dictsum(num['pending'], num['paid'])
 
@@ -252,11 +461,7 @@ def order_overview(
         qs = qs.filter(
             order__event=event
         ).annotate(
-            status=Case(
-                When(order__status='n', order__require_approval=True, then=Value('unapproved')),
-                When(canceled=True, then=Value('c')),
-                default=F('order__status')
-            )
+            status=_position_status()
         )
         if date_filter == 'order_date':
             if date_from:
@@ -326,3 +531,29 @@ def order_overview(
         total['num'][l] = tuplesum(c.num[l] for c, i in items_by_category)
 
     return items_by_category, total
+
+
+@app.task(base=EventTask)
+def refresh_order_rollups_task(event: Event):
+    refresh_order_rollups(event)
+
+
+@receiver(signal=periodic_task)
+@scopes_disabled()
+@minimum_interval(minutes_after_success=5)
+def refresh_all_order_rollups(sender, **kwargs):
+    # Keep rollups of events with recent sales current, so order_overview can use them on the request path.
+    for state in OrderPositionRollupState.objects.select_related('event', 'event__organizer'):
+        with scope(organizer=state.event.organizer):
+            if state.watermark is None or _modified_orders(state.event, state.watermark - ROLLUP_SAFETY_MARGIN).exists():
+                refresh_order_rollups(state.event)
+
+
+@receiver(signal=periodic_task)
+@scopes_disabled()
+@minimum_interval(minutes_after_success=int(ROLLUP_FULL_REBUILD_INTERVAL.total_seconds() // 60))
+def rebuild_all_order_rollups(sender, **kwargs):
+    # Catches changes that do not touch Order.last_modified, such as queryset updates
+    for state in OrderPositionRollupState.objects.select_related('event', 'event__organizer'):
+        with scope(organizer=state.event.organizer):
+            refresh_order_rollups(state.event, full=True)
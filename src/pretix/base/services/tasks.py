@@ -38,10 +38,12 @@ from django.db import transaction
 from django_scopes import scope, scopes_disabled
 
 from pretix.base.metrics import (
+    pretix_task_db_queries, pretix_task_db_seconds,
     pretix_task_duration_seconds, pretix_task_runs_total,
 )
 from pretix.base.models import Event, Organizer, User
 from pretix.celery_app import app
+from pretix.helpers.profile.queries import QueryProfile
 
 
 class ProfiledTask(app.Task):
@@ -57,6 +59,14 @@ class ProfiledTask(app.Task):
             profiler.dump_stats(os.path.join(settings.PROFILE_DIR, '{time:.0f}_{tottime:.3f}_celery_{t}.pstat'.format(
                 t=self.name, tottime=tottime, time=time.time()
             )))
+        elif QueryProfile.sampled():
+            with QueryProfile('task', self.name) as profile:
+                ret = super().__call__(*args, **kwargs)
+            tottime = profile.duration
+            if settings.METRICS_ENABLED:
+                pretix_task_db_queries.observe(profile.queries, task_name=self.name)
+                pretix_task_db_seconds.observe(profile.db_time, task_name=self.name)
+            profile.write_report()
         else:
             t0 = time.perf_counter()
             ret = super().__call__(*args, **kwargs)
@@ -21,18 +21,26 @@
 #
 import logging
 import os
+import time
 from decimal import Decimal
 
+from django.conf import settings
+from django.core.cache import cache
 from django.core.files.base import ContentFile
+from django.db import transaction
 from django.utils.timezone import now
 from django.utils.translation import gettext as _
 from django_scopes import scopes_disabled
 
 from pretix.base.i18n import language
+from pretix.base.metrics import pretix_ticket_render_duration_seconds
 from pretix.base.models import (
     CachedCombinedTicket, CachedTicket, Event, InvoiceAddress, Order,
     OrderPosition,
 )
+from pretix.base.services.pdfdata import (
+    enqueue_pdf_data_refresh, has_pdf_data_snapshots, invalidate_pdf_data,
+)
 from pretix.base.services.tasks import EventTask, ProfiledTask
 from pretix.base.settings import PERSON_NAME_SCHEMES
 from pretix.base.signals import register_ticket_outputs
@@ -41,6 +49,13 @@ from pretix.helpers.database import rolledback_transaction
 
 logger = logging.getLogger(__name__)
 
+# How long an email waits in total for a background rendering of the same order that is already in progress,
+# before rendering the tickets itself
+PRERENDER_WAIT_SECONDS = 10
+PRERENDER_KEY_TIMEOUT = 600
+# Keeps a crashed rendering from delaying emails for long
+PRERENDER_RENDERING_TIMEOUT = 60
+
 
 def generate_orderposition(order_position: int, provider: str):
     order_position = OrderPosition.objects.select_related('order', 'order__event').get(id=order_position)
@@ -50,7 +65,9 @@ def generate_orderposition(order_position: int, provider: str):
         for receiver, response in responses:
             prov = response(order_position.order.event)
             if prov.identifier == provider:
+                t0 = time.monotonic()
                 filename, ttype, data = prov.generate(order_position)
+                pretix_ticket_render_duration_seconds.observe(time.monotonic() - t0, provider=provider)
                 path, ext = os.path.splitext(filename)
                 for ct in CachedTicket.objects.filter(order_position=order_position, provider=provider):
                     ct.delete()
@@ -68,7 +85,9 @@ def generate_order(order: int, provider: str):
         for receiver, response in responses:
             prov = response(order.event)
             if prov.identifier == provider:
+                t0 = time.monotonic()
                 filename, ttype, data = prov.generate_order(order)
+                pretix_ticket_render_duration_seconds.observe(time.monotonic() - t0, provider=provider)
                 path, ext = os.path.splitext(filename)
                 for ct in CachedCombinedTicket.objects.filter(order=order, provider=provider):
                     ct.delete()
@@ -122,7 +141,35 @@ def preview(event: int, provider: str):
                 return prov.generate(p)
 
 
-def get_tickets_for_order(order, base_position=None):
+def _queued_key(order_pk):
+    return f'pretix:tickets:prerender:queued:{order_pk}'
+
+
+def _rendering_key(order_pk):
+    return f'pretix:tickets:prerender:rendering:{order_pk}'
+
+
+def _wait_for_prerender(order_pk, deadline):
+    """
+    Waits while a background rendering of this order is in progress, but not beyond ``deadline``. A rendering
+    that has not started yet is not waited for, since the ``tickets`` queue might be busy. Returns ``True`` if
+    we waited, i.e. if it makes sense to look for the cached file again.
+    """
+    waited = False
+    while time.monotonic() < deadline and cache.get(_rendering_key(order_pk)):
+        waited = True
+        time.sleep(.5)
+    return waited
+
+
+def _get_cached_ticket(qs):
+    ct = qs.filter(file__isnull=False).last()
+    if not ct or not ct.file:
+        return None
+    return ct
+
+
+def get_tickets_for_order(order, base_position=None, wait=True):
     positions = list(order.positions_with_tickets)
     if not positions:
         return []
@@ -135,6 +182,8 @@ def get_tickets_for_order(order, base_position=None):
         in register_ticket_outputs.send(order.event)
     ]
     tickets = []
+    # All files of the order are rendered by the same background task, so we wait for it only once per order
+    deadline = time.monotonic() + PRERENDER_WAIT_SECONDS if wait else 0
 
     if base_position:
         # Only the given position and its children
@@ -150,10 +199,11 @@ def get_tickets_for_order(order, base_position=None):
             try:
                 if len(positions) == 0:
                     continue
-                ct = CachedCombinedTicket.objects.filter(
-                    order=order, provider=p.identifier, file__isnull=False
-                ).last()
-                if not ct or not ct.file:
+                qs = CachedCombinedTicket.objects.filter(order=order, provider=p.identifier)
+                ct = _get_cached_ticket(qs)
+                if not ct and _wait_for_prerender(order.pk, deadline):
+                    ct = _get_cached_ticket(qs)
+                if not ct:
                     retval = generate_order(order.pk, p.identifier)
                     if not retval:
                         continue
@@ -173,10 +223,11 @@ def get_tickets_for_order(order, base_position=None):
         else:
             for pos in positions:
                 try:
-                    ct = CachedTicket.objects.filter(
-                        order_position=pos, provider=p.identifier, file__isnull=False
-                    ).last()
-                    if not ct or not ct.file:
+                    qs = CachedTicket.objects.filter(order_position=pos, provider=p.identifier)
+                    ct = _get_cached_ticket(qs)
+                    if not ct and _wait_for_prerender(order.pk, deadline):
+                        ct = _get_cached_ticket(qs)
+                    if not ct:
                         retval = generate_orderposition(pos.pk, p.identifier)
                         if not retval:
                             continue
@@ -206,6 +257,43 @@ def get_tickets_for_order(order, base_position=None):
     return tickets
 
 
+def enqueue_prerender(order, priority=None):
+    """
+    Schedules the rendering of all enabled ticket outputs of the given order on the ``tickets`` queue, so that
+    emails and downloads can use the existing files. Further calls for the same order are ignored as long as
+    the rendering has not started yet.
+    """
+    def _enqueue():
+        if not cache.add(_queued_key(order.pk), '1', timeout=PRERENDER_KEY_TIMEOUT):
+            return
+        prerender_tickets.apply_async(
+            args=(order.pk,),
+            priority=priority if priority is not None else settings.PRIORITY_CELERY_LOW,
+        )
+
+    transaction.on_commit(_enqueue)
+
+
+@app.task(base=ProfiledTask, acks_late=True)
+def prerender_tickets(order: int):
+    cache.delete(_queued_key(order))
+    with scopes_disabled():
+        try:
+            order = Order.objects.select_related('event', 'event__organizer').get(pk=order)
+        except Order.DoesNotExist:
+            return
+
+        cache.set(_rendering_key(order.pk), '1', timeout=PRERENDER_RENDERING_TIMEOUT)
+        try:
+            # Files for single positions are used by attendee emails and position downloads, the combined files
+            # (if enabled) by order emails and downloads.
+            for p in order.positions.filter(addon_to__isnull=True):
+                get_tickets_for_order(order, base_position=p, wait=False)
+            get_tickets_for_order(order, wait=False)
+        finally:
+            cache.delete(_rendering_key(order.pk))
+
+
 @app.task(base=EventTask, acks_late=True)
 def invalidate_cache(event: Event, item: int=None, provider: str=None, order: int=None, **kwargs):
     qs = CachedTicket.objects.filter(order_position__order__event=event)
@@ -226,3 +314,17 @@ def invalidate_cache(event: Event, item: int=None, provider: str=None, order: in
         ct.delete()
     for ct in qsc:
         ct.delete()
+
+    if order and event.settings.ticket_download:
+        try:
+            enqueue_prerender(event.orders.get(pk=order))
+        except Order.DoesNotExist:
+            pass
+
+    if not provider and has_pdf_data_snapshots(event):
+        # Keep the pdf_data snapshots used by the API warm, see pretix.base.services.pdfdata
+        if order:
+            enqueue_pdf_data_refresh(event, order=order)
+        else:
+            invalidate_pdf_data(event)
+            enqueue_pdf_data_refresh(event)
@@ -19,6 +19,7 @@
 # You should have received a copy of the GNU Affero General Public License along with this program.  If not, see
 # <https://www.gnu.org/licenses/>.
 #
+from django.db import connection
 from django.utils.translation import gettext
 from i18nfield.strings import LazyI18nString
 
@@ -28,6 +29,39 @@ from pretix.base.models import Event, LogEntry, User, Voucher
 from pretix.base.services.mail import mail
 
 
+def bulk_create_vouchers(event: Event, vouchers: list, log_data, user=None, auth=None, batch_size=500,
+                         chunk_done=None) -> list:
+    """
+    Saves a list of new vouchers in chunks of ``batch_size``, including one ``pretix.voucher.added`` log entry per
+    voucher, with one query per chunk each. Availability and uniqueness of the codes need to be checked before.
+
+    :param log_data: Function returning the data to log for a saved voucher
+    :param chunk_done: Optional function called with the saved vouchers of every chunk
+    """
+    created = []
+    for i in range(0, len(vouchers), batch_size):
+        chunk = vouchers[i:i + batch_size]
+        for v in chunk:
+            v.event = event
+            v.code = v.code.upper()
+        Voucher.objects.bulk_create(chunk)
+        if not connection.features.can_return_rows_from_bulk_insert:
+            by_code = {v.code: v for v in event.vouchers.filter(code__in=[v.code for v in chunk])}
+            chunk = [by_code[v.code] for v in chunk]
+
+        LogEntry.bulk_create_and_postprocess([
+            v.log_action('pretix.voucher.added', data=log_data(v), user=user, auth=auth, save=False)
+            for v in chunk
+        ])
+        if chunk_done:
+            chunk_done(chunk)
+        created += chunk
+
+    if created:
+        event.cache.set('vouchers_exist', True)
+    return created
+
+
 def vouchers_send(event: Event, vouchers: list, subject: str, message: str, recipients: list, user: int,
                   progress=None) -> None:
     vouchers = list(Voucher.objects.filter(id__in=vouchers).order_by('id'))
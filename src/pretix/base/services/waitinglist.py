@@ -20,7 +20,6 @@
 # <https://www.gnu.org/licenses/>.
 #
 import sys
-from collections import defaultdict
 from datetime import timedelta
 
 from django.db import transaction
@@ -34,11 +33,182 @@ from django_scopes import scopes_disabled
 from pretix.base.models import (
     Event, EventMetaValue, SeatCategoryMapping, User, WaitingListEntry,
 )
-from pretix.base.models.waitinglist import WaitingListException
 from pretix.base.services.locking import lock_objects
-from pretix.base.services.tasks import EventTask
+from pretix.base.services.tasks import (
+    EventTask, TransactionAwareProfiledEventTask,
+)
 from pretix.base.signals import periodic_task
 from pretix.celery_app import app
+from pretix.helpers import OF_SELF
+
+# Number of entries that receive a voucher within one transaction. Quotas are only locked for the duration
+# of a batch, so that ticket sales are not blocked while working through a long waiting list.
+ASSIGN_BATCH_SIZE = 50
+
+
+def _seats_available(event, item, subevent, seats_cache):
+    # See comment in WaitingListEntry.send_voucher() for rationale
+    key = item.pk, subevent.pk if subevent else None
+    if key not in seats_cache:
+        num_free_seats_for_product = (subevent or event).free_seats().filter(product_id=item.pk).count()
+        num_valid_vouchers_for_product = event.vouchers.filter(
+            Q(valid_until__isnull=True) | Q(valid_until__gte=now()),
+            block_quota=True,
+            item_id=item.pk,
+            subevent_id=key[1],
+            waitinglistentries__isnull=False
+        ).aggregate(free=Sum(F('max_usages') - F('redeemed')))['free'] or 0
+        seats_cache[key] = num_free_seats_for_product - num_valid_vouchers_for_product
+    return seats_cache[key]
+
+
+def _check_quotas(wle, quota_cache):
+    return (
+        wle.variation.check_quotas(count_waitinglist=False, _cache=quota_cache, subevent=wle.subevent)
+        if wle.variation
+        else wle.item.check_quotas(count_waitinglist=False, _cache=quota_cache, subevent=wle.subevent)
+    )
+
+
+def _use_quotas(wle, quota_cache):
+    # Reduce affected quotas in cache
+    for q in wle._quotas:
+        quota_cache[q.pk] = (
+            quota_cache[q.pk][0] if quota_cache[q.pk][0] > 1 else 0,
+            quota_cache[q.pk][1] - 1 if quota_cache[q.pk][1] is not None else sys.maxsize
+        )
+
+
+def _plan(event, entries, seated_product_set):
+    """
+    Computes which entries can receive a voucher based on the current availability, without acquiring any
+    locks. The result is verified again when the vouchers are created.
+    """
+    gone = set()
+    quota_cache = {}
+    seats_cache = {}
+    quotas_by_item = {}
+    planned = []
+    for wle in entries:
+        key = wle.item_id, wle.variation_id, wle.subevent_id
+        if key in gone:
+            continue
+
+        # add this event to wle.item as it is not yet cached and is needed in check_quotas
+        wle.item.event = event
+        if wle.variation:
+            wle.variation.item = wle.item
+
+        ev = (wle.subevent or event)
+        if not ev.presale_is_running or (wle.subevent and not wle.subevent.active):
+            continue
+        if wle.subevent and not wle.subevent.presale_is_running:
+            continue
+        if event.settings.waiting_list_auto_disable and event.settings.waiting_list_auto_disable.datetime(wle.subevent or event) <= now():
+            gone.add(key)
+            continue
+        if not wle.item.is_available():
+            gone.add(key)
+            continue
+
+        if key not in quotas_by_item:
+            quotas_by_item[key] = list(
+                wle.variation.quotas.filter(subevent=wle.subevent)
+                if wle.variation
+                else wle.item.quotas.filter(subevent=wle.subevent)
+            )
+        wle._quotas = quotas_by_item[key]
+
+        seated = (wle.item_id, wle.subevent_id) in seated_product_set
+        if seated and _seats_available(event, wle.item, wle.subevent, seats_cache) < 1:
+            gone.add(key)
+            continue
+
+        if '@' not in wle.email:
+            # Anonymized entry, which WaitingListEntry.send_voucher() would reject as well
+            continue
+
+        availability = _check_quotas(wle, quota_cache)
+        if availability[1] is None:
+            # Rejected by WaitingListEntry.send_voucher() as well
+            continue
+        if availability[1] > 0:
+            planned.append(wle)
+            _use_quotas(wle, quota_cache)
+            if seated:
+                seats_cache[wle.item_id, wle.subevent_id] -= 1
+        else:
+            gone.add(key)
+    return planned
+
+
+def _assign_batch(event, batch, seated_product_set, gone, user):
+    quota_cache = {}
+    seats_cache = {}
+    assigned = []
+    with transaction.atomic(durable=True):
+        lock_objects({q for wle in batch for q in wle._quotas}, shared_lock_objects=[event])
+        # The entries in the batch have been loaded without a lock and might be outdated by now, so we only
+        # work with the locked rows from here on.
+        locked = {
+            wle.pk: wle for wle in WaitingListEntry.objects.select_for_update(of=OF_SELF).filter(
+                pk__in=[wle.pk for wle in batch], voucher__isnull=True
+            )
+        }
+        for planned_wle in batch:
+            wle = locked.get(planned_wle.pk)
+            if not wle:
+                continue
+            key = wle.item_id, wle.variation_id, wle.subevent_id
+            if key in gone or key != (planned_wle.item_id, planned_wle.variation_id, planned_wle.subevent_id):
+                # The product has been changed since planning, so the quotas we locked might not be the right ones
+                continue
+            if '@' not in wle.email:
+                # Anonymized since planning
+                continue
+
+            wle.event = event
+            wle.item = planned_wle.item
+            wle.variation = planned_wle.variation
+            wle.subevent = planned_wle.subevent
+            wle._quotas = planned_wle._quotas
+
+            seated = (wle.item_id, wle.subevent_id) in seated_product_set
+            if seated and _seats_available(event, wle.item, wle.subevent, seats_cache) < 1:
+                gone.add(key)
+                continue
+
+            availability = _check_quotas(wle, quota_cache)
+            if availability[1] is None:
+                continue
+            if availability[1] > 0:
+                wle.create_voucher(user=user)
+                assigned.append(wle.pk)
+                _use_quotas(wle, quota_cache)
+                if seated:
+                    seats_cache[wle.item_id, wle.subevent_id] -= 1
+            else:
+                gone.add(key)
+
+        if assigned:
+            send_waitinglist_vouchers.apply_async(kwargs={
+                'event': event.pk,
+                'entries': assigned,
+                'user': user.pk if user else None,
+            })
+    return len(assigned)
+
+
+@app.task(base=TransactionAwareProfiledEventTask, acks_late=True)
+def send_waitinglist_vouchers(event: Event, entries: list, user: int=None):
+    if user:
+        user = User.objects.get(id=user)
+
+    qs = event.waitinglistentries.filter(
+        pk__in=entries, voucher__isnull=False
+    ).select_related('voucher', 'item', 'variation', 'subevent')
+    for wle in qs:
+        wle.send_voucher_mail(wle.voucher, user=user)
 
 
 @app.task(base=EventTask)
@@ -48,31 +218,10 @@ def assign_automatically(event: Event, user_id: int=None, subevent_id: int=None)
     else:
         user = None
 
-    quota_cache = {}
-    gone = set()
-    _seats_available_cache = {}
-    seats_used = defaultdict(int)
-
     seated_product_set = set(
         SeatCategoryMapping.objects.filter(event=event).values_list('product_id', 'subevent_id')
     )
 
-    def _seats_available(item, subevent):
-        # See comment in WaitingListEntry.send_voucher() for rationale
-        subevent_id = subevent.pk if subevent else None
-        if (item.pk, subevent_id) not in _seats_available_cache:
-            num_free_seats_for_product = (subevent or event).free_seats().filter(product_id=item.pk).count()
-            num_valid_vouchers_for_product = event.vouchers.filter(
-                Q(valid_until__isnull=True) | Q(valid_until__gte=now()),
-                block_quota=True,
-                item_id=item.pk,
-                subevent_id=subevent_id,
-                waitinglistentries__isnull=False
-            ).aggregate(free=Sum(F('max_usages') - F('redeemed')))['free'] or 0
-            _seats_available_cache[item.pk, subevent_id] = num_free_seats_for_product - num_valid_vouchers_for_product
-
-        return _seats_available_cache[item.pk, subevent_id] - seats_used[item.pk, subevent_id]
-
     prefetch_related_objects(
         [event.organizer],
         'meta_properties'
@@ -96,71 +245,12 @@ def assign_automatically(event: Event, user_id: int=None, subevent_id: int=None)
         subevent = event.subevents.get(id=subevent_id)
         qs = qs.filter(subevent=subevent)
 
-    sent = 0
-
-    with transaction.atomic(durable=True):
-        quotas_by_item = {}
-        quotas = set()
-        for wle in qs:
-            if (wle.item_id, wle.variation_id, wle.subevent_id) not in quotas_by_item:
-                quotas_by_item[wle.item_id, wle.variation_id, wle.subevent_id] = list(
-                    wle.variation.quotas.filter(subevent=wle.subevent)
-                    if wle.variation
-                    else wle.item.quotas.filter(subevent=wle.subevent)
-                )
-            wle._quotas = quotas_by_item[wle.item_id, wle.variation_id, wle.subevent_id]
-            quotas |= set(wle._quotas)
-
-        lock_objects(quotas, shared_lock_objects=[event])
-        for wle in qs:
-            # add this event to wle.item as it is not yet cached and is needed in check_quotas
-            wle.item.event = event
-            if wle.variation:
-                wle.variation.item = wle.item
-
-            if (wle.item_id, wle.variation_id, wle.subevent_id) in gone:
-                continue
-            ev = (wle.subevent or event)
-            if not ev.presale_is_running or (wle.subevent and not wle.subevent.active):
-                continue
-            if wle.subevent and not wle.subevent.presale_is_running:
-                continue
-            if event.settings.waiting_list_auto_disable and event.settings.waiting_list_auto_disable.datetime(wle.subevent or event) <= now():
-                gone.add((wle.item_id, wle.variation_id, wle.subevent_id))
-                continue
-            if not wle.item.is_available():
-                gone.add((wle.item_id, wle.variation_id, wle.subevent_id))
-                continue
-
-            if (wle.item_id, wle.subevent_id) in seated_product_set:
-                if _seats_available(wle.item, wle.subevent) < 1:
-                    gone.add((wle.item_id, wle.variation_id, wle.subevent_id))
-                    continue
-
-            availability = (
-                wle.variation.check_quotas(count_waitinglist=False, _cache=quota_cache, subevent=wle.subevent)
-                if wle.variation
-                else wle.item.check_quotas(count_waitinglist=False, _cache=quota_cache, subevent=wle.subevent)
-            )
-            if availability[1] is None or availability[1] > 0:
-                try:
-                    wle.send_voucher(quota_cache, user=user)
-                    sent += 1
-                except WaitingListException:  # noqa
-                    continue
-
-                # Reduce affected quotas in cache
-                for q in wle._quotas:
-                    quota_cache[q.pk] = (
-                        quota_cache[q.pk][0] if quota_cache[q.pk][0] > 1 else 0,
-                        quota_cache[q.pk][1] - 1 if quota_cache[q.pk][1] is not None else sys.maxsize
-                    )
-
-                if (wle.item_id, wle.subevent_id) in seated_product_set:
-                    seats_used[wle.item_id, wle.subevent_id] += 1
-            else:
-                gone.add((wle.item_id, wle.variation_id, wle.subevent_id))
+    planned = _plan(event, list(qs), seated_product_set)
 
+    gone = set()
+    sent = 0
+    for i in range(0, len(planned), ASSIGN_BATCH_SIZE):
+        sent += _assign_batch(event, planned[i:i + ASSIGN_BATCH_SIZE], seated_product_set, gone, user)
     return sent
 
 
@@ -0,0 +1,232 @@
+#
+# This file is part of pretix (Community Edition).
+#
+# Copyright (C) 2014-2020  Raphael Michel and contributors
+# Copyright (C) 2020-today pretix GmbH and contributors
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU Affero General
+# Public License as published by the Free Software Foundation in version 3 of the License.
+#
+# ADDITIONAL TERMS APPLY: Pursuant to Section 7 of the GNU Affero General Public License, additional terms are
+# applicable granting you additional permissions and placing additional restrictions on your usage of this software.
+# Please refer to the pretix LICENSE file to obtain the full terms applicable to this work. If you did not receive
+# this file, see <https://pretix.eu/about/en/license>.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License along with this program.  If not, see
+# <https://www.gnu.org/licenses/>.
+#
+
+
+"""
+A virtual waiting room that protects the shop of an event from on-sale peaks.
+
+If the waiting room is enabled, buyers need an admission before they can add products to their cart or start
+the checkout. Buyers without one are put into a FIFO queue: they draw a ticket number from a counter and keep
+a signed token containing it in their session. Admissions are handed out by moving a cursor over the ticket
+numbers at a configured rate per minute, which can optionally follow the rate at which orders are actually
+placed. An admission stays valid as long as the buyer keeps using the shop.
+
+All state is kept in the cache (redis, if configured), so it is shared between all web workers and does not
+touch the database.
+"""
+import math
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache as default_cache, caches
+from django.dispatch import receiver
+
+from pretix.base.models import Event, SubEvent
+from pretix.base.signals import order_placed
+
+# Admitting more buyers than are currently placing orders keeps the shop busy even though not everybody buys.
+ADAPTIVE_RATE_FACTOR = 1.5
+THROUGHPUT_WINDOW = 5  # minutes
+STATE_TIMEOUT = 3600 * 24
+
+
+def _cache():
+    return caches['redis'] if settings.HAS_REDIS else default_cache
+
+
+def waiting_room_enabled(event: Event) -> bool:
+    return event.settings.waiting_room_active
+
+
+class WaitingRoom:
+    """
+    The queue of one event or, for event series, one subevent.
+    """
+
+    def __init__(self, event: Event, subevent: SubEvent=None):
+        self.event = event
+        self.subevent_id = subevent.pk if isinstance(subevent, SubEvent) else subevent
+        self.cache = _cache()
+
+    @property
+    def key(self):
+        return '{}:{}'.format(self.event.pk, self.subevent_id or 0)
+
+    def _key(self, name):
+        return 'pretix_waitingroom:{}:{}'.format(self.key, name)
+
+    def _incr(self, name, delta=1):
+        self.cache.add(self._key(name), 0, STATE_TIMEOUT)
+        try:
+            return self.cache.incr(self._key(name), delta)
+        except ValueError:
+            # The key expired right between add and incr
+            self.cache.set(self._key(name), delta, STATE_TIMEOUT)
+            return delta
+
+    @property
+    def base_rate(self):
+        return max(1, self.event.settings.waiting_room_rate)
+
+    def throughput(self) -> float:
+        """
+        Returns the number of orders placed per minute, averaged over the last few minutes.
+        """
+        minute = int(time.time() // 60)
+        counts = self.cache.get_many([self._key('placed:{}'.format(m)) for m in range(minute - THROUGHPUT_WINDOW, minute)])
+        return sum(counts.values()) / THROUGHPUT_WINDOW
+
+    def rate(self) -> float:
+        """
+        Returns the number of admissions per minute. If the rate is adaptive and orders are placed faster than
+        the configured rate, buyers are admitted in proportion to the observed order throughput instead.
+        """
+        rate = self.base_rate
+        if self.event.settings.waiting_room_adaptive:
+            rate = max(rate, self.throughput() * ADAPTIVE_RATE_FACTOR)
+        return rate
+
+    def record_order(self):
+        self._incr('placed:{}'.format(int(time.time() // 60)))
+
+    def enqueue(self) -> int:
+        """
+        Draws the next ticket number.
+        """
+        self._advance()
+        return self._incr('seq')
+
+    def admitted_up_to(self) -> int:
+        """
+        Returns the highest ticket number that has been admitted so far.
+        """
+        self._advance()
+        return self.cache.get(self._key('cursor')) or 0
+
+    def _advance(self):
+        ts = time.time()
+        last = self.cache.get(self._key('tick'))
+        if last is None:
+            self.cache.add(self._key('tick'), ts, STATE_TIMEOUT)
+            return
+        if ts - last < 1 or not self.cache.add(self._key('lock'), 1, 5):
+            return
+        try:
+            # Another worker might have moved the cursor while we waited for the lock
+            last = self.cache.get(self._key('tick')) or ts
+            rate = self.rate()
+            admissions = int((ts - last) * rate / 60)
+            if not admissions:
+                return
+            state = self.cache.get_many([self._key('seq'), self._key('cursor')])
+            seq, cursor = state.get(self._key('seq'), 0), state.get(self._key('cursor'), 0)
+            # Capacity that was not used while the queue was empty is not saved up for later, apart from one
+            # second's worth of admissions, so quiet periods do not allow a burst of buyers at once.
+            cursor = min(cursor + admissions, max(cursor, seq + math.ceil(rate / 60)))
+            self.cache.set_many({
+                self._key('cursor'): cursor,
+                self._key('tick'): last + admissions * 60 / rate,
+            }, STATE_TIMEOUT)
+        finally:
+            self.cache.delete(self._key('lock'))
+
+    def estimated_wait(self, number: int) -> timedelta:
+        ahead = max(0, number - self.admitted_up_to())
+        return timedelta(seconds=math.ceil(ahead * 60 / self.rate()))
+
+
+def _signer(event):
+    return signing.Signer(salt='pretix-waitingroom-{}'.format(event.pk))
+
+
+def _session_key(event):
+    return 'pretix_waitingroom_{}'.format(event.pk)
+
+
+def get_ticket(request, room: WaitingRoom, create=False):
+    """
+    Returns the ticket number of the current session in the given waiting room, drawing a new one if ``create``
+    is set and the session does not hold a valid one yet.
+    """
+    entries = request.session.get(_session_key(room.event), {})
+    entry = entries.get(room.key)
+    if entry:
+        try:
+            key, number = _signer(room.event).unsign(entry['token']).rsplit(':', 1)
+            if key == room.key:
+                return int(number)
+        except (signing.BadSignature, ValueError):
+            pass
+    if not create:
+        return None
+    number = room.enqueue()
+    entries[room.key] = {'token': _signer(room.event).sign('{}:{}'.format(room.key, number))}
+    request.session[_session_key(room.event)] = entries
+    return number
+
+
+def is_admitted(request, room: WaitingRoom) -> bool:
+    """
+    Checks whether the current session has been admitted to the shop. An admission expires if the buyer has
+    not used the shop for the configured period; the buyer then needs to queue again.
+    """
+    number = get_ticket(request, room)
+    if number is None:
+        return False
+
+    entries = request.session[_session_key(room.event)]
+    entry = entries[room.key]
+    ts = time.time()
+    if 'seen' in entry:
+        if ts - entry['seen'] > room.event.settings.waiting_room_admission_minutes * 60:
+            del entries[room.key]
+            request.session[_session_key(room.event)] = entries
+            return False
+    elif number > room.admitted_up_to():
+        return False
+
+    if ts - entry.get('seen', 0) > 10:
+        entry['seen'] = ts
+        request.session[_session_key(room.event)] = entries
+    return True
+
+
+def has_any_admission(request, event: Event) -> bool:
+    """
+    Checks whether the current session has been admitted to the shop for the event or any of its subevents.
+    """
+    for key in list(request.session.get(_session_key(event), {}).keys()):
+        subevent_id = int(key.rsplit(':', 1)[1]) or None
+        if is_admitted(request, WaitingRoom(event, subevent_id)):
+            return True
+    return False
+
+
+@receiver(order_placed, dispatch_uid="pretixbase_waitingroom_order_placed")
+def record_order(sender: Event, order, bulk=False, **kwargs):
+    if bulk or not waiting_room_enabled(sender):
+        return
+    subevent_ids = {p.subevent_id for p in order.positions.all()} if sender.has_subevents else {None}
+    for subevent_id in subevent_ids:
+        WaitingRoom(sender, subevent_id).record_order()
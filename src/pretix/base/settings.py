@@ -35,14 +35,18 @@
 
 import json
 import operator
+import secrets
+import threading
 from collections import OrderedDict, UserList
-from datetime import datetime
+from datetime import date, datetime, time
 from decimal import Decimal
+from types import MappingProxyType
 from typing import Any
 
 import pycountry
 from django import forms
 from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.core.files import File
 from django.core.validators import (
@@ -56,6 +60,7 @@ from django.utils.translation import (
 )
 from django_countries.fields import Country
 from hierarkey.models import GlobalSettingsBase, Hierarkey
+from hierarkey.proxy import HierarkeyProxy
 from i18nfield.forms import I18nFormField, I18nTextarea, I18nTextInput
 from i18nfield.rest_framework import I18nField
 from i18nfield.strings import LazyI18nString
@@ -878,6 +883,64 @@ DEFAULTS = {
             label=_('Directly redirect to check-out after a product has been added to the cart.'),
         )
     },
+    'waiting_room_active': {
+        'default': 'False',
+        'type': bool,
+        'serializer_class': serializers.BooleanField,
+        'form_class': forms.BooleanField,
+        'form_kwargs': dict(
+            label=_('Use a virtual waiting room'),
+            help_text=_('Visitors need to wait in a queue before they can add products to their cart. They are let in '
+                        'in the order they arrived, at the rate configured below. Use this to protect your shop when '
+                        'you expect a large number of visitors at the same time, e.g. at the start of sales.'),
+        )
+    },
+    'waiting_room_rate': {
+        'default': '100',
+        'type': int,
+        'serializer_class': serializers.IntegerField,
+        'serializer_kwargs': dict(
+            min_value=1,
+        ),
+        'form_class': forms.IntegerField,
+        'form_kwargs': dict(
+            label=_('Admissions per minute'),
+            min_value=1,
+            required=True,
+            help_text=_('The number of visitors that are let into the shop per minute. For event series, this applies '
+                        'to every date separately.'),
+            widget=forms.NumberInput(attrs={'data-display-dependency': '#id_settings-waiting_room_active'}),
+        )
+    },
+    'waiting_room_adaptive': {
+        'default': 'True',
+        'type': bool,
+        'serializer_class': serializers.BooleanField,
+        'form_class': forms.BooleanField,
+        'form_kwargs': dict(
+            label=_('Let more visitors in if orders are placed quickly'),
+            help_text=_('If orders are placed faster than the rate above, visitors are let in based on the number of '
+                        'orders placed in the last minutes instead.'),
+            widget=forms.CheckboxInput(attrs={'data-display-dependency': '#id_settings-waiting_room_active'}),
+        )
+    },
+    'waiting_room_admission_minutes': {
+        'default': '30',
+        'type': int,
+        'serializer_class': serializers.IntegerField,
+        'serializer_kwargs': dict(
+            min_value=1,
+        ),
+        'form_class': forms.IntegerField,
+        'form_kwargs': dict(
+            label=_('Admission period'),
+            min_value=1,
+            required=True,
+            help_text=_('The number of minutes a visitor who has been let in can be inactive before they need to queue '
+                        'again.'),
+            widget=forms.NumberInput(attrs={'data-display-dependency': '#id_settings-waiting_room_active'}),
+        )
+    },
     'presale_has_ended_text': {
         'default': '',
         'type': LazyI18nString,
@@ -3936,7 +3999,190 @@ COUNTRY_STATE_LABEL = {
     'IT': pgettext_lazy('address', 'Province'),
 }
 
-settings_hierarkey = Hierarkey(attribute_name='settings')
+
+class SettingsSnapshot:
+    """
+    Immutable view of the settings stored on one level of the hierarchy (the global settings, an organizer
+    or an event) at a given settings version. Deserialized values are memoized on the snapshot, so looking up
+    the same setting again does not pay the parsing cost. Only values of immutable types are memoized, mutable
+    values like ``dict`` or ``list`` are deserialized freshly on every access.
+    """
+    MEMOIZABLE_TYPES = (str, int, float, bool, Decimal, date, datetime, time, LazyI18nString, RelativeDateWrapper)
+
+    __slots__ = ('version', 'values', '_typed')
+
+    def __init__(self, version, values: dict):
+        self.version = version
+        self.values = MappingProxyType(dict(values))
+        self._typed = {}
+
+    def typed(self, key, as_type, value, unserialize):
+        try:
+            return self._typed[key, as_type]
+        except KeyError:
+            pass
+        typed_value = unserialize(value, as_type)
+        if typed_value is None or isinstance(typed_value, self.MEMOIZABLE_TYPES):
+            self._typed[key, as_type] = typed_value
+        return typed_value
+
+
+class SettingsSnapshotCache:
+    """
+    Process-local LRU cache of :py:class:`SettingsSnapshot` objects. A snapshot is only returned if its version
+    matches the current settings version of the object, which is kept in the shared cache and bumped whenever
+    the settings of the object change.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        with self._lock:
+            snapshot = self._data.get(key)
+            if snapshot is None:
+                return None
+            if snapshot.version != version:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return snapshot
+
+    def put(self, key, snapshot: SettingsSnapshot):
+        with self._lock:
+            self._data[key] = snapshot
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+settings_snapshots = SettingsSnapshotCache(maxsize=2000)
+
+
+class SettingsProxy(HierarkeyProxy):
+    """
+    Settings proxy that reads the stored values from a process-local :py:class:`SettingsSnapshot`
+    instead of fetching and deserializing them from the shared cache for every proxy instance. Reading
+    from a snapshot requires only one lookup of the settings version in the shared cache.
+
+    If the settings have been changed within the current transaction or through this proxy, or the
+    shared cache does not retain the version counter, the proxy behaves exactly like its parent class.
+    """
+
+    @property
+    def _version_key(self):
+        return '{}_version'.format(self._cache_key)
+
+    def _version(self):
+        version = cache.get(self._version_key)
+        if version is None:
+            # Start at a random offset so that snapshots created before the cache was cleared are never
+            # mistaken for current ones.
+            cache.add(self._version_key, secrets.randbelow(2 ** 48), timeout=None)
+            version = cache.get(self._version_key)
+        return version
+
+    def _bump_version(self):
+        try:
+            cache.incr(self._version_key)
+        except ValueError:
+            cache.delete(self._version_key)
+
+    def _snapshot(self):
+        version = self._version()
+        if version is None:
+            return None
+        key = (self._cache_namespace, self._obj.pk)
+        snapshot = settings_snapshots.get(key, version)
+        if snapshot is None:
+            snapshot = SettingsSnapshot(version, cache.get_or_set(
+                self._cache_key,
+                lambda: {s.key: s.value for s in self._objects.all()},
+                timeout=1800
+            ))
+            settings_snapshots.put(key, snapshot)
+        return snapshot
+
+    def _cache(self):
+        if self._cached_obj is None and self._cache_key not in self._get_dirty_cache_queue():
+            self._snap = self._snapshot()
+            if self._snap is not None:
+                # The proxy gets its own copy, since set() and delete() modify it in place
+                self._cached_obj = dict(self._snap.values)
+        return super()._cache()
+
+    def _invalidate_cache_after_transaction(self):
+        super()._invalidate_cache_after_transaction()
+        self._bump_version()
+
+    def flush(self):
+        self._snap = None
+        super().flush()
+        self._bump_version()
+
+    def get(self, key: str, default=None, as_type: type = None, binary_file: bool = False):
+        if as_type is None:
+            as_type = self._h.get_declared_type(key)
+
+        if self._cached_obj is None and self._cache_key not in self._get_dirty_cache_queue():
+            self._cache()
+        snapshot = self._snap if self._cached_obj is not None else None
+        if snapshot is None or binary_file or as_type is File:
+            return super().get(key, default=default, as_type=as_type, binary_file=binary_file)
+
+        values = self._cached_obj
+        if key in values:
+            return snapshot.typed(key, as_type, values[key], self._unserialize)
+        if self._parent:
+            # Inherited values are memoized in the parent's snapshot, which is versioned independently
+            return getattr(self._parent, self._h.attribute_name).get(key, default=default, as_type=as_type)
+        if key in self._h.defaults and self._h.defaults[key].value is not None:
+            return snapshot.typed(key, as_type, self._h.defaults[key].value, self._unserialize)
+        return self._unserialize(default, as_type)
+
+    def set(self, key: str, value: Any) -> None:
+        super().set(key, value)
+        self._snap = None
+
+    def delete(self, key: str) -> None:
+        super().delete(key)
+        self._snap = None
+
+
+class SettingsHierarkey(Hierarkey):
+    """
+    Hierarkey that attaches a :py:class:`SettingsProxy` instead of a plain ``HierarkeyProxy``.
+    """
+
+    def _use_settings_proxy(self, wrapped_class):
+        base_property = getattr(wrapped_class, self.attribute_name)
+
+        def prop(iself):
+            proxy = base_property.fget(iself)
+            if type(proxy) is HierarkeyProxy:
+                proxy.__class__ = SettingsProxy
+                proxy._snap = None
+            return proxy
+
+        setattr(wrapped_class, self.attribute_name, property(prop))
+        return wrapped_class
+
+    def add(self, cache_namespace: str = None, parent_field: str = None) -> type:
+        wrapper = super().add(cache_namespace=cache_namespace, parent_field=parent_field)
+        return lambda model: self._use_settings_proxy(wrapper(model))
+
+    def set_global(self, cache_namespace: str = None) -> type:
+        wrapper = super().set_global(cache_namespace=cache_namespace)
+        return lambda wrapped_class: self._use_settings_proxy(wrapper(wrapped_class))
+
+
+settings_hierarkey = SettingsHierarkey(attribute_name='settings')
 
 for k, v in DEFAULTS.items():
     settings_hierarkey.add_default(k, v['default'], v['type'])
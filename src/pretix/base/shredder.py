@@ -53,6 +53,7 @@ from pretix.base.models import (
     CachedCombinedTicket, CachedTicket, Event, InvoiceAddress, OrderPayment,
     OrderPosition, OrderRefund, QuestionAnswer,
 )
+from pretix.base.models.changefeed import EventChange
 from pretix.base.services.invoices import invoice_pdf_task
 from pretix.base.signals import register_data_shredders
 from pretix.helpers.json import CustomJSONEncoder
@@ -317,6 +318,8 @@ class EmailAddressShredder(BaseDataShredder):
 
         total = qs_op_cnt + qs_orders_cnt + qs_le_cnt
 
+        # slow_update() does not send any signals, but devices need to know about the changes as well
+        shredded_positions = list(qs_op.values_list('pk', flat=True))
         slow_update(
             qs_op,
             attendee_email=None,
@@ -328,6 +331,7 @@ class EmailAddressShredder(BaseDataShredder):
             batch_size=100,
             sleep_time=2,
         )
+        EventChange.record_positions(shredded_positions)
 
         for o in _progress_helper(qs_orders, progress_callback, qs_op_cnt, total):
             changed = bool(o.email) or bool(o.customer)
@@ -457,6 +461,7 @@ class AttendeeInfoShredder(BaseDataShredder):
 
         total = qs_op_cnt + qs_le_cnt
 
+        shredded_positions = list(qs_op.values_list('pk', flat=True))
         slow_update(
             qs_op,
             attendee_name_cached=None,
@@ -473,6 +478,7 @@ class AttendeeInfoShredder(BaseDataShredder):
             batch_size=100,
             sleep_time=2,
         )
+        EventChange.record_positions(shredded_positions)
 
         for le in _progress_helper(qs_le, progress_callback, qs_op_cnt, total):
             d = le.parsed_data
@@ -993,6 +993,10 @@ also be a subevent, if applicable.
 
 The ``evaluate_bulk`` member is optional but can significantly improve performance in some situations because you
 can perform database fetches in bulk instead of single queries for every position.
+
+By default, your variable is evaluated every time the API returns ``pdf_data``. If the result only depends on the
+order position, its order, or the event and its products, set ``"cacheable": True`` to have it stored in snapshots
+that are reused until one of those is modified.
 """
 
 
@@ -1017,6 +1021,9 @@ class and point to a valid JPEG or PNG file. If no image is available, ``evaluat
 The ``etag`` member will be called with the same arguments as ``evaluate`` but should return a ``str`` value
 uniquely identifying the version of the file. This can be a hash of the file, but can also be something else.
 If no image is available, ``etag`` should return ``None``. In some cases, this can speed up the implementation.
+
+As with ``layout_text_variables``, you can set ``"cacheable": True`` if the result of ``etag`` and ``evaluate``
+only depends on the order position, its order, or the event and its products.
 """
 
 
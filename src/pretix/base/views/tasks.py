@@ -20,6 +20,7 @@
 # <https://www.gnu.org/licenses/>.
 #
 import logging
+import time
 from collections import defaultdict
 from datetime import timedelta
 from importlib import import_module
@@ -46,6 +47,7 @@ from django.views import View
 from django.views.generic import FormView
 from redis import ResponseError
 
+from pretix.base.metrics import pretix_async_result_seconds
 from pretix.base.models import CachedFile, User
 from pretix.base.services.tasks import ProfiledEventTask
 from pretix.celery_app import app
@@ -54,6 +56,21 @@ from pretix.helpers.http import redirect_to_url
 logger = logging.getLogger('pretix.base.tasks')
 
 
+def poll_interval(elapsed):
+    """
+    Returns the number of milliseconds a client should wait before checking for the result of a task again,
+    given the number of seconds since the task has been submitted. Most tasks finish within a second, so clients
+    poll quickly at first and back off if the task takes longer.
+    """
+    if elapsed < 2:
+        return 250
+    elif elapsed < 10:
+        return 500
+    elif elapsed < 60:
+        return 1000
+    return 3000
+
+
 class AsyncMixin:
     success_url = None
     error_url = None
@@ -66,14 +83,31 @@ class AsyncMixin:
         return self.error_url
 
     def get_check_url(self, task_id, ajax):
-        return self.request.path + '?async_id=%s' % task_id + ('&ajax=1' if ajax else '')
+        submitted = getattr(self, '_task_submitted', None) or time.time()
+        return self.request.path + '?async_id=%s&async_ts=%d' % (task_id, submitted * 1000) + ('&ajax=1' if ajax else '')
 
     def _ajax_response_data(self, value):
         return {}
 
+    def _task_elapsed(self):
+        """
+        Returns the number of seconds since the task has been submitted, if known.
+        """
+        if getattr(self, '_task_submitted', None):
+            return time.time() - self._task_submitted
+        try:
+            return max(0.0, time.time() - int(self.request.GET['async_ts']) / 1000)
+        except (KeyError, ValueError):
+            return None
+
+    def _observe_result(self, delivery):
+        elapsed = self._task_elapsed()
+        if settings.METRICS_ENABLED and elapsed is not None:
+            pretix_async_result_seconds.observe(elapsed, view=type(self).__name__, delivery=delivery)
+
     def _return_ajax_result(self, res, timeout=.5):
         ready = res.ready()
-        if not ready:
+        if not ready and timeout:
             try:
                 res.get(timeout=timeout, propagate=False)
             except celery.exceptions.TimeoutError:
@@ -100,6 +134,7 @@ class AsyncMixin:
             'started': False,
         })
         if ready:
+            self._observe_result('direct' if getattr(self, '_task_submitted', None) else 'poll')
             if state == states.SUCCESS and not isinstance(info, Exception):
                 smes = self.get_success_message(info)
                 if smes and 'ajax_dont_redirect' not in self.request.GET and 'ajax_dont_redirect' not in self.request.POST:
@@ -128,6 +163,9 @@ class AsyncMixin:
             data.update({
                 'started': True,
             })
+        if not ready:
+            elapsed = self._task_elapsed()
+            data['retry_after'] = poll_interval(elapsed or 0)
         return data
 
     def get_result(self, request):
@@ -135,9 +173,12 @@ class AsyncMixin:
             raise BadRequest("No async_id given")
         res = AsyncResult(request.GET.get('async_id'))
         if 'ajax' in self.request.GET:
-            return JsonResponse(self._return_ajax_result(res, timeout=0.25))
+            # Do not wait for the result here, this would only keep a web worker busy. The client checks back
+            # after the interval we tell it.
+            return JsonResponse(self._return_ajax_result(res, timeout=0))
         else:
             if res.ready():
+                self._observe_result('page')
                 if res.successful() and not isinstance(res.info, Exception):
                     return self.success(res.info)
                 else:
@@ -195,6 +236,7 @@ class AsyncAction(AsyncMixin):
         if not isinstance(self.task, app.Task):
             raise TypeError('Method has no task attached')
 
+        self._task_submitted = time.time()
         try:
             res = self.task.apply_async(args=args, kwargs=kwargs)
         except ConnectionError:
@@ -207,6 +249,7 @@ class AsyncAction(AsyncMixin):
             return JsonResponse(data)
         else:
             if res.ready():
+                self._observe_result('direct')
                 if res.successful() and not isinstance(res.info, Exception):
                     return self.success(res.info)
                 else:
@@ -369,6 +412,7 @@ class AsyncFormView(AsyncMixin, FormView):
         if hasattr(self.request, 'session'):
             kwargs['session_key'] = self.request.session.session_key
 
+        self._task_submitted = time.time()
         try:
             res = type(self).async_execute.apply_async(kwargs=kwargs)
         except ConnectionError:
@@ -381,6 +425,7 @@ class AsyncFormView(AsyncMixin, FormView):
             return JsonResponse(data)
         else:
             if res.ready():
+                self._observe_result('direct')
                 if res.successful() and not isinstance(res.info, Exception):
                     return self.success(res.info)
                 else:
@@ -472,6 +517,7 @@ class AsyncPostView(AsyncMixin, View):
         if hasattr(self.request, 'session'):
             kwargs['session_key'] = self.request.session.session_key
 
+        self._task_submitted = time.time()
         try:
             res = type(self).async_execute.apply_async(kwargs=kwargs)
         except ConnectionError:
@@ -484,6 +530,7 @@ class AsyncPostView(AsyncMixin, View):
             return JsonResponse(data)
         else:
             if res.ready():
+                self._observe_result('direct')
                 if res.successful() and not isinstance(res.info, Exception):
                     return self.success(res.info)
                 else:
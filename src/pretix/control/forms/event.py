@@ -572,6 +572,10 @@ class EventSettingsForm(EventSettingsValidationMixin, FormPlaceholderMixin, Sett
         'hide_sold_out',
         'meta_noindex',
         'redirect_to_checkout_directly',
+        'waiting_room_active',
+        'waiting_room_rate',
+        'waiting_room_adaptive',
+        'waiting_room_admission_minutes',
         'frontpage_subevent_ordering',
         'low_availability_percentage',
         'event_list_type',
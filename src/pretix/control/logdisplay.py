@@ -55,8 +55,8 @@ from pretix.base.logentrytypes import (
     WaitingListEntryLogEntryType, log_entry_types,
 )
 from pretix.base.models import (
-    Checkin, CheckinList, Event, ItemVariation, LogEntry, OrderPosition,
-    TaxRule,
+    Checkin, CheckinList, Event, Item, ItemVariation, LogEntry, OrderPosition,
+    SubEvent, TaxRule,
 )
 from pretix.base.models.orders import PrintLog
 from pretix.base.signals import (
@@ -71,6 +71,19 @@ OVERVIEW_BANLIST = [
 
 class OrderChangeLogEntryType(OrderLogEntryType):
     prefix = _('The order has been changed:')
+    related_objects = {
+        'item': (Item, 'event_id'),
+        'old_item': (Item, 'event_id'),
+        'new_item': (Item, 'event_id'),
+        'variation': (ItemVariation, 'item__event_id'),
+        'old_variation': (ItemVariation, 'item__event_id'),
+        'new_variation': (ItemVariation, 'item__event_id'),
+        'old_subevent': (SubEvent, 'event_id'),
+        'new_subevent': (SubEvent, 'event_id'),
+        'old_taxrule': (TaxRule, 'event_id'),
+        'new_taxrule': (TaxRule, 'event_id'),
+        'addon_to': (OrderPosition, 'order__event_id'),
+    }
 
     def display(self, logentry, data):
         return format_html('{} {}', self.prefix, self.display_prefixed(logentry.event, logentry, data))
@@ -91,12 +104,12 @@ class OrderItemChanged(OrderChangeLogEntryType):
     action_type = 'pretix.event.order.changed.item'
 
     def display_prefixed(self, event: Event, logentry: LogEntry, data):
-        old_item = str(event.items.get(pk=data['old_item']))
+        old_item = str(self.related_object(logentry, Item, data['old_item'], event.items))
         if data['old_variation']:
-            old_item += ' - ' + str(ItemVariation.objects.get(item__event=event, pk=data['old_variation']))
-        new_item = str(event.items.get(pk=data['new_item']))
+            old_item += ' - ' + str(self.related_object(logentry, ItemVariation, data['old_variation'], ItemVariation.objects.filter(item__event=event)))
+        new_item = str(self.related_object(logentry, Item, data['new_item'], event.items))
         if data['new_variation']:
-            new_item += ' - ' + str(ItemVariation.objects.get(item__event=event, pk=data['new_variation']))
+            new_item += ' - ' + str(self.related_object(logentry, ItemVariation, data['new_variation'], ItemVariation.objects.filter(item__event=event)))
         return _('Position #{posid}: {old_item} ({old_price}) changed to {new_item} ({new_price}).').format(
             posid=data.get('positionid', '?'),
             old_item=old_item, new_item=new_item,
@@ -122,8 +135,8 @@ class OrderSubeventChanged(OrderChangeLogEntryType):
     action_type = 'pretix.event.order.changed.subevent'
 
     def display_prefixed(self, event: Event, logentry: LogEntry, data):
-        old_se = str(event.subevents.get(pk=data['old_subevent']))
-        new_se = str(event.subevents.get(pk=data['new_subevent']))
+        old_se = str(self.related_object(logentry, SubEvent, data['old_subevent'], event.subevents))
+        new_se = str(self.related_object(logentry, SubEvent, data['new_subevent'], event.subevents))
         return _('Position #{posid}: Event date "{old_event}" ({old_price}) changed '
                  'to "{new_event}" ({new_price}).').format(
             posid=data.get('positionid', '?'),
@@ -153,14 +166,14 @@ class OrderTaxRuleChanged(OrderChangeLogEntryType):
         if 'positionid' in data:
             return _('Tax rule of position #{posid} changed from {old_rule} to {new_rule}.').format(
                 posid=data.get('positionid', '?'),
-                old_rule=TaxRule.objects.get(pk=data['old_taxrule']) if data['old_taxrule'] else '–',
-                new_rule=TaxRule.objects.get(pk=data['new_taxrule']),
+                old_rule=self.related_object(logentry, TaxRule, data['old_taxrule'], TaxRule.objects) if data['old_taxrule'] else '–',
+                new_rule=self.related_object(logentry, TaxRule, data['new_taxrule'], TaxRule.objects),
             )
         elif 'fee' in data:
             return _('Tax rule of fee #{fee} changed from {old_rule} to {new_rule}.').format(
                 fee=data.get('fee', '?'),
-                old_rule=TaxRule.objects.get(pk=data['old_taxrule']) if data['old_taxrule'] else '–',
-                new_rule=TaxRule.objects.get(pk=data['new_taxrule']),
+                old_rule=self.related_object(logentry, TaxRule, data['old_taxrule'], TaxRule.objects) if data['old_taxrule'] else '–',
+                new_rule=self.related_object(logentry, TaxRule, data['new_taxrule'], TaxRule.objects),
             )
 
 
@@ -196,9 +209,9 @@ class OrderCanceled(OrderChangeLogEntryType):
     action_type = 'pretix.event.order.changed.cancel'
 
     def display_prefixed(self, event: Event, logentry: LogEntry, data):
-        old_item = str(event.items.get(pk=data['old_item']))
+        old_item = str(self.related_object(logentry, Item, data['old_item'], event.items))
         if data['old_variation']:
-            old_item += ' - ' + str(ItemVariation.objects.get(pk=data['old_variation']))
+            old_item += ' - ' + str(self.related_object(logentry, ItemVariation, data['old_variation'], ItemVariation.objects))
         return _('Position #{posid} ({old_item}, {old_price}) canceled.').format(
             posid=data.get('positionid', '?'),
             old_item=old_item,
@@ -211,11 +224,11 @@ class OrderPositionAdded(OrderChangeLogEntryType):
     action_type = 'pretix.event.order.changed.add'
 
     def display_prefixed(self, event: Event, logentry: LogEntry, data):
-        item = str(event.items.get(pk=data['item']))
+        item = str(self.related_object(logentry, Item, data['item'], event.items))
         if data['variation']:
-            item += ' - ' + str(ItemVariation.objects.get(item__event=event, pk=data['variation']))
+            item += ' - ' + str(self.related_object(logentry, ItemVariation, data['variation'], ItemVariation.objects.filter(item__event=event)))
         if data['addon_to']:
-            addon_to = OrderPosition.objects.get(order__event=event, pk=data['addon_to'])
+            addon_to = self.related_object(logentry, OrderPosition, data['addon_to'], OrderPosition.objects.filter(order__event=event))
             return _('Position #{posid} created: {item} ({price}) as an add-on to position #{addon_to}.').format(
                 posid=data.get('positionid', '?'),
                 item=item, addon_to=addon_to.positionid,
@@ -275,9 +288,9 @@ class OrderChangedSplit(OrderChangeLogEntryType):
     action_type = 'pretix.event.order.changed.split'
 
     def display_prefixed(self, event: Event, logentry: LogEntry, data):
-        old_item = str(event.items.get(pk=data['old_item']))
+        old_item = str(self.related_object(logentry, Item, data['old_item'], event.items))
         if data['old_variation']:
-            old_item += ' - ' + str(ItemVariation.objects.get(pk=data['old_variation']))
+            old_item += ' - ' + str(self.related_object(logentry, ItemVariation, data['old_variation'], ItemVariation.objects))
         url = reverse('control:event.order', kwargs={
             'event': event.slug,
             'organizer': event.organizer.slug,
@@ -333,6 +346,10 @@ class OrderChangedSplitFrom(OrderLogEntryType):
     'pretix.event.checkin.reverted': _('The check-in of position #{posid} on list "{list}" has been reverted.'),
 })
 class CheckinErrorLogEntryType(OrderLogEntryType):
+    related_objects = {
+        'list': (CheckinList, 'event_id'),
+    }
+
     def display(self, logentry: LogEntry, data):
         return self.display_plain(self.plain, logentry, data)
 
@@ -348,7 +365,7 @@ class CheckinErrorLogEntryType(OrderLogEntryType):
 
         if 'list' in data and event:
             try:
-                data['list'] = event.checkin_lists.get(pk=data.get('list')).name
+                data['list'] = self.related_object(logentry, CheckinList, data.get('list'), event.checkin_lists).name
             except CheckinList.DoesNotExist:
                 data['list'] = _("(unknown)")
         else:
@@ -572,7 +589,7 @@ def pretixcontrol_orderposition_blocked_display(sender: Event, orderposition, bl
     'pretix.event.order.email.payment_failed': _('An email has been sent to notify the user that the payment failed.'),
 })
 class CoreOrderLogEntryType(OrderLogEntryType):
-    pass
+    cacheable = True
 
 
 @log_entry_types.new_from_dict({
@@ -586,7 +603,7 @@ class CoreOrderLogEntryType(OrderLogEntryType):
     'pretix.voucher.added.waitinglist': _('The voucher has been assigned to {email} through the waiting list.'),
 })
 class CoreVoucherLogEntryType(VoucherLogEntryType):
-    pass
+    cacheable = True
 
 
 @log_entry_types.new()
@@ -613,7 +630,7 @@ class VoucherRedeemedLogEntryType(VoucherLogEntryType):
     'pretix.event.category.reordered': _('The category has been reordered.'),
 })
 class CoreItemCategoryLogEntryType(ItemCategoryLogEntryType):
-    pass
+    cacheable = True
 
 
 @log_entry_types.new_from_dict({
@@ -622,7 +639,7 @@ class CoreItemCategoryLogEntryType(ItemCategoryLogEntryType):
     'pretix.event.taxrule.changed': _('The tax rule has been changed.'),
 })
 class CoreTaxRuleLogEntryType(TaxRuleLogEntryType):
-    pass
+    cacheable = True
 
 
 class TeamMembershipLogEntryType(LogEntryType):
@@ -637,7 +654,7 @@ class TeamMembershipLogEntryType(LogEntryType):
     'pretix.team.invite.resent': _('Invite for {user} has been resent.'),
 })
 class CoreTeamMembershipLogEntryType(TeamMembershipLogEntryType):
-    pass
+    cacheable = True
 
 
 @log_entry_types.new()
@@ -673,7 +690,7 @@ class UserSettingsChangedLogEntryType(LogEntryType):
     'pretix.user.email.confirmed': _('Your email address {email} has been confirmed.'),
 })
 class UserEmailChangedLogEntryType(LogEntryType):
-    pass
+    cacheable = True
 
 
 class UserImpersonatedLogEntryType(LogEntryType):
@@ -686,7 +703,7 @@ class UserImpersonatedLogEntryType(LogEntryType):
     'pretix.control.auth.user.impersonate_stopped': _('You stopped impersonating {}.'),
 })
 class CoreUserImpersonatedLogEntryType(UserImpersonatedLogEntryType):
-    pass
+    cacheable = True
 
 
 @log_entry_types.new_from_dict({
@@ -798,7 +815,7 @@ class CoreUserImpersonatedLogEntryType(UserImpersonatedLogEntryType):
     'pretix.event.checkin.reset': _('The check-in and print log state has been reset.')
 })
 class CoreLogEntryType(LogEntryType):
-    pass
+    cacheable = True
 
 
 @log_entry_types.new_from_dict({
@@ -806,6 +823,7 @@ class CoreLogEntryType(LogEntryType):
     'pretix.organizer.plugins.disabled': _('The plugin has been disabled.'),
 })
 class OrganizerPluginStateLogEntryType(LogEntryType):
+    cacheable = True
     object_link_wrapper = _('Plugin {val}')
 
     def get_object_link_info(self, logentry) -> Optional[dict]:
@@ -844,7 +862,7 @@ class OrganizerPluginStateLogEntryType(LogEntryType):
     'pretix.event.permissions.deleted': _('A user has been removed from the event team.'),
 })
 class CoreEventLogEntryType(EventLogEntryType):
-    pass
+    cacheable = True
 
 
 @log_entry_types.new_from_dict({
@@ -854,6 +872,7 @@ class CoreEventLogEntryType(EventLogEntryType):
     'pretix.event.checkinlist.changed': _('The check-in list has been changed.'),
 })
 class CheckinlistLogEntryType(EventLogEntryType):
+    cacheable = True
     object_link_wrapper = _('Check-in list {val}')
     object_link_viewname = 'control:event.orders.checkinlists.edit'
     object_link_argname = 'list'
@@ -865,6 +884,7 @@ class CheckinlistLogEntryType(EventLogEntryType):
     'pretix.event.plugins.disabled': _('The plugin has been disabled.'),
 })
 class EventPluginStateLogEntryType(EventLogEntryType):
+    cacheable = True
     object_link_wrapper = _('Plugin {val}')
 
     def get_object_link_info(self, logentry) -> Optional[dict]:
@@ -896,7 +916,7 @@ class EventPluginStateLogEntryType(EventLogEntryType):
     'pretix.event.item.program_times.removed': _('A program time has been removed from this product.'),
 })
 class CoreItemLogEntryType(ItemLogEntryType):
-    pass
+    cacheable = True
 
 
 @log_entry_types.new_from_dict({
@@ -934,7 +954,7 @@ class VariationLogEntryType(ItemLogEntryType):
     'pretix.event.order.refund.failed': _('Refund {local_id} has failed.'),
 })
 class CoreOrderPaymentLogEntryType(OrderLogEntryType):
-    pass
+    cacheable = True
 
 
 @log_entry_types.new_from_dict({
@@ -945,7 +965,7 @@ class CoreOrderPaymentLogEntryType(OrderLogEntryType):
     'pretix.event.quota.opened': _('The quota has been re-opened.'),
 })
 class CoreQuotaLogEntryType(QuotaLogEntryType):
-    pass
+    cacheable = True
 
 
 @log_entry_types.new_from_dict({
@@ -955,7 +975,7 @@ class CoreQuotaLogEntryType(QuotaLogEntryType):
     'pretix.event.question.reordered': _('The question has been reordered.'),
 })
 class CoreQuestionLogEntryType(QuestionLogEntryType):
-    pass
+    cacheable = True
 
 
 @log_entry_types.new_from_dict({
@@ -964,7 +984,7 @@ class CoreQuestionLogEntryType(QuestionLogEntryType):
     'pretix.event.discount.changed': _('The discount has been changed.'),
 })
 class CoreDiscountLogEntryType(DiscountLogEntryType):
-    pass
+    cacheable = True
 
 
 @log_entry_types.new()
@@ -1004,4 +1024,4 @@ class LegacyCheckinLogEntryType(OrderLogEntryType):
     'pretix.event.orders.waitinglist.added': _('An entry has been added to the waiting list.'),
 })
 class CoreWaitingListEntryLogEntryType(WaitingListEntryLogEntryType):
-    pass
+    cacheable = True
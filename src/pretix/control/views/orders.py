@@ -2542,6 +2542,7 @@ class OrderEmailHistory(EventPermissionRequiredMixin, OrderViewMixin, ListView):
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
+        ctx["logs"] = LogEntry.prepare_display(ctx["logs"])
         for l in ctx["logs"]:
             invoice_ids = l.parsed_data.get("invoices")
             if invoice_ids:
@@ -1287,6 +1287,7 @@ class DeviceLogView(OrganizerDetailViewMixin, OrganizerPermissionRequiredMixin,
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
+        ctx['logs'] = LogEntry.prepare_display(ctx['logs'])
         ctx['device'] = self.device
         return ctx
 
@@ -2595,6 +2596,7 @@ class LogView(OrganizerPermissionRequiredMixin, PaginationMixin, ListView):
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data()
+        ctx['logs'] = LogEntry.prepare_display(ctx['logs'])
         return ctx
 
 
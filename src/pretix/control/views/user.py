@@ -273,6 +273,7 @@ class UserHistoryView(ListView):
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data()
+        ctx['logs'] = LogEntry.prepare_display(ctx['logs'])
 
         class FakeClass:
             def top_logentries(self):
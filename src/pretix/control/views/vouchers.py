@@ -41,7 +41,7 @@ from defusedcsv import csv
 from django.conf import settings
 from django.contrib import messages
 from django.core.exceptions import PermissionDenied, ValidationError
-from django.db import connection, transaction
+from django.db import transaction
 from django.db.models import Exists, OuterRef, Sum
 from django.http import (
     Http404, HttpResponse, HttpResponseBadRequest, HttpResponseRedirect,
@@ -65,7 +65,7 @@ from pretix.base.models import (
 from pretix.base.models.vouchers import generate_codes
 from pretix.base.services.mail import prefix_subject
 from pretix.base.services.placeholders import get_sample_context
-from pretix.base.services.vouchers import vouchers_send
+from pretix.base.services.vouchers import bulk_create_vouchers, vouchers_send
 from pretix.base.templatetags.rich_text import markdown_compile_email
 from pretix.base.views.tasks import AsyncFormView
 from pretix.control.forms.filter import VoucherFilterForm, VoucherTagFilterForm
@@ -450,9 +450,6 @@ class VoucherBulkCreate(EventPermissionRequiredMixin, AsyncFormView):
         return form_kwargs
 
     def async_form_valid(self, task, form):
-        batch_size = 500
-        total_num = 1  # will be set later
-
         def set_progress(percent):
             if not task.request.called_directly:
                 task.update_state(
@@ -460,38 +457,18 @@ class VoucherBulkCreate(EventPermissionRequiredMixin, AsyncFormView):
                     meta={'value': percent}
                 )
 
-        def process_batch(batch_vouchers, voucherids):
-            Voucher.objects.bulk_create(batch_vouchers)
-            if not connection.features.can_return_rows_from_bulk_insert:
-                from_db = list(self.request.event.vouchers.filter(code__in=[v.code for v in batch_vouchers]))
-                batch_vouchers.clear()
-                batch_vouchers += from_db
-
-            log_entries = []
-            for v in batch_vouchers:
-                voucherids.append(v.pk)
-                data = dict(form.cleaned_data)
-                data['code'] = code
-                data['bulk'] = True
-                del data['codes']
-                log_entries.append(
-                    v.log_action('pretix.voucher.added', data={**data, "source": "control_bulk"}, user=self.request.user, save=False)
-                )
-            LogEntry.bulk_create_and_postprocess(log_entries)
-            form.post_bulk_save(batch_vouchers)
-            batch_vouchers.clear()
-            set_progress(len(voucherids) / total_num * (50. if form.cleaned_data['send'] else 100.))
-
-        voucherids = []
         if not form.is_valid():
             raise ValidationError(form.errors)
         total_num = len(form.cleaned_data['codes'])
 
-        batch_vouchers = []
-        for code in form.cleaned_data['codes']:
-            if len(batch_vouchers) >= batch_size:
-                process_batch(batch_vouchers, voucherids)
+        log_data = dict(form.cleaned_data)
+        log_data['bulk'] = True
+        log_data['source'] = 'control_bulk'
+        del log_data['codes']
+        del log_data['seats']
 
+        vouchers = []
+        for code in form.cleaned_data['codes']:
             obj = modelcopy(form.instance, code=None)
             obj.event = self.request.event
             obj.code = code
@@ -500,9 +477,21 @@ class VoucherBulkCreate(EventPermissionRequiredMixin, AsyncFormView):
                 obj.item = obj.seat.product
             except IndexError:
                 pass
-            batch_vouchers.append(obj)
+            vouchers.append(obj)
+
+        voucherids = []
 
-        process_batch(batch_vouchers, voucherids)
+        def chunk_done(chunk):
+            form.post_bulk_save(chunk)
+            voucherids.extend(v.pk for v in chunk)
+            set_progress(len(voucherids) / total_num * (50. if form.cleaned_data['send'] else 100.))
+
+        bulk_create_vouchers(
+            self.request.event, vouchers,
+            log_data=lambda v: {**log_data, 'code': v.code, 'seat': v.seat.seat_guid if v.seat else None},
+            user=self.request.user,
+            chunk_done=chunk_done,
+        )
 
         if form.cleaned_data['send']:
             vouchers_send(
@@ -263,3 +263,84 @@ class Logic():
             return self._operations[operator](*values)
         else:
             raise ValueError("Unrecognized operation %s" % operator)
+
+
+def _compile_list(values):
+    return [compile_logic(v) for v in values]
+
+
+def compile_logic(tests):
+    """
+    Translates json-logic into a tree of Python closures, so the structure of the logic only needs to be analyzed
+    once. The result is a function ``f(logic, data)`` that returns the same result as ``logic.apply(tests, data)``.
+    Custom operations are looked up on the given ``Logic`` instance on every call, so the compiled function can be
+    re-used with different environments.
+    """
+    # Primitives evaluate to themselves
+    if tests is None or not isinstance(tests, dict):
+        return lambda logic, data: tests
+
+    operator = [k for k in tests.keys() if not k.startswith("__")][0]
+    values = tests[operator]
+    if not isinstance(values, list) and not isinstance(values, tuple):
+        values = [values]
+    args = _compile_list(values)
+
+    # Array-level operations
+    if operator == 'none':
+        def f(logic, data):
+            data = data or {}
+            return not any(args[1](logic, i or {}) for i in args[0](logic, data))
+    elif operator == 'all':
+        def f(logic, data):
+            elements = args[0](logic, data or {})
+            if not elements:
+                return False
+            return all(args[1](logic, i or {}) for i in elements)
+    elif operator == 'some':
+        def f(logic, data):
+            return any(args[1](logic, i or {}) for i in args[0](logic, data or {}))
+    elif operator == 'reduce':
+        def f(logic, data):
+            data = data or {}
+            return reduce(
+                lambda acc, el: args[1](logic, {'current': el, 'accumulator': acc}),
+                args[0](logic, data) or [],
+                args[2](logic, data)
+            )
+    elif operator == 'map':
+        def f(logic, data):
+            return [args[1](logic, i or {}) for i in (args[0](logic, data or {}) or [])]
+    elif operator == 'filter':
+        def f(logic, data):
+            return [i for i in args[0](logic, data or {}) if args[1](logic, i or {})]
+
+    # Operations on data
+    elif operator == 'var':
+        def f(logic, data):
+            data = data or {}
+            return get_var(data, *[a(logic, data) for a in args])
+    elif operator == 'missing':
+        def f(logic, data):
+            data = data or {}
+            return missing(data, *[a(logic, data) for a in args])
+    elif operator == 'missing_some':
+        def f(logic, data):
+            data = data or {}
+            return missing_some(data, *[a(logic, data) for a in args])
+
+    elif operator in operations:
+        func = operations[operator]
+
+        def f(logic, data):
+            data = data or {}
+            return func(*[a(logic, data) for a in args])
+    else:
+        def f(logic, data):
+            data = data or {}
+            evaluated = [a(logic, data) for a in args]
+            if operator not in logic._operations:
+                raise ValueError("Unrecognized operation %s" % operator)
+            return logic._operations[operator](*evaluated)
+
+    return f
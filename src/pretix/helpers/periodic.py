@@ -20,25 +20,118 @@
 # <https://www.gnu.org/licenses/>.
 #
 import logging
+import time
 import uuid
 from functools import wraps
 
+from django.conf import settings
 from django.core.cache import cache
+from django.utils.timezone import now
 
 logger = logging.getLogger(__name__)
 
 SKIPPED = object()
 
+HISTORY_LENGTH = 50
+
+# Deletes the key only if it still holds our token, so we never release a lock that expired and has been
+# acquired by someone else in the meantime.
+_RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+else
+    return 0
+end
+"""
+
+
+def acquire_lock(key, timeout):
+    """
+    Tries to acquire a lock for ``timeout`` seconds. Returns a token to pass to ``release_lock``, or ``None`` if
+    the lock is currently held by someone else. Uses an atomic ``SET NX`` in redis if available, otherwise the
+    atomic ``add`` operation of the cache.
+    """
+    token = str(uuid.uuid4())
+    if settings.HAS_REDIS:
+        from django_redis import get_redis_connection
+
+        rc = get_redis_connection("redis")
+        if rc.set(f'pretix_lock_{key}', token, nx=True, ex=int(timeout)):
+            return token
+        return None
+    if cache.add(f'pretix_lock_{key}', token, timeout=timeout):
+        return token
+    return None
+
+
+def release_lock(key, token):
+    if settings.HAS_REDIS:
+        from django_redis import get_redis_connection
+
+        rc = get_redis_connection("redis")
+        rc.eval(_RELEASE_SCRIPT, 1, f'pretix_lock_{key}', token)
+    elif cache.get(f'pretix_lock_{key}') == token:
+        cache.delete(f'pretix_lock_{key}')
+
+
+def record_run(name, started, duration, outcome, message=None):
+    """
+    Stores the outcome of a run of a periodic task in a short history in the cache.
+    """
+    from pretix.base.metrics import (
+        pretix_periodic_task_duration_seconds, pretix_periodic_task_runs_total,
+    )
+
+    pretix_periodic_task_runs_total.inc(1, task_name=name, outcome=outcome)
+    if outcome != 'skipped':
+        pretix_periodic_task_duration_seconds.observe(duration, task_name=name)
+    try:
+        history = cache.get(f'pretix_periodic_history_{name}') or []
+        history.insert(0, {
+            'started': started.isoformat(),
+            'duration': round(duration, 3),
+            'outcome': outcome,
+            'message': message,
+        })
+        cache.set(f'pretix_periodic_history_{name}', history[:HISTORY_LENGTH], timeout=3600 * 24 * 7)
+    except Exception:
+        logger.exception('Could not store history')
+
+
+def get_history(name):
+    return cache.get(f'pretix_periodic_history_{name}') or []
+
+
+def receiver_name(receiver):
+    return f'{receiver.__module__}.{receiver.__name__}'
+
+
+def run_receiver(receiver, signal, sender):
+    """
+    Runs a receiver of the ``periodic_task`` signal and records the outcome in its history. Exceptions are
+    re-raised after recording.
+    """
+    name = receiver_name(receiver)
+    started = now()
+    t0 = time.monotonic()
+    try:
+        r = receiver(signal=signal, sender=sender)
+    except Exception as e:
+        record_run(name, started, time.monotonic() - t0, 'error', str(e))
+        raise
+    record_run(name, started, time.monotonic() - t0, 'skipped' if r is SKIPPED else 'success')
+    return r
+
 
 def minimum_interval(minutes_after_success, minutes_after_error=0, minutes_running_timeout=30):
     """
     This is intended to be used as a decorator on receivers of the ``periodic_task`` signal.
     It stores the result in the task in the cache (usually redis) to ensure the receiver function
     isn't executed less than ``minutes_after_success`` after the last successful run and no less
-    than ``minutes_after_error`` after the last failed run. There's also a simple locking mechanism
-    implemented making sure the function is not called a second time while it is running, unless
-    ``minutes_running_timeout`` have passed. This locking mechanism is naive and not safe of
-    race-conditions, it should not be relied upon.
+    than ``minutes_after_error`` after the last failed run. A lock acquired atomically through
+    ``acquire_lock`` makes sure the function is not called a second time while it is running, unless
+    ``minutes_running_timeout`` have passed. The running timeout is also used as a time limit when
+    the receiver is dispatched as a separate task by ``runperiodic --dispatch``.
     """
     def deco(f):
         @wraps(f)
@@ -46,18 +139,16 @@ def minimum_interval(minutes_after_success, minutes_after_error=0, minutes_runni
             key_running = f'pretix_periodic_{f.__module__}.{f.__name__}_running'
             key_result = f'pretix_periodic_{f.__module__}.{f.__name__}_result'
 
-            running_val = cache.get(key_running)
-            if running_val:
-                # Currently running
-                return SKIPPED
-
             result_val = cache.get(key_result)
             if result_val:
                 # Has run recently
                 return SKIPPED
 
-            uniqid = str(uuid.uuid4())
-            cache.set(key_running, uniqid, timeout=minutes_running_timeout * 60)
+            uniqid = acquire_lock(key_running, minutes_running_timeout * 60)
+            if not uniqid:
+                # Currently running
+                return SKIPPED
+
             try:
                 retval = f(*args, **kwargs)
             except Exception as e:
@@ -74,11 +165,11 @@ def minimum_interval(minutes_after_success, minutes_after_error=0, minutes_runni
                 return retval
             finally:
                 try:
-                    if cache.get(key_running) == uniqid:
-                        cache.delete(key_running)
+                    release_lock(key_running, uniqid)
                 except:
                     logger.exception('Could not release lock')
 
+        wrapper.periodic_timeout = minutes_running_timeout * 60
         return wrapper
 
     return deco
@@ -33,12 +33,16 @@
 # License for the specific language governing permissions and limitations under the License.
 
 import cProfile
+import hmac
 import os
 import random
 import time
 
 from django.conf import settings
 
+from pretix.base.metrics import pretix_view_db_queries, pretix_view_db_seconds
+from pretix.helpers.profile.queries import QueryProfile
+
 
 class CProfileMiddleware(object):
     banlist = (
@@ -70,3 +74,44 @@ class CProfileMiddleware(object):
             return response
         else:
             return self.get_response(request)
+
+
+class QueryProfileMiddleware:
+    """
+    Records the database queries and cache lookups of a sample of requests, as well as of all requests that send
+    the configured secret in the ``X-Pretix-Profile-Queries`` header.
+    """
+    banlist = (
+        '/healthcheck/',
+        '/jsi18n/',
+        '/metrics',
+    )
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def _requested(self, request):
+        secret = request.headers.get('X-Pretix-Profile-Queries')
+        return bool(secret and settings.QUERY_PROFILING_SECRET and hmac.compare_digest(
+            secret.encode(), settings.QUERY_PROFILING_SECRET.encode()
+        ))
+
+    def __call__(self, request):
+        for b in self.banlist:
+            if b in request.path:
+                return self.get_response(request)
+
+        if not QueryProfile.sampled() and not self._requested(request):
+            return self.get_response(request)
+
+        with QueryProfile('view') as profile:
+            response = self.get_response(request)
+
+        url = getattr(request, 'resolver_match', None)
+        if url and url.url_name:
+            profile.name = url.namespace + ':' + url.url_name
+            if settings.METRICS_ENABLED:
+                pretix_view_db_queries.observe(profile.queries, url_name=profile.name)
+                pretix_view_db_seconds.observe(profile.db_time, url_name=profile.name)
+        profile.write_report(path=request.path, method=request.method, status_code=response.status_code)
+        return response
@@ -0,0 +1,170 @@
+#
+# This file is part of pretix (Community Edition).
+#
+# Copyright (C) 2014-2020  Raphael Michel and contributors
+# Copyright (C) 2020-today pretix GmbH and contributors
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU Affero General
+# Public License as published by the Free Software Foundation in version 3 of the License.
+#
+# ADDITIONAL TERMS APPLY: Pursuant to Section 7 of the GNU Affero General Public License, additional terms are
+# applicable granting you additional permissions and placing additional restrictions on your usage of this software.
+# Please refer to the pretix LICENSE file to obtain the full terms applicable to this work. If you did not receive
+# this file, see <https://pretix.eu/about/en/license>.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License along with this program.  If not, see
+# <https://www.gnu.org/licenses/>.
+#
+
+"""
+Opt-in instrumentation that records the database queries and cache lookups of a single request or task.
+"""
+import json
+import os
+import random
+import re
+import socket
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+_MISSING = object()
+_whitespace_re = re.compile(r'\s+')
+_literal_re = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_list_re = re.compile(r'\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)')
+
+
+def fingerprint(sql):
+    """
+    Normalizes a SQL statement such that queries only differing in their parameters look the same.
+    """
+    sql = _whitespace_re.sub(' ', sql).strip()
+    sql = _literal_re.sub('?', sql)
+    return _list_re.sub('(...)', sql)
+
+
+class QueryProfile:
+    """
+    Context manager recording all database queries as well as cache hits and misses in the current thread.
+    Database connections and caches are thread-local in Django, so the profile does not see other threads.
+    """
+
+    def __init__(self, kind, name=None):
+        self.kind = kind
+        self.name = name
+        self.queries = 0
+        self.db_time = 0.0
+        self.duration = 0.0
+        self.fingerprints = defaultdict(lambda: [0, 0.0])
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._stack = None
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for conn in connections.all():
+            self._stack.enter_context(conn.execute_wrapper(self._execute))
+        for cache in caches.all():
+            self._patch_cache(cache)
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.duration = time.perf_counter() - self._t0
+        self._stack.close()
+
+    def _execute(self, execute, sql, params, many, context):
+        t0 = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - t0
+            self.queries += 1
+            self.db_time += duration
+            fp = self.fingerprints[fingerprint(sql)]
+            fp[0] += 1
+            fp[1] += duration
+
+    def _patch_cache(self, cache):
+        orig_get = cache.get
+        orig_get_many = cache.get_many
+
+        nested = []
+
+        def get(key, default=None, version=None):
+            value = orig_get(key, _MISSING, version=version)
+            if nested:
+                # Called by the default implementation of get_many, which counts for itself
+                pass
+            elif value is _MISSING:
+                self.cache_misses += 1
+            else:
+                self.cache_hits += 1
+            return default if value is _MISSING else value
+
+        def get_many(keys, version=None):
+            keys = list(keys)
+            nested.append(True)
+            try:
+                values = orig_get_many(keys, version=version)
+            finally:
+                nested.pop()
+            self.cache_hits += len(values)
+            self.cache_misses += len(keys) - len(values)
+            return values
+
+        # Shadow the methods on this (thread-local) instance only and drop them again at the end
+        cache.get = get
+        cache.get_many = get_many
+        self._stack.callback(cache.__dict__.pop, 'get', None)
+        self._stack.callback(cache.__dict__.pop, 'get_many', None)
+
+    @property
+    def duplicates(self):
+        """
+        Statements that have been executed more than once, which often hints at a N+1 query pattern.
+        """
+        return sorted(
+            (
+                {'fingerprint': sql, 'count': count, 'time': round(t, 6)}
+                for sql, (count, t) in self.fingerprints.items() if count > 1
+            ),
+            key=lambda d: -d['count']
+        )
+
+    def report(self, **kwargs):
+        return {
+            'time': time.time(),
+            'kind': self.kind,
+            'name': self.name,
+            'duration': round(self.duration, 6),
+            'queries': self.queries,
+            'db_time': round(self.db_time, 6),
+            'duplicates': self.duplicates,
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            **kwargs
+        }
+
+    @classmethod
+    def sampled(cls):
+        return settings.QUERY_PROFILING_RATE > 0 and random.random() < settings.QUERY_PROFILING_RATE / 100
+
+    def write_report(self, **kwargs):
+        """
+        Appends the report as one line of JSON to a file in ``PROFILE_DIR``. Every process writes to its own
+        file, the files of all workers can be concatenated for analysis.
+        """
+        filename = os.path.join(settings.PROFILE_DIR, 'queries_{host}_{pid}.jsonl'.format(
+            host=socket.gethostname(), pid=os.getpid()
+        ))
+        with open(filename, 'a') as f:
+            f.write(json.dumps(self.report(**kwargs)) + '\n')
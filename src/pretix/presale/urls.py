@@ -47,6 +47,7 @@ import pretix.presale.views.robots
 import pretix.presale.views.theme
 import pretix.presale.views.user
 import pretix.presale.views.waiting
+import pretix.presale.views.waitingroom
 import pretix.presale.views.widget
 
 # This is not a valid Django URL configuration, as the final
@@ -70,6 +71,7 @@ frame_wrapped_urls = [
     re_path(r'^(?P<subevent>[0-9]+)/seatingframe/$', pretix.presale.views.event.SeatingPlanView.as_view(),
             name='event.seatingplan'),
     re_path(r'^(?P<subevent>[0-9]+)/$', pretix.presale.views.event.EventIndex.as_view(), name='event.index'),
+    re_path(r'^waitingroom/$', pretix.presale.views.waitingroom.WaitingRoomView.as_view(), name='event.waitingroom'),
     re_path(r'^waitinglist/remove$', pretix.presale.views.waiting.WaitingRemoveView.as_view(), name='event.waitinglist.remove'),
     re_path(r'^waitinglist', pretix.presale.views.waiting.WaitingView.as_view(), name='event.waitinglist'),
     re_path(r'^$', pretix.presale.views.event.EventIndex.as_view(), name='event.index'),
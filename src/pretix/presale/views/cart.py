@@ -64,6 +64,9 @@ from pretix.base.services.cart import (
     CartError, add_items_to_cart, apply_voucher, clear_cart, error_messages,
     extend_cart_reservation, remove_cart_position,
 )
+from pretix.base.services.waitingroom import (
+    WaitingRoom, is_admitted, waiting_room_enabled,
+)
 from pretix.base.timemachine import time_machine_now
 from pretix.base.views.tasks import AsyncAction
 from pretix.helpers.http import redirect_to_url
@@ -76,6 +79,7 @@ from pretix.presale.views.event import (
     get_grouped_items, item_group_by_category,
 )
 from pretix.presale.views.robots import NoSearchIndexViewMixin
+from pretix.presale.views.waitingroom import waiting_room_url
 
 try:
     widget_data_cache = caches['redis']
@@ -628,6 +632,20 @@ class CartAdd(EventViewMixin, CartActionMixin, AsyncAction, View):
             widget_data = cs.get('widget_data', {})
 
         items = _items_from_post_data(self.request)
+        if items and waiting_room_enabled(request.event):
+            for subevent_id in sorted({i.get('subevent') or 0 for i in items}):
+                if not is_admitted(request, WaitingRoom(request.event, subevent_id or None)):
+                    url = waiting_room_url(request, subevent_id, next_url=self.get_error_url())
+                    msg = _('Due to high demand, you need to wait for your turn before you can add products to '
+                            'your cart.')
+                    if 'ajax' in self.request.GET or 'ajax' in self.request.POST:
+                        # Not marked as failed, so the widget opens the waiting room instead of showing an error
+                        return JsonResponse({
+                            'redirect': url,
+                            'message': str(msg)
+                        })
+                    messages.info(request, msg)
+                    return redirect_to_url(url)
         if items:
             return self.do(self.request.event.id, items, cart_id, translation.get_language(),
                            self.invoice_address.pk, widget_data, self.request.sales_channel.identifier,
@@ -28,6 +28,9 @@ from django.utils.translation import gettext_lazy as _
 from django.views.generic import View
 
 from pretix.base.services.cart import CartError
+from pretix.base.services.waitingroom import (
+    has_any_admission, waiting_room_enabled,
+)
 from pretix.base.signals import validate_cart
 from pretix.helpers.http import redirect_to_url
 from pretix.multidomain.urlreverse import eventreverse
@@ -36,6 +39,7 @@ from pretix.presale.views import (
     allow_frame_if_namespaced, cart_exists, get_cart,
     iframe_entry_view_wrapper,
 )
+from pretix.presale.views.waitingroom import waiting_room_url
 
 
 @method_decorator(allow_frame_if_namespaced, 'dispatch')
@@ -59,6 +63,18 @@ class CheckoutView(View):
             messages.error(request, _("The booking period for this event is over or has not yet started."))
             return self.redirect(self.get_index_url(self.request))
 
+        if (waiting_room_enabled(request.event) and "async_id" not in request.GET
+                and not has_any_admission(request, request.event)):
+            cart = get_cart(request)
+            messages.info(request, _("Due to high demand, you need to wait for your turn before you can continue "
+                                     "with your order."))
+            return self.redirect(waiting_room_url(
+                request, cart[0].subevent_id if cart else None,
+                next_url=eventreverse(request.event, 'presale:event.checkout.start', kwargs={
+                    k: v for k, v in self.kwargs.items() if k == 'cart_namespace'
+                })
+            ))
+
         cart_error = None
         try:
             validate_cart.send(sender=self.request.event, positions=get_cart(request))
@@ -0,0 +1,99 @@
+#
+# This file is part of pretix (Community Edition).
+#
+# Copyright (C) 2014-2020  Raphael Michel and contributors
+# Copyright (C) 2020-today pretix GmbH and contributors
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU Affero General
+# Public License as published by the Free Software Foundation in version 3 of the License.
+#
+# ADDITIONAL TERMS APPLY: Pursuant to Section 7 of the GNU Affero General Public License, additional terms are
+# applicable granting you additional permissions and placing additional restrictions on your usage of this software.
+# Please refer to the pretix LICENSE file to obtain the full terms applicable to this work. If you did not receive
+# this file, see <https://pretix.eu/about/en/license>.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License along with this program.  If not, see
+# <https://www.gnu.org/licenses/>.
+#
+
+import math
+from urllib.parse import urlencode
+
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.views.generic import TemplateView
+
+from pretix.base.models import SubEvent
+from pretix.base.services.waitingroom import (
+    WaitingRoom, get_ticket, is_admitted, waiting_room_enabled,
+)
+from pretix.helpers.http import redirect_to_url
+from pretix.multidomain.urlreverse import eventreverse
+from pretix.presale.views import (
+    EventViewMixin, allow_frame_if_namespaced, iframe_entry_view_wrapper,
+)
+
+
+def waiting_room_url(request, subevent_id=None, next_url=None):
+    kwargs = {}
+    if request.resolver_match and 'cart_namespace' in request.resolver_match.kwargs:
+        kwargs['cart_namespace'] = request.resolver_match.kwargs['cart_namespace']
+    query = {}
+    if subevent_id:
+        query['subevent'] = subevent_id
+    if next_url:
+        query['next'] = next_url
+    u = eventreverse(request.event, 'presale:event.waitingroom', kwargs=kwargs)
+    if query:
+        u += '?' + urlencode(query)
+    return u
+
+
+@method_decorator(allow_frame_if_namespaced, 'dispatch')
+@method_decorator(iframe_entry_view_wrapper, 'dispatch')
+class WaitingRoomView(EventViewMixin, TemplateView):
+    template_name = 'pretixpresale/event/waitingroom.html'
+
+    def get_next_url(self):
+        if "next" in self.request.GET and url_has_allowed_host_and_scheme(self.request.GET.get("next"), allowed_hosts=None):
+            return self.request.GET.get('next')
+        kwargs = {}
+        if 'cart_namespace' in self.kwargs:
+            kwargs['cart_namespace'] = self.kwargs['cart_namespace']
+        if self.subevent:
+            kwargs['subevent'] = self.subevent.pk
+        return eventreverse(self.request.event, 'presale:event.index', kwargs=kwargs)
+
+    def dispatch(self, request, *args, **kwargs):
+        self.subevent = None
+        if request.event.has_subevents and 'subevent' in request.GET:
+            try:
+                self.subevent = get_object_or_404(SubEvent, event=request.event, pk=request.GET['subevent'],
+                                                  active=True)
+            except ValueError:
+                raise Http404()
+
+        if not waiting_room_enabled(request.event):
+            return redirect_to_url(self.get_next_url())
+
+        self.room = WaitingRoom(request.event, self.subevent)
+        self.number = get_ticket(request, self.room, create=True)
+        if is_admitted(request, self.room):
+            return redirect_to_url(self.get_next_url())
+        return super().dispatch(request, *args, **kwargs)
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        wait = self.room.estimated_wait(self.number)
+        ctx['subevent'] = self.subevent
+        ctx['position'] = max(1, self.number - self.room.admitted_up_to())
+        ctx['wait_minutes'] = max(1, math.ceil(wait.total_seconds() / 60))
+        # Poll often when the visitor is about to be let in, rarely while the queue is long
+        ctx['refresh'] = min(30, max(5, int(wait.total_seconds() / 4)))
+        return ctx
@@ -223,6 +223,8 @@ PRETIX_PLUGINS_EXCLUDE = config.get('pretix', 'plugins_exclude', fallback='').sp
 PRETIX_PLUGINS_SHOW_META = config.getboolean('pretix', 'plugins_show_meta', fallback=True)
 
 FETCH_ECB_RATES = config.getboolean('pretix', 'ecb_rates', fallback=True)
+DATASYNC_WORKERS = config.getint('pretix', 'datasync_workers', fallback=1)
+PERIODIC_TASK_CONCURRENCY = config.getint('pretix', 'periodic_task_concurrency', fallback=4)
 
 DEFAULT_CURRENCY = config.get('pretix', 'currency', fallback='EUR')
 
@@ -252,6 +254,12 @@ ADMINS = [('Admin', n) for n in config.get('mail', 'admins', fallback='').split(
 METRICS_ENABLED = config.getboolean('metrics', 'enabled', fallback=False)
 METRICS_USER = config.get('metrics', 'user', fallback="metrics")
 METRICS_PASSPHRASE = config.get('metrics', 'passphrase', fallback="")
+# Metrics are collected in every process and written to redis in batches, after this number of updates or
+# this number of seconds, whatever comes first
+METRICS_FLUSH_THRESHOLD = config.getint('metrics', 'flush_threshold', fallback=500)
+METRICS_FLUSH_INTERVAL = config.getfloat('metrics', 'flush_interval', fallback=5)
+# Counting all model instances is expensive on large databases, so it is done in the background every few minutes
+METRICS_MODEL_COUNT_INTERVAL = config.getint('metrics', 'model_count_interval', fallback=15)
 
 CACHES = {
     'default': {
@@ -333,6 +341,12 @@ if HAS_REDIS:
         SESSION_ENGINE = "django.contrib.sessions.backends.cache"
         SESSION_CACHE_ALIAS = "redis_sessions"
 
+# Carts may take units from a copy of the quota headroom in redis instead of locking the quota, as long as more
+# than this number of units is left. Since quota used outside of carts is only noticed after the copy expires or
+# is refreshed, the margin needs to be larger than the number of units that can be sold in that time. 0 disables it.
+QUOTA_TOKENS_MARGIN = config.getint('redis', 'quota_tokens_margin', fallback=0) if HAS_REDIS else 0
+QUOTA_TOKENS_TTL = config.getint('redis', 'quota_tokens_ttl', fallback=60)
+
 if not SESSION_ENGINE:
     if REAL_CACHE_USED:
         SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
@@ -518,6 +532,13 @@ if METRICS_ENABLED:
                       'pretix.helpers.metrics.middleware.MetricsMiddleware')
 
 
+QUERY_PROFILING_RATE = config.getfloat('django', 'profile_queries', fallback=0)  # Percentage of requests and tasks to profile
+QUERY_PROFILING_SECRET = config.get('django', 'profile_queries_secret', fallback='')  # Also profile requests sending this value in X-Pretix-Profile-Queries
+if QUERY_PROFILING_RATE > 0 or QUERY_PROFILING_SECRET:
+    if not os.path.exists(PROFILE_DIR):
+        os.mkdir(PROFILE_DIR)
+    MIDDLEWARE.insert(0, 'pretix.helpers.profile.middleware.QueryProfileMiddleware')
+
 PROFILING_RATE = config.getfloat('django', 'profile', fallback=0)  # Percentage of requests to profile
 if PROFILING_RATE > 0:
     if not os.path.exists(PROFILE_DIR):
@@ -733,17 +754,22 @@ CELERY_TASK_QUEUES = (
     Queue('mail', routing_key='mail.#'),
     Queue('background', routing_key='background.#'),
     Queue('notifications', routing_key='notifications.#'),
+    Queue('tickets', routing_key='tickets.#'),
 )
 CELERY_TASK_ROUTES = ([
     ('pretix.base.services.cart.*', {'queue': 'checkout'}),
     ('pretix.base.services.export.scheduled_organizer_export', {'queue': 'background'}),
     ('pretix.base.services.export.scheduled_event_export', {'queue': 'background'}),
+    ('pretix.base.services.orders.expire_orders_for_event', {'queue': 'background'}),
+    ('pretix.base.services.orders.send_expiry_warnings_for_event', {'queue': 'background'}),
     ('pretix.base.services.orders.*', {'queue': 'checkout'}),
     ('pretix.base.services.mail.*', {'queue': 'mail'}),
     ('pretix.base.services.update_check.*', {'queue': 'background'}),
     ('pretix.base.services.quotas.*', {'queue': 'background'}),
+    ('pretix.base.services.periodic.*', {'queue': 'background'}),
     ('pretix.base.services.waitinglist.*', {'queue': 'background'}),
     ('pretix.base.services.notifications.*', {'queue': 'notifications'}),
+    ('pretix.base.services.tickets.prerender_tickets', {'queue': 'tickets'}),
     ('pretix.api.webhooks.*', {'queue': 'notifications'}),
     ('pretix.presale.style.*', {'queue': 'background'}),
     ('pretix.plugins.banktransfer.*', {'queue': 'background'}),
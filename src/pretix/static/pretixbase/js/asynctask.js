@@ -71,7 +71,8 @@ function async_task_check_callback(data, textStatus, jqXHR) {
     if (typeof data.steps === "object" && Array.isArray(data.steps)) {
         waitingDialog.setSteps(data.steps);
     }
-    async_task_schedule_check(this, 250);
+    // The server tells us how long to wait, so that we back off while a task takes longer
+    async_task_schedule_check(this, data.retry_after || 250);
 
     async_task_update_status(data);
 }
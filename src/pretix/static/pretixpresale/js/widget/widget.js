@@ -758,7 +758,7 @@ var shared_methods = {
             if (data.check_url) {
                 this.async_task_check_url = this.$root.target_url.replace(/^([^\/]+:\/\/[^\/]+)\/.*$/, "$1") + data.check_url;
             }
-            this.async_task_timeout = window.setTimeout(this.buy_check, this.async_task_interval);
+            this.async_task_timeout = window.setTimeout(this.buy_check, data.retry_after || this.async_task_interval);
             this.async_task_interval = 250;
         }
     },
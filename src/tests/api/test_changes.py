@@ -0,0 +1,152 @@
+#
+# This file is part of pretix (Community Edition).
+#
+# Copyright (C) 2014-2020  Raphael Michel and contributors
+# Copyright (C) 2020-today pretix GmbH and contributors
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU Affero General
+# Public License as published by the Free Software Foundation in version 3 of the License.
+#
+# ADDITIONAL TERMS APPLY: Pursuant to Section 7 of the GNU Affero General Public License, additional terms are
+# applicable granting you additional permissions and placing additional restrictions on your usage of this software.
+# Please refer to the pretix LICENSE file to obtain the full terms applicable to this work. If you did not receive
+# this file, see <https://pretix.eu/about/en/license>.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License along with this program.  If not, see
+# <https://www.gnu.org/licenses/>.
+#
+
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from django.utils.timezone import now
+from django_scopes import scopes_disabled
+
+from pretix.base.models import Order, OrderPosition
+from pretix.base.models.changefeed import EventChange
+from pretix.base.services import changefeed
+from pretix.base.settings import GlobalSettingsObject
+
+
+@pytest.fixture(autouse=True)
+def no_horizon(monkeypatch):
+    monkeypatch.setattr(changefeed, 'CHANGE_FEED_HORIZON', timedelta(seconds=0))
+
+
+def _create_order(event, item):
+    o = Order.objects.create(
+        code='FOO', event=event, email='dummy@dummy.test', status=Order.STATUS_PENDING, total=23,
+        datetime=now(), expires=now() + timedelta(days=10),
+        sales_channel=event.organizer.sales_channels.get(identifier="web"),
+    )
+    op = OrderPosition.objects.create(order=o, item=item, price=Decimal('23.00'), positionid=1)
+    return o, op
+
+
+def _url(organizer, event, since=None, **params):
+    url = '/api/v1/organizers/{}/events/{}/changes/'.format(organizer.slug, event.slug)
+    if since is not None:
+        params['since'] = since
+    if params:
+        url += '?' + '&'.join('{}={}'.format(k, v) for k, v in params.items())
+    return url
+
+
+@pytest.mark.django_db
+def test_cursor_and_changes(token_client, organizer, event, item, django_capture_on_commit_callbacks):
+    resp = token_client.get(_url(organizer, event))
+    assert resp.status_code == 200
+    assert resp.data['reset']
+    assert resp.data['changes'] == []
+    cursor = resp.data['cursor']
+
+    with scopes_disabled(), django_capture_on_commit_callbacks(execute=True):
+        o, op = _create_order(event, item)
+        checkin = op.checkins.create(list=event.checkin_lists.create(name='Default'))
+
+    resp = token_client.get(_url(organizer, event, cursor))
+    assert resp.status_code == 200
+    assert not resp.data['reset']
+    assert not resp.data['more']
+    changes = {(c['type'], c['id']): c for c in resp.data['changes']}
+    assert changes['order', o.pk]['data'] == {'code': 'FOO', 'status': 'n'}
+    assert changes['position', op.pk]['data'] == {'order': 'FOO', 'secret': op.secret, 'canceled': False}
+    assert changes['position', op.pk]['action'] == 'upsert'
+    assert changes['checkin', checkin.pk]['data']['position'] == op.pk
+    assert resp.data['cursor'] == max(c['seq'] for c in resp.data['changes'])
+
+    resp = token_client.get(_url(organizer, event, resp.data['cursor']))
+    assert resp.data['changes'] == []
+
+
+@pytest.mark.django_db
+def test_changes_of_subevent_dates(token_client, organizer, event, item, subevent, django_capture_on_commit_callbacks):
+    with scopes_disabled():
+        o, op = _create_order(event, item)
+        op.subevent = subevent
+        op.save()
+        cursor = EventChange.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+        # Orders are only touched through a queryset update here
+        with django_capture_on_commit_callbacks(execute=True):
+            subevent.date_from += timedelta(days=7)
+            subevent.save()
+
+    resp = token_client.get(_url(organizer, event, cursor))
+    assert resp.status_code == 200
+    changes = {(c['type'], c['id']): c for c in resp.data['changes']}
+    assert changes['order', o.pk]['data'] == {'code': 'FOO', 'status': 'n'}
+
+
+@pytest.mark.django_db
+def test_changes_compacted_and_paginated(token_client, organizer, event, item, django_capture_on_commit_callbacks):
+    cursor = token_client.get(_url(organizer, event)).data['cursor']
+    with scopes_disabled(), django_capture_on_commit_callbacks(execute=True):
+        o, op = _create_order(event, item)
+        o.status = Order.STATUS_PAID
+        o.save()
+
+    resp = token_client.get(_url(organizer, event, cursor))
+    orders = [c for c in resp.data['changes'] if c['type'] == 'order']
+    assert len(orders) == 1
+    assert orders[0]['data']['status'] == 'p'
+
+    resp = token_client.get(_url(organizer, event, cursor, limit=1))
+    assert len(resp.data['changes']) == 1
+    assert resp.data['more']
+    assert resp.data['cursor'] == resp.data['changes'][0]['seq']
+
+    resp = token_client.get(_url(organizer, event, cursor, limit='foo'))
+    assert resp.status_code == 400
+
+
+@pytest.mark.django_db
+def test_changes_of_other_events_not_included(token_client, organizer, event, event2, item,
+                                              django_capture_on_commit_callbacks):
+    cursor = token_client.get(_url(organizer, event2)).data['cursor']
+    with scopes_disabled(), django_capture_on_commit_callbacks(execute=True):
+        _create_order(event, item)
+    resp = token_client.get(_url(organizer, event2, cursor))
+    assert resp.data['changes'] == []
+    assert resp.data['cursor'] == cursor
+
+
+@pytest.mark.django_db
+def test_reset_after_truncation(token_client, organizer, event, item, django_capture_on_commit_callbacks):
+    cursor = token_client.get(_url(organizer, event)).data['cursor']
+    with scopes_disabled(), django_capture_on_commit_callbacks(execute=True):
+        _create_order(event, item)
+    EventChange.objects.update(datetime=now() - timedelta(days=40))
+
+    changefeed.clean_change_feed(sender=None)
+    assert not EventChange.objects.exists()
+    assert GlobalSettingsObject().settings.get('change_feed_truncated', as_type=int) > cursor
+
+    resp = token_client.get(_url(organizer, event, cursor))
+    assert resp.data['reset']
+    assert resp.data['changes'] == []
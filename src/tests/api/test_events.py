@@ -40,6 +40,7 @@ from unittest import mock
 import pytest
 from django.conf import settings
 from django.core.files.base import ContentFile
+from django.test import override_settings
 from django.utils.timezone import now
 from django_countries.fields import Country
 from django_scopes import scope, scopes_disabled
@@ -662,6 +663,122 @@ def test_event_delete_with_clone(token_client, organizer, event, meta_prop):
     assert resp.status_code == 405
 
 
+@pytest.mark.django_db
+def test_event_clone_bulk(token_client, organizer, event, item, free_quota, meta_prop):
+    event.date_admission = event.date_from - timedelta(hours=1)
+    event.save()
+    resp = token_client.post(
+        '/api/v1/organizers/{}/events/{}/clone_bulk/'.format(organizer.slug, event.slug),
+        {
+            "events": [
+                {
+                    "name": {"en": "Demo Conference 2031"},
+                    "slug": "2031",
+                    "date_from": "2031-12-27T10:00:00Z",
+                },
+                {
+                    "name": {"en": "Demo Conference 2032"},
+                    "slug": "2032",
+                    "date_from": "2032-12-27T10:00:00Z",
+                    "date_admission": "2032-12-27T08:00:00Z",
+                    "location": {"en": "Heidelberg"},
+                },
+            ]
+        },
+        format='json'
+    )
+    assert resp.status_code == 200
+    assert resp.data == {'status': 'ok', 'events': ['2031', '2032']}
+
+    with scopes_disabled():
+        e1 = organizer.events.get(slug='2031')
+        assert e1.date_from.isoformat() == "2031-12-27T10:00:00+00:00"
+        assert e1.date_admission == e1.date_from - timedelta(hours=1)
+        assert e1.plugins == event.plugins
+        assert e1.meta_values.filter(property=meta_prop).exists() == event.meta_values.filter(property=meta_prop).exists()
+        assert set(str(i.name) for i in e1.items.all()) == {"Budget Ticket", "Free Ticket"}
+        assert str(e1.quotas.get().items.get().name) == "Free Ticket"
+        assert e1.all_logentries().filter(action_type='pretix.event.added').exists()
+
+        e2 = organizer.events.get(slug='2032')
+        assert e2.date_admission.isoformat() == "2032-12-27T08:00:00+00:00"
+        assert str(e2.location) == "Heidelberg"
+        assert e2.items.count() == 2
+
+
+@pytest.mark.django_db
+def test_event_clone_bulk_validation(token_client, organizer, event):
+    resp = token_client.post(
+        '/api/v1/organizers/{}/events/{}/clone_bulk/'.format(organizer.slug, event.slug),
+        {
+            "events": [
+                {"name": {"en": "A"}, "slug": "new", "date_from": "2031-12-27T10:00:00Z"},
+                {"name": {"en": "B"}, "slug": "new", "date_from": "2031-12-27T10:00:00Z"},
+            ]
+        },
+        format='json'
+    )
+    assert resp.status_code == 400
+    assert resp.data == {'events': ['Duplicate event slug in request.']}
+
+    resp = token_client.post(
+        '/api/v1/organizers/{}/events/{}/clone_bulk/'.format(organizer.slug, event.slug),
+        {
+            "events": [
+                {"name": {"en": "A"}, "slug": "new", "date_from": "2031-12-27T10:00:00Z"},
+                {"name": {"en": "B"}, "slug": event.slug, "date_from": "2031-12-27T10:00:00Z"},
+            ]
+        },
+        format='json'
+    )
+    assert resp.status_code == 400
+    assert resp.data['events'][1]['slug'] == ['This slug has already been used for a different event.']
+    with scopes_disabled():
+        assert not organizer.events.filter(slug='new').exists()
+
+
+@pytest.mark.django_db
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+def test_event_clone_bulk_status(token_client, organizer, event, event2, team):
+    with mock.patch('pretix.api.views.event.clone_event.apply_async') as apply_async:
+        apply_async.return_value.ready.return_value = False
+        apply_async.return_value.id = 'abc'
+        resp = token_client.post(
+            '/api/v1/organizers/{}/events/{}/clone_bulk/'.format(organizer.slug, event.slug),
+            {"events": [{"name": {"en": "A"}, "slug": "new", "date_from": "2031-12-27T10:00:00Z"}]},
+            format='json'
+        )
+    assert resp.status_code == 202
+    assert resp.data['status'].endswith('/clone_bulk/status/abc/')
+
+    with mock.patch('pretix.api.views.event.AsyncResult') as ar:
+        ar.return_value.failed.return_value = False
+        ar.return_value.successful.return_value = False
+        ar.return_value.state = 'PROGRESS'
+        ar.return_value.result = {'value': 40}
+        resp = token_client.get(
+            '/api/v1/organizers/{}/events/{}/clone_bulk/status/abc/'.format(organizer.slug, event.slug),
+        )
+        assert resp.status_code == 409
+        assert resp.data == {'status': 'running', 'percentage': 40}
+
+        # Unknown jobs and jobs started through a different event or by someone else are not visible
+        resp = token_client.get(
+            '/api/v1/organizers/{}/events/{}/clone_bulk/status/xyz/'.format(organizer.slug, event.slug),
+        )
+        assert resp.status_code == 404
+        resp = token_client.get(
+            '/api/v1/organizers/{}/events/{}/clone_bulk/status/abc/'.format(organizer.slug, event2.slug),
+        )
+        assert resp.status_code == 404
+        other = team.tokens.create(name='Other')
+        token_client.credentials(HTTP_AUTHORIZATION='Token ' + other.token)
+        resp = token_client.get(
+            '/api/v1/organizers/{}/events/{}/clone_bulk/status/abc/'.format(organizer.slug, event.slug),
+        )
+        assert resp.status_code == 404
+
+
 @pytest.mark.django_db
 def test_event_update(token_client, organizer, event, item, meta_prop):
     resp = token_client.patch(
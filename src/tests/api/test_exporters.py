@@ -33,14 +33,17 @@
 # License for the specific language governing permissions and limitations under the License.
 
 import copy
+import json
 import uuid
 import zoneinfo
-from datetime import time
+from datetime import time, timedelta
+from decimal import Decimal
 
 import pytest
 from django.utils.timezone import now
+from django_scopes import scopes_disabled
 
-from pretix.base.models import CachedFile, User
+from pretix.base.models import CachedFile, Order, OrderPosition, User
 
 SAMPLE_EXPORTER_CONFIG = {
     "identifier": "orderlist",
@@ -809,3 +812,39 @@ def test_org_scheduled_export_validate_rrule(user_client, organizer, user):
     )
     assert resp.status_code == 400
     assert resp.data == {"schedule_rrule": ["BYEASTER not supported"]}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_run_orders_jsonl(token_client, organizer, team, event, item):
+    with scopes_disabled():
+        o = Order.objects.create(
+            code='FOO', event=event, email='dummy@dummy.test', status=Order.STATUS_PAID,
+            datetime=now(), expires=now() + timedelta(days=10), total=Decimal('23.00'),
+            sales_channel=organizer.sales_channels.get(identifier="web"),
+        )
+        OrderPosition.objects.create(order=o, item=item, variation=None, price=Decimal('23.00'),
+                                     attendee_name_parts={'full_name': 'Peter'}, positionid=1)
+        Order.objects.create(
+            code='BAR', event=event, email='dummy@dummy.test', status=Order.STATUS_PENDING,
+            datetime=now(), expires=now() + timedelta(days=10), total=Decimal('0.00'),
+            sales_channel=organizer.sales_channels.get(identifier="web"),
+        )
+
+    resp = token_client.post('/api/v1/organizers/{}/events/{}/exporters/orders_jsonl/run/'.format(organizer.slug, event.slug),
+                             data={}, format='json')
+    assert resp.status_code == 202
+    resp = token_client.get("/" + resp.data["download"].split("/", 3)[3])
+    assert resp.status_code == 200
+    assert resp["Content-Type"] == "application/jsonl"
+    lines = [json.loads(line) for line in resp.getvalue().splitlines()]
+
+    api = json.loads(token_client.get('/api/v1/organizers/{}/events/{}/orders/?ordering=code'.format(
+        organizer.slug, event.slug)).content)
+    assert sorted(lines, key=lambda o: o['code']) == api['results']
+
+    resp = token_client.post('/api/v1/organizers/{}/events/{}/exporters/orders_jsonl/run/'.format(organizer.slug, event.slug),
+                             data={'modified_since': (now() + timedelta(hours=1)).isoformat()}, format='json')
+    assert resp.status_code == 202
+    resp = token_client.get("/" + resp.data["download"].split("/", 3)[3])
+    assert resp.status_code == 200
+    assert resp.getvalue() == b""
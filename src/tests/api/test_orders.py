@@ -27,6 +27,7 @@ from unittest import mock
 
 import pytest
 from django.core import mail as djmail
+from django.test import override_settings
 from django.utils.timezone import now
 from django_countries.fields import Country
 from django_scopes import scopes_disabled
@@ -34,7 +35,9 @@ from stripe import error
 from tests.plugins.stripe.test_checkout import apple_domain_create
 from tests.plugins.stripe.test_provider import MockedCharge
 
-from pretix.base.models import InvoiceAddress, Order, OrderPosition
+from pretix.base.models import (
+    CachedPdfData, InvoiceAddress, Item, Order, OrderPosition,
+)
 from pretix.base.models.orders import OrderFee, OrderPayment, OrderRefund
 
 
@@ -2040,3 +2043,76 @@ def test_pdf_data(token_client, organizer, event, order, django_assert_max_num_q
     ))
     assert resp.status_code == 200
     assert not resp.data.get('pdf_data')
+
+
+@pytest.mark.django_db
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'test_pdf_data_snapshots',
+    }
+})
+def test_pdf_data_snapshots(token_client, organizer, event, order, item, django_capture_on_commit_callbacks):
+    url = '/api/v1/organizers/{}/events/{}/orderpositions/?pdf_data=true'.format(organizer.slug, event.slug)
+
+    # The first request is evaluated live and schedules the creation of the snapshot
+    with django_capture_on_commit_callbacks(execute=True):
+        resp = token_client.get(url)
+    assert resp.data['results'][0]['pdf_data']['order'] == order.code
+    with scopes_disabled():
+        cached = CachedPdfData.objects.get(order_position__order=order)
+    assert cached.data['text']['order'] == order.code
+    assert cached.data['text']['positionid'] == '1'
+    assert 'now_date' not in cached.data['text']
+
+    cached.data['text']['order'] = 'SNAPSHOT'
+    cached.save()
+    resp = token_client.get(url)
+    assert resp.data['results'][0]['pdf_data']['order'] == 'SNAPSHOT'
+    assert resp.data['results'][0]['pdf_data']['now_date']
+
+    # Changes to the order make the snapshot outdated
+    with scopes_disabled():
+        order.touch()
+    with django_capture_on_commit_callbacks(execute=True):
+        resp = token_client.get(url)
+    assert resp.data['results'][0]['pdf_data']['order'] == order.code
+    cached.refresh_from_db()
+    assert cached.data['text']['order'] == order.code
+
+    # So do changes to the products
+    cached.data['text']['order'] = 'SNAPSHOT'
+    cached.save()
+    with scopes_disabled(), django_capture_on_commit_callbacks(execute=True):
+        Item.objects.get(pk=item.pk).save()
+    resp = token_client.get(url)
+    assert resp.data['results'][0]['pdf_data']['order'] == order.code
+
+
+@pytest.mark.django_db
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'test_pdf_data_snapshots_plugins',
+    }
+})
+def test_pdf_data_snapshots_plugin_variables(token_client, organizer, event, order, django_capture_on_commit_callbacks):
+    url = '/api/v1/organizers/{}/events/{}/orderpositions/?pdf_data=true'.format(organizer.slug, event.slug)
+    plugin_variables = {
+        'plugin_live': {'label': 'Live', 'evaluate': lambda op, order, ev: 'live'},
+        'plugin_cached': {'label': 'Cached', 'evaluate': lambda op, order, ev: 'cached', 'cacheable': True},
+    }
+
+    with mock.patch('pretix.base.pdf.layout_text_variables.send', return_value=[(None, plugin_variables)]):
+        with django_capture_on_commit_callbacks(execute=True):
+            token_client.get(url)
+        with scopes_disabled():
+            cached = CachedPdfData.objects.get(order_position__order=order)
+        # Plugin variables are only stored if they declare that they can be
+        assert cached.data['text']['plugin_cached'] == 'cached'
+        assert 'plugin_live' not in cached.data['text']
+
+        plugin_variables['plugin_live']['evaluate'] = lambda op, order, ev: 'changed'
+        resp = token_client.get(url)
+    assert resp.data['results'][0]['pdf_data']['plugin_live'] == 'changed'
+    assert resp.data['results'][0]['pdf_data']['plugin_cached'] == 'cached'
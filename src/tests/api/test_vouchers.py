@@ -1140,6 +1140,68 @@ def test_create_multiple_vouchers_autogenerate_codes(token_client, organizer, ev
         assert v2.block_quota
 
 
+@pytest.mark.django_db
+def test_create_multiple_vouchers_quota_checked_together(token_client, organizer, event, item, quota):
+    quota.size = 3
+    quota.save()
+    data = [
+        {
+            'max_usages': 2,
+            'block_quota': True,
+            'price_mode': 'set',
+            'value': '12.00',
+            'item': item.pk,
+        },
+        {
+            'max_usages': 2,
+            'block_quota': True,
+            'price_mode': 'set',
+            'value': '12.00',
+            'item': item.pk,
+        },
+    ]
+    resp = token_client.post(
+        '/api/v1/organizers/{}/events/{}/vouchers/batch_create/'.format(organizer.slug, event.slug),
+        data=data, format='json'
+    )
+    assert resp.status_code == 400
+    assert resp.data[0] == resp.data[1] == {
+        'block_quota': ['You cannot create a voucher that blocks quota as the selected product or quota is '
+                        'currently sold out or completely reserved.']
+    }
+    with scopes_disabled():
+        assert Voucher.objects.count() == 0
+
+    data[1]['max_usages'] = 1
+    resp = token_client.post(
+        '/api/v1/organizers/{}/events/{}/vouchers/batch_create/'.format(organizer.slug, event.slug),
+        data=data, format='json'
+    )
+    assert resp.status_code == 201
+    with scopes_disabled():
+        assert Voucher.objects.count() == 2
+        assert [v.all_logentries().get().parsed_data for v in Voucher.objects.order_by('pk')] == data
+
+
+@pytest.mark.django_db
+def test_create_multiple_vouchers_existing_code(token_client, organizer, event, item, voucher):
+    resp = token_client.post(
+        '/api/v1/organizers/{}/events/{}/vouchers/batch_create/'.format(organizer.slug, event.slug),
+        data=[
+            {
+                'code': 'ABCDEFGHI',
+                'item': item.pk,
+            },
+            {
+                'code': voucher.code.lower(),
+                'item': item.pk,
+            },
+        ], format='json'
+    )
+    assert resp.status_code == 400
+    assert resp.data == [{}, {'code': ['A voucher with this code already exists.']}]
+
+
 @pytest.fixture
 def seatingplan(organizer, event):
     plan = SeatingPlan.objects.create(
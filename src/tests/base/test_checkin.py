@@ -25,14 +25,16 @@ from decimal import Decimal
 
 import pytest
 from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils.timezone import now, override
 from django_scopes import scope
 from freezegun import freeze_time
 
 from pretix.base.models import Checkin, Event, Order, OrderPosition, Organizer
 from pretix.base.services.checkin import (
-    CheckInError, RequiredQuestionsError, SQLLogic, perform_checkin,
-    process_exit_all,
+    CheckInError, LazyRuleVars, RequiredQuestionsError, SQLLogic,
+    _compiled_rules, _get_logic_environment, perform_checkin, process_exit_all,
 )
 
 
@@ -953,6 +955,31 @@ def test_rules_entries_days_before(event, position, clist):
         perform_checkin(position, clist, {})
 
 
+@pytest.mark.django_db
+def test_rules_history_single_query(event, position, clist):
+    clist.allow_multiple_entries = True
+    clist.rules = {
+        "and": [
+            {"<": [{"var": "entries_number"}, 5]},
+            {"<": [{"var": "entries_today"}, 5]},
+            {"<": [{"var": "entries_days"}, 5]},
+            {"<=": [{"entries_since": [{"buildTime": ["custom", "2020-01-01T23:00:00.000+01:00"]}]}, 5]},
+        ]
+    }
+    clist.save()
+    perform_checkin(position, clist, {})
+    perform_checkin(position, clist, {})
+
+    rule_data = LazyRuleVars(position, clist, now(), gate=None)
+    logic = _get_logic_environment(clist.event, rule_data, now())
+    with CaptureQueriesContext(connection) as ctx:
+        assert _compiled_rules(clist)(logic, rule_data)
+    assert len([q for q in ctx.captured_queries if 'pretixbase_checkin"' in q['sql'].split('WHERE')[0]]) == 1
+    assert rule_data.entries_number == 2
+    assert rule_data.entries_days == 1
+    assert _compiled_rules(clist) is _compiled_rules(clist)
+
+
 @pytest.mark.django_db
 def test_rules_time_isafter_tolerance(event, position, clist):
     # Ticket is valid starting 10 minutes before admission time
@@ -1186,7 +1213,8 @@ def test_rules_reasoning_prefer_number_over_date(event, position, clist):
 
 @pytest.mark.django_db(transaction=True)
 def test_position_queries(django_assert_max_num_queries, position, clist):
-    with django_assert_max_num_queries(13) as captured:
+    # 13 queries for the check-in itself, one for the change feed entry written after commit
+    with django_assert_max_num_queries(14) as captured:
         perform_checkin(position, clist, {})
     if 'sqlite' not in settings.DATABASES['default']['ENGINE']:
         assert any('FOR UPDATE' in s['sql'] for s in captured)
@@ -0,0 +1,85 @@
+#
+# This file is part of pretix (Community Edition).
+#
+# Copyright (C) 2014-2020  Raphael Michel and contributors
+# Copyright (C) 2020-today pretix GmbH and contributors
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU Affero General
+# Public License as published by the Free Software Foundation in version 3 of the License.
+#
+# ADDITIONAL TERMS APPLY: Pursuant to Section 7 of the GNU Affero General Public License, additional terms are
+# applicable granting you additional permissions and placing additional restrictions on your usage of this software.
+# Please refer to the pretix LICENSE file to obtain the full terms applicable to this work. If you did not receive
+# this file, see <https://pretix.eu/about/en/license>.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License along with this program.  If not, see
+# <https://www.gnu.org/licenses/>.
+#
+
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from django.core.files.base import ContentFile
+from django.utils.timezone import now
+from django_scopes import scopes_disabled
+
+from pretix.base.models import CachedFile, CartPosition, Event, Item, Organizer
+from pretix.base.services import cleanup
+
+
+@pytest.fixture
+def event():
+    o = Organizer.objects.create(name='Dummy', slug='dummy')
+    return Event.objects.create(organizer=o, name='Dummy', slug='dummy', date_from=now())
+
+
+@pytest.mark.django_db
+def test_clean_cached_files(monkeypatch):
+    monkeypatch.setattr(cleanup, 'CLEANUP_CHUNK_SIZE', 2)
+    names = []
+    for i in range(5):
+        cf = CachedFile.objects.create(expires=now() - timedelta(minutes=1), date=now())
+        cf.file.save('test.txt', ContentFile(b'12345'))
+        names.append(cf.file.name)
+    keep = CachedFile.objects.create(expires=now() + timedelta(days=1), date=now())
+
+    storage = CachedFile._meta.get_field('file').storage
+    rows, reclaimed = cleanup.delete_in_chunks(
+        CachedFile.objects.filter(expires__isnull=False, expires__lt=now()), cleanup.time.monotonic() + 60,
+        file_field='file'
+    )
+    assert rows == 5
+    assert reclaimed == 25
+    assert list(CachedFile.objects.all()) == [keep]
+    assert not any(storage.exists(n) for n in names)
+
+
+@pytest.mark.django_db
+def test_clean_cached_files_time_budget():
+    CachedFile.objects.create(expires=now() - timedelta(minutes=1), date=now())
+    rows, reclaimed = cleanup.delete_in_chunks(
+        CachedFile.objects.filter(expires__isnull=False, expires__lt=now()), cleanup.time.monotonic() - 1,
+    )
+    assert rows == 0
+    assert CachedFile.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_clean_cart_positions(event, monkeypatch):
+    monkeypatch.setattr(cleanup, 'CLEANUP_CHUNK_SIZE', 1)
+    item = Item.objects.create(event=event, name='Ticket', default_price=Decimal('23.00'))
+    with scopes_disabled():
+        parent = CartPosition.objects.create(event=event, item=item, price=23, cart_id='a',
+                                             expires=now() - timedelta(days=15))
+        CartPosition.objects.create(event=event, item=item, price=23, cart_id='a', addon_to=parent,
+                                    expires=now() - timedelta(days=15))
+        current = CartPosition.objects.create(event=event, item=item, price=23, cart_id='b',
+                                              expires=now() + timedelta(minutes=10))
+
+        cleanup.clean_cart_positions(None)
+        assert list(CartPosition.objects.all()) == [current]
@@ -29,14 +29,17 @@ from django.utils.timezone import now
 from django_scopes import scope
 
 from pretix.base.datasync.datasync import (
-    OutboundSyncProvider, StaticMapping, datasync_providers,
+    OutboundSyncProvider, RecoverableSyncError, StaticMapping,
+    datasync_providers,
 )
+from pretix.base.datasync.sourcefields import ORDER
 from pretix.base.datasync.utils import assign_properties
 from pretix.base.models import (
     Event, InvoiceAddress, Item, Order, Organizer, Question,
 )
 from pretix.base.models.datasync import (
     MODE_APPEND_LIST, MODE_OVERWRITE, MODE_SET_IF_EMPTY, MODE_SET_IF_NEW,
+    OrderSyncQueue, OrderSyncResult,
 )
 from pretix.base.services.datasync import sync_all
 
@@ -519,6 +522,66 @@ def test_association_sync(event):
     assert OrderAndTicketAssociationSync.fake_api_client.fake_database == expected
 
 
+class BatchedAssociationSync(OrderAndTicketAssociationSync):
+    batch_size = 10
+    batch_calls = []
+
+    def sync_objects_with_properties(self, mapping, objects):
+        self.batch_calls.append((mapping.id, len(objects)))
+        return super().sync_objects_with_properties(mapping, objects)
+
+
+@pytest.mark.django_db
+def test_batched_association_sync(event):
+    _register_with_fake_plugin_name(datasync_providers, BatchedAssociationSync, 'testplugin')
+
+    for order in event.orders.order_by("code").all():
+        BatchedAssociationSync.enqueue_order(order, 'testcase')
+
+    BatchedAssociationSync.fake_api_client = FakeSyncAPI()
+    BatchedAssociationSync.batch_calls = []
+
+    sync_all()
+
+    assert BatchedAssociationSync.fake_api_client.fake_database == expected_sync_result_with_associations()
+    assert [c[0] for c in BatchedAssociationSync.batch_calls] == [m.id for m in BatchedAssociationSync(event).mappings]
+    assert not OrderSyncQueue.objects.exists()
+    assert OrderSyncResult.objects.filter(order__event=event).count() == sum(c[1] for c in BatchedAssociationSync.batch_calls)
+
+
+class PartiallyFailingBatchSync(SimpleOrderSync):
+    batch_size = 10
+
+    def sync_objects_with_properties(self, mapping, objects):
+        results = iter(super().sync_objects_with_properties(mapping, [
+            obj for obj in objects if obj.inputs[ORDER].code != '1AAA'
+        ]))
+        return [
+            RecoverableSyncError(["try again"]) if obj.inputs[ORDER].code == '1AAA' else next(results)
+            for obj in objects
+        ]
+
+
+@pytest.mark.django_db
+def test_batched_sync_failure_only_affects_order(event):
+    _register_with_fake_plugin_name(datasync_providers, PartiallyFailingBatchSync, 'testplugin')
+
+    for order in event.orders.order_by("code").all():
+        PartiallyFailingBatchSync.enqueue_order(order, 'testcase')
+
+    PartiallyFailingBatchSync.fake_api_client = FakeSyncAPI()
+
+    sync_all()
+
+    assert [o['ordernumber'] for o in PartiallyFailingBatchSync.fake_api_client.fake_database['ticketorders']] == [
+        'DUMMY-2EEE'
+    ]
+    sq = OrderSyncQueue.objects.get()
+    assert sq.order.code == '1AAA'
+    assert sq.failed_attempts == 1
+    assert not sq.in_flight
+
+
 @pytest.mark.django_db
 def test_legacy_name_splitting(event):
     _register_with_fake_plugin_name(datasync_providers, OrderAndTicketAssociationSync, 'testplugin')
@@ -36,11 +36,13 @@ import datetime
 from datetime import timedelta
 
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils.timezone import now
 from django_scopes import scopes_disabled
 
 from pretix.base.models import (
-    Event, ItemProgramTime, Organizer, Question, SeatingPlan,
+    Event, ItemProgramTime, ItemVariation, Organizer, Question, SeatingPlan,
 )
 from pretix.base.models.items import ItemAddOn, ItemBundle, ItemMetaValue
 
@@ -284,3 +286,34 @@ def test_full_clone_cross_organizer_differences():
 
     assert event.settings.get('payment_giftcard__restrict_to_sales_channels', as_type=list) == ['web', 'b', 'c']
     assert copied_event.settings.get('payment_giftcard__restrict_to_sales_channels', as_type=list) == ['web', 'c']
+
+
+@pytest.mark.django_db
+@scopes_disabled()
+def test_clone_query_count_independent_of_size():
+    organizer = Organizer.objects.create(name='Dummy', slug='dummy')
+
+    def _clone(n):
+        event = Event.objects.create(organizer=organizer, name='Dummy', slug=f'source{n}', date_from=now())
+        category = event.categories.create(name="Tickets")
+        q = event.quotas.create(name="Quota", size=10)
+        question = event.questions.create(question="Size", type="C")
+        cl = event.checkin_lists.create(name="Default", all_products=False)
+        for i in range(n):
+            item = event.items.create(name=f"Ticket {i}", default_price=23, category=category)
+            item.variations.create(value="Large")
+            q.items.add(item)
+            question.items.add(item)
+            question.options.create(answer=f"Option {i}")
+            cl.limit_products.add(item)
+        copied_event = Event.objects.create(organizer=organizer, name='Dummy', slug=f'copy{n}', date_from=now())
+        with CaptureQueriesContext(connection) as ctx:
+            copied_event.copy_data_from(event)
+        assert copied_event.items.count() == n
+        assert ItemVariation.objects.filter(item__event=copied_event).count() == n
+        assert copied_event.quotas.get().items.count() == n
+        assert copied_event.questions.get().options.count() == n
+        assert copied_event.checkin_lists.get().limit_products.count() == n
+        return len(ctx)
+
+    assert _clone(2) == _clone(10)
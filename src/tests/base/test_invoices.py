@@ -49,6 +49,7 @@ from pretix.base.models import (
     Event, ExchangeRate, Invoice, InvoiceAddress, Item, ItemVariation, Order,
     OrderPosition, Organizer,
 )
+from pretix.base.models.invoices import InvoiceNumberCounter
 from pretix.base.models.orders import OrderFee
 from pretix.base.services.invoices import (
     build_preview_invoice_pdf, generate_cancellation, generate_invoice,
@@ -813,3 +814,33 @@ def test_period_always_order_date(env):
     l1 = inv.lines.first()
     assert l1.period_start == order.datetime
     assert l1.period_end == order.datetime
+
+
+@pytest.mark.django_db
+def test_invoice_number_counter(env):
+    event, order = env
+    event.settings.set('invoice_numbers_consecutive', True)
+    event.settings.set('invoice_numbers_prefix', 'shared_')
+
+    # Invoices created before the counter existed are taken into account
+    Invoice.objects.create(
+        order=order, event=order.event, organizer=order.event.organizer, date=now().date(), locale='en',
+        prefix='shared_', invoice_no='00041',
+    )
+    assert generate_invoice(order).number == 'shared_00042'
+    assert InvoiceNumberCounter.objects.get(organizer=event.organizer, prefix='shared_').value == 42
+
+    # Numbers assigned outside of the counter lead to a resync instead of an endless collision
+    Invoice.objects.create(
+        order=order, event=order.event, organizer=order.event.organizer, date=now().date(), locale='en',
+        prefix='shared_', invoice_no='00043',
+    )
+    assert generate_invoice(order).number == 'shared_00044'
+    assert generate_invoice(order).number == 'shared_00045'
+
+    # A failed transaction does not leave a gap
+    with pytest.raises(ValueError):
+        with transaction.atomic():
+            generate_invoice(order)
+            raise ValueError()
+    assert generate_invoice(order).number == 'shared_00046'
@@ -36,6 +36,7 @@
 # pytest
 
 import base64
+import threading
 
 import pytest
 from django.test import override_settings
@@ -69,6 +70,13 @@ class FakeRedis(object):
         pass
 
 
+@pytest.fixture(autouse=True)
+def flush_immediately(settings):
+    settings.METRICS_FLUSH_THRESHOLD = 1
+    yield
+    metrics.flush()
+
+
 @override_settings(HAS_REDIS=True)
 def test_counter(monkeypatch):
 
@@ -201,6 +209,92 @@ def test_histogram(monkeypatch):
     assert fake_redis.storage['my_histogram_bucket{dimension="two",le="1.0"}'] == 1
 
 
+@override_settings(HAS_REDIS=True, METRICS_FLUSH_THRESHOLD=100, METRICS_FLUSH_INTERVAL=3600)
+def test_buffered_until_flush(monkeypatch):
+
+    fake_redis = FakeRedis()
+    monkeypatch.setattr(metrics, "redis", fake_redis, raising=False)
+
+    test_counter = metrics.Counter("my_counter", "this is a helpstring")
+    test_gauge = metrics.Gauge("my_gauge", "this is a helpstring")
+    test_hist = metrics.Histogram("my_histogram", "this is a helpstring")
+
+    test_counter.inc(2)
+    test_counter.inc(3)
+    test_gauge.inc(4)
+    test_gauge.set(10)
+    test_gauge.dec(3)
+    test_hist.observe(3.0)
+    test_hist.observe(0.9)
+    assert fake_redis.storage == {}
+
+    metrics.flush()
+    assert fake_redis.storage['my_counter'] == 5
+    assert fake_redis.storage['my_gauge'] == 7
+    assert fake_redis.storage['my_histogram_count'] == 2
+    assert fake_redis.storage['my_histogram_sum'] == 3.9
+    assert fake_redis.storage['my_histogram_bucket{le="1.0"}'] == 1
+    assert fake_redis.storage['my_histogram_bucket{le="5.0"}'] == 2
+
+    test_counter.inc(1)
+    assert fake_redis.storage['my_counter'] == 5
+    metrics.flush()
+    assert fake_redis.storage['my_counter'] == 6
+
+
+@override_settings(HAS_REDIS=True, METRICS_FLUSH_THRESHOLD=3, METRICS_FLUSH_INTERVAL=3600)
+def test_flush_after_threshold(monkeypatch):
+
+    fake_redis = FakeRedis()
+    monkeypatch.setattr(metrics, "redis", fake_redis, raising=False)
+
+    test_counter = metrics.Counter("my_counter", "this is a helpstring")
+    test_counter.inc()
+    test_counter.inc()
+    assert fake_redis.storage == {}
+    test_counter.inc()
+    assert fake_redis.storage['my_counter'] == 3
+
+
+@pytest.mark.django_db
+@override_settings(HAS_REDIS=True, METRICS_FLUSH_THRESHOLD=100, METRICS_FLUSH_INTERVAL=3600)
+def test_flush_after_request_and_task_once_interval_passed(monkeypatch, settings):
+    from celery.signals import task_postrun
+    from django.core.signals import request_finished
+
+    fake_redis = FakeRedis()
+    monkeypatch.setattr(metrics, "redis", fake_redis, raising=False)
+
+    test_counter = metrics.Counter("my_counter", "this is a helpstring")
+    test_counter.inc()
+    request_finished.send(sender=None)
+    task_postrun.send(sender=None)
+    assert fake_redis.storage == {}
+
+    settings.METRICS_FLUSH_INTERVAL = 0
+    request_finished.send(sender=None)
+    assert fake_redis.storage['my_counter'] == 1
+
+
+@override_settings(HAS_REDIS=True, METRICS_FLUSH_THRESHOLD=100, METRICS_FLUSH_INTERVAL=3600)
+def test_flush_all_drains_other_threads(monkeypatch):
+    fake_redis = FakeRedis()
+    monkeypatch.setattr(metrics, "redis", fake_redis, raising=False)
+
+    test_counter = metrics.Counter("my_counter", "this is a helpstring")
+    t = threading.Thread(target=test_counter.inc)
+    t.start()
+    t.join()
+    test_counter.inc()
+    # Buffers of threads that have ended are written right away and then dropped
+    metrics.flush_all(only_due=True)
+    assert fake_redis.storage['my_counter'] == 1
+    assert not any(buf.thread is t for buf in metrics._buffers)
+
+    metrics.flush_all()
+    assert fake_redis.storage['my_counter'] == 2
+
+
 @pytest.mark.django_db
 @override_settings(HAS_REDIS=True, METRICS_USER="foo", METRICS_PASSPHRASE="bar")
 def test_metrics_view(monkeypatch, client):
@@ -232,3 +326,27 @@ def test_do_not_break_append_slash(monkeypatch, client):
     r = client.get('/control')
     assert r.status_code == 301
     assert r['Location'] == '/control/'
+
+
+@pytest.mark.django_db
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+def test_model_counts_from_cache(django_assert_max_num_queries):
+    from django.core.cache import cache
+    cache.clear()
+
+    with django_assert_max_num_queries(2):
+        values = metrics.metric_values()
+    assert 'pretix_model_instances' not in values
+
+    metrics.refresh_model_counts()
+    with django_assert_max_num_queries(2):
+        values = metrics.metric_values()
+    assert values['pretix_model_instances']['{model="pretixbase.order"}'] == 0
+    assert values['pretix_model_instances_age_seconds'][""] < 10
+    cache.clear()
+
+
+def test_published_header():
+    headers = {}
+    metrics.add_published_header(headers=headers)
+    assert headers[metrics.PUBLISHED_HEADER] > 0
@@ -38,14 +38,18 @@ import time
 import zoneinfo
 from datetime import date, timedelta
 from decimal import Decimal
+from unittest import mock
 
 import pytest
 from dateutil.tz import tzoffset
 from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils.timezone import now
 from django_scopes import scope, scopes_disabled
 from freezegun import freeze_time
@@ -53,14 +57,15 @@ from freezegun import freeze_time
 from pretix.base.i18n import language
 from pretix.base.models import (
     CachedFile, CartPosition, Checkin, CheckinList, Event, Item, ItemCategory,
-    ItemVariation, Order, OrderFee, OrderPayment, OrderPosition, OrderRefund,
-    Organizer, Question, Quota, ScheduledEventExport, SeatingPlan, User,
-    Voucher, WaitingListEntry,
+    ItemVariation, LogEntry, Order, OrderFee, OrderPayment, OrderPosition,
+    OrderRefund, Organizer, Question, Quota, ScheduledEventExport, Seat,
+    SeatingPlan, User, Voucher, WaitingListEntry,
 )
 from pretix.base.models.event import SubEvent
 from pretix.base.models.items import (
     ItemBundle, SubEventItem, SubEventItemVariation,
 )
+from pretix.base.models.seating import SeatAvailabilityCheck
 from pretix.base.reldate import RelativeDate, RelativeDateWrapper
 from pretix.base.services.orders import OrderError, cancel_order, perform_order
 from pretix.base.services.quotas import QuotaAvailability
@@ -2803,6 +2808,35 @@ class SeatingTestCase(TestCase):
         assert not self.seat_a1.is_available()
         assert self.seat_a2.is_available()
 
+    @classscope(attr='organizer')
+    def test_check_availability_bulk(self):
+        seat_a3 = self.event.seats.create(seat_number="A3", product=self.ticket, blocked=True, x=2, y=2)
+        cp = CartPosition.objects.create(
+            event=self.event, cart_id='a', item=self.ticket, seat=self.seat_a1,
+            price=23, expires=now() + timedelta(minutes=10)
+        )
+        v = self.event.vouchers.create(item=self.ticket, seat=self.seat_a2)
+        with CaptureQueriesContext(connection) as ctx:
+            result = Seat.check_availability([
+                SeatAvailabilityCheck(self.seat_a1),
+                SeatAvailabilityCheck(self.seat_a1, ignore_cart=cp),
+                SeatAvailabilityCheck(self.seat_a1, ignore_cart=True),
+                SeatAvailabilityCheck(self.seat_a2),
+                SeatAvailabilityCheck(self.seat_a2, ignore_voucher_id=v.pk),
+                SeatAvailabilityCheck(seat_a3),
+            ])
+        assert result == [
+            Seat.UNAVAILABLE_CART,
+            None,
+            None,
+            Seat.UNAVAILABLE_VOUCHER,
+            None,
+            Seat.UNAVAILABLE_BLOCKED,
+        ]
+        # Settings are read from the database since the test transaction is never committed
+        assert len([q for q in ctx.captured_queries if 'settingsstore' not in q['sql']]) == 1
+        assert Seat.check_availability([SeatAvailabilityCheck(seat_a3)], always_allow_blocked=True) == [None]
+
     @classscope(attr='organizer')
     def test_blocked_in_proximity(self):
         o = Order.objects.create(
@@ -3135,6 +3169,95 @@ def test_subevent_date_updates_order_date():
         assert order2.last_modified == o2lm
 
 
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class LogEntryDisplayTestCase(TestCase):
+    def setUp(self):
+        self.organizer = Organizer.objects.create(name='Dummy', slug='dummy')
+        with scope(organizer=self.organizer):
+            self.event = Event.objects.create(
+                organizer=self.organizer, name='Dummy', slug='dummy',
+                date_from=now(),
+            )
+            self.shirt = self.event.items.create(name="T-Shirt", default_price=12)
+            self.red = self.shirt.variations.create(value="Red")
+            self.ticket = self.event.items.create(name="Ticket", default_price=23)
+            for i in range(5):
+                self.event.log_action('pretix.event.order.changed.item', data={
+                    'positionid': i + 1,
+                    'old_item': self.shirt.pk,
+                    'old_variation': self.red.pk,
+                    'old_price': '12.00',
+                    'new_item': self.ticket.pk,
+                    'new_variation': None,
+                    'new_price': '23.00',
+                })
+        cache.clear()
+
+    def _prepare(self):
+        with CaptureQueriesContext(connection) as ctx:
+            logs = LogEntry.prepare_display(
+                self.event.logentry_set.filter(action_type='pretix.event.order.changed.item')
+            )
+        return logs, [q for q in ctx.captured_queries if 'settingsstore' not in q['sql']]
+
+    @classscope(attr='organizer')
+    def test_prefetch_related_objects(self):
+        logs, queries = self._prepare()
+        assert len(logs) == 5
+        # log entries, content objects, items, variations
+        assert len(queries) == 4
+        assert 'Position #1: T-Shirt - Red (€12.00) changed to Ticket (€23.00).' in logs[-1].display()
+
+        # Texts containing names of other objects are not cached, so renaming them is visible right away
+        self.ticket.name = "Admission"
+        self.ticket.save()
+        logs, queries = self._prepare()
+        assert len(queries) == 4
+        assert 'changed to Admission' in logs[-1].display()
+
+    @classscope(attr='organizer')
+    def test_cache(self):
+        self.event.log_action('pretix.event.order.comment', data={'new_comment': 'Foo'})
+        qs = self.event.logentry_set.filter(action_type='pretix.event.order.comment')
+        logs = LogEntry.prepare_display(qs)
+        assert logs[0].display() == 'The order\'s internal comment has been updated.'
+
+        with mock.patch.object(LogEntry, '_render_display') as render_display:
+            logs = LogEntry.prepare_display(qs)
+        assert not render_display.called
+        assert logs[0].display() == 'The order\'s internal comment has been updated.'
+
+    @classscope(attr='organizer')
+    def test_no_cache_for_lookups(self):
+        clist = self.event.checkin_lists.create(name="Main entrance")
+        self.event.log_action('pretix.control.views.checkin', data={
+            'datetime': now().isoformat(), 'positionid': 1, 'first': True, 'list': clist.pk,
+        })
+        qs = self.event.logentry_set.filter(action_type='pretix.control.views.checkin')
+        assert 'Main entrance' in LogEntry.prepare_display(qs)[0].display()
+
+        clist.name = "Side entrance"
+        clist.save()
+        assert 'Side entrance' in LogEntry.prepare_display(qs)[0].display()
+
+    @classscope(attr='organizer')
+    def test_invalidate_on_version_change(self):
+        from pretix.base.logentrytype_registry import log_entry_types
+
+        self.event.log_action('pretix.event.order.comment', data={'new_comment': 'Foo'})
+        qs = self.event.logentry_set.filter(action_type='pretix.event.order.comment')
+        LogEntry.prepare_display(qs)
+        log_entry_type, meta = log_entry_types.get(action_type='pretix.event.order.comment')
+        log_entry_type.display_version += 1
+        try:
+            with mock.patch.object(LogEntry, '_render_display', return_value='Changed') as render_display:
+                logs = LogEntry.prepare_display(qs)
+        finally:
+            log_entry_type.display_version -= 1
+        assert render_display.called
+        assert logs[0].display() == 'Changed'
+
+
 class ScheduledExportTestCase(TestCase):
 
     @scopes_disabled()
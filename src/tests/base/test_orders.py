@@ -326,6 +326,73 @@ def test_expiring(event):
     assert o2.transactions.aggregate(s=Sum(F('price') * F('count')))['s'] == Decimal('0.00')
 
 
+@pytest.mark.django_db
+def test_expiring_chunked_refreshes_quotas(event, monkeypatch):
+    from pretix.base.services import orders as order_services
+
+    monkeypatch.setattr(order_services, 'EXPIRY_CHUNK_SIZE', 2)
+    ticket = Item.objects.create(event=event, name='Early-bird ticket',
+                                 default_price=Decimal('23.00'), admission=True)
+    quota = event.quotas.create(name='Quota', size=10)
+    quota.items.add(ticket)
+    orders = []
+    for i in range(5):
+        o = Order.objects.create(
+            code=f'FO{i}', event=event, email='dummy@dummy.test',
+            status=Order.STATUS_PENDING, locale='en',
+            datetime=now(), expires=now() - timedelta(days=10),
+            total=12,
+            sales_channel=event.organizer.sales_channels.get(identifier="web"),
+        )
+        OrderPosition.objects.create(
+            order=o, item=ticket, variation=None,
+            price=Decimal("12.00"), attendee_name_parts={'full_name': "Peter"}, positionid=1
+        )
+        orders.append(o)
+
+    computed = []
+    monkeypatch.setattr(order_services.QuotaAvailability, 'compute', lambda self, *a, **kw: computed.extend(self._queue))
+    expire_orders(None)
+    assert all(Order.objects.get(pk=o.pk).status == Order.STATUS_EXPIRED for o in orders)
+    assert computed == [quota]
+
+
+@pytest.mark.django_db
+def test_expiring_skips_orders_changed_after_read(event, monkeypatch):
+    from pretix.base.services import orders as order_services
+
+    o1 = Order.objects.create(
+        code='FO1', event=event, email='dummy@dummy.test',
+        status=Order.STATUS_PENDING, locale='en',
+        datetime=now(), expires=now() - timedelta(days=10),
+        total=12,
+        sales_channel=event.organizer.sales_channels.get(identifier="web"),
+    )
+    o2 = Order.objects.create(
+        code='FO2', event=event, email='dummy@dummy.test',
+        status=Order.STATUS_PENDING, locale='en',
+        datetime=now(), expires=now() - timedelta(days=10),
+        total=12,
+        sales_channel=event.organizer.sales_channels.get(identifier="web"),
+    )
+    iter_chunks = order_services._iter_chunks
+
+    def iter_chunks_and_change(qs):
+        for chunk in iter_chunks(qs):
+            # Concurrent changes after the chunk has been read
+            Order.objects.filter(pk=o1.pk).update(status=Order.STATUS_PAID)
+            Order.objects.filter(pk=o2.pk).update(expires=now() + timedelta(days=1))
+            yield chunk
+
+    monkeypatch.setattr(order_services, '_iter_chunks', iter_chunks_and_change)
+    expire_orders(None)
+    o1.refresh_from_db()
+    o2.refresh_from_db()
+    assert o1.status == Order.STATUS_PAID
+    assert o2.status == Order.STATUS_PENDING
+    assert not o1.all_logentries().filter(action_type='pretix.event.order.expired').exists()
+
+
 @pytest.mark.django_db
 def test_expiring_paid_invoice(event):
     o2 = Order.objects.create(
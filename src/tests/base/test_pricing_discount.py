@@ -24,6 +24,7 @@ from datetime import timedelta
 from decimal import Decimal
 
 import pytest
+from django.test import override_settings
 from django.utils.timezone import now
 from django_scopes import scopes_disabled
 
@@ -1507,3 +1508,57 @@ def test_multiple_discounts_with_same_condition(event, item, item2, item3):
 
     new_prices = [p for p, d in apply_discounts(event, 'web', positions)]
     assert sorted(new_prices) == sorted(expected)
+
+
+@pytest.mark.django_db
+@scopes_disabled()
+def test_discount_plan_cached_and_invalidated(event, item, item2, django_assert_num_queries):
+    with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+        event = Event.objects.get(pk=event.pk)  # event.cache is bound to the cache backend on first use
+        d1 = Discount(event=event, condition_min_count=2, benefit_discount_matching_percent=20, condition_all_products=False)
+        d1.save()
+        d1.condition_limit_products.add(item)
+
+        positions = (
+            (item2.pk, None, None, Decimal('100.00'), False, False, Decimal('0.00')),
+            (item2.pk, None, None, Decimal('100.00'), False, False, Decimal('0.00')),
+        )
+        assert [p for p, d in apply_discounts(event, 'web', positions)] == [Decimal('100.00'), Decimal('100.00')]
+        with django_assert_num_queries(0):
+            assert [p for p, d in apply_discounts(event, 'web', positions)] == [Decimal('100.00'), Decimal('100.00')]
+
+        d1.condition_limit_products.add(item2)
+        assert [p for p, d in apply_discounts(event, 'web', positions)] == [Decimal('80.00'), Decimal('80.00')]
+
+        d1.benefit_discount_matching_percent = 50
+        d1.save()
+        assert [p for p, d in apply_discounts(event, 'web', positions)] == [Decimal('50.00'), Decimal('50.00')]
+
+        d1.delete()
+        assert [p for p, d in apply_discounts(event, 'web', positions)] == [Decimal('100.00'), Decimal('100.00')]
+
+
+@pytest.mark.django_db
+@scopes_disabled()
+def test_large_cart_query_count(event, item, item2, item3, django_assert_num_queries):
+    for i in range(12):
+        d = Discount.objects.create(
+            event=event, condition_min_count=2 + i % 3, benefit_discount_matching_percent=10 + i,
+            benefit_only_apply_to_cheapest_n_matches=1, condition_all_products=False, position=i,
+        )
+        d.condition_limit_products.add([item, item2, item3][i % 3])
+
+    positions = []
+    for i in range(40):
+        positions.append((item.pk, None, None, Decimal('23.00'), False, False, Decimal('0.00')))
+        positions.append((item2.pk, None, None, Decimal('50.00'), i, False, Decimal('0.00')))
+        positions.append((item3.pk, None, None, Decimal('42.00'), i, False, Decimal('0.00')))
+
+    with django_assert_num_queries(3):
+        result = apply_discounts(event, 'web', positions)
+
+    assert len(result) == 120
+    # The first discount for every product consumes all of its positions, with every 2nd, 3rd or 4th one discounted
+    assert sorted(p for p, d in result if p != Decimal('23.00') and d and d.position == 0) == [Decimal('20.70')] * 20
+    assert len([1 for p, d in result if d and d.position == 1]) == 39
+    assert len([1 for p, d in result if d and d.position == 2]) == 40
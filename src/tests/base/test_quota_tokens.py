@@ -0,0 +1,155 @@
+#
+# This file is part of pretix (Community Edition).
+#
+# Copyright (C) 2014-2020  Raphael Michel and contributors
+# Copyright (C) 2020-today pretix GmbH and contributors
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU Affero General
+# Public License as published by the Free Software Foundation in version 3 of the License.
+#
+# ADDITIONAL TERMS APPLY: Pursuant to Section 7 of the GNU Affero General Public License, additional terms are
+# applicable granting you additional permissions and placing additional restrictions on your usage of this software.
+# Please refer to the pretix LICENSE file to obtain the full terms applicable to this work. If you did not receive
+# this file, see <https://pretix.eu/about/en/license>.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License along with this program.  If not, see
+# <https://www.gnu.org/licenses/>.
+#
+
+from datetime import timedelta
+from unittest import mock
+
+import pytest
+from django.test import override_settings
+from django.utils.timezone import now
+from django_scopes import scope
+
+from pretix.base.models import CartPosition, Event, Organizer
+from pretix.base.services.cart import CartError, CartManager
+from pretix.base.services.quotas import (
+    reconcile_quota_tokens, set_quota_tokens, take_quota_tokens,
+)
+
+
+@pytest.fixture
+def event():
+    o = Organizer.objects.create(name='Dummy', slug='dummy')
+    event = Event.objects.create(
+        organizer=o, name='Dummy', slug='dummy',
+        date_from=now() + timedelta(days=10), live=True,
+    )
+    with scope(organizer=o):
+        yield event
+
+
+@pytest.fixture
+def item(event):
+    return event.items.create(name="Ticket", default_price=23)
+
+
+def make_quota(event, item, size):
+    q = event.quotas.create(name="Tickets", size=size)
+    q.items.add(item)
+    return q
+
+
+def add_to_cart(event, item, count=1, cart_id='abc'):
+    cm = CartManager(event=event, cart_id=cart_id, sales_channel=event.organizer.sales_channels.get(identifier="web"))
+    cm.add_new_items([{'item': item.pk, 'variation': None, 'count': count}])
+    cm.commit()
+
+
+def tokens(redis, quota):
+    v = redis.get(f'quotas:{quota.pk}:tokens')
+    return int(v) if v is not None else None
+
+
+@pytest.mark.django_db
+@override_settings(QUOTA_TOKENS_MARGIN=10)
+def test_take_all_or_nothing(fakeredis_client, event, item):
+    q1 = make_quota(event, item, 100)
+    q2 = make_quota(event, item, 100)
+    set_quota_tokens({q1: 100, q2: 15})
+
+    assert take_quota_tokens({q1: 5, q2: 5})
+    assert tokens(fakeredis_client, q1) == 95
+    assert tokens(fakeredis_client, q2) == 10
+
+    assert not take_quota_tokens({q1: 5, q2: 1})
+    assert tokens(fakeredis_client, q1) == 95
+    assert tokens(fakeredis_client, q2) == 10
+
+    fakeredis_client.delete(f'quotas:{q1.pk}:tokens')
+    assert not take_quota_tokens({q1: 1})
+
+
+@pytest.mark.django_db
+@override_settings(QUOTA_TOKENS_MARGIN=10)
+def test_cart_fast_path(fakeredis_client, event, item):
+    q = make_quota(event, item, 100)
+
+    with mock.patch('pretix.base.services.cart.lock_objects') as lock:
+        add_to_cart(event, item, 2)
+        assert q in lock.call_args[0][0]
+    # The exact check has filled in the headroom
+    assert tokens(fakeredis_client, q) == 98
+
+    with mock.patch('pretix.base.services.cart.lock_objects') as lock:
+        add_to_cart(event, item, 3, cart_id='def')
+        assert q not in lock.call_args[0][0]
+    assert tokens(fakeredis_client, q) == 95
+    assert CartPosition.objects.filter(event=event).count() == 5
+
+
+@pytest.mark.django_db
+@override_settings(QUOTA_TOKENS_MARGIN=10)
+def test_cart_exact_check_below_margin(fakeredis_client, event, item):
+    q = make_quota(event, item, 12)
+    add_to_cart(event, item, 2)
+    assert tokens(fakeredis_client, q) == 10
+
+    with mock.patch('pretix.base.services.cart.lock_objects') as lock:
+        add_to_cart(event, item, 8, cart_id='def')
+        assert q in lock.call_args[0][0]
+    assert tokens(fakeredis_client, q) == 2
+
+    with pytest.raises(CartError):
+        add_to_cart(event, item, 5, cart_id='ghi')
+    assert CartPosition.objects.filter(event=event).count() == 12
+
+
+@pytest.mark.django_db
+@override_settings(QUOTA_TOKENS_MARGIN=10)
+def test_quota_change_clears_tokens(fakeredis_client, event, item):
+    q = make_quota(event, item, 100)
+    set_quota_tokens({q: 100})
+    q.size = 10
+    q.save()
+    assert tokens(fakeredis_client, q) is None
+
+
+@pytest.mark.django_db
+@override_settings(QUOTA_TOKENS_MARGIN=10)
+def test_reconcile(fakeredis_client, event, item):
+    q1 = make_quota(event, item, 100)
+    q2 = make_quota(event, item, 100)
+    add_to_cart(event, item, 2)
+    set_quota_tokens({q1: 50, q2: 50})
+    fakeredis_client.delete(f'quotas:{q2.pk}:tokens')
+
+    reconcile_quota_tokens(None)
+    assert tokens(fakeredis_client, q1) == 98
+    assert tokens(fakeredis_client, q2) is None
+    assert fakeredis_client.smembers('quotas:tokens') == {str(q1.pk).encode()}
+
+
+@pytest.mark.django_db
+def test_disabled_by_default(fakeredis_client, event, item):
+    q = make_quota(event, item, 100)
+    add_to_cart(event, item, 2)
+    assert tokens(fakeredis_client, q) is None
+    assert not take_quota_tokens({q: 1})
@@ -32,9 +32,11 @@
 # distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 # License for the specific language governing permissions and limitations under the License.
 
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.utils.timezone import now
 from django_scopes import scopes_disabled
+from hierarkey.proxy import dirty_cache_keys
 from i18nfield.strings import LazyI18nString
 
 from pretix.base import settings
@@ -89,3 +91,63 @@ class SettingsTestCase(TestCase):
 
         self.assertIsNone(sandbox.bar)
         self.assertIsNone(sandbox['baz'])
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                       'LOCATION': 'settings-snapshots'}})
+class SettingsSnapshotTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        settings.settings_snapshots.clear()
+        # Other test cases leave uncommitted settings changes behind
+        dirty_cache_keys.set(set())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.organizer = Organizer.objects.create(name='Dummy', slug='dummy')
+            self.event = Event.objects.create(
+                organizer=self.organizer, name='Dummy', slug='dummy',
+                date_from=now(),
+            )
+            self.event.settings.set('test_i18n', LazyI18nString({'de': 'Hallo', 'en': 'Hello'}))
+            self.event.settings.set('test_dict', {'a': 1})
+
+    def _fresh_event(self):
+        with scopes_disabled():
+            return Event.objects.select_related('organizer').get(pk=self.event.pk)
+
+    def test_snapshot_shared_between_instances(self):
+        first = self._fresh_event().settings.get('test_i18n', as_type=LazyI18nString)
+        self._fresh_event().settings.get('timezone')
+        event = self._fresh_event()
+        with self.assertNumQueries(0):
+            second = event.settings.get('test_i18n', as_type=LazyI18nString)
+            event.settings.get('timezone')
+        assert first is second
+        assert str(second.localize('en')) == 'Hello'
+
+    def test_mutable_values_not_shared(self):
+        d = self._fresh_event().settings.get('test_dict', as_type=dict)
+        d['b'] = 2
+        assert self._fresh_event().settings.get('test_dict', as_type=dict) == {'a': 1}
+
+    def test_version_bumped_on_save(self):
+        assert self._fresh_event().settings.get('test_i18n', as_type=LazyI18nString).localize('en') == 'Hello'
+        with self.captureOnCommitCallbacks(execute=True):
+            self._fresh_event().settings.set('test_i18n', LazyI18nString({'en': 'Goodbye'}))
+        assert self._fresh_event().settings.get('test_i18n', as_type=LazyI18nString).localize('en') == 'Goodbye'
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._fresh_event().settings.delete('test_i18n')
+        assert self._fresh_event().settings.get('test_i18n', as_type=LazyI18nString) is None
+
+    def test_inherited_values_follow_parent_version(self):
+        assert self._fresh_event().settings.get('test_inherited') is None
+        with self.captureOnCommitCallbacks(execute=True):
+            Organizer.objects.get(pk=self.organizer.pk).settings.set('test_inherited', 'foo')
+        assert self._fresh_event().settings.get('test_inherited') == 'foo'
+        assert self._fresh_event().settings.get('test_missing', default='bar') == 'bar'
+
+    def test_uncommitted_changes_not_exposed(self):
+        event = self._fresh_event()
+        event.settings.set('test_dict', {'a': 2})
+        assert event.settings.get('test_dict', as_type=dict) == {'a': 2}
+        assert self._fresh_event().settings.get('test_dict', as_type=dict) == {'a': 2}
@@ -0,0 +1,192 @@
+#
+# This file is part of pretix (Community Edition).
+#
+# Copyright (C) 2014-2020  Raphael Michel and contributors
+# Copyright (C) 2020-today pretix GmbH and contributors
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU Affero General
+# Public License as published by the Free Software Foundation in version 3 of the License.
+#
+# ADDITIONAL TERMS APPLY: Pursuant to Section 7 of the GNU Affero General Public License, additional terms are
+# applicable granting you additional permissions and placing additional restrictions on your usage of this software.
+# Please refer to the pretix LICENSE file to obtain the full terms applicable to this work. If you did not receive
+# this file, see <https://pretix.eu/about/en/license>.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License along with this program.  If not, see
+# <https://www.gnu.org/licenses/>.
+#
+
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from unittest import mock
+from zoneinfo import ZoneInfo
+
+import pytest
+from django.utils.timezone import now
+from django_scopes import scope
+
+from pretix.base.models import Event, Order, OrderPosition, Organizer
+from pretix.base.models.orders import OrderPayment
+from pretix.base.models.stats import OrderPositionRollupState
+from pretix.base.services.stats import (
+    _outdated_rollup_days, order_overview, refresh_order_rollups,
+)
+
+
+@pytest.fixture
+def event():
+    o = Organizer.objects.create(name='Dummy', slug='dummy')
+    event = Event.objects.create(
+        organizer=o, name='Dummy', slug='dummy',
+        date_from=now(),
+    )
+    event.settings.timezone = 'Europe/Berlin'
+    with scope(organizer=o):
+        yield event
+
+
+@pytest.fixture
+def item(event):
+    return event.items.create(name='Ticket', default_price=Decimal('23.00'))
+
+
+def _order(event, item, status=Order.STATUS_PENDING, dt=None, count=1):
+    o = Order.objects.create(
+        event=event, status=status, datetime=dt or now(), expires=now() + timedelta(days=10),
+        total=item.default_price * count, sales_channel=event.organizer.sales_channels.get(identifier="web"),
+    )
+    for i in range(count):
+        OrderPosition.objects.create(
+            order=o, item=item, variation=None, price=item.default_price, positionid=i + 1,
+        )
+    return o
+
+
+def _numbers(event, **kwargs):
+    # Usually done by a background task
+    refresh_order_rollups(event)
+    assert _outdated_rollup_days(event) is not None
+    cats, total = order_overview(event, **kwargs)
+    live_cats, live_total = order_overview(event, base_qs=OrderPosition.all, **kwargs)
+    assert total == live_total
+    return total['num']
+
+
+@pytest.mark.django_db
+def test_rollups_match_live_query(event, item):
+    _order(event, item, status=Order.STATUS_PAID, count=2)
+    _order(event, item, status=Order.STATUS_PENDING)
+    _order(event, item, status=Order.STATUS_CANCELED)
+    num = _numbers(event)
+    assert num['paid'] == (2, Decimal('46.00'), Decimal('46.00'))
+    assert num['pending'] == (1, Decimal('23.00'), Decimal('23.00'))
+    assert num['canceled'] == (1, Decimal('23.00'), Decimal('23.00'))
+    assert num['total'] == (3, Decimal('69.00'), Decimal('69.00'))
+    assert event.order_position_rollups.exists()
+
+
+@pytest.mark.django_db
+def test_rollups_updated_incrementally(event, item):
+    o = _order(event, item, status=Order.STATUS_PENDING, dt=now() - timedelta(days=3))
+    old = _order(event, item, status=Order.STATUS_PAID, dt=now() - timedelta(days=10))
+    Order.objects.filter(pk=old.pk).update(last_modified=now() - timedelta(hours=1))
+    assert _numbers(event)['paid'][0] == 1
+    OrderPositionRollupState.objects.filter(event=event).update(watermark=now() - timedelta(minutes=30))
+    old_rollup = event.order_position_rollups.get(day=old.datetime.astimezone(event.timezone).date())
+
+    o.status = Order.STATUS_PAID
+    o.save()
+    assert _numbers(event)['paid'][0] == 2
+    # Rollups of days without changes have been left untouched
+    assert event.order_position_rollups.get(day=old.datetime.astimezone(event.timezone).date()).pk == old_rollup.pk
+
+
+@pytest.mark.django_db
+def test_rollups_order_date_filter(event, item):
+    tz = ZoneInfo('Europe/Berlin')
+    _order(event, item, dt=datetime(2024, 3, 1, 0, 30, tzinfo=tz))
+    _order(event, item, dt=datetime(2024, 3, 2, 23, 30, tzinfo=tz))
+    _order(event, item, dt=datetime(2024, 3, 3, 0, 30, tzinfo=tz))
+    assert _numbers(event, date_filter='order_date', date_from=date(2024, 3, 1), date_until=date(2024, 3, 2))['pending'][0] == 2
+    assert _numbers(event, date_filter='order_date', date_from=date(2024, 3, 2))['pending'][0] == 2
+    assert _numbers(event, date_filter='order_date', date_until=date(2024, 2, 28))['pending'][0] == 0
+
+
+@pytest.mark.django_db
+def test_rollups_last_payment_date_filter(event, item):
+    tz = ZoneInfo('Europe/Berlin')
+    o1 = _order(event, item, status=Order.STATUS_PAID)
+    o1.payments.create(
+        amount=o1.total, provider='manual', state=OrderPayment.PAYMENT_STATE_CONFIRMED,
+        payment_date=datetime(2024, 3, 1, 12, 0, tzinfo=tz),
+    )
+    o1.payments.create(
+        amount=o1.total, provider='manual', state=OrderPayment.PAYMENT_STATE_CONFIRMED,
+        payment_date=datetime(2024, 3, 5, 12, 0, tzinfo=tz),
+    )
+    _order(event, item, status=Order.STATUS_PAID)
+    num = _numbers(event, date_filter='last_payment_date', date_from=date(2024, 3, 5), date_until=date(2024, 3, 5))
+    assert num['paid'][0] == 1
+    num = _numbers(event, date_filter='last_payment_date', date_from=date(2024, 3, 1), date_until=date(2024, 3, 1))
+    assert num['paid'][0] == 0
+
+
+@pytest.mark.django_db
+def test_rollups_rebuilt_after_order_deletion(event, item):
+    o = _order(event, item, status=Order.STATUS_PAID)
+    _order(event, item, status=Order.STATUS_PAID)
+    assert _numbers(event)['paid'][0] == 2
+    o.all_positions.all().delete()
+    o.delete()
+    assert OrderPositionRollupState.objects.get(event=event).watermark is None
+    assert _numbers(event)['paid'][0] == 1
+
+
+@pytest.mark.django_db
+def test_rollups_rebuilt_after_timezone_change(event, item):
+    _order(event, item, dt=datetime(2024, 3, 1, 23, 30, tzinfo=ZoneInfo('UTC')))
+    refresh_order_rollups(event)
+    assert event.order_position_rollups.get().day == date(2024, 3, 2)
+    event.settings.timezone = 'UTC'
+    refresh_order_rollups(event)
+    assert event.order_position_rollups.get().day == date(2024, 3, 1)
+
+
+def _day(event, dt):
+    return dt.astimezone(event.timezone).date()
+
+
+@pytest.mark.django_db
+def test_overview_aggregates_modified_days_live(event, item, django_capture_on_commit_callbacks):
+    old = _order(event, item, status=Order.STATUS_PAID, dt=now() - timedelta(days=10))
+    Order.objects.filter(pk=old.pk).update(last_modified=now() - timedelta(hours=1))
+    refresh_order_rollups(event)
+    watermark = OrderPositionRollupState.objects.get(event=event).watermark
+    # Proves that the untouched day is answered from its rollup
+    event.order_position_rollups.filter(day=_day(event, old.datetime)).update(count=5)
+    new = _order(event, item, status=Order.STATUS_PAID)
+    assert _outdated_rollup_days(event) == [_day(event, new.datetime)]
+
+    with mock.patch('pretix.base.services.stats.refresh_order_rollups_task.apply_async') as apply_async:
+        with django_capture_on_commit_callbacks(execute=True):
+            cats, total = order_overview(event)
+    assert total['num']['paid'][0] == 6
+    assert apply_async.called
+    assert OrderPositionRollupState.objects.get(event=event).watermark == watermark
+
+
+@pytest.mark.django_db
+def test_rollups_outdated_by_payment(event, item):
+    o = _order(event, item, status=Order.STATUS_PAID, dt=now() - timedelta(days=3))
+    Order.objects.filter(pk=o.pk).update(last_modified=now() - timedelta(hours=1))
+    refresh_order_rollups(event)
+    assert _outdated_rollup_days(event) == []
+    o.payments.create(
+        amount=o.total, provider='manual', state=OrderPayment.PAYMENT_STATE_CONFIRMED, payment_date=now(),
+    )
+    assert _outdated_rollup_days(event) == [_day(event, o.datetime)]
+    assert _numbers(event, date_filter='last_payment_date', date_from=now().astimezone(event.timezone).date())['paid'][0] == 1
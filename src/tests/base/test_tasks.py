@@ -0,0 +1,85 @@
+#
+# This file is part of pretix (Community Edition).
+#
+# Copyright (C) 2014-2020  Raphael Michel and contributors
+# Copyright (C) 2020-today pretix GmbH and contributors
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU Affero General
+# Public License as published by the Free Software Foundation in version 3 of the License.
+#
+# ADDITIONAL TERMS APPLY: Pursuant to Section 7 of the GNU Affero General Public License, additional terms are
+# applicable granting you additional permissions and placing additional restrictions on your usage of this software.
+# Please refer to the pretix LICENSE file to obtain the full terms applicable to this work. If you did not receive
+# this file, see <https://pretix.eu/about/en/license>.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License along with this program.  If not, see
+# <https://www.gnu.org/licenses/>.
+#
+
+import time
+
+import pytest
+from celery import states
+from django.test import RequestFactory, override_settings
+
+from pretix.base import metrics
+from pretix.base.views.tasks import AsyncMixin, poll_interval
+
+from .test_metrics import FakeRedis
+
+
+class FakeResult:
+    id = 'abc'
+
+    def __init__(self, state, info=None):
+        self.state = state
+        self.info = info
+
+    def ready(self):
+        return self.state in states.READY_STATES
+
+    def get(self, *args, **kwargs):
+        raise AssertionError('Must not wait for the result')
+
+
+def _view(submitted_ago):
+    view = AsyncMixin()
+    view.request = RequestFactory().get('/', {
+        'async_id': 'abc',
+        'async_ts': int((time.time() - submitted_ago) * 1000),
+        'ajax': '1',
+        'ajax_dont_redirect': '1',
+    })
+    return view
+
+
+def test_poll_interval():
+    assert poll_interval(0.5) == 250
+    assert poll_interval(5) == 500
+    assert poll_interval(30) == 1000
+    assert poll_interval(600) == 3000
+
+
+def test_poll_does_not_wait():
+    data = _view(submitted_ago=5)._return_ajax_result(FakeResult(states.PENDING), timeout=0)
+    assert not data['ready']
+    assert data['retry_after'] == 500
+
+
+@pytest.mark.django_db
+@override_settings(HAS_REDIS=True, METRICS_ENABLED=True)
+def test_time_to_result_observed(monkeypatch):
+    fake_redis = FakeRedis()
+    monkeypatch.setattr(metrics, "redis", fake_redis, raising=False)
+
+    data = _view(submitted_ago=3)._return_ajax_result(FakeResult(states.SUCCESS, 'ok'), timeout=0)
+    assert data['ready']
+    assert 'retry_after' not in data
+    metrics.flush()
+    labels = '{view="AsyncMixin",delivery="poll"'
+    assert fake_redis.storage['pretix_async_result_seconds_count' + labels + '}'] == 1
+    assert fake_redis.storage['pretix_async_result_seconds_bucket' + labels + ',le="5.0"}'] == 1
@@ -20,6 +20,7 @@
 # <https://www.gnu.org/licenses/>.
 #
 from datetime import timedelta
+from unittest import mock
 
 from django.core import mail as djmail
 from django.test import TestCase
@@ -32,7 +33,7 @@ from pretix.base.models import (
 from pretix.base.models.waitinglist import WaitingListException
 from pretix.base.reldate import RelativeDate, RelativeDateWrapper
 from pretix.base.services.waitinglist import (
-    assign_automatically, process_waitinglist,
+    _plan, assign_automatically, process_waitinglist,
 )
 from pretix.testutils.scope import classscope
 
@@ -176,6 +177,56 @@ class WaitingListTestCase(TestCase):
                 'foo0@bar.com', 'foo1@bar.com', 'foo2@bar.com'
             ]
 
+    def test_send_auto_batched_mail_after_commit(self):
+        with scope(organizer=self.o):
+            self.quota.variations.add(self.var1)
+            self.quota.size = 7
+            self.quota.save()
+            for i in range(10):
+                WaitingListEntry.objects.create(
+                    event=self.event, item=self.item2, variation=self.var1, email='foo{}@bar.com'.format(i)
+                )
+
+        with mock.patch('pretix.base.services.waitinglist.ASSIGN_BATCH_SIZE', 3):
+            with self.captureOnCommitCallbacks() as callbacks:
+                assign_automatically.apply(args=(self.event.pk,))
+        assert len(djmail.outbox) == 0
+        with scope(organizer=self.o):
+            assert WaitingListEntry.objects.filter(voucher__isnull=True).count() == 3
+            assert Voucher.objects.count() == 7
+
+        for c in callbacks:
+            c()
+        assert len(djmail.outbox) == 7
+        assert sorted(m.to[0] for m in djmail.outbox) == ['foo{}@bar.com'.format(i) for i in range(7)]
+
+    def test_send_auto_entry_changed_after_planning(self):
+        with scope(organizer=self.o):
+            self.quota.variations.add(self.var1)
+            self.quota.size = 7
+            self.quota.save()
+            for i in range(3):
+                WaitingListEntry.objects.create(
+                    event=self.event, item=self.item2, variation=self.var1, email='foo{}@bar.com'.format(i),
+                    name_parts={'full_name': 'Max'}
+                )
+
+        def plan_and_anonymize(*args, **kwargs):
+            planned = _plan(*args, **kwargs)
+            WaitingListEntry.objects.filter(email='foo0@bar.com').update(
+                email='»anonymized«', name_parts={}, name_cached=None
+            )
+            WaitingListEntry.objects.filter(email='foo1@bar.com').update(email='new@bar.com')
+            return planned
+
+        with mock.patch('pretix.base.services.waitinglist._plan', plan_and_anonymize):
+            assign_automatically.apply(args=(self.event.pk,))
+        with scope(organizer=self.o):
+            assert not WaitingListEntry.objects.filter(email__in=['foo0@bar.com', 'foo1@bar.com']).exists()
+            assert WaitingListEntry.objects.get(email='»anonymized«').voucher is None
+            assert WaitingListEntry.objects.get(email='new@bar.com').voucher
+            assert WaitingListEntry.objects.get(email='foo2@bar.com').voucher
+
     def test_send_auto_quota_infinite(self):
         with scope(organizer=self.o):
             self.quota.variations.add(self.var1)
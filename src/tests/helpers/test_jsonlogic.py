@@ -24,7 +24,7 @@ import os
 
 import pytest
 
-from pretix.helpers.jsonlogic import Logic
+from pretix.helpers.jsonlogic import Logic, compile_logic
 
 with open(os.path.join(os.path.dirname(__file__), 'jsonlogic-tests.json'), 'r') as f:
     data = json.load(f)
@@ -44,6 +44,11 @@ def test_shared_tests(logic, data, expected):
     assert Logic().apply(logic, data) == expected
 
 
+@pytest.mark.parametrize("logic,data,expected", params)
+def test_shared_tests_compiled(logic, data, expected):
+    assert compile_logic(logic)(Logic(), data) == expected
+
+
 def test_unknown_operator():
     with pytest.raises(ValueError):
         assert Logic().apply({'unknownOp': []}, {})
@@ -53,3 +58,12 @@ def test_custom_operation():
     logic = Logic()
     logic.add_operation('double', lambda a: a * 2)
     assert logic.apply({'double': [{'var': 'value'}]}, {'value': 3}) == 6
+
+
+def test_compiled_custom_operation():
+    f = compile_logic({'double': [{'var': 'value'}]})
+    with pytest.raises(ValueError):
+        f(Logic(), {'value': 3})
+    logic = Logic()
+    logic.add_operation('double', lambda a: a * 2)
+    assert f(logic, {'value': 3}) == 6
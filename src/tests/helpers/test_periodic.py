@@ -0,0 +1,98 @@
+#
+# This file is part of pretix (Community Edition).
+#
+# Copyright (C) 2014-2020  Raphael Michel and contributors
+# Copyright (C) 2020-today pretix GmbH and contributors
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU Affero General
+# Public License as published by the Free Software Foundation in version 3 of the License.
+#
+# ADDITIONAL TERMS APPLY: Pursuant to Section 7 of the GNU Affero General Public License, additional terms are
+# applicable granting you additional permissions and placing additional restrictions on your usage of this software.
+# Please refer to the pretix LICENSE file to obtain the full terms applicable to this work. If you did not receive
+# this file, see <https://pretix.eu/about/en/license>.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License along with this program.  If not, see
+# <https://www.gnu.org/licenses/>.
+#
+
+import pytest
+from django.test import override_settings
+
+from pretix.base.services.periodic import run_periodic_receiver
+from pretix.base.signals import periodic_task
+from pretix.helpers.periodic import (
+    SKIPPED, acquire_lock, get_history, minimum_interval, release_lock,
+    run_receiver,
+)
+
+LOCMEM = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'test_periodic',
+    }
+}
+
+
+@override_settings(CACHES=LOCMEM)
+def test_lock():
+    token = acquire_lock('foo', 10)
+    assert token
+    assert acquire_lock('foo', 10) is None
+    release_lock('foo', 'wrong')
+    assert acquire_lock('foo', 10) is None
+    release_lock('foo', token)
+    token = acquire_lock('foo', 10)
+    assert token
+    release_lock('foo', token)
+
+
+@override_settings(CACHES=LOCMEM)
+def test_minimum_interval_history():
+    calls = []
+
+    @minimum_interval(minutes_after_success=10, minutes_running_timeout=5)
+    def my_task(sender, **kwargs):
+        calls.append(1)
+
+    assert my_task.periodic_timeout == 300
+    run_receiver(my_task, periodic_task, None)
+    assert run_receiver(my_task, periodic_task, None) is SKIPPED
+    assert len(calls) == 1
+
+    history = get_history(f'{my_task.__module__}.{my_task.__name__}')
+    assert [h['outcome'] for h in history] == ['skipped', 'success']
+
+
+def _failing_task(sender, **kwargs):
+    raise ValueError('Oops')
+
+
+@override_settings(CACHES=LOCMEM)
+def test_error_history():
+    with pytest.raises(ValueError):
+        run_receiver(_failing_task, periodic_task, None)
+    history = get_history(f'{__name__}._failing_task')
+    assert history[0]['outcome'] == 'error'
+    assert history[0]['message'] == 'Oops'
+
+
+@override_settings(CACHES=LOCMEM)
+def test_dispatched_task_skipped_while_running():
+    periodic_task.connect(_failing_task, dispatch_uid='test_periodic_failing')
+    try:
+        name = f'{__name__}._failing_task'
+        token = acquire_lock(f'periodic_task_{name}', 10)
+        run_periodic_receiver.apply(args=(name,))
+        assert get_history(name)[0]['outcome'] == 'skipped'
+
+        release_lock(f'periodic_task_{name}', token)
+        with pytest.raises(ValueError):
+            run_periodic_receiver.apply(args=(name,), throw=True)
+        assert get_history(name)[0]['outcome'] == 'error'
+    finally:
+        periodic_task.disconnect(dispatch_uid='test_periodic_failing')
@@ -0,0 +1,102 @@
+#
+# This file is part of pretix (Community Edition).
+#
+# Copyright (C) 2014-2020  Raphael Michel and contributors
+# Copyright (C) 2020-today pretix GmbH and contributors
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU Affero General
+# Public License as published by the Free Software Foundation in version 3 of the License.
+#
+# ADDITIONAL TERMS APPLY: Pursuant to Section 7 of the GNU Affero General Public License, additional terms are
+# applicable granting you additional permissions and placing additional restrictions on your usage of this software.
+# Please refer to the pretix LICENSE file to obtain the full terms applicable to this work. If you did not receive
+# this file, see <https://pretix.eu/about/en/license>.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License along with this program.  If not, see
+# <https://www.gnu.org/licenses/>.
+#
+
+import json
+
+import pytest
+from django.conf import settings
+from django.core.cache import cache
+from django.test import override_settings
+from django_scopes import scopes_disabled
+
+from pretix.base.models import Organizer
+from pretix.helpers.profile.queries import QueryProfile, fingerprint
+
+LOCMEM = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'test_query_profile',
+    }
+}
+
+
+def test_fingerprint():
+    assert fingerprint('SELECT * FROM foo WHERE id = 3 AND name = \'bar\'') == 'SELECT * FROM foo WHERE id = ? AND name = ?'
+    assert fingerprint('SELECT *\n  FROM foo WHERE id IN (%s, %s, %s)') == 'SELECT * FROM foo WHERE id IN (...)'
+    assert fingerprint('SELECT * FROM foo WHERE id IN (%s, %s)') == fingerprint('SELECT * FROM foo WHERE id IN (%s,%s,%s)')
+
+
+@pytest.mark.django_db
+@scopes_disabled()
+def test_queries_and_duplicates():
+    o1 = Organizer.objects.create(name='Dummy', slug='dummy')
+    o2 = Organizer.objects.create(name='Dummy', slug='dummy2')
+
+    with QueryProfile('view', 'test') as profile:
+        Organizer.objects.get(pk=o1.pk)
+        Organizer.objects.get(pk=o2.pk)
+        Organizer.objects.count()
+
+    assert profile.queries == 3
+    assert profile.db_time > 0
+    assert len(profile.duplicates) == 1
+    assert profile.duplicates[0]['count'] == 2
+    assert '"pretixbase_organizer"' in profile.duplicates[0]['fingerprint']
+
+    Organizer.objects.count()
+    assert profile.queries == 3
+
+
+@override_settings(CACHES=LOCMEM)
+def test_cache_hits_and_misses():
+    cache.clear()
+    cache.set('a', 1)
+    with QueryProfile('task', 'test') as profile:
+        assert cache.get('a') == 1
+        assert cache.get('b', 'default') == 'default'
+        assert cache.get_many(['a', 'b', 'c']) == {'a': 1}
+    assert profile.cache_hits == 2
+    assert profile.cache_misses == 3
+    assert 'get' not in cache.__dict__
+    cache.get('a')
+    assert profile.cache_hits == 2
+
+
+@pytest.mark.django_db
+def test_middleware_requested_by_header(client, tmp_path):
+    middleware = ['pretix.helpers.profile.middleware.QueryProfileMiddleware'] + settings.MIDDLEWARE
+    with override_settings(MIDDLEWARE=middleware, QUERY_PROFILING_SECRET='s3cr3t', PROFILE_DIR=str(tmp_path)):
+        client.get('/control/login')
+        assert not list(tmp_path.iterdir())
+
+        client.get('/control/login', headers={'X-Pretix-Profile-Queries': 'wrong'})
+        assert not list(tmp_path.iterdir())
+
+        client.get('/control/login', headers={'X-Pretix-Profile-Queries': 's3cr3t'})
+        files = list(tmp_path.iterdir())
+        assert len(files) == 1
+        report = json.loads(files[0].read_text().strip())
+        assert report['kind'] == 'view'
+        assert report['name'] == 'control:auth.login'
+        assert report['path'] == '/control/login'
+        assert report['status_code'] == 200
+        assert report['queries'] > 0
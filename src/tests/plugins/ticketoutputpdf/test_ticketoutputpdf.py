@@ -22,15 +22,21 @@
 from datetime import timedelta
 from decimal import Decimal
 from io import BytesIO
+from unittest import mock
 
 import pytest
+from django.core.cache import cache
+from django.test import override_settings
 from django.utils.timezone import now
 from django_scopes import scope
 from pypdf import PdfReader
 
 from pretix.base.models import (
-    Event, Item, ItemVariation, Order, OrderPosition, Organizer,
+    CachedCombinedTicket, CachedTicket, Event, Item, ItemVariation, Order,
+    OrderPosition, Organizer,
 )
+from pretix.base.services import tickets
+from pretix.base.services.tickets import get_tickets_for_order
 from pretix.plugins.ticketoutputpdf.ticketoutput import PdfTicketOutput
 
 
@@ -73,3 +79,57 @@ def test_generate_pdf(env0):
         assert ftype == 'application/pdf'
         pdf = PdfReader(BytesIO(buf))
         assert len(pdf.pages) == 1
+
+
+@pytest.mark.django_db
+def test_prerender_on_paid(env0, django_capture_on_commit_callbacks):
+    event, order = env0
+    event.plugins = 'pretix.plugins.ticketoutputpdf'
+    event.save()
+    event.settings.ticket_download = True
+    event.settings.ticketoutput_pdf__enabled = True
+    with scope(organizer=event.organizer):
+        item = order.positions.first().item
+        item.admission = True
+        item.save()
+        with django_capture_on_commit_callbacks(execute=True):
+            order.payments.create(provider='manual', amount=order.total).confirm()
+
+        assert CachedTicket.objects.filter(order_position__order=order, provider='pdf').count() == 2
+        assert CachedCombinedTicket.objects.filter(order=order, provider='pdf').count() == 1
+
+        # Emails and downloads reuse the rendered files
+        cts = {ct.pk for ct in CachedTicket.objects.all()} | {ct.pk for ct in CachedCombinedTicket.objects.all()}
+        assert {ct.pk for name, ct in get_tickets_for_order(order)} <= cts
+
+
+@pytest.mark.django_db
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+def test_wait_for_running_prerender_once_per_order(env0, monkeypatch):
+    event, order = env0
+    event.plugins = 'pretix.plugins.ticketoutputpdf'
+    event.save()
+    event.settings.ticket_download = True
+    event.settings.ticketoutput_pdf__enabled = True
+    monkeypatch.setattr(tickets, 'PRERENDER_WAIT_SECONDS', 1)
+    monkeypatch.setattr(PdfTicketOutput, 'multi_download_enabled', property(lambda self: False))
+    with scope(organizer=event.organizer):
+        item = order.positions.first().item
+        item.admission = True
+        item.save()
+        order.status = Order.STATUS_PAID
+        order.save()
+
+        # A rendering that has not started yet is not waited for
+        with mock.patch('pretix.base.services.tickets.prerender_tickets.apply_async'):
+            tickets.enqueue_prerender(order)
+        with mock.patch('pretix.base.services.tickets.time.sleep') as sleep:
+            assert len(get_tickets_for_order(order)) == 2
+        assert not sleep.called
+
+        # A rendering that has started but never finishes is waited for once for all files of the order
+        CachedTicket.objects.all().delete()
+        cache.set(tickets._rendering_key(order.pk), '1')
+        with mock.patch('pretix.base.services.tickets.time.sleep', wraps=tickets.time.sleep) as sleep:
+            assert len(get_tickets_for_order(order)) == 2
+        assert 0 < sleep.call_count <= 3
@@ -36,11 +36,12 @@ import datetime
 import json
 from datetime import timedelta
 from decimal import Decimal
+from unittest import mock
 
 import freezegun
 from bs4 import BeautifulSoup
 from django.conf import settings
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.utils.timezone import now
 from django_countries.fields import Country
 from django_scopes import scopes_disabled
@@ -2670,6 +2671,82 @@ class CartTest(CartTestMixin, TestCase):
         self.assertEqual(len(objs), 2)
         self.assertEqual({objs[0].price, objs[1].price}, {Decimal('4.00'), Decimal('4.00')})
 
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_recompute_prices_only_for_changed_positions(self):
+        with scopes_disabled():
+            event = Event.objects.get(pk=self.event.pk)  # event.cache is bound to the cache backend on first use
+            Discount.objects.create(event=event, condition_min_count=3, benefit_discount_matching_percent=20,
+                                    benefit_only_apply_to_cheapest_n_matches=1)
+            cps = [
+                CartPosition.objects.create(
+                    expires=now() + timedelta(minutes=10), max_extend=now() + 10 * self.cart_reservation_time,
+                    item=self.ticket, price=Decimal('23.00'), event=event, cart_id=self.session_key
+                ) for i in range(3)
+            ]
+            cm = CartManager(event=event, cart_id=self.session_key,
+                             sales_channel=self.orga.sales_channels.get(identifier="web"))
+            cm.recompute_final_prices_and_taxes()
+            assert sorted(cp.price for cp in CartPosition.objects.filter(cart_id=self.session_key)) == [
+                Decimal('18.40'), Decimal('23.00'), Decimal('23.00')
+            ]
+
+            with mock.patch.object(CartPosition, 'update_line_price') as update_line_price, \
+                    mock.patch('pretix.base.services.cart.apply_discounts') as apply_discounts:
+                assert cm.recompute_final_prices_and_taxes() == Decimal('0.00')
+            assert not update_line_price.called
+            assert not apply_discounts.called
+
+            cps[0].delete()
+            with mock.patch.object(CartPosition, 'update_line_price') as update_line_price:
+                cm.recompute_final_prices_and_taxes()
+            assert not update_line_price.called
+            assert sorted(cp.price for cp in CartPosition.objects.filter(cart_id=self.session_key)) == [
+                Decimal('23.00'), Decimal('23.00')
+            ]
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_recompute_prices_after_invoice_address_change(self):
+        ia = self._enable_reverse_charge()
+        with scopes_disabled():
+            event = Event.objects.get(pk=self.event.pk)  # event.cache is bound to the cache backend on first use
+            CartPosition.objects.create(
+                expires=now() + timedelta(minutes=10), max_extend=now() + 10 * self.cart_reservation_time,
+                item=self.ticket, price=Decimal('23.00'), event=event, cart_id=self.session_key
+            )
+            cm = CartManager(event=event, cart_id=self.session_key,
+                             sales_channel=self.orga.sales_channels.get(identifier="web"))
+            cm.recompute_final_prices_and_taxes()
+            cp = CartPosition.objects.get(cart_id=self.session_key)
+            assert cp.price == Decimal('23.00')
+            assert cp.tax_rate == Decimal('19.00')
+
+            cm = CartManager(event=event, cart_id=self.session_key, invoice_address=ia,
+                             sales_channel=self.orga.sales_channels.get(identifier="web"))
+            assert cm.recompute_final_prices_and_taxes() == Decimal('-3.67')
+            cp.refresh_from_db()
+            assert cp.price == Decimal('19.33')
+            assert cp.tax_rate == Decimal('0.00')
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_recompute_prices_after_discount_change(self):
+        with scopes_disabled():
+            event = Event.objects.get(pk=self.event.pk)  # event.cache is bound to the cache backend on first use
+            for i in range(2):
+                CartPosition.objects.create(
+                    expires=now() + timedelta(minutes=10), max_extend=now() + 10 * self.cart_reservation_time,
+                    item=self.ticket, price=Decimal('23.00'), event=event, cart_id=self.session_key
+                )
+            cm = CartManager(event=event, cart_id=self.session_key,
+                             sales_channel=self.orga.sales_channels.get(identifier="web"))
+            cm.recompute_final_prices_and_taxes()
+
+            Discount.objects.create(event=event, condition_min_count=2, benefit_discount_matching_percent=20,
+                                    benefit_only_apply_to_cheapest_n_matches=1)
+            cm.recompute_final_prices_and_taxes()
+            assert sorted(cp.price for cp in CartPosition.objects.filter(cart_id=self.session_key)) == [
+                Decimal('18.40'), Decimal('23.00')
+            ]
+
 
 class CartAddonTest(CartTestMixin, TestCase):
     @scopes_disabled()
@@ -0,0 +1,115 @@
+#
+# This file is part of pretix (Community Edition).
+#
+# Copyright (C) 2014-2020  Raphael Michel and contributors
+# Copyright (C) 2020-today pretix GmbH and contributors
+#
+# This program is free software: you can redistribute it and/or modify it under the terms of the GNU Affero General
+# Public License as published by the Free Software Foundation in version 3 of the License.
+#
+# ADDITIONAL TERMS APPLY: Pursuant to Section 7 of the GNU Affero General Public License, additional terms are
+# applicable granting you additional permissions and placing additional restrictions on your usage of this software.
+# Please refer to the pretix LICENSE file to obtain the full terms applicable to this work. If you did not receive
+# this file, see <https://pretix.eu/about/en/license>.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License along with this program.  If not, see
+# <https://www.gnu.org/licenses/>.
+#
+
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.utils.timezone import now
+from django_scopes import scopes_disabled
+from freezegun import freeze_time
+
+from pretix.base.models import CartPosition
+
+from .test_cart import CartTestMixin
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class WaitingRoomTest(CartTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.event.settings.waiting_room_active = True
+        self.event.settings.waiting_room_rate = 1
+        self.event.settings.waiting_room_adaptive = False
+        self.base_url = '/%s/%s/' % (self.orga.slug, self.event.slug)
+
+    def _add_to_cart(self, client=None):
+        return (client or self.client).post(self.base_url + 'cart/add', {
+            'item_%d' % self.ticket.id: '1'
+        })
+
+    def _cart_exists(self):
+        with scopes_disabled():
+            return CartPosition.objects.filter(cart_id=self.session_key, event=self.event).exists()
+
+    def test_queue_and_admission(self):
+        with freeze_time(now()) as frozen:
+            response = self._add_to_cart()
+            assert response.status_code == 302
+            assert response['Location'].startswith(self.base_url + 'waitingroom/')
+            assert not self._cart_exists()
+
+            response = self.client.get(response['Location'])
+            assert response.status_code == 200
+            assert 'Your position in the queue: <strong>1</strong>' in response.content.decode()
+
+            frozen.tick(timedelta(seconds=61))
+            response = self.client.get(self.base_url + 'waitingroom/')
+            assert response.status_code == 302
+            assert response['Location'] == self.base_url
+
+            self._add_to_cart()
+            assert self._cart_exists()
+
+    def test_fifo(self):
+        other = Client()
+        other.get(self.base_url)
+        with freeze_time(now()) as frozen:
+            self.client.get(self.base_url + 'waitingroom/')
+            response = other.get(self.base_url + 'waitingroom/')
+            assert 'Your position in the queue: <strong>2</strong>' in response.content.decode()
+
+            frozen.tick(timedelta(seconds=61))
+            assert other.get(self.base_url + 'waitingroom/').status_code == 200
+            assert self.client.get(self.base_url + 'waitingroom/').status_code == 302
+
+            frozen.tick(timedelta(seconds=60))
+            assert other.get(self.base_url + 'waitingroom/').status_code == 302
+
+    def test_admission_expires(self):
+        with freeze_time(now()) as frozen:
+            self.client.get(self.base_url + 'waitingroom/')
+            frozen.tick(timedelta(seconds=61))
+            assert self.client.get(self.base_url + 'waitingroom/').status_code == 302
+
+            frozen.tick(timedelta(minutes=31))
+            response = self._add_to_cart()
+            assert response['Location'].startswith(self.base_url + 'waitingroom/')
+            assert not self._cart_exists()
+
+    def test_checkout_requires_admission(self):
+        with scopes_disabled():
+            CartPosition.objects.create(
+                event=self.event, cart_id=self.session_key, item=self.ticket,
+                price=23, expires=now() + timedelta(minutes=10)
+            )
+        response = self.client.get(self.base_url + 'checkout/start')
+        assert response.status_code == 302
+        assert response['Location'].startswith(self.base_url + 'waitingroom/')
+
+    def test_disabled(self):
+        self.event.settings.waiting_room_active = False
+        response = self.client.get(self.base_url + 'waitingroom/')
+        assert response.status_code == 302
+        self._add_to_cart()
+        assert self._cart_exists()